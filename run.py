@@ -46,13 +46,14 @@ def main():
 示例:
   python run.py api         # 仅启动API服务
   python run.py frontend    # 仅启动前端
+  python run.py embedding   # 启动共享Embedding服务（多worker共用一个BGE模型）
   python run.py all        # 同时启动API和前端（需要两个终端）
         """
     )
 
     parser.add_argument(
         "service",
-        choices=["api", "frontend", "all"],
+        choices=["api", "frontend", "embedding", "all"],
         help="要启动的服务"
     )
 
@@ -83,6 +84,11 @@ def main():
         from src.api.app import run_server
         run_server(host=args.host, port=args.port)
 
+    elif args.service == "embedding":
+        logger.info("启动共享Embedding服务")
+        from src.embedding.server import run_embedding_server
+        run_embedding_server()
+
     elif args.service == "frontend":
         import subprocess
         logger.info(f"启动前端服务 - {args.host}:{args.frontend_port}")
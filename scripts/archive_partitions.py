@@ -0,0 +1,64 @@
+"""
+分区维护与归档任务
+预建 analysis_results / analysis_messages 的未来月分区，并把超出保留期的分区导出为压缩文件后删除
+
+用法:
+    python scripts/archive_partitions.py                          # 按配置（DB_RETENTION_MONTHS 等）执行
+    python scripts/archive_partitions.py --dry-run                # 只列出将要归档的分区
+    python scripts/archive_partitions.py --retain-months 6 --format parquet
+
+建议每天由 cron / systemd timer 运行一次；重复运行是幂等的
+"""
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+async def run(args) -> dict:
+    from src.config.settings import get_settings
+    from src.database.connection import get_db_manager
+    from src.database.partitions import (
+        PARTITIONED_TABLES, PartitionArchiver, ensure_partitions, list_partitions
+    )
+
+    settings = get_settings()
+    engine = get_db_manager().engine
+    archiver = PartitionArchiver(
+        retain_months=args.retain_months or settings.DB_RETENTION_MONTHS,
+        archive_dir=args.archive_dir or settings.DB_ARCHIVE_DIR,
+        export_format=args.format or settings.DB_ARCHIVE_FORMAT
+    )
+
+    try:
+        if args.dry_run:
+            expired = {}
+            async with engine.connect() as conn:
+                for table in PARTITIONED_TABLES:
+                    expired[table] = archiver.expired(await list_partitions(conn, table))
+            return {"dry_run": True, "expired": expired}
+
+        async with engine.begin() as conn:
+            created = await ensure_partitions(conn, months_ahead=settings.DB_PARTITION_MONTHS_AHEAD)
+        archived = await archiver.run(engine)
+        return {"created": created, "archived": archived}
+    finally:
+        await get_db_manager().close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分区维护与归档")
+    parser.add_argument("--retain-months", type=int, help="在线保留月数（默认 DB_RETENTION_MONTHS）")
+    parser.add_argument("--archive-dir", help="归档目录（默认 DB_ARCHIVE_DIR）")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], help="归档格式（默认 DB_ARCHIVE_FORMAT）")
+    parser.add_argument("--dry-run", action="store_true", help="只列出过期分区，不做修改")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args)), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+LogCompressor 基准测试
+测量大日志上的压缩耗时，并与旧的基于子串查找的保留统计对比
+
+用法:
+    python scripts/benchmark_compressor.py                  # 5万行
+    python scripts/benchmark_compressor.py --lines 200000 --target-kb 64
+    python scripts/benchmark_compressor.py --max-stats-ratio 0.2   # 统计耗时超过压缩耗时20%时失败
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+ERROR_CODES = ["0XCO001", "0XCO005", "0XLA017", "0XDD042"]
+
+
+def generate_log(n_lines: int, seed: int = 42) -> str:
+    """生成带错误、寄存器、噪音和大量重复心跳的合成日志"""
+    rng = random.Random(seed)
+    lines = []
+    for i in range(n_lines):
+        ts = f"2024-01-01 {i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}"
+        roll = rng.random()
+        if roll < 0.03:
+            lines.append(f"{ts} [ERROR] Error Code: {rng.choice(ERROR_CODES)} core {rng.randint(0, 63)} fault")
+        elif roll < 0.06:
+            lines.append(f"{ts} [WARN] register dump reg: 0x{rng.getrandbits(32):08x}")
+        elif roll < 0.08:
+            lines.append("")
+        elif roll < 0.3:
+            lines.append(f"{ts} [INFO] heartbeat ok")
+        else:
+            lines.append(
+                f"{ts} [INFO] module {rng.randint(0, 500)} "
+                f"{rng.choice(['ok', 'busy', 'idle', 'retry'])} value {rng.randint(0, 99999)}"
+            )
+    return "\n".join(lines)
+
+
+def legacy_preserved(compressed: str, lines, line_info, error_codes) -> dict:
+    """旧实现：逐行在压缩文本中做子串查找"""
+    return {
+        "error_codes": sum(1 for c in error_codes if c in compressed),
+        "error_lines": sum(1 for li in line_info if li.get('is_error') and lines[li['index']] in compressed),
+        "register_lines": sum(1 for li in line_info if li.get('has_register') and lines[li['index']] in compressed),
+    }
+
+
+def run(n_lines: int, target_kb: int, enable_templates: bool) -> dict:
+    """运行一次基准"""
+    from src.context.compressor import LogCompressor
+
+    raw_log = generate_log(n_lines)
+    compressor = LogCompressor(target_size_kb=target_kb, enable_templates=enable_templates)
+    fault_features = {"error_codes": ERROR_CODES}
+
+    start = time.perf_counter()
+    result = compressor.compress(raw_log, fault_features)
+    compress_seconds = time.perf_counter() - start
+
+    # 单独测量新旧两种保留统计
+    lines = raw_log.split("\n")
+    line_info = compressor._analyze_lines(lines, set(ERROR_CODES))
+    if enable_templates:
+        from src.context.template_miner import mine_templates
+        compressor._mark_template_repeats(line_info, mine_templates(lines))
+    combined = compressor._merge_lines(
+        lines,
+        compressor._extract_key_lines(line_info),
+        compressor._extract_context_lines(lines, line_info)
+    )
+    compressed, kept_indices, _ = compressor._truncate_if_needed(lines, combined)
+
+    start = time.perf_counter()
+    preserved = compressor._count_preserved(lines, line_info, kept_indices)
+    stats_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    legacy = legacy_preserved(compressed, lines, line_info, ERROR_CODES)
+    legacy_seconds = time.perf_counter() - start
+
+    return {
+        "lines": n_lines,
+        "target_kb": target_kb,
+        "templates": enable_templates,
+        "compress_seconds": round(compress_seconds, 3),
+        "stats_seconds": round(stats_seconds, 4),
+        "legacy_stats_seconds": round(legacy_seconds, 4),
+        "stats_match_legacy": all(preserved[k] == legacy[k] for k in legacy),
+        "compressed_kb": round(result["compressed_size_kb"], 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LogCompressor 基准测试")
+    parser.add_argument("--lines", type=int, default=50000)
+    parser.add_argument("--target-kb", type=int, default=35)
+    parser.add_argument("--no-templates", action="store_true", help="关闭模板折叠")
+    parser.add_argument("--max-stats-ratio", type=float, default=0.0,
+                        help="保留统计耗时占压缩总耗时的上限（>0 时超出则以非零码退出）")
+    args = parser.parse_args()
+
+    from loguru import logger
+    logger.remove()
+
+    result = run(args.lines, args.target_kb, not args.no_templates)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+    if args.max_stats_ratio > 0:
+        ratio = result["stats_seconds"] / max(result["compress_seconds"], 1e-9)
+        if ratio > args.max_stats_ratio:
+            print(f"保留统计耗时占比 {ratio:.1%} 超过上限 {args.max_stats_ratio:.1%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+数据库连接池压测
+模拟多worker部署下每个请求打开多个会话（如 analyze_chip_fault），
+扫描 pool_size / max_overflow 组合，给出吞吐量、请求延迟、借出等待和超时次数
+
+用法:
+    python scripts/benchmark_db_pool.py                                # 4 worker，默认扫描组合
+    python scripts/benchmark_db_pool.py --workers 4 --concurrency 64 --requests 2000
+    python scripts/benchmark_db_pool.py --configs 5:5,10:10,20:5 --max-connections 200
+    python scripts/benchmark_db_pool.py --statement-cache 0            # 对比关闭预编译语句缓存
+
+每个worker是独立子进程、各自一个连接池，与 uvicorn --workers 部署一致；
+workers × (pool_size + max_overflow) 超过 --max-connections 减去预留连接数的组合直接跳过。
+推荐结果为无超时组合中吞吐量最高者（相差5%以内取连接数更少的）
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+DEFAULT_CONFIGS = "5:5,10:0,10:10,15:10,20:10"
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run_worker(options: dict) -> dict:
+    """单个worker：一个连接池上并发执行模拟请求"""
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from src.config.settings import get_settings
+    from src.database.pool import engine_options, POOL_CHECKOUT_SECONDS
+
+    settings = get_settings()
+    pool_settings = SimpleNamespace(
+        DB_POOL_SIZE=options["pool_size"],
+        DB_MAX_OVERFLOW=options["max_overflow"],
+        DB_POOL_TIMEOUT=options["pool_timeout"],
+        DB_POOL_RECYCLE=settings.DB_POOL_RECYCLE,
+        DB_POOL_PRE_PING=settings.DB_POOL_PRE_PING,
+        DB_STATEMENT_CACHE_SIZE=options["statement_cache"]
+    )
+    engine = create_async_engine(settings.DATABASE_URL, **engine_options(pool_settings))
+    session_factory = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    # 一个会话内：一次热点查询 + 模拟该会话持有连接期间的其他工作
+    query = text("SELECT id FROM soc_chips WHERE chip_model = :chip_model")
+    hold = text("SELECT pg_sleep(:seconds)")
+
+    semaphore = asyncio.Semaphore(options["concurrency"])
+    latencies = []
+    errors = 0
+
+    async def _request(i: int):
+        nonlocal errors
+        start = time.perf_counter()
+        async with semaphore:
+            try:
+                for _ in range(options["sessions_per_request"]):
+                    async with session_factory() as session:
+                        await session.execute(query, {"chip_model": f"XC{9000 + i % 8}"})
+                        await session.execute(hold, {"seconds": options["hold_ms"] / 1000})
+            except Exception:
+                errors += 1
+                return
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[_request(i) for i in range(options["requests"])])
+    elapsed = time.perf_counter() - start
+    pool_stats = engine.sync_engine.pool.get_stats()
+    checkout_p99 = POOL_CHECKOUT_SECONDS.quantile(0.99, pool_stats["pool"])
+    await engine.dispose()
+
+    return {
+        "elapsed": elapsed,
+        "completed": len(latencies),
+        "errors": errors,
+        "latencies": latencies,
+        "timeouts": pool_stats["timeouts"],
+        "checkout_p99_ms": round(checkout_p99 * 1000, 2) if checkout_p99 is not None else None
+    }
+
+
+def run_config(args, pool_size: int, max_overflow: int) -> dict:
+    """启动 workers 个子进程压测同一组连接池参数"""
+    per_worker = max(1, args.requests // args.workers)
+    options = {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": args.pool_timeout,
+        "statement_cache": args.statement_cache,
+        "concurrency": max(1, args.concurrency // args.workers),
+        "requests": per_worker,
+        "sessions_per_request": args.sessions_per_request,
+        "hold_ms": args.hold_ms
+    }
+    processes = [
+        subprocess.Popen(
+            [sys.executable, __file__, "--child", json.dumps(options)],
+            stdout=subprocess.PIPE
+        )
+        for _ in range(args.workers)
+    ]
+    results = [json.loads(process.communicate()[0]) for process in processes]
+
+    latencies = [value for result in results for value in result["latencies"]]
+    elapsed = max(result["elapsed"] for result in results)
+    completed = sum(result["completed"] for result in results)
+    checkout_p99 = [result["checkout_p99_ms"] for result in results if result["checkout_p99_ms"] is not None]
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "max_connections_used": args.workers * (pool_size + max_overflow),
+        "requests_per_second": round(completed / elapsed, 1),
+        "latency_p50_ms": round((_percentile(latencies, 0.5) or 0.0) * 1000, 1),
+        "latency_p99_ms": round((_percentile(latencies, 0.99) or 0.0) * 1000, 1),
+        "checkout_p99_ms": max(checkout_p99, default=None),
+        "timeouts": sum(result["timeouts"] for result in results),
+        "errors": sum(result["errors"] for result in results)
+    }
+
+
+def recommend(results: list) -> dict:
+    """无超时/错误的组合中吞吐量最高者；相差5%以内取总连接数更少的"""
+    healthy = [r for r in results if r["timeouts"] == 0 and r["errors"] == 0]
+    if not healthy:
+        return {}
+    best = max(r["requests_per_second"] for r in healthy)
+    candidates = [r for r in healthy if r["requests_per_second"] >= best * 0.95]
+    return min(candidates, key=lambda r: (r["max_connections_used"], -r["requests_per_second"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="数据库连接池压测")
+    parser.add_argument("--workers", type=int, default=4, help="worker进程数（与 uvicorn --workers 一致）")
+    parser.add_argument("--concurrency", type=int, default=64, help="所有worker合计的并发请求数")
+    parser.add_argument("--requests", type=int, default=2000, help="所有worker合计的请求数")
+    parser.add_argument("--sessions-per-request", type=int, default=3, help="每个请求依次打开的会话数")
+    parser.add_argument("--hold-ms", type=float, default=5.0, help="每个会话持有连接的模拟耗时(ms)")
+    parser.add_argument("--pool-timeout", type=float, default=10.0, help="借出连接超时(秒)")
+    parser.add_argument("--statement-cache", type=int, default=500, help="asyncpg预编译语句缓存大小")
+    parser.add_argument("--configs", default=DEFAULT_CONFIGS, help="pool_size:max_overflow 列表，逗号分隔")
+    parser.add_argument("--max-connections", type=int, default=100, help="PostgreSQL max_connections")
+    parser.add_argument("--reserved", type=int, default=10, help="为迁移/管理连接预留的连接数")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(run_worker(json.loads(args.child)))))
+        return
+
+    budget = args.max_connections - args.reserved
+    results = []
+    for item in args.configs.split(","):
+        pool_size, max_overflow = (int(value) for value in item.split(":"))
+        if args.workers * (pool_size + max_overflow) > budget:
+            print(f"跳过 {pool_size}:{max_overflow}：{args.workers} 个worker最多需要 "
+                  f"{args.workers * (pool_size + max_overflow)} 个连接，超过可用 {budget}", file=sys.stderr)
+            continue
+        results.append(run_config(args, pool_size, max_overflow))
+
+    print(json.dumps({"results": results, "recommended": recommend(results)}, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
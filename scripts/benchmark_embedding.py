@@ -0,0 +1,176 @@
+"""
+Embedding后端基准测试
+对比 SentenceTransformer (bge) 与 ONNX Runtime int8 (bge_onnx) 的吞吐量和内存占用
+
+用法:
+    python scripts/benchmark_embedding.py                   # 两个后端各跑一遍
+    python scripts/benchmark_embedding.py --backend bge_onnx --texts 2000
+    python scripts/benchmark_embedding.py --backend bge --concurrency 32   # 并发下逐条线程池 vs 微批执行器
+
+每个后端在独立子进程中运行，RSS 互不影响
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+SAMPLE_TEXTS = [
+    "[ERROR] Error Code: 0XCO001 - CPU fault on core {i}",
+    "DDR控制器ECC不可纠正错误，地址 0x{i:08x}",
+    "NoC router {i} congestion timeout, retry exhausted",
+    "L3 cache coherence violation detected by HA {i}",
+    "芯片失效分析：HBM通道{i}训练失败，降速运行",
+]
+
+
+def _peak_rss_mb() -> float:
+    """当前进程的峰值RSS（MB）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux单位为KB，macOS为字节
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def run_backend(backend: str, n_texts: int, batch_size: int) -> dict:
+    """在当前进程内测试单个后端"""
+    from src.config.settings import get_settings
+    from src.embedding import get_bge_model_manager
+
+    settings = get_settings()
+    texts = [SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)].format(i=i) for i in range(n_texts)]
+
+    rss_before = _peak_rss_mb()
+    start = time.perf_counter()
+    model = get_bge_model_manager().get_model(
+        model_name=settings.EMBEDDING_MODEL,
+        device=settings.EMBEDDING_DEVICE,
+        backend=backend
+    )
+    load_seconds = time.perf_counter() - start
+
+    # 预热
+    model.encode(texts[:batch_size], normalize_embeddings=True, show_progress_bar=False)
+
+    # 单条延迟
+    single_start = time.perf_counter()
+    for text in texts[:50]:
+        model.encode(text, normalize_embeddings=True, show_progress_bar=False)
+    single_ms = (time.perf_counter() - single_start) / 50 * 1000
+
+    # 批量吞吐
+    batch_start = time.perf_counter()
+    model.encode(texts, batch_size=batch_size, normalize_embeddings=True, show_progress_bar=False)
+    batch_seconds = time.perf_counter() - batch_start
+
+    return {
+        "backend": backend,
+        "model": settings.EMBEDDING_MODEL,
+        "load_seconds": round(load_seconds, 2),
+        "single_text_ms": round(single_ms, 2),
+        "texts_per_second": round(n_texts / batch_seconds, 1),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "model_rss_mb": round(_peak_rss_mb() - rss_before, 1),
+    }
+
+
+def run_concurrent(backend: str, n_texts: int, concurrency: int, batch_size: int) -> dict:
+    """并发单条请求：默认线程池逐条encode 与 EmbeddingBatcher 微批的吞吐对比"""
+    import asyncio
+    from src.config.settings import get_settings
+    from src.embedding import EmbeddingBatcher, get_bge_model_manager
+
+    settings = get_settings()
+    texts = [SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)].format(i=i) for i in range(n_texts)]
+    model = get_bge_model_manager().get_model(
+        model_name=settings.EMBEDDING_MODEL,
+        device=settings.EMBEDDING_DEVICE,
+        backend=backend
+    )
+    model.encode(texts[:batch_size], normalize_embeddings=True, show_progress_bar=False)
+
+    async def _drive(encode_one) -> float:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _one(text):
+            async with semaphore:
+                await encode_one(text)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[_one(t) for t in texts])
+        return time.perf_counter() - start
+
+    async def _per_text(text):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            None, lambda: model.encode(text, normalize_embeddings=True, show_progress_bar=False)
+        )
+
+    async def _main():
+        per_text_seconds = await _drive(_per_text)
+        batcher = EmbeddingBatcher(
+            model=model,
+            max_batch_size=batch_size,
+            max_wait_ms=settings.EMBEDDING_BATCH_MAX_WAIT_MS
+        )
+        try:
+            batched_seconds = await _drive(lambda text: batcher.encode(text, normalize=True))
+            return per_text_seconds, batched_seconds, batcher.get_stats()
+        finally:
+            await batcher.close()
+
+    per_text_seconds, batched_seconds, stats = asyncio.run(_main())
+    return {
+        "backend": backend,
+        "concurrency": concurrency,
+        "per_text_texts_per_second": round(n_texts / per_text_seconds, 1),
+        "batched_texts_per_second": round(n_texts / batched_seconds, 1),
+        "avg_batch_texts": stats["avg_batch_texts"],
+        "max_batch_texts": stats["max_batch_texts"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding后端基准测试")
+    parser.add_argument("--backend", choices=["bge", "bge_onnx", "all"], default="all")
+    parser.add_argument("--texts", type=int, default=1000, help="批量测试的文本数")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=0, help="并发请求数（>0 时测试微批执行器）")
+    args = parser.parse_args()
+
+    if args.concurrency > 0:
+        backend = "bge" if args.backend == "all" else args.backend
+        print(json.dumps(
+            run_concurrent(backend, args.texts, args.concurrency, args.batch_size),
+            ensure_ascii=False
+        ))
+        return
+
+    if args.backend != "all":
+        print(json.dumps(run_backend(args.backend, args.texts, args.batch_size), ensure_ascii=False))
+        return
+
+    results = []
+    for backend in ("bge", "bge_onnx"):
+        proc = subprocess.run(
+            [sys.executable, __file__, "--backend", backend,
+             "--texts", str(args.texts), "--batch-size", str(args.batch_size)],
+            capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            print(f"[{backend}] 运行失败:\n{proc.stderr[-2000:]}")
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    print(f"\n{'后端':<10}{'加载(s)':>10}{'单条(ms)':>12}{'吞吐(条/s)':>14}{'峰值RSS(MB)':>14}")
+    for r in results:
+        print(f"{r['backend']:<10}{r['load_seconds']:>10}{r['single_text_ms']:>12}"
+              f"{r['texts_per_second']:>14}{r['peak_rss_mb']:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+登录吞吐量基准测试
+对比密码校验在事件循环内同步执行与放到专用线程池执行时的吞吐量和事件循环阻塞
+
+用法:
+    python scripts/benchmark_login.py                          # 本地对比 inline / pool 两种模式
+    python scripts/benchmark_login.py --logins 200 --concurrency 50 --workers 8
+    python scripts/benchmark_login.py --url http://localhost:8889 --username admin --password xxx
+                                                               # 对运行中的服务压测 /api/v1/auth/login
+
+本地模式在登录的同时运行一个每 10ms 唤醒一次的心跳协程，
+心跳的最大延迟即登录高峰期间其他请求（如进行中的分析）会被卡住的时间
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def _heartbeat(stop: asyncio.Event, lags: list, interval: float = 0.01):
+    """记录事件循环调度延迟"""
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - expected))
+
+
+async def run_local(mode: str, logins: int, concurrency: int, workers: int, rounds: int) -> dict:
+    """不连接数据库，只测密码校验部分"""
+    from passlib.context import CryptContext
+    from src.auth.password_pool import PasswordHashPool
+
+    context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+    password = "benchmark-password"
+    password_hash = context.hash(password)
+    pool = PasswordHashPool(max_workers=workers, max_pending=concurrency, verifier=context.verify)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def _login():
+        # 延迟从提交登录开始计，含排队时间
+        start = time.perf_counter()
+        async with semaphore:
+            if mode == "inline":
+                ok = context.verify(password, password_hash)
+            else:
+                ok = await pool.verify(password, password_hash)
+            assert ok
+            latencies.append(time.perf_counter() - start)
+
+    stop = asyncio.Event()
+    lags = []
+    heartbeat = asyncio.create_task(_heartbeat(stop, lags))
+    start = time.perf_counter()
+    await asyncio.gather(*[_login() for _ in range(logins)])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await heartbeat
+    pool.shutdown()
+
+    return {
+        "mode": mode,
+        "logins": logins,
+        "concurrency": concurrency,
+        "workers": workers if mode == "pool" else 1,
+        "bcrypt_rounds": rounds,
+        "logins_per_second": round(logins / elapsed, 1),
+        "latency_p50_ms": round(_percentile(latencies, 0.5) * 1000, 1),
+        "latency_p99_ms": round(_percentile(latencies, 0.99) * 1000, 1),
+        "loop_lag_max_ms": round(max(lags, default=0.0) * 1000, 1),
+        "loop_lag_p99_ms": round((_percentile(lags, 0.99) or 0.0) * 1000, 1)
+    }
+
+
+async def run_http(url: str, username: str, password: str, logins: int, concurrency: int) -> dict:
+    """对运行中的服务发起真实登录请求"""
+    import aiohttp
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    failures = 0
+
+    async def _login(session):
+        nonlocal failures
+        start = time.perf_counter()
+        async with semaphore:
+            async with session.post(
+                f"{url.rstrip('/')}/api/v1/auth/login",
+                json={"username": username, "password": password}
+            ) as response:
+                await response.read()
+                if response.status != 200:
+                    failures += 1
+            latencies.append(time.perf_counter() - start)
+
+    async with aiohttp.ClientSession() as session:
+        start = time.perf_counter()
+        await asyncio.gather(*[_login(session) for _ in range(logins)])
+        elapsed = time.perf_counter() - start
+
+    return {
+        "mode": "http",
+        "logins": logins,
+        "concurrency": concurrency,
+        "failures": failures,
+        "logins_per_second": round(logins / elapsed, 1),
+        "latency_p50_ms": round(_percentile(latencies, 0.5) * 1000, 1),
+        "latency_p99_ms": round(_percentile(latencies, 0.99) * 1000, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="登录吞吐量基准测试")
+    parser.add_argument("--logins", type=int, default=100, help="登录次数")
+    parser.add_argument("--concurrency", type=int, default=20, help="并发登录数")
+    parser.add_argument("--workers", type=int, default=4, help="密码哈希线程数（pool 模式）")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost（passlib 默认 12）")
+    parser.add_argument("--mode", choices=["inline", "pool", "both"], default="both", help="本地模式")
+    parser.add_argument("--url", help="服务地址，指定时压测真实登录接口")
+    parser.add_argument("--username", default="admin", help="登录用户名（--url 模式）")
+    parser.add_argument("--password", default="", help="登录密码（--url 模式）")
+    args = parser.parse_args()
+
+    if args.url:
+        results = [asyncio.run(run_http(args.url, args.username, args.password, args.logins, args.concurrency))]
+    else:
+        modes = ["inline", "pool"] if args.mode == "both" else [args.mode]
+        results = [
+            asyncio.run(run_local(mode, args.logins, args.concurrency, args.workers, args.rounds))
+            for mode in modes
+        ]
+
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
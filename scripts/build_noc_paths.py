@@ -0,0 +1,124 @@
+"""
+NoC路径表构建脚本
+从Neo4j（或拓扑JSON文件）导出各芯片的NoC拓扑，预计算全源最短路径并保存为npz
+
+用法:
+    python scripts/build_noc_paths.py                          # 导出Neo4j中全部芯片
+    python scripts/build_noc_paths.py --chip XC9000 --chip XC9100
+    python scripts/build_noc_paths.py --from-json topo.json    # {"chip_model": ..., "nodes": [...], "edges": [[a, b], ...]}
+    python scripts/build_noc_paths.py --synthetic 16           # 16x16 mesh 基准测试（不写文件）
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def mesh_topology(size: int) -> dict:
+    """size x size 的2D mesh：每个路由器挂一个端点"""
+    nodes = []
+    edges = []
+    for x in range(size):
+        for y in range(size):
+            router = f"R{x}_{y}"
+            nodes.append({"name": router, "label": "NoCRouter"})
+            nodes.append({"name": f"E{x}_{y}", "label": "NoCEndpoint"})
+            edges.append((router, f"E{x}_{y}"))
+            if x + 1 < size:
+                edges.append((router, f"R{x + 1}_{y}"))
+            if y + 1 < size:
+                edges.append((router, f"R{x}_{y + 1}"))
+    return {"chip_model": f"mesh{size}", "nodes": nodes, "edges": edges}
+
+
+def run_synthetic(size: int, lookups: int):
+    """在合成mesh上测量预计算与查表耗时"""
+    import random
+    from src.database.noc_paths import NoCPathTable
+
+    topo = mesh_topology(size)
+    start = time.perf_counter()
+    table = NoCPathTable.build(topo["chip_model"], topo["nodes"], topo["edges"])
+    build_seconds = time.perf_counter() - start
+
+    rng = random.Random(0)
+    names = [n["name"] for n in topo["nodes"] if n["label"] == "NoCEndpoint"]
+    pairs = [(rng.choice(names), rng.choice(names)) for _ in range(lookups)]
+
+    start = time.perf_counter()
+    for source, target in pairs:
+        table.hop_count(source, target)
+    hop_us = (time.perf_counter() - start) / lookups * 1e6
+
+    start = time.perf_counter()
+    for source, target in pairs:
+        table.path(source, target)
+    path_us = (time.perf_counter() - start) / lookups * 1e6
+
+    print(json.dumps({
+        "nodes": table.num_nodes,
+        "edges": table.num_edges,
+        "build_seconds": round(build_seconds, 4),
+        "table_mb": round((table.dist.nbytes + table.parent.nbytes) / 1e6, 2),
+        "hop_count_us": round(hop_us, 2),
+        "path_us": round(path_us, 2)
+    }, indent=2))
+
+
+async def build_from_neo4j(chip_models):
+    """从Neo4j导出并构建"""
+    from src.database.neo4j_schema import KnowledgeGraphRepository, close_neo4j
+    from src.database.noc_paths import build_noc_path_tables
+
+    repository = KnowledgeGraphRepository()
+    try:
+        if not chip_models:
+            async with repository.driver.session() as session:
+                result = await session.run("MATCH (c:Chip) RETURN c.model AS model")
+                chip_models = [r["model"] for r in await result.data()]
+        return await build_noc_path_tables(repository, chip_models)
+    finally:
+        await close_neo4j()
+
+
+def build_from_json(path: str):
+    """从拓扑JSON文件构建"""
+    from src.database.noc_paths import NoCPathTable, get_noc_path_registry
+
+    topo = json.loads(Path(path).read_text(encoding="utf-8"))
+    start = time.perf_counter()
+    table = NoCPathTable.build(topo["chip_model"], topo["nodes"], [tuple(e) for e in topo["edges"]])
+    get_noc_path_registry().put(table)
+    return {table.chip_model: {
+        "nodes": table.num_nodes,
+        "edges": table.num_edges,
+        "seconds": round(time.perf_counter() - start, 4)
+    }}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="构建NoC全源最短路径表")
+    parser.add_argument("--chip", action="append", default=[], help="芯片型号（可多次指定，默认全部）")
+    parser.add_argument("--from-json", help="从拓扑JSON文件构建，不连接Neo4j")
+    parser.add_argument("--synthetic", type=int, help="在 NxN mesh 上做基准测试")
+    parser.add_argument("--lookups", type=int, default=10000, help="基准测试查询次数")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        run_synthetic(args.synthetic, args.lookups)
+        return
+
+    if args.from_json:
+        summary = build_from_json(args.from_json)
+    else:
+        summary = asyncio.run(build_from_neo4j(args.chip))
+
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+知识图谱快照导出脚本
+从Neo4j批量导出各芯片的图投影，写入本地快照供 LocalGraphStore 加载
+
+用法:
+    python scripts/export_kg_snapshot.py                        # 导出全部芯片到 KG_SNAPSHOT_PATH
+    python scripts/export_kg_snapshot.py --chip XC9000 --output ./data/kg_snapshot.json
+    python scripts/export_kg_snapshot.py --check                # 加载已有快照并测量推理耗时
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+async def export(chip_models, output: Path):
+    """从Neo4j导出快照"""
+    from src.database.local_graph import LocalGraphStore
+    from src.database.neo4j_schema import KnowledgeGraphRepository, close_neo4j
+
+    repository = KnowledgeGraphRepository()
+    try:
+        if not chip_models:
+            async with repository.driver.session() as session:
+                result = await session.run("MATCH (c:Chip) RETURN c.model AS model")
+                chip_models = [r["model"] for r in await result.data()]
+        store = await LocalGraphStore.export_from_neo4j(repository, chip_models)
+    finally:
+        await close_neo4j()
+
+    store.save_snapshot(output)
+    return store.get_stats()
+
+
+def check(path: Path, iterations: int):
+    """加载快照，对每个芯片的全部错误码做推理并统计耗时"""
+    from src.database.local_graph import LocalGraphStore
+
+    store = LocalGraphStore.from_snapshot(path)
+    timings = {}
+    for chip_model in store.chip_models:
+        projection = store.get(chip_model)
+        codes = list(projection.error_code_index)
+        modules = [m["name"] for m in projection.modules.values() if m["name"]]
+        start = time.perf_counter()
+        for _ in range(iterations):
+            store.infer(chip_model, modules[:2], codes[:3])
+        timings[chip_model] = round((time.perf_counter() - start) / iterations * 1e6, 2)
+    return {**store.get_stats(), "infer_us": timings}
+
+
+def main():
+    from src.config.settings import get_settings
+
+    parser = argparse.ArgumentParser(description="导出本地知识图谱快照")
+    parser.add_argument("--chip", action="append", default=[], help="芯片型号（可多次指定，默认全部）")
+    parser.add_argument("--output", default=get_settings().KG_SNAPSHOT_PATH, help="快照路径")
+    parser.add_argument("--check", action="store_true", help="只加载已有快照并测量推理耗时")
+    parser.add_argument("--iterations", type=int, default=1000, help="--check 时每个芯片的推理次数")
+    args = parser.parse_args()
+
+    output = Path(args.output)
+    if args.check:
+        summary = check(output, args.iterations)
+    else:
+        summary = asyncio.run(export(args.chip, output))
+
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
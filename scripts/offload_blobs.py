@@ -0,0 +1,90 @@
+"""
+存量大文本迁移到大对象存储
+把 analysis_results.raw_log / infer_report 和 analysis_messages.content 中超过 BLOB_INLINE_MAX_BYTES 的内联文本
+写入大对象存储，行内改为引用；之后 VACUUM 即可回收TOAST空间
+
+用法:
+    python scripts/offload_blobs.py                  # 按配置的后端迁移
+    python scripts/offload_blobs.py --batch-size 200 --dry-run
+
+可重复执行：已是引用的行不会再被选中
+"""
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+# (表, 行定位列, 文本列)
+TARGETS = (
+    ("analysis_results", ("id", "created_at"), "raw_log"),
+    ("analysis_results", ("id", "created_at"), "infer_report"),
+    ("analysis_messages", ("message_id", "created_at"), "content"),
+)
+
+
+async def offload_column(engine, store, table, keys, column, batch_size, inline_max, dry_run) -> int:
+    from sqlalchemy import text
+    from src.database.blobs import BLOB_REF_PREFIX
+
+    where = f"octet_length({column}) > :inline_max AND {column} NOT LIKE :prefix"
+    params = {"inline_max": inline_max, "prefix": f"{BLOB_REF_PREFIX}%"}
+    if dry_run:
+        async with engine.connect() as conn:
+            return (await conn.execute(text(f"SELECT count(*) FROM {table} WHERE {where}"), params)).scalar()
+
+    select_sql = text(f"SELECT {', '.join(keys)}, {column} FROM {table} WHERE {where} LIMIT :limit")
+    update_sql = text(
+        f"UPDATE {table} SET {column} = :ref WHERE "
+        + " AND ".join(f"{key} = :{key}" for key in keys)
+    )
+    total = 0
+    while True:
+        async with engine.begin() as conn:
+            rows = (await conn.execute(select_sql, {**params, "limit": batch_size})).all()
+            if not rows:
+                return total
+            for row in rows:
+                ref = await store.offload(row[-1])
+                await conn.execute(update_sql, {"ref": ref, **{key: row[i] for i, key in enumerate(keys)}})
+        total += len(rows)
+        print(f"{table}.{column}: {total}", file=sys.stderr)
+
+
+async def run(args) -> dict:
+    from src.config.settings import get_settings
+    from src.database.blobs import BlobStore, get_blob_store
+    from src.database.connection import get_db_manager
+
+    settings = get_settings()
+    store = get_blob_store()
+    if not isinstance(store, BlobStore):
+        raise SystemExit("BLOB_STORE_BACKEND=none，未启用大对象存储")
+    engine = get_db_manager().engine
+
+    report = {}
+    try:
+        for table, keys, column in TARGETS:
+            report[f"{table}.{column}"] = await offload_column(
+                engine, store, table, keys, column,
+                args.batch_size, settings.BLOB_INLINE_MAX_BYTES, args.dry_run
+            )
+    finally:
+        await get_db_manager().close()
+    return {"dry_run": args.dry_run, "rows": report, "blob_store": store.get_stats()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="存量大文本迁移到大对象存储")
+    parser.add_argument("--batch-size", type=int, default=500, help="每个事务处理的行数")
+    parser.add_argument("--dry-run", action="store_true", help="只统计待迁移行数")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args)), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+导入耗时分析
+在子进程中以 python -X importtime 导入目标模块，按顶层包汇总耗时
+
+用法:
+    python scripts/profile_imports.py                       # 分析 src.api.app
+    python scripts/profile_imports.py --module src.agents.workflow --top 30
+"""
+import argparse
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# import time: self [us] | cumulative | imported package
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def profile_imports(module: str):
+    """
+    导入模块并解析 -X importtime 输出
+
+    Returns:
+        (各模块记录列表, 子进程退出码)，记录为 (模块名, 自身耗时us, 累计耗时us, 缩进层级)
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=PROJECT_ROOT
+    )
+
+    records = []
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            records.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+
+    return records, proc.returncode, proc.stderr
+
+
+def summarize_by_package(records):
+    """按顶层包汇总自身耗时（各模块自身耗时之和即为该包的总导入开销）"""
+    totals = defaultdict(lambda: {"self_us": 0, "modules": 0})
+    for name, self_us, _, _ in records:
+        package = name.split(".")[0]
+        totals[package]["self_us"] += self_us
+        totals[package]["modules"] += 1
+    return sorted(totals.items(), key=lambda item: item[1]["self_us"], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导入耗时分析")
+    parser.add_argument("--module", default="src.api.app", help="要导入的模块")
+    parser.add_argument("--top", type=int, default=20, help="显示前N项")
+    args = parser.parse_args()
+
+    records, returncode, stderr = profile_imports(args.module)
+    if not records:
+        print(f"未获取到导入记录（退出码 {returncode}）:\n{stderr[-2000:]}")
+        sys.exit(1)
+
+    total_us = sum(self_us for _, self_us, _, _ in records)
+    print(f"导入 {args.module}: {len(records)} 个模块, 合计 {total_us / 1e6:.2f}s")
+    if returncode != 0:
+        print(f"注意: 导入过程以退出码 {returncode} 结束，以下为失败前的记录")
+
+    print(f"\n按顶层包（前{args.top}）:")
+    print(f"{'包':<32}{'模块数':>8}{'耗时(ms)':>12}{'占比':>8}")
+    for package, info in summarize_by_package(records)[:args.top]:
+        print(f"{package:<32}{info['modules']:>8}{info['self_us'] / 1000:>12.1f}"
+              f"{info['self_us'] / total_us:>8.1%}")
+
+    print(f"\n累计耗时最高的模块（前{args.top}）:")
+    print(f"{'模块':<56}{'累计(ms)':>12}")
+    for name, _, cumulative_us, level in sorted(records, key=lambda r: r[2], reverse=True)[:args.top]:
+        print(f"{name:<56}{cumulative_us / 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,5 +3,8 @@
 -- Enable pgvector extension (must be installed first)
 CREATE EXTENSION IF NOT EXISTS vector;
 
+-- Trigram matching for lexical case retrieval (failure_cases.symptoms)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 -- Create database tables if they don't exist
 -- Note: Tables are created automatically by SQLAlchemy
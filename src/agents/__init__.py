@@ -1,18 +1,31 @@
 """
 芯片失效分析AI Agent系统 - Agent包初始化
 导出所有Agent和工作流
+
+导出按需加载：导入 src.agents 子模块（如 agent2.correction_processor）
+不会连带加载 LangGraph 工作流
 """
 
-from .agent1 import Agent1, Agent1State
-from .agent2 import Agent2, Agent2State
-from .workflow import ChipFaultWorkflow, get_workflow, AgentState
+import importlib
+
+_EXPORTS = {
+    "Agent1": ".agent1",
+    "Agent1State": ".agent1",
+    "Agent2": ".agent2",
+    "Agent2State": ".agent2",
+    "ChipFaultWorkflow": ".workflow",
+    "get_workflow": ".workflow",
+    "AgentState": ".workflow"
+}
+
+__all__ = list(_EXPORTS)
+
 
-__all__ = [
-    "Agent1",
-    "Agent1State",
-    "Agent2",
-    "Agent2State",
-    "ChipFaultWorkflow",
-    "get_workflow",
-    "AgentState"
-]
+def __getattr__(name):
+    """首次访问时导入对应子模块"""
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
@@ -4,7 +4,6 @@ Agent1 - ��理核心模块
 """
 
 from typing import Dict, List, Any, Optional
-from langchain.tools import tool
 from loguru import logger
 
 from .log_parser import LogParserAgent
@@ -162,6 +161,12 @@ class Agent1:
         # 知识图谱推理
         kg_result = await self._reason_with_kg()
 
+        # NoC路径分析：日志中出现的模块之间的最短路径与共经路由器（查预计算路径表）
+        if "noc_router" in self.state.fault_features.get("modules", []):
+            noc_analysis = await self._analyze_noc_paths()
+            if noc_analysis and kg_result:
+                kg_result["noc_analysis"] = noc_analysis
+
         # 案例匹配推理
         case_match_result = await self._reason_with_case_matching()
 
@@ -187,6 +192,26 @@ class Agent1:
         # 融合推理结果
         await self._fuse_reasoning_results()
 
+    async def _analyze_noc_paths(self) -> Optional[Dict]:
+        """NoC路径表分析，结果写入故障特征（随分析结果落库 noc_path / noc_congestion_info）"""
+        from src.database.noc_paths import analyze_noc_paths
+
+        if not self.state.chip_model or not self.state.raw_log:
+            return None
+        try:
+            result = await analyze_noc_paths(self.state.chip_model, self.state.raw_log)
+        except Exception as e:
+            logger.warning(f"[{self.name}] NoC路径分析失败: {e}")
+            return None
+        if result is None:
+            return None
+
+        self.state.fault_features["noc_module_pairs"] = result["module_pairs"]
+        self.state.fault_features["noc_path"] = result["noc_path"]
+        self.state.fault_features["noc_congestion_info"] = result["congestion"]
+        logger.info(f"[{self.name}] NoC路径分析: {len(result['module_pairs'])} 个模块对，路径 {result['noc_path']}")
+        return result
+
     async def _reason_with_chip_tool(self) -> Dict:
         """基于规则引擎的芯片工具推理"""
         # 提取故障特征
@@ -268,8 +293,15 @@ class Agent1:
         if not modules and not error_codes:
             return result
 
-        # 简单实现（实际应调用Neo4j）
-        # 模拟知识图谱匹配：检查是否有足够的证据
+        # 优先在本地知识图谱快照上推理（不访问Neo4j）
+        from src.config.settings import get_settings
+        if get_settings().KG_LOCAL_REASONING:
+            from src.database.local_graph import get_local_graph_store
+            local_result = get_local_graph_store().infer(self.state.chip_model, modules, error_codes)
+            if local_result is not None:
+                return local_result
+        # 快照中没有该芯片、或模块和错误码都未命中图时按模块名/错误码规则匹配
+        # 快照中没有该芯片时按模块名/错误码规则匹配
         evidence_count = 0
         matched_module = None
         matched_domain = "unknown"
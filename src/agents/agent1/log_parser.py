@@ -7,9 +7,10 @@ Agent1 - 日志解析Agent
 """
 
 from typing import Dict, List, Any, Optional
-from langchain.tools import tool
 from loguru import logger
 
+from ...monitoring.metrics import timed
+
 
 class LogParserAgent:
     """日志解析Agent类"""
@@ -19,6 +20,7 @@ class LogParserAgent:
         self.name = "LogParserAgent"
         self.description = "解析芯片故障日志，提取标准化特征"
 
+    @timed("log_parse")
     async def parse(
         self,
         chip_model: str,
@@ -266,26 +266,9 @@ class ReasoningAgent:
         logger.info("[ReasoningAgent] 执行案例匹配推理")
 
         try:
-            from src.mcp.server import get_mcp_server
-            mcp_server = get_mcp_server()
-
-            # 生成特征向量（使用真实embedding模型）
-            feature_vector = await self._generate_feature_vector(features)
-
-            # 调用pgvector搜索工具
-            search_result = await mcp_server.call_tool(
-                "pgvector_search",
-                {
-                    "feature_vector": feature_vector,
-                    "chip_model": chip_model,
-                    "top_k": 5,
-                    "threshold": 0.6
-                }
-            )
-
-            import json
-            parsed_result = json.loads(search_result[0].text)
+            parsed_result = await self._search_similar_cases(chip_model, features)
             similar_cases = parsed_result.get("results", [])
+            retrieval_mode = parsed_result.get("mode", "vector")
 
             if not similar_cases:
                 return {
@@ -331,7 +314,8 @@ class ReasoningAgent:
                     "match_count": case_count,
                     "root_cause": top_case.get("root_cause"),
                     "solution": top_case.get("solution"),
-                    "reasoning": [f"匹配到{case_count}个相似案例 (平均相似度: {avg_similarity:.2f})"],
+                    "retrieval_mode": retrieval_mode,
+                    "reasoning": [f"匹配到{case_count}个相似案例 (平均相似度: {avg_similarity:.2f}, 检索: {retrieval_mode})"],
                     "evidence_strength": evidence_strength
                 },
                 "confidence": confidence
@@ -349,6 +333,39 @@ class ReasoningAgent:
                 "confidence": 0.0
             }
 
+    async def _search_similar_cases(
+        self,
+        chip_model: str,
+        features: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """检索相似案例（默认混合检索，CASE_RETRIEVAL_MODE=vector 时只走pgvector）"""
+        from src.config.settings import get_settings
+
+        if get_settings().CASE_RETRIEVAL_MODE != "vector":
+            from src.mcp.tools.hybrid_search import HybridCaseSearch
+            search = HybridCaseSearch(embed=self._generate_feature_vector)
+            return await search.search(chip_model, features, top_k=5, threshold=0.6)
+
+        from src.mcp.server import get_mcp_server
+        mcp_server = get_mcp_server()
+
+        # 生成特征向量（使用真实embedding模型）
+        feature_vector = await self._generate_feature_vector(features)
+
+        # 调用pgvector搜索工具
+        search_result = await mcp_server.call_tool(
+            "pgvector_search",
+            {
+                "feature_vector": feature_vector,
+                "chip_model": chip_model,
+                "top_k": 5,
+                "threshold": 0.6
+            }
+        )
+
+        import json
+        return json.loads(search_result[0].text)
+
     def _fuse_results(
         self,
         source_results: Dict[str, Dict],
@@ -4,7 +4,6 @@ Agent2 - 专家交互与知识循环模块
 """
 
 from typing import Dict, List, Any, Optional
-from langchain.tools import tool
 from loguru import logger
 from datetime import datetime
 from uuid import uuid4
@@ -8,12 +8,14 @@ from loguru import logger
 from datetime import datetime
 from uuid import uuid4
 
-from sqlalchemy import select, and_, or_
+from sqlalchemy import select, and_, or_, func, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ...database.connection import get_db_manager
+from ...database.pagination import encode_cursor, decode_cursor
 from ...database.models import ExpertCorrection
 from ...database.rbac_models import User, SystemRoles
+from .expert_scheduler import get_expert_scheduler
 
 
 class CorrectionProcessor:
@@ -71,6 +73,7 @@ class CorrectionProcessor:
             session.add(correction_record)
             await session.commit()
             await session.refresh(correction_record)
+            get_expert_scheduler().on_correction_created(correction_record.submitted_by, pending=False)
 
             logger.info(f"[{self.name}] 修正记录创建成功: {correction_record.correction_id}")
 
@@ -215,6 +218,95 @@ class CorrectionProcessor:
 
             return correction_list
 
+    async def list_corrections(
+        self,
+        status: Optional[str] = "pending",
+        expert_id: Optional[str] = None,
+        submitted_after: Optional[datetime] = None,
+        submitted_before: Optional[datetime] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        offset: int = 0
+    ) -> Dict[str, Any]:
+        """
+        分页查询修正（筛选、排序、分页都在SQL中完成）
+
+        按提交时间倒序，correction_id 作为同一时间的次序键；
+        传入 cursor 时按键集分页（offset 忽略），否则按 offset 分页
+
+        Args:
+            status: 审批状态（None 表示不限）
+            expert_id: 提交者ID
+            submitted_after: 提交时间下限（含）
+            submitted_before: 提交时间上限（不含）
+            limit: 每页条数
+            cursor: 上一页返回的 next_cursor
+            offset: 跳过条数（无游标时）
+
+        Returns:
+            {"items": [...], "total": 满足筛选条件的总数, "next_cursor": 下一页游标或None}
+
+        Raises:
+            ValueError: 游标无效
+        """
+        filters = []
+        if status:
+            filters.append(ExpertCorrection.approval_status == status)
+        if expert_id:
+            filters.append(ExpertCorrection.submitted_by == expert_id)
+        if submitted_after:
+            filters.append(ExpertCorrection.submitted_at >= submitted_after)
+        if submitted_before:
+            filters.append(ExpertCorrection.submitted_at < submitted_before)
+
+        page_stmt = select(ExpertCorrection).where(*filters)
+        if cursor:
+            last_submitted_at, last_correction_id = decode_cursor(cursor, 2)
+            page_stmt = page_stmt.where(
+                tuple_(ExpertCorrection.submitted_at, ExpertCorrection.correction_id)
+                < tuple_(last_submitted_at, last_correction_id)
+            )
+        elif offset:
+            page_stmt = page_stmt.offset(offset)
+        # 多取一条判断是否还有下一页
+        page_stmt = page_stmt.order_by(
+            ExpertCorrection.submitted_at.desc(),
+            ExpertCorrection.correction_id.desc()
+        ).limit(limit + 1)
+
+        count_stmt = select(func.count()).select_from(ExpertCorrection).where(*filters)
+
+        db_manager = get_db_manager()
+        async with db_manager.get_session() as session:
+            rows = (await session.execute(page_stmt)).scalars().all()
+            total = (await session.execute(count_stmt)).scalar_one()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = None
+        if has_more and rows:
+            next_cursor = encode_cursor(rows[-1].submitted_at, rows[-1].correction_id)
+
+        return {
+            "items": [self._correction_to_dict(correction) for correction in rows],
+            "total": total,
+            "next_cursor": next_cursor
+        }
+
+    @staticmethod
+    def _correction_to_dict(correction: ExpertCorrection) -> Dict[str, Any]:
+        return {
+            "correction_id": correction.correction_id,
+            "analysis_id": correction.analysis_id,
+            "submitted_by": correction.submitted_by,
+            "submitted_at": correction.submitted_at.isoformat() if correction.submitted_at else None,
+            "approval_status": correction.approval_status,
+            "approved_by": correction.approved_by,
+            "correction_reason": correction.correction_reason,
+            "original_result": correction.original_result,
+            "corrected_result": correction.corrected_result
+        }
+
     async def approve_correction(
         self,
         correction_id: str,
@@ -250,6 +342,7 @@ class CorrectionProcessor:
                 }
 
             # 更新状态
+            was_pending = correction.approval_status == "pending"
             correction.approval_status = "approved"
             correction.approved_by = approver_id
             correction.approved_at = datetime.utcnow()
@@ -260,6 +353,8 @@ class CorrectionProcessor:
                 correction.correction_reason = f"{original_reason}\n\n[审批意见] {comments}"
 
             await session.commit()
+            if was_pending:
+                get_expert_scheduler().on_correction_resolved(correction.submitted_by)
 
             logger.info(f"[{self.name}] 修正批准成功: {correction_id}")
 
@@ -303,6 +398,7 @@ class CorrectionProcessor:
                 }
 
             # 更新状态
+            was_pending = correction.approval_status == "pending"
             correction.approval_status = "rejected"
             correction.approved_by = approver_id
             correction.approved_at = datetime.utcnow()
@@ -312,6 +408,8 @@ class CorrectionProcessor:
             correction.correction_reason = f"{original_reason}\n\n[拒绝原因] {reason}"
 
             await session.commit()
+            if was_pending:
+                get_expert_scheduler().on_correction_resolved(correction.submitted_by)
 
             logger.info(f"[{self.name}] 修正拒绝成功: {correction_id}")
 
@@ -7,14 +7,12 @@ from typing import Dict, List, Any, Optional
 from loguru import logger
 from datetime import datetime, timedelta
 from uuid import uuid4
-import random
 
-from sqlalchemy import select, and_
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
 
 from ...database.connection import get_db_manager
-from ...database.rbac_models import User, SystemRoles
 from ...database.models import ExpertCorrection
+from .expert_scheduler import get_expert_scheduler
 
 
 class ExpertInteractionAgent:
@@ -48,108 +46,52 @@ class ExpertInteractionAgent:
         """
         logger.info(f"[{self.name}] 分配专家 - 失效域: {failure_domain}, 芯片: {chip_model}")
 
-        db_manager = get_db_manager()
-        async with db_manager.get_session() as session:
-            # 查找具有专家角色的用户
-            stmt = select(User).join(User.roles).where(
-                and_(
-                    User.is_active == True,
-                    Role.name == SystemRoles.EXPERT
-                )
-            )
-
-            # 如果指定了部门，筛选部门
-            if department:
-                stmt = stmt.where(User.department == department)
-
-            result = await session.execute(stmt)
-            experts = result.scalars().all()
-
-            if not experts:
-                logger.warning(f"[{self.name}] 没有找到可用的专家")
-                return {
-                    "success": False,
-                    "message": "没有可用的专家",
-                    "expert_id": None
-                }
-
-            # 选择专家（简单随机选择，实际可以基于负载、专业领域等）
-            expert = self._select_expert(experts, failure_domain, chip_model)
-
-            if not expert:
-                return {
-                    "success": False,
-                    "message": "没有匹配的专家",
-                    "expert_id": None
-                }
-
-            # 创建专家介入记录
-            correction = ExpertCorrection(
-                correction_id=f"EC_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{uuid4().hex[:6]}".upper(),
-                analysis_id=session_id,
-                original_result={},  # 稍后填充
-                corrected_result={},  # 等待专家填充
-                correction_reason="",
-                submitted_by=expert.user_id,
-                approval_status="pending",
-                is_applied=False
-            )
-
-            session.add(correction)
-            await session.commit()
-
-            logger.info(f"[{self.name}] 专家分配成功 - 专家: {expert.username}")
+        scheduler = get_expert_scheduler()
+        await scheduler.ensure_loaded()
 
+        # 按负载和领域匹配选出专家，并立即计入待处理任务
+        expert = scheduler.assign(failure_domain, department)
+        if not expert:
+            logger.warning(f"[{self.name}] 没有找到可用的专家")
             return {
-                "success": True,
-                "expert_id": expert.user_id,
-                "expert_name": expert.full_name or expert.username,
-                "expert_department": expert.department,
-                "expert_position": expert.position,
-                "correction_id": correction.correction_id,
-                "assigned_at": datetime.utcnow().isoformat()
+                "success": False,
+                "message": "没有可用的专家",
+                "expert_id": None
             }
 
-    def _select_expert(
-        self,
-        experts: List[User],
-        failure_domain: str,
-        chip_model: str
-    ) -> Optional[User]:
-        """
-        选择最合适的专家
-
-        Args:
-            experts: 专家列表
-            failure_domain: 失效域
-            chip_model: 芯片型号
+        # 创建专家介入记录
+        try:
+            db_manager = get_db_manager()
+            async with db_manager.get_session() as session:
+                correction = ExpertCorrection(
+                    correction_id=f"EC_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{uuid4().hex[:6]}".upper(),
+                    analysis_id=session_id,
+                    original_result={},  # 稍后填充
+                    corrected_result={},  # 等待专家填充
+                    correction_reason="",
+                    submitted_by=expert.user_id,
+                    approval_status="pending",
+                    is_applied=False
+                )
 
-        Returns:
-            选择的专家
-        """
-        # 优先选择匹配部门的专家
-        domain_departments = {
-            "compute": ["研发部", "CPU设计部"],
-            "cache": ["研发部", "缓存设计部"],
-            "interconnect": ["研发部", "互连设计部"],
-            "memory": ["研发部", "存储设计部"],
-            "io": ["研发部", "IO设计部"]
+                session.add(correction)
+                await session.commit()
+        except Exception:
+            scheduler.release(expert.user_id)
+            raise
+
+        logger.info(f"[{self.name}] 专家分配成功 - 专家: {expert.username}, 待处理: {expert.pending}")
+
+        return {
+            "success": True,
+            "expert_id": expert.user_id,
+            "expert_name": expert.full_name or expert.username,
+            "expert_department": expert.department,
+            "expert_position": expert.position,
+            "correction_id": correction.correction_id,
+            "assigned_at": datetime.utcnow().isoformat()
         }
 
-        preferred_depts = domain_departments.get(failure_domain, [])
-
-        # 先筛选匹配部门的专家
-        matched_experts = [
-            e for e in experts
-            if e.department and any(dept in e.department for dept in preferred_depts)
-        ]
-
-        if matched_experts:
-            return random.choice(matched_experts)
-
-        # 如果没有匹配的，随机选择一个专家
-        return random.choice(experts)
-
     async def get_expert_workload(self, expert_id: str) -> Dict[str, Any]:
         """
         获取专家工作负载
@@ -160,36 +102,33 @@ class ExpertInteractionAgent:
         Returns:
             工作负载信息
         """
-        db_manager = get_db_manager()
-        async with db_manager.get_session() as session:
-            # 查询待处理的专家修正数量
-            stmt = select(ExpertCorrection).where(
-                and_(
-                    ExpertCorrection.submitted_by == expert_id,
-                    ExpertCorrection.approval_status == "pending"
-                )
-            )
-            result = await session.execute(stmt)
-            pending_count = len(result.all())
-
-            # 查询已完成的专家修正数量（最近30天）
-            thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-            stmt = select(ExpertCorrection).where(
-                and_(
-                    ExpertCorrection.submitted_by == expert_id,
-                    ExpertCorrection.submitted_at >= thirty_days_ago
-                )
-            )
-            result = await session.execute(stmt)
-            completed_count = len(result.all())
-
+        scheduler = get_expert_scheduler()
+        await scheduler.ensure_loaded()
+        expert = scheduler.get(expert_id)
+        if expert is not None:
             return {
                 "expert_id": expert_id,
-                "pending_tasks": pending_count,
-                "completed_last_30_days": completed_count,
-                "workload_score": pending_count * 2 + completed_count * 0.1
+                "pending_tasks": expert.pending,
+                "completed_last_30_days": expert.recent,
+                "workload_score": expert.workload_score
             }
 
+        # 非专家角色用户：直接计数
+        db_manager = get_db_manager()
+        async with db_manager.get_session() as session:
+            stmt = select(
+                func.count().filter(ExpertCorrection.approval_status == "pending"),
+                func.count().filter(ExpertCorrection.submitted_at >= datetime.utcnow() - timedelta(days=30))
+            ).where(ExpertCorrection.submitted_by == expert_id)
+            pending_count, completed_count = (await session.execute(stmt)).one()
+
+        return {
+            "expert_id": expert_id,
+            "pending_tasks": pending_count,
+            "completed_last_30_days": completed_count,
+            "workload_score": pending_count * 2 + completed_count * 0.1
+        }
+
     async def notify_expert(
         self,
         expert_id: str,
@@ -230,38 +169,11 @@ class ExpertInteractionAgent:
         Returns:
             专家列表
         """
-        db_manager = get_db_manager()
-        async with db_manager.get_session() as session:
-            stmt = select(User).join(User.roles).where(
-                and_(
-                    User.is_active == True,
-                    Role.name == SystemRoles.EXPERT
-                )
-            )
-
-            if department:
-                stmt = stmt.where(User.department == department)
-
-            result = await session.execute(stmt)
-            experts = result.scalars().all()
-
-            expert_list = []
-            for expert in experts:
-                # 获取工作负载
-                workload = await self.get_expert_workload(expert.user_id)
-
-                expert_list.append({
-                    "expert_id": expert.user_id,
-                    "username": expert.username,
-                    "full_name": expert.full_name,
-                    "department": expert.department,
-                    "position": expert.position,
-                    "pending_tasks": workload["pending_tasks"],
-                    "completed_last_30_days": workload["completed_last_30_days"],
-                    "workload_score": workload["workload_score"]
-                })
-
-            # 按工作负载排序
-            expert_list.sort(key=lambda x: x["workload_score"])
-
-            return expert_list
+        scheduler = get_expert_scheduler()
+        await scheduler.ensure_loaded()
+
+        # 按工作负载排序；指定失效域时擅长该领域的专家排在前面
+        experts = scheduler.list_experts(department)
+        if failure_domain:
+            experts.sort(key=lambda expert: failure_domain not in expert.domains)
+        return [expert.to_dict() for expert in experts]
@@ -0,0 +1,301 @@
+"""
+Agent2 - 专家调度器
+在内存中维护每位专家的待处理任务数和擅长失效域，按负载与领域匹配度分配，
+分配只做堆顶查询 O(log n)，不再每次查询全部专家及其负载
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+
+# 失效域 -> 擅长该领域的部门关键字（用户 attributes.expert_domains 可显式指定）
+DOMAIN_DEPARTMENTS = {
+    "compute": ["研发部", "CPU设计部"],
+    "cache": ["研发部", "缓存设计部"],
+    "interconnect": ["研发部", "互连设计部"],
+    "memory": ["研发部", "存储设计部"],
+    "io": ["研发部", "IO设计部"]
+}
+
+
+def infer_expert_domains(department: Optional[str], attributes: Optional[Dict[str, Any]] = None) -> FrozenSet[str]:
+    """专家擅长的失效域：显式配置优先，否则按部门推断"""
+    explicit = (attributes or {}).get("expert_domains")
+    if explicit:
+        return frozenset(explicit)
+    if not department:
+        return frozenset()
+    return frozenset(
+        domain for domain, departments in DOMAIN_DEPARTMENTS.items()
+        if any(dept in department for dept in departments)
+    )
+
+
+@dataclass
+class ExpertProfile:
+    """专家画像（内存）"""
+    user_id: str
+    username: str
+    full_name: Optional[str] = None
+    department: Optional[str] = None
+    position: Optional[str] = None
+    domains: FrozenSet[str] = field(default_factory=frozenset)
+    pending: int = 0
+    recent: int = 0  # 最近30天提交的修正数
+
+    @property
+    def workload_score(self) -> float:
+        return self.pending * 2 + self.recent * 0.1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "expert_id": self.user_id,
+            "username": self.username,
+            "full_name": self.full_name,
+            "department": self.department,
+            "position": self.position,
+            "domains": sorted(self.domains),
+            "pending_tasks": self.pending,
+            "completed_last_30_days": self.recent,
+            "workload_score": self.workload_score
+        }
+
+
+class ExpertScheduler:
+    """
+    专家调度器
+
+    每位专家进入若干个候选池：全体、所在部门、擅长的失效域、部门×失效域；
+    每个池是按 (待处理数, 近期任务数) 排序的最小堆，负载变化时压入新条目，
+    旧条目在出堆顶时按版本号懒删除。
+
+    分配时比较"领域匹配池"与"不限领域池"的堆顶：匹配的专家享有 domain_slack 个任务的让分，
+    负载超出更多时改派给负载更低的非匹配专家，避免峰值时压垮少数领域专家。
+
+    计数随修正的新增/审批在本进程内增减，每 reload_interval 秒从数据库全量重建一次，
+    用于纠正多worker之间的偏差并纳入新增/禁用的专家
+    """
+
+    def __init__(self, domain_slack: int = 2, reload_interval: float = 300.0):
+        """
+        Args:
+            domain_slack: 领域匹配专家的负载让分（任务数）
+            reload_interval: 从数据库重建的间隔（秒）
+        """
+        self.domain_slack = domain_slack
+        self.reload_interval = reload_interval
+        self._experts: Dict[str, ExpertProfile] = {}
+        self._versions: Dict[str, int] = {}
+        self._heaps: Dict[Tuple[Optional[str], Optional[str]], List[Tuple[int, int, int, int, str]]] = {}
+        self._seq = itertools.count()
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self.stats = {"assignments": 0, "domain_matched": 0, "reloads": 0}
+
+    # ---------- 状态维护 ----------
+
+    @staticmethod
+    def _pools(expert: ExpertProfile) -> List[Tuple[Optional[str], Optional[str]]]:
+        pools = [(None, None)]
+        if expert.department:
+            pools.append((expert.department, None))
+        for domain in expert.domains:
+            pools.append((None, domain))
+            if expert.department:
+                pools.append((expert.department, domain))
+        return pools
+
+    def _push(self, expert: ExpertProfile):
+        version = self._versions.get(expert.user_id, 0) + 1
+        self._versions[expert.user_id] = version
+        entry = (expert.pending, expert.recent, next(self._seq), version, expert.user_id)
+        for pool in self._pools(expert):
+            heapq.heappush(self._heaps.setdefault(pool, []), entry)
+
+    def _peek(self, pool: Tuple[Optional[str], Optional[str]]) -> Optional[ExpertProfile]:
+        """池中负载最低的专家（弹出过期条目）"""
+        heap = self._heaps.get(pool)
+        while heap:
+            _, _, _, version, user_id = heap[0]
+            if user_id in self._experts and self._versions.get(user_id) == version:
+                return self._experts[user_id]
+            heapq.heappop(heap)
+        return None
+
+    def set_experts(self, experts: Iterable[ExpertProfile]):
+        """整体替换专家集合（重建所有堆）"""
+        self._experts = {expert.user_id: expert for expert in experts}
+        self._rebuild_heaps()
+        self._loaded_at = time.monotonic()
+
+    def _adjust(self, user_id: str, pending: int = 0, recent: int = 0):
+        expert = self._experts.get(user_id)
+        if expert is None:
+            return
+        expert.pending = max(0, expert.pending + pending)
+        expert.recent = max(0, expert.recent + recent)
+        self._push(expert)
+        # 过期条目过多时重建堆，内存与专家数成正比
+        if len(self._heaps[(None, None)]) > 4 * len(self._experts) + 64:
+            self._rebuild_heaps()
+
+    def _rebuild_heaps(self):
+        self._versions = {}
+        self._heaps = {}
+        for expert in self._experts.values():
+            self._push(expert)
+
+    def on_correction_created(self, user_id: str, pending: bool):
+        """新增修正记录后调用（pending=True 表示进入待处理状态）"""
+        self._adjust(user_id, pending=1 if pending else 0, recent=1)
+
+    def on_correction_resolved(self, user_id: str):
+        """待处理修正被批准/拒绝后调用"""
+        self._adjust(user_id, pending=-1)
+
+    # ---------- 分配 ----------
+
+    def select(
+        self,
+        failure_domain: Optional[str] = None,
+        department: Optional[str] = None
+    ) -> Optional[ExpertProfile]:
+        """选出专家（不修改负载）"""
+        best_any = self._peek((department, None))
+        if best_any is None:
+            return None
+        best_match = self._peek((department, failure_domain)) if failure_domain else None
+        if best_match is not None and best_match.pending - self.domain_slack <= best_any.pending:
+            return best_match
+        return best_any
+
+    def assign(
+        self,
+        failure_domain: Optional[str] = None,
+        department: Optional[str] = None
+    ) -> Optional[ExpertProfile]:
+        """选出专家并立即计入一个待处理任务（并发分配不会都落到同一人）"""
+        expert = self.select(failure_domain, department)
+        if expert is None:
+            return None
+        self.stats["assignments"] += 1
+        if failure_domain and failure_domain in expert.domains:
+            self.stats["domain_matched"] += 1
+        self.on_correction_created(expert.user_id, pending=True)
+        return expert
+
+    def release(self, user_id: str):
+        """分配后写库失败时撤销计数"""
+        self._adjust(user_id, pending=-1, recent=-1)
+
+    # ---------- 查询 ----------
+
+    def get(self, user_id: str) -> Optional[ExpertProfile]:
+        return self._experts.get(user_id)
+
+    def list_experts(self, department: Optional[str] = None) -> List[ExpertProfile]:
+        experts = [
+            expert for expert in self._experts.values()
+            if department is None or expert.department == department
+        ]
+        experts.sort(key=lambda expert: (expert.workload_score, expert.user_id))
+        return experts
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "experts": len(self._experts),
+            "pending_total": sum(expert.pending for expert in self._experts.values()),
+            "loaded_age_seconds": round(time.monotonic() - self._loaded_at, 1) if self._loaded_at else None
+        }
+
+    # ---------- 数据库同步 ----------
+
+    def _stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.reload_interval
+
+    async def ensure_loaded(self):
+        """首次使用或超过重建间隔时从数据库加载"""
+        if not self._stale():
+            return
+        async with self._lock:
+            if self._stale():
+                await self.reload()
+
+    async def reload(self):
+        """从数据库重建：一次查专家，两次分组计数"""
+        from sqlalchemy import select, func, and_
+        from ...database.connection import get_db_manager
+        from ...database.models import ExpertCorrection
+        from ...database.rbac_models import User, Role, SystemRoles
+
+        db_manager = get_db_manager()
+        async with db_manager.get_session() as session:
+            result = await session.execute(
+                select(User).join(User.roles).where(
+                    and_(User.is_active == True, Role.name == SystemRoles.EXPERT)
+                )
+            )
+            users = result.scalars().unique().all()
+
+            result = await session.execute(
+                select(ExpertCorrection.submitted_by, func.count())
+                .where(ExpertCorrection.approval_status == "pending")
+                .group_by(ExpertCorrection.submitted_by)
+            )
+            pending = dict(result.all())
+
+            result = await session.execute(
+                select(ExpertCorrection.submitted_by, func.count())
+                .where(ExpertCorrection.submitted_at >= datetime.utcnow() - timedelta(days=30))
+                .group_by(ExpertCorrection.submitted_by)
+            )
+            recent = dict(result.all())
+
+        self.set_experts(
+            ExpertProfile(
+                user_id=user.user_id,
+                username=user.username,
+                full_name=user.full_name,
+                department=user.department,
+                position=user.position,
+                domains=infer_expert_domains(user.department, user.attributes),
+                pending=pending.get(user.user_id, 0),
+                recent=recent.get(user.user_id, 0)
+            )
+            for user in users
+        )
+        self.stats["reloads"] += 1
+        logger.info(f"[ExpertScheduler] 专家负载已加载 - 专家数: {len(self._experts)}")
+
+
+# ============================================
+# 全局调度器
+# ============================================
+_expert_scheduler: Optional[ExpertScheduler] = None
+
+
+def get_expert_scheduler() -> ExpertScheduler:
+    """获取专家调度器单例"""
+    global _expert_scheduler
+    if _expert_scheduler is None:
+        from ...config.settings import get_settings
+        settings = get_settings()
+        _expert_scheduler = ExpertScheduler(
+            domain_slack=settings.EXPERT_DOMAIN_SLACK,
+            reload_interval=settings.EXPERT_SCHEDULER_RELOAD_SECONDS
+        )
+    return _expert_scheduler
+
+
+def reset_expert_scheduler():
+    """重置调度器（测试用）"""
+    global _expert_scheduler
+    _expert_scheduler = None
@@ -8,8 +8,10 @@ from loguru import logger
 from datetime import datetime, timedelta
 from uuid import uuid4
 import hashlib
+import time
 
-from sqlalchemy import select, and_, or_
+from sqlalchemy import select, and_, or_, func, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ...database.connection import get_db_manager
@@ -17,6 +19,7 @@ from ...database.models import (
     FailureCase, InferenceRule, ExpertCorrection
 )
 from ...database.rbac_models import SystemPermissions
+from ...database.error_code_index import get_error_code_index
 
 
 class KnowledgeLoopAgent:
@@ -80,6 +83,401 @@ class KnowledgeLoopAgent:
 
         return updates
 
+    async def learn_from_corrections_batch(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        批量从已批准的专家修正中学习
+
+        与逐条调用 learn_from_correction 的结果一致，但：
+        案例文本一次批量生成embedding；活跃规则一次取回建成 错误码 -> 规则 映射；
+        案例和规则分别用一条 INSERT ... ON CONFLICT 批量写入，在同一事务中提交
+
+        Args:
+            items: [{"session_id", "chip_model", "original_result", "correction", "fault_features"}]
+
+        Returns:
+            学习结果（results 与 items 一一对应）
+        """
+        start = time.perf_counter()
+        logger.info(f"[{self.name}] 开始批量学习 - 修正数: {len(items)}")
+
+        summary = {
+            "timestamp": datetime.utcnow().isoformat(),
+            "total": len(items),
+            "cases_created": 0,
+            "cases_updated": 0,
+            "rules_created": 0,
+            "rules_updated": 0,
+            "results": []
+        }
+        if not items:
+            return summary
+
+        payloads = [
+            self._build_case_payload(
+                item["chip_model"],
+                item.get("original_result") or {},
+                item.get("correction") or {},
+                item.get("fault_features") or {}
+            )
+            for item in items
+        ]
+        chip_models = sorted({p["chip_model"] for p in payloads})
+
+        # 1. 整批案例文本一次编码（同一案例以最后一条修正为准），在开事务之前完成
+        last_payloads = {p["case_key"]: p for p in payloads}
+        case_keys = list(last_payloads)
+        embeddings = dict(zip(case_keys, await self._embed_case_texts(
+            [last_payloads[key]["embedding_text"] for key in case_keys],
+            {"chip_models": chip_models, "case_count": len(case_keys)}
+        )))
+
+        db_manager = get_db_manager()
+        async with db_manager.get_session() as session:
+            async with session.begin():
+                # 2. 一次取回已存在的已验证案例
+                result = await session.execute(
+                    select(FailureCase).where(
+                        and_(
+                            tuple_(
+                                FailureCase.chip_model, FailureCase.failure_domain, FailureCase.module_type
+                            ).in_(case_keys),
+                            FailureCase.is_verified == True
+                        )
+                    )
+                )
+                existing_cases = {}
+                for case in result.scalars().all():
+                    existing_cases.setdefault((case.chip_model, case.failure_domain, case.module_type), case)
+
+                # 3. 一次取回这些芯片的活跃规则
+                result = await session.execute(
+                    select(InferenceRule.rule_id, InferenceRule.chip_model, InferenceRule.conditions).where(
+                        and_(
+                            InferenceRule.chip_model.in_(chip_models),
+                            InferenceRule.is_active == True
+                        )
+                    )
+                )
+                rule_map = {}
+                for rule_id, rule_chip, conditions in result.all():
+                    for code in (conditions or {}).get("error_codes", []):
+                        rule_map.setdefault((rule_chip, code), rule_id)
+
+                plan = self._plan_batch(payloads, existing_cases, rule_map, datetime.utcnow())
+
+                case_rows = list(plan["cases"].values())
+                for row in case_rows:
+                    row["embedding"] = embeddings[(row["chip_model"], row["failure_domain"], row["module_type"])]
+
+                # 4. 批量 upsert
+                if case_rows:
+                    await session.execute(self._case_upsert_stmt(), case_rows)
+                rule_rows = list(plan["rules"].values())
+                if rule_rows:
+                    await session.execute(self._rule_upsert_stmt(), rule_rows)
+
+        # 事务提交后再更新进程内倒排索引
+        index = get_error_code_index()
+        for row in case_rows:
+            index.add_case(row["case_id"], row["error_codes"], row["chip_model"])
+        for rule_id in plan["new_rules"]:
+            row = plan["rules"][rule_id]
+            index.add_rule(rule_id, row["conditions"]["error_codes"], row["chip_model"])
+
+        # 图版本号整批只加一次
+        from ...database.kg_cache import get_kg_cache
+        graph_version = await get_kg_cache().bump_version(
+            reason=f"expert_correction_batch:{','.join(chip_models)}"
+        )
+
+        for item, item_plan in zip(items, plan["items"]):
+            summary["results"].append({
+                "session_id": item.get("session_id"),
+                **item_plan,
+                "case_learned": True,
+                "rules_updated": bool(item_plan["rules"])
+            })
+        summary.update({
+            "cases_created": plan["cases_created"],
+            "cases_updated": len(case_rows) - plan["cases_created"],
+            "rules_created": len(plan["new_rules"]),
+            "rules_updated": len(rule_rows) - len(plan["new_rules"]),
+            "graph_version": graph_version,
+            "seconds": round(time.perf_counter() - start, 3)
+        })
+
+        logger.info(
+            f"[{self.name}] 批量学习完成 - 案例 新建 {summary['cases_created']} / 更新 {summary['cases_updated']}, "
+            f"规则 新建 {summary['rules_created']} / 更新 {summary['rules_updated']}, 耗时 {summary['seconds']}s"
+        )
+        return summary
+
+    # 批量 upsert 时冲突行需要覆盖的案例字段
+    _CASE_UPSERT_COLUMNS = (
+        "failure_domain", "module_type", "root_cause", "root_cause_category",
+        "failure_mode", "failure_mechanism", "solution", "symptoms", "error_codes",
+        "is_verified", "verified_by", "verified_at", "updated_at"
+    )
+
+    @classmethod
+    def _case_upsert_stmt(cls):
+        """案例批量 upsert：case_id 冲突时覆盖修正字段并递增版本"""
+        stmt = pg_insert(FailureCase)
+        return stmt.on_conflict_do_update(
+            index_elements=[FailureCase.case_id],
+            set_={
+                **{column: getattr(stmt.excluded, column) for column in cls._CASE_UPSERT_COLUMNS},
+                # 向量生成失败时保留旧向量
+                "embedding": func.coalesce(stmt.excluded.embedding, FailureCase.embedding),
+                "version": FailureCase.version + 1
+            }
+        )
+
+    @staticmethod
+    def _rule_upsert_stmt():
+        """规则批量 upsert：rule_id 冲突（已有规则）时只更新结论"""
+        stmt = pg_insert(InferenceRule)
+        return stmt.on_conflict_do_update(
+            index_elements=[InferenceRule.rule_id],
+            set_={
+                "conclusion": stmt.excluded.conclusion,
+                "updated_at": stmt.excluded.updated_at
+            }
+        )
+
+    def _plan_batch(
+        self,
+        payloads: List[Dict[str, Any]],
+        existing_cases: Dict[tuple, Any],
+        rule_map: Dict[tuple, str],
+        now: datetime
+    ) -> Dict[str, Any]:
+        """
+        由修正负载生成批量写入的行
+
+        按顺序应用每条修正：同一 (芯片, 失效域, 模块) 的案例、同一 (芯片, 错误码) 的规则，
+        后面的修正覆盖前面的，与逐条学习的最终结果一致
+
+        Args:
+            payloads: _build_case_payload 的结果列表
+            existing_cases: (芯片, 失效域, 模块) -> 已存在的案例
+            rule_map: (芯片, 错误码) -> 已存在的活跃规则ID（会被本批新建的规则补充）
+            now: 写入时间
+
+        Returns:
+            {"cases": 案例ID -> 行, "rules": 规则ID -> 行, "new_rules": [...], "cases_created": int, "items": [...]}
+        """
+        stamp = now.strftime('%Y%m%d%H%M%S')
+        rule_map = dict(rule_map)
+        case_ids: Dict[tuple, str] = {}
+        cases: Dict[str, Dict[str, Any]] = {}
+        rules: Dict[str, Dict[str, Any]] = {}
+        new_rules: List[str] = []
+        cases_created = 0
+        items = []
+
+        for payload in payloads:
+            key = payload["case_key"]
+            corrected = payload["corrected"]
+            existing = existing_cases.get(key)
+
+            if key not in case_ids:
+                if existing is not None:
+                    case_ids[key] = existing.case_id
+                else:
+                    case_ids[key] = self._unique_id(
+                        f"CASE_{payload['case_identifier']}_{stamp}".upper(), cases
+                    )
+                    cases_created += 1
+            case_id = case_ids[key]
+
+            # 字段缺省值：已存在案例沿用旧值，新案例与 _update_failure_case 一致
+            previous = cases.get(case_id)
+            if previous is not None:
+                defaults = previous
+            elif existing is not None:
+                defaults = {
+                    column: getattr(existing, column)
+                    for column in ("root_cause", "root_cause_category", "failure_mode", "failure_mechanism")
+                }
+            else:
+                defaults = {
+                    "root_cause": "",
+                    "root_cause_category": "unknown",
+                    "failure_mode": "unknown",
+                    "failure_mechanism": "unknown"
+                }
+
+            cases[case_id] = {
+                "case_id": case_id,
+                "chip_model": payload["chip_model"],
+                "failure_domain": payload["failure_domain"],
+                "module_type": payload["failure_module"],
+                "root_cause": corrected.get("root_cause", defaults["root_cause"]),
+                "root_cause_category": corrected.get("root_cause_category", defaults["root_cause_category"]),
+                "failure_mode": corrected.get("failure_mode", defaults["failure_mode"]),
+                "failure_mechanism": corrected.get("failure_mechanism", defaults["failure_mechanism"]),
+                "solution": payload["solution"],
+                "error_codes": payload["error_codes"],
+                "symptoms": payload["symptoms"],
+                "is_verified": True,
+                "verified_by": payload["submitted_by"],
+                "verified_at": now,
+                "sensitivity_level": 1,
+                "version": 1,
+                "created_at": now,
+                "updated_at": now
+            }
+
+            item_rules = []
+            for error_code in payload["error_codes"][:3]:  # 与逐条学习一致，最多3条规则
+                rule_key = (payload["chip_model"], error_code)
+                rule_id = rule_map.get(rule_key)
+                if rule_id is None:
+                    rule_id = self._unique_id(f"RULE_{error_code}_{stamp}".upper(), rules)
+                    rule_map[rule_key] = rule_id
+                    new_rules.append(rule_id)
+                rules[rule_id] = {
+                    "rule_id": rule_id,
+                    "rule_name": f"{error_code} 修正规则",
+                    "chip_model": payload["chip_model"],
+                    "conditions": {"error_codes": [error_code], "min_confidence": 0.0},
+                    "conclusion": self._rule_conclusion(corrected),
+                    "confidence": 1.0,
+                    "priority": 100,
+                    "rule_type": "expert_learned",
+                    "is_active": True,
+                    "created_by": payload["submitted_by"],
+                    "created_at": now,
+                    "updated_at": now
+                }
+                item_rules.append(rule_id)
+
+            items.append({
+                "case_id": case_id,
+                "case_action": "updated" if existing is not None or previous is not None else "created",
+                "rules": item_rules
+            })
+
+        return {
+            "cases": cases,
+            "rules": rules,
+            "new_rules": new_rules,
+            "cases_created": cases_created,
+            "items": items
+        }
+
+    @staticmethod
+    def _unique_id(base: str, taken: Dict[str, Any]) -> str:
+        """同一秒内批量生成的ID加序号去重"""
+        candidate, n = base, 1
+        while candidate in taken:
+            n += 1
+            candidate = f"{base}_{n}"
+        return candidate
+
+    @staticmethod
+    def _rule_conclusion(corrected: Dict[str, Any]) -> Dict[str, Any]:
+        """专家修正规则的结论（专家修正后置信度为1.0）"""
+        return {
+            "failure_domain": corrected.get("failure_domain"),
+            "failure_module": corrected.get("module"),
+            "root_cause": corrected.get("root_cause"),
+            "confidence": 1.0
+        }
+
+    def _build_case_payload(
+        self,
+        chip_model: str,
+        original_result: Dict[str, Any],
+        correction: Dict[str, Any],
+        fault_features: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """由一条修正构建案例字段和embedding文本（逐条与批量学习共用）"""
+        # 获取修正后的结果
+        corrected = correction.get("corrected_result", {})
+        correction_reason = correction.get("correction_reason", "")
+        submitted_by = correction.get("submitted_by", "system")
+
+        # 构建案例标识 - 优先使用失效域和模块组合作为标识
+        failure_domain = corrected.get("failure_domain") or original_result.get("failure_domain", "unknown")
+        failure_module = corrected.get("module") or original_result.get("module", "unknown")
+
+        # 构建症状描述（包含原始日志信息）
+        raw_log = fault_features.get("raw_log", "")
+        error_codes = fault_features.get("error_codes", [])
+        modules = fault_features.get("modules", [])
+
+        symptoms_parts = []
+        if error_codes:
+            symptoms_parts.append(f"错误码: {', '.join(error_codes)}")
+        if modules:
+            symptoms_parts.append(f"相关模块: {', '.join(modules)}")
+        if raw_log:
+            symptoms_parts.append(f"原始日志: {raw_log[:500]}...")  # 限制长度
+
+        symptoms = "\n".join(symptoms_parts) if symptoms_parts else "专家修正案例"
+
+        # 构建完整的解决方案（包含修正原因）
+        solution_parts = [correction_reason]
+        if submitted_by and submitted_by != "anonymous":
+            solution_parts.append(f"\n提交专家: {submitted_by}")
+        solution = "\n".join(solution_parts)
+
+        # 构建用于embedding的文本
+        embedding_text = f"""
+失效域: {failure_domain}
+模块: {failure_module}
+根因: {corrected.get('root_cause', '')}
+症状: {symptoms}
+解决方案: {solution}
+""".strip()
+
+        return {
+            "chip_model": chip_model,
+            "corrected": corrected,
+            "submitted_by": submitted_by,
+            "failure_domain": failure_domain,
+            "failure_module": failure_module,
+            "case_identifier": f"{failure_domain}_{failure_module}",
+            "case_key": (chip_model, failure_domain, failure_module),
+            "symptoms": symptoms,
+            "solution": solution,
+            "error_codes": error_codes,
+            "embedding_text": embedding_text
+        }
+
+    async def _embed_case_texts(
+        self,
+        texts: List[str],
+        alert_details: Dict[str, Any]
+    ) -> List[Optional[List[float]]]:
+        """案例文本批量生成embedding；失败时告警并返回全None（案例照常写入，只是没有向量）"""
+        if not texts:
+            return []
+        try:
+            from ...mcp.tools.llm_tool import LLMTool
+            embeddings = await LLMTool().generate_embeddings(texts)
+            logger.info(f"[{self.name}] 案例embedding生成成功 - 数量: {len(embeddings)}")
+            return embeddings
+        except Exception as e:
+            # 发送告警
+            from ...monitoring import get_alert_manager, AlertSeverity, AlertType
+            alert_manager = get_alert_manager()
+            await alert_manager.send_alert(
+                alert_type=AlertType.EMBEDDING_API_FAILED,
+                severity=AlertSeverity.WARNING,
+                title="Golden案例embedding生成失败",
+                message=f"无法为专家修正案例生成语义向量: {str(e)}",
+                details={
+                    **alert_details,
+                    "error": str(e),
+                    "impact": "该案例将无法通过语义相似度被匹配到"
+                }
+            )
+            logger.warning(f"[{self.name}] 案例embedding生成失败，案例将创建但无向量索引: {str(e)}")
+            return [None] * len(texts)
+
     async def _update_failure_case(
         self,
         chip_model: str,
@@ -92,15 +490,14 @@ class KnowledgeLoopAgent:
 
         db_manager = get_db_manager()
         async with db_manager.get_session() as session:
-            # 获取修正后的结果
-            corrected = correction.get("corrected_result", {})
-            correction_reason = correction.get("correction_reason", "")
-            submitted_by = correction.get("submitted_by", "system")
-
-            # 构建案例标识 - 优先使用失效域和模块组合作为标识
-            failure_domain = corrected.get("failure_domain") or original_result.get("failure_domain", "unknown")
-            failure_module = corrected.get("module") or original_result.get("module", "unknown")
-            case_identifier = f"{failure_domain}_{failure_module}"
+            payload = self._build_case_payload(chip_model, original_result, correction, fault_features)
+            corrected = payload["corrected"]
+            submitted_by = payload["submitted_by"]
+            failure_domain = payload["failure_domain"]
+            failure_module = payload["failure_module"]
+            symptoms = payload["symptoms"]
+            solution = payload["solution"]
+            error_codes = payload["error_codes"]
 
             # 检查是否已存在相似案例（基于失效域和模块）
             stmt = select(FailureCase).where(
@@ -115,65 +512,13 @@ class KnowledgeLoopAgent:
             existing_case = result.scalar_one_or_none()
 
             # 构建案例ID（使用失效域+模块+日期）
-            case_id = f"CASE_{case_identifier}_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}".upper()
-
-            # 构建症状描述（包含原始日志信息）
-            raw_log = fault_features.get("raw_log", "")
-            error_codes = fault_features.get("error_codes", [])
-            modules = fault_features.get("modules", [])
-
-            # 构建完整的症状描述
-            symptoms_parts = []
-            if error_codes:
-                symptoms_parts.append(f"错误码: {', '.join(error_codes)}")
-            if modules:
-                symptoms_parts.append(f"相关模块: {', '.join(modules)}")
-            if raw_log:
-                symptoms_parts.append(f"原始日志: {raw_log[:500]}...")  # 限制长度
-
-            symptoms = "\n".join(symptoms_parts) if symptoms_parts else "专家修正案例"
-
-            # 构建完整的解决方案（包含修正原因）
-            solution_parts = [correction_reason]
-            if submitted_by and submitted_by != "anonymous":
-                solution_parts.append(f"\n提交专家: {submitted_by}")
-            solution = "\n".join(solution_parts)
+            case_id = f"CASE_{payload['case_identifier']}_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}".upper()
 
             # 生成embedding向量
-            embedding = None
-            try:
-                from ..mcp.tools.llm_tool import LLMTool
-                llm_tool = LLMTool()
-
-                # 构建用于embedding的文本
-                embedding_text = f"""
-失效域: {failure_domain}
-模块: {failure_module}
-根因: {corrected.get('root_cause', '')}
-症状: {symptoms}
-解决方案: {solution}
-""".strip()
-
-                embedding = await llm_tool.generate_embedding(embedding_text)
-                logger.info(f"[{self.name}] 案例embedding生成成功 - 维度: {len(embedding)}")
-            except Exception as e:
-                # 发送告警
-                from ..monitoring import get_alert_manager, AlertSeverity, AlertType
-                alert_manager = get_alert_manager()
-                await alert_manager.send_alert(
-                    alert_type=AlertType.EMBEDDING_API_FAILED,
-                    severity=AlertSeverity.WARNING,
-                    title="Golden案例embedding生成失败",
-                    message=f"无法为专家修正案例生成语义向量: {str(e)}",
-                    details={
-                        "case_id": case_id,
-                        "chip_model": chip_model,
-                        "failure_domain": failure_domain,
-                        "error": str(e),
-                        "impact": "该案例将无法通过语义相似度被匹配到"
-                    }
-                )
-                logger.warning(f"[{self.name}] 案例embedding生成失败，案例将创建但无向量索引: {str(e)}")
+            embedding = (await self._embed_case_texts(
+                [payload["embedding_text"]],
+                {"case_id": case_id, "chip_model": chip_model, "failure_domain": failure_domain}
+            ))[0]
 
             if existing_case:
                 # 更新现有案例
@@ -197,6 +542,7 @@ class KnowledgeLoopAgent:
                     existing_case.embedding = embedding
 
                 await session.commit()
+                get_error_code_index().add_case(existing_case.case_id, error_codes, chip_model)
 
                 logger.info(f"[{self.name}] 更新现有案例: {existing_case.case_id}")
 
@@ -230,6 +576,7 @@ class KnowledgeLoopAgent:
 
                 session.add(new_case)
                 await session.commit()
+                get_error_code_index().add_case(case_id, error_codes, chip_model)
 
                 logger.info(f"[{self.name}] 创建新Golden案例: {case_id}")
 
@@ -259,37 +606,35 @@ class KnowledgeLoopAgent:
             if not error_codes:
                 return {"success": False, "message": "没有错误码，无法创建规则"}
 
+            # 一次取回包含这些错误码的现有规则（conditions @> 走 jsonb_path_ops 索引）
+            target_codes = error_codes[:3]  # 限制最多创建3条规则
+            stmt = select(InferenceRule).where(
+                and_(
+                    InferenceRule.chip_model == chip_model,
+                    InferenceRule.is_active == True,
+                    or_(*[
+                        InferenceRule.conditions.contains({"error_codes": [code]})
+                        for code in target_codes
+                    ])
+                )
+            )
+            result = await session.execute(stmt)
+            rule_by_code = {}
+            for rule in result.scalars().all():
+                for code in rule.conditions.get("error_codes", []):
+                    rule_by_code.setdefault(code, rule)
+
             # 为每个错误码创建或更新规则
             rules_created = []
-            for error_code in error_codes[:3]:  # 限制最多创建3条规则
-                # 检查是否已存在规则
-                stmt = select(InferenceRule).where(
-                    and_(
-                        InferenceRule.chip_model == chip_model,
-                        InferenceRule.is_active == True
-                    )
-                )
-                result = await session.execute(stmt)
-                existing_rules = result.scalars().all()
-
-                # 检查规则条件是否匹配
-                rule_exists = False
-                for rule in existing_rules:
-                    conditions = rule.conditions
-                    if conditions.get("error_codes") and error_code in conditions.get("error_codes", []):
-                        # 更新现有规则
-                        rule.conclusion = {
-                            "failure_domain": corrected.get("failure_domain"),
-                            "failure_module": corrected.get("module"),
-                            "root_cause": corrected.get("root_cause"),
-                            "confidence": 1.0  # 专家修正后置信度为1.0
-                        }
-                        rule.updated_at = datetime.utcnow()
-                        rule_exists = True
-                        rules_created.append(rule.rule_id)
-                        break
-
-                if not rule_exists:
+            new_rules = {}
+            for error_code in target_codes:
+                rule = rule_by_code.get(error_code)
+                if rule is not None:
+                    # 更新现有规则
+                    rule.conclusion = self._rule_conclusion(corrected)
+                    rule.updated_at = datetime.utcnow()
+                    rules_created.append(rule.rule_id)
+                else:
                     # 创建新规则
                     rule_id = f"RULE_{error_code}_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}".upper()
 
@@ -301,12 +646,7 @@ class KnowledgeLoopAgent:
                             "error_codes": [error_code],
                             "min_confidence": 0.0
                         },
-                        conclusion={
-                            "failure_domain": corrected.get("failure_domain"),
-                            "failure_module": corrected.get("module"),
-                            "root_cause": corrected.get("root_cause"),
-                            "confidence": 1.0
-                        },
+                        conclusion=self._rule_conclusion(corrected),
                         confidence=1.0,
                         priority=100,  # 专家修正的规则优先级最高
                         rule_type="expert_learned",
@@ -316,8 +656,11 @@ class KnowledgeLoopAgent:
 
                     session.add(new_rule)
                     rules_created.append(rule_id)
+                    new_rules[rule_id] = error_code
 
             await session.commit()
+            for rule_id, error_code in new_rules.items():
+                get_error_code_index().add_rule(rule_id, [error_code], chip_model)
 
             logger.info(f"[{self.name}] 创建/更新规则: {len(rules_created)} 条")
 
@@ -356,6 +699,10 @@ class KnowledgeLoopAgent:
 
         logger.info(f"[{self.name}] 知识图谱更新: {kg_update}")
 
+        # 图版本号加一，使各进程的芯片投影缓存失效
+        from ...database.kg_cache import get_kg_cache
+        kg_update["graph_version"] = await get_kg_cache().bump_version(reason=f"expert_correction:{chip_model}")
+
         return {
             "success": True,
             "message": "知识图谱更新记录成功",
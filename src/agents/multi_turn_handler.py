@@ -7,12 +7,24 @@
 from datetime import datetime
 from typing import Optional, Dict, Any, List
 from loguru import logger
-from sqlalchemy import select, text
+from sqlalchemy import select, text, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..database.blobs import offload_text, resolve_fields
 from ..database.connection import get_db_manager
 from ..database.models import AnalysisMessage, AnalysisSnapshot
-from .workflow import get_workflow
+
+
+def summarize_analysis(analysis_result: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """分析结果的时间线摘要（保存快照时写入 summary 投影列）"""
+    result = analysis_result or {}
+    root_cause = result.get("final_root_cause") or {}
+    return {
+        "failure_domain": root_cause.get("failure_domain"),
+        "confidence": root_cause.get("confidence", 0),
+        "need_expert": result.get("need_expert", False),
+        "root_cause": root_cause.get("root_cause")
+    }
 
 
 class MultiTurnConversationHandler:
@@ -187,12 +199,13 @@ class MultiTurnConversationHandler:
         if session_chip_model:
             context["chip_model"] = session_chip_model
 
+        # 下一条消息的序号接在全部消息（含已回滚的）之后，保持审计记录中序号唯一且递增
+        context["last_sequence"] = await self.db.get_max_sequence_number(session_id)
+
         # 跟踪已被纠正的消息ID
         corrected_message_ids = set()
 
         for msg in messages:
-            context["last_sequence"] = max(context["last_sequence"], msg.get("sequence_number", 0))
-
             # 记录纠正关系（转换为字典以避免序列化问题）
             if msg.get("is_correction") and msg.get("corrected_message_id"):
                 context["corrections"][msg["corrected_message_id"]] = {
@@ -390,6 +403,7 @@ class MultiTurnConversationHandler:
         )
 
         # 4. 调用工作流分析（使用压缩后的日志）
+        from .workflow import get_workflow
         workflow = get_workflow()
         result = await workflow.run(
             chip_model=chip_model,
@@ -414,13 +428,14 @@ class MultiTurnConversationHandler:
         correction_target: Optional[int] = None,
         user_id: Optional[str] = None
     ) -> Dict[str, Any]:
-        """保存消息到数据库"""
+        """保存消息到数据库（大段日志存为大对象引用）"""
+        stored_content = await offload_text(content)
         async with self.db._session_factory() as session:
             message = AnalysisMessage(
                 session_id=session_id,
                 message_type=message_type,
                 sequence_number=sequence_number,
-                content=content,
+                content=stored_content,
                 content_type=content_type,
                 is_correction=(correction_target is not None),
                 corrected_message_id=correction_target,
@@ -435,171 +450,13 @@ class MultiTurnConversationHandler:
 
             message_id = message.message_id
             await session.commit()
+            self.db.mark_written(session_id)
 
             return {
                 "message_id": message_id,
                 "sequence_number": sequence_number
             }
 
-    async def _save_snapshot(
-        self,
-        session_id: str,
-        message_id: int,
-        accumulated_context: Dict[str, Any],
-        analysis_result: Dict[str, Any]
-    ) -> None:
-        """保存分析快照"""
-        print("[DEBUG] _save_snapshot CALLED with latest code!!!")
-
-        import json
-        print(f"[DEBUG] _save_snapshot called with message_id={message_id}")
-        
-        # 检查context的类型
-        print(f"[DEBUG] accumulated_context type: {type(accumulated_context)}")
-        print(f"[DEBUG] messages type: {type(accumulated_context.get('messages', []))}")
-        
-        # 打印每个消息的类型
-        for idx, msg in enumerate(accumulated_context.get('messages', [])):
-            print(f"[DEBUG] Message {idx}: type={type(msg)}, has_content={'content' in msg if isinstance(msg, dict) else hasattr(msg, 'content')}")
-            if hasattr(msg, '__table__'):
-                print(f"[DEBUG] Message {idx} is SQLAlchemy object!!!")
-        
-        # 递归转换
-        def deep_convert(obj):
-            if hasattr(obj, '__table__'):
-                print(f"[DEBUG] Converting SQLAlchemy object: {type(obj)}")
-                return {c.name: deep_convert(getattr(obj, c.name)) for c in obj.__table__.columns}
-            elif isinstance(obj, dict):
-                return {k: deep_convert(v) for k, v in obj.items()}
-            elif isinstance(obj, (list, tuple)):
-                return [deep_convert(item) for item in obj]
-            else:
-                return obj
-        
-        serializable_context = deep_convert(accumulated_context)
-        
-        # 验证可序列化
-        try:
-            json_str = json.dumps(serializable_context)
-            print(f"[DEBUG] Serialization SUCCESS: {len(json_str)} chars")
-        except Exception as e:
-            print(f"[DEBUG] Serialization FAILED: {e}")
-            # 作为fallback，使用最小context
-            serializable_context = {
-                'session_id': accumulated_context.get('session_id'),
-                'messages': [],
-                'accumulated_logs': accumulated_context.get('accumulated_logs', []),
-                'accumulated_features': accumulated_context.get('accumulated_features', {}),
-                'corrections': {},
-                'last_sequence': accumulated_context.get('last_sequence', 0),
-                'chip_model': accumulated_context.get('chip_model')
-            }
-            print(f"[DEBUG] Using fallback minimal context")
-        # 调试日志：保存快照时的上下文状态
-        messages_list = accumulated_context.get("messages", [])
-        print(f"[DEBUG] _save_snapshot - messages数量: {len(messages_list)}, message_id: {message_id}, context id: {id(accumulated_context)}")
-        logger.info(f"[MultiTurnHandler] _save_snapshot - messages数量: {len(messages_list)}, message_id: {message_id}")
-
-        # 将SQLAlchemy对象转换为字典以便JSON序列化
-        serializable_messages = []
-        for msg in messages_list:
-            if isinstance(msg, dict):
-                # 已经是字典格式，直接使用
-                serializable_messages.append(msg)
-            else:
-                # SQLAlchemy对象，需要转换
-                serializable_messages.append({
-                    "message_id": msg["message_id"],
-                    "message_type": msg["message_type"],
-                    "sequence_number": msg["sequence_number"],
-                    "content": msg["content"],
-                    "content_type": msg["content_type"],
-                    "is_correction": msg["is_correction"],
-                    "corrected_message_id": msg.get("corrected_message_id"),
-                    "extracted_fields": msg.get("extracted_fields", {})
-                })
-
-        # 将corrections字典中的SQLAlchemy对象也转换为字典
-        serializable_corrections = {}
-        for msg_id, correction_msg in accumulated_context.get("corrections", {}).items():
-            if isinstance(correction_msg, dict):
-                serializable_corrections[msg_id] = correction_msg
-            else:
-                # SQLAlchemy对象，需要转换
-                serializable_corrections[msg_id] = {
-                    "message_id": correction_msg.message_id,
-                    "message_type": correction_msg.message_type,
-                    "sequence_number": correction_msg.sequence_number,
-                    "content": correction_msg.content,
-                    "content_type": correction_msg.content_type,
-                    "is_correction": correction_msg.is_correction,
-                    "corrected_message_id": correction_msg.corrected_message_id,
-                    "extracted_fields": correction_msg.extracted_fields or {}
-                }
-
-        serializable_context = {
-            "session_id": accumulated_context.get("session_id"),
-            "messages": serializable_messages,
-            "accumulated_logs": accumulated_context.get("accumulated_logs", []),
-            "accumulated_features": accumulated_context.get("accumulated_features", {}),
-            "corrections": serializable_corrections,
-            "last_sequence": accumulated_context.get("last_sequence", 0),
-            "chip_model": accumulated_context.get("chip_model")
-        }
-
-        logger.info(f"[MultiTurnHandler] _save_snapshot - 序列化后messages数量: {len(serializable_context['messages'])}")
-
-        # 调��：检查serializable_context中是否还有SQLAlchemy对象
-        print(f"[DEBUG] Before DB insert - checking serializable_context for SQLAlchemy objects")
-        for key, value in serializable_context.items():
-            if key == "messages":
-                for i, msg in enumerate(value):
-                    if not isinstance(msg, dict):
-                        print(f"[DEBUG] WARNING: Found non-dict in messages at index {i}: {type(msg)}")
-            elif key == "corrections":
-                for k, v in value.items():
-                    if not isinstance(v, dict):
-                        print(f"[DEBUG] WARNING: Found non-dict in corrections[{k}]: {type(v)}")
-
-        # 确保完全JSON可序列化
-        import json
-        try:
-            json.dumps(serializable_context)
-            print(f'[DEBUG] JSON serialization successful')
-        except Exception as e:
-            print(f'[DEBUG] Serialization failed: {e}')
-            # 强制转换所有SQLAlchemy对象
-            for key, value in serializable_context.items():
-                if key == 'messages':
-                    for i, msg in enumerate(value):
-                        if hasattr(msg, '__table__'):
-                            serializable_context['messages'][i] = {
-                                c.name: getattr(msg, c.name) 
-                                for c in msg.__table__.columns
-                            }
-                            print(f'[DEBUG] Converted message {i} to dict')
-                elif key == 'corrections':
-                    for k, v in value.items():
-                        if hasattr(v, '__table__'):
-                            serializable_context['corrections'][k] = {
-                                c.name: getattr(v, c.name) 
-                                for c in v.__table__.columns
-                            }
-                            print(f'[DEBUG] Converted correction {k} to dict')
-
-        async with self.db._session_factory() as session:
-            snapshot = AnalysisSnapshot(
-                session_id=session_id,
-                message_id=message_id,
-                accumulated_context=serializable_context,
-                analysis_result=analysis_result
-            )
-
-            session.add(snapshot)
-            await session.commit()
-
-
-
     async def _save_snapshot(
         self,
         session_id: str,
@@ -640,15 +497,31 @@ class MultiTurnConversationHandler:
                 'chip_model': accumulated_context.get('chip_model')
             }
         
+        # 每个快照都带着截至当时的全部日志，日志和报告只存引用（与消息共用同一对象）
+        serializable_context = {
+            **serializable_context,
+            "accumulated_logs": [await offload_text(log) for log in serializable_context.get("accumulated_logs") or []],
+            "messages": [
+                {**msg, "content": await offload_text(msg.get("content"))} if isinstance(msg, dict) else msg
+                for msg in serializable_context.get("messages") or []
+            ]
+        }
+        stored_result = analysis_result
+        if isinstance(analysis_result, dict) and analysis_result.get("infer_report"):
+            stored_result = {**analysis_result, "infer_report": await offload_text(analysis_result["infer_report"])}
+
         async with self.db._session_factory() as session:
             snapshot = AnalysisSnapshot(
                 session_id=session_id,
                 message_id=message_id,
                 accumulated_context=serializable_context,
-                analysis_result=analysis_result
+                analysis_result=stored_result,
+                summary=summarize_analysis(analysis_result),
+                info_count=len(serializable_context.get("messages") or [])
             )
             session.add(snapshot)
             await session.commit()
+        self.db.mark_written(session_id)
 
     async def _generate_response(
         self,
@@ -714,25 +587,34 @@ class MultiTurnConversationHandler:
         self,
         session_id: str
     ) -> Dict[str, Any]:
-        """获取分析时间线"""
-        snapshots = await self.db.get_session_snapshots(session_id)
-
-        timeline = []
-        for snapshot in snapshots:
-            result = snapshot.analysis_result
-            timeline_entry = {
-                "snapshot_id": snapshot.snapshot_id,
-                "message_id": snapshot.message_id,
-                "created_at": snapshot.created_at.isoformat(),
-                "analysis_summary": {
-                    "failure_domain": result.get("final_root_cause", {}).get("failure_domain"),
-                    "confidence": result.get("final_root_cause", {}).get("confidence", 0),
-                    "need_expert": result.get("need_expert", False),
-                    "root_cause": result.get("final_root_cause", {}).get("root_cause")
-                },
-                "accumulated_info_count": len(snapshot.accumulated_context.get("messages", []))
+        """获取分析时间线（只读取摘要投影列，不加载完整快照）"""
+        async with self.db.get_read_session(session_id) as session:
+            result = await session.execute(
+                select(
+                    AnalysisSnapshot.snapshot_id,
+                    AnalysisSnapshot.message_id,
+                    AnalysisSnapshot.created_at,
+                    AnalysisSnapshot.summary,
+                    AnalysisSnapshot.info_count
+                )
+                .where(
+                    AnalysisSnapshot.session_id == session_id,
+                    AnalysisSnapshot.is_superseded.isnot(True)
+                )
+                .order_by(AnalysisSnapshot.created_at)
+            )
+            rows = result.all()
+
+        timeline = [
+            {
+                "snapshot_id": row.snapshot_id,
+                "message_id": row.message_id,
+                "created_at": row.created_at.isoformat(),
+                "analysis_summary": row.summary or summarize_analysis(None),
+                "accumulated_info_count": row.info_count or 0
             }
-            timeline.append(timeline_entry)
+            for row in rows
+        ]
 
         return {
             "success": True,
@@ -741,6 +623,110 @@ class MultiTurnConversationHandler:
             "total_entries": len(timeline)
         }
 
+    async def rollback_to_message(
+        self,
+        session_id: str,
+        to_message_id: int,
+        reason: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        回滚到指定消息时的分析状态
+
+        目标消息（及其系统响应）之后的消息和快照只标记为已回滚，不删除；
+        上下文由有效消息重建，当前分析取目标位置的最新有效快照，
+        整个回滚是两条批量UPDATE，不读取快照中的累积上下文
+
+        Args:
+            session_id: 会话ID
+            to_message_id: 回滚到的目标消息ID
+            reason: 回滚原因
+
+        Returns:
+            回滚结果；目标消息不存在或已被回滚时 success=False
+        """
+        async with self.db._session_factory() as session:
+            result = await session.execute(
+                select(AnalysisMessage.sequence_number, AnalysisMessage.message_type)
+                .where(
+                    AnalysisMessage.session_id == session_id,
+                    AnalysisMessage.message_id == to_message_id,
+                    AnalysisMessage.is_superseded.isnot(True)
+                )
+            )
+            target = result.first()
+            if target is None:
+                return {
+                    "success": False,
+                    "error": f"消息不存在或已被回滚: {to_message_id}",
+                    "session_id": session_id
+                }
+
+            # 用户消息连同紧随其后的系统响应一起保留
+            keep_through = target.sequence_number
+            if target.message_type != "system_response":
+                keep_through += 1
+
+            later_messages = select(AnalysisMessage.message_id).where(
+                AnalysisMessage.session_id == session_id,
+                AnalysisMessage.sequence_number > keep_through
+            )
+            snapshots_result = await session.execute(
+                update(AnalysisSnapshot)
+                .where(
+                    AnalysisSnapshot.session_id == session_id,
+                    AnalysisSnapshot.is_superseded.isnot(True),
+                    AnalysisSnapshot.message_id.in_(later_messages.scalar_subquery())
+                )
+                .values(is_superseded=True)
+                .execution_options(synchronize_session=False)
+            )
+            messages_result = await session.execute(
+                update(AnalysisMessage)
+                .where(
+                    AnalysisMessage.session_id == session_id,
+                    AnalysisMessage.sequence_number > keep_through,
+                    AnalysisMessage.is_superseded.isnot(True)
+                )
+                .values(is_superseded=True)
+                .execution_options(synchronize_session=False)
+            )
+
+            result = await session.execute(
+                select(
+                    AnalysisSnapshot.snapshot_id,
+                    AnalysisSnapshot.analysis_result,
+                    AnalysisSnapshot.summary,
+                    AnalysisSnapshot.info_count
+                )
+                .where(
+                    AnalysisSnapshot.session_id == session_id,
+                    AnalysisSnapshot.is_superseded.isnot(True)
+                )
+                .order_by(AnalysisSnapshot.created_at.desc())
+                .limit(1)
+            )
+            current = result.first()
+            await session.commit()
+        self.db.mark_written(session_id)
+
+        logger.info(
+            f"[MultiTurnHandler] 会话回滚 - session: {session_id}, to_message: {to_message_id}, "
+            f"消息: {messages_result.rowcount}, 快照: {snapshots_result.rowcount}, 原因: {reason}"
+        )
+
+        return {
+            "success": True,
+            "session_id": session_id,
+            "rolled_back_to": to_message_id,
+            "reason": reason,
+            "superseded_messages": messages_result.rowcount,
+            "superseded_snapshots": snapshots_result.rowcount,
+            "snapshot_id": current.snapshot_id if current else None,
+            "current_analysis": await resolve_fields(current.analysis_result, ("infer_report",)) if current else None,
+            "analysis_summary": (current.summary or summarize_analysis(current.analysis_result)) if current else None,
+            "accumulated_info_count": current.info_count if current else 0
+        }
+
 
 # 全局实例
 multi_turn_handler = MultiTurnConversationHandler()
@@ -7,6 +7,7 @@ from typing import TypedDict, Dict, Any, List, Optional, Literal
 from langgraph.graph import StateGraph, END
 from loguru import logger
 
+from ..monitoring.metrics import timed
 from .agent1 import Agent1, Agent1State
 from .agent2 import Agent2, Agent2State
 
@@ -71,13 +72,17 @@ class ChipFaultWorkflow:
         # 创建状态图
         workflow = StateGraph(AgentState)
 
-        # 添加节点
-        workflow.add_node("input_validation", self._validate_input)
-        workflow.add_node("agent1_reasoning", self._run_agent1)
-        workflow.add_node("agent2_knowledge", self._run_agent2)  # Phase 2: Agent2
-        workflow.add_node("expert_intervention", self._handle_expert_intervention)
-        workflow.add_node("report_generation", self._generate_report)
-        workflow.add_node("error_handler", self._handle_error)
+        # 添加节点（每个节点记录耗时指标 stage="node_<节点名>"）
+        nodes = {
+            "input_validation": self._validate_input,
+            "agent1_reasoning": self._run_agent1,
+            "agent2_knowledge": self._run_agent2,  # Phase 2: Agent2
+            "expert_intervention": self._handle_expert_intervention,
+            "report_generation": self._generate_report,
+            "error_handler": self._handle_error,
+        }
+        for node_name, node in nodes.items():
+            workflow.add_node(node_name, timed(f"node_{node_name}")(node))
 
         # 设置入口点
         workflow.set_entry_point("input_validation")
@@ -3,20 +3,23 @@
 提供用户管理、角色管理、权限管理等功能
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 from uuid import UUID
 from loguru import logger
-from sqlalchemy import select, or_
+from sqlalchemy import select, or_, func
+from sqlalchemy.orm import selectinload
 
 from ..auth.dependencies import get_current_user_required, get_current_superuser
+from ..auth.revocation import TokenPrincipal
 from ..auth.service import auth_service
 from ..database.rbac_models import (
-    User, Role, Permission, SystemRoles, SystemPermissions
+    User, Role, Permission, SystemRoles, SystemPermissions, user_role_association
 )
 from ..database.connection import get_db_manager
+from ..database.pagination import encode_cursor, decode_cursor
 
 
 # ============================================
@@ -113,19 +116,62 @@ class PermissionListItem(BaseModel):
     is_active: bool
 
 
+# ============================================
+# 辅助函数
+# ============================================
+
+async def _role_user_ids(session, role_id: UUID) -> List[str]:
+    """拥有该角色的用户ID（角色变更后吊销这些用户的访问Token）"""
+    result = await session.execute(
+        select(user_role_association.c.user_id).where(user_role_association.c.role_id == role_id)
+    )
+    return list(result.scalars().all())
+
+
+async def _active_user_counts(session, role_ids: List[UUID]) -> Dict[UUID, int]:
+    """各角色的激活用户数（一次分组计数，不加载用户对象）"""
+    if not role_ids:
+        return {}
+    result = await session.execute(
+        select(user_role_association.c.role_id, func.count())
+        .join(User, User.user_id == user_role_association.c.user_id)
+        .where(user_role_association.c.role_id.in_(role_ids), User.is_active == True)
+        .group_by(user_role_association.c.role_id)
+    )
+    return dict(result.all())
+
+
+def _like_pattern(search: str) -> str:
+    """子串匹配模式（转义通配符；3个字符以上的关键词可走 pg_trgm 索引）"""
+    escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _decode_page_cursor(cursor: str, size: int) -> list:
+    try:
+        return decode_cursor(cursor, size)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
 # ============================================
 # 用户管理端点
 # ============================================
 
 @router.get("/users", response_model=List[UserListItem], tags=["管理员"])
 async def list_users(
-    skip: int = Query(0, ge=0, description="跳过记录数"),
+    response: Response,
+    skip: int = Query(0, ge=0, description="跳过记录数（未传cursor时生效）"),
     limit: int = Query(50, ge=1, le=100, description="返回记录数"),
     search: Optional[str] = Query(None, description="搜索关键词"),
-    current_user: User = Depends(get_current_user_required)
+    cursor: Optional[str] = Query(None, description="上一页响应头 X-Next-Cursor 的值（键集分页）"),
+    current_user: TokenPrincipal = Depends(get_current_user_required)
 ):
     """
-    获取用户列表
+    获取用户列表（按用户名排序；还有下一页时响应头 X-Next-Cursor 给出游标）
 
     需要权限: user:read
     """
@@ -138,22 +184,33 @@ async def list_users(
 
     db_manager = get_db_manager()
     async with db_manager.get_session() as session:
-        # 构建查询
-        stmt = select(User)
+        # 构建查询（角色一次批量加载）
+        stmt = select(User).options(selectinload(User.roles))
 
         if search:
+            pattern = _like_pattern(search)
             stmt = stmt.where(
                 or_(
-                    User.username.ilike(f"%{search}%"),
-                    User.full_name.ilike(f"%{search}%"),
-                    User.email.ilike(f"%{search}%")
+                    User.username.ilike(pattern, escape="\\"),
+                    User.full_name.ilike(pattern, escape="\\"),
+                    User.email.ilike(pattern, escape="\\")
                 )
             )
 
-        stmt = stmt.offset(skip).limit(limit)
+        if cursor:
+            (last_username,) = _decode_page_cursor(cursor, 1)
+            stmt = stmt.where(User.username > last_username)
+        elif skip:
+            stmt = stmt.offset(skip)
+
+        stmt = stmt.order_by(User.username).limit(limit + 1)
         result = await session.execute(stmt)
         users = result.scalars().all()
 
+        if len(users) > limit:
+            users = users[:limit]
+            response.headers["X-Next-Cursor"] = encode_cursor(users[-1].username)
+
         # 构建响应
         user_list = []
         for user in users:
@@ -176,7 +233,7 @@ async def list_users(
 @router.get("/users/{user_id}", response_model=UserListItem, tags=["管理员"])
 async def get_user(
     user_id: str,
-    current_user: User = Depends(get_current_user_required)
+    current_user: TokenPrincipal = Depends(get_current_user_required)
 ):
     """
     获取用户详情
@@ -192,7 +249,7 @@ async def get_user(
 
     db_manager = get_db_manager()
     async with db_manager.get_session() as session:
-        stmt = select(User).where(User.user_id == user_id)
+        stmt = select(User).options(selectinload(User.roles)).where(User.user_id == user_id)
         result = await session.execute(stmt)
         user = result.scalar_one_or_none()
 
@@ -219,7 +276,7 @@ async def get_user(
 @router.post("/users", response_model=UserListItem, tags=["管理员"])
 async def create_user(
     user_data: CreateUserRequest,
-    current_user: User = Depends(get_current_user_required)
+    current_user: TokenPrincipal = Depends(get_current_user_required)
 ):
     """
     创建用户
@@ -271,7 +328,7 @@ async def create_user(
 async def update_user(
     user_id: str,
     user_data: UpdateUserRequest,
-    current_user: User = Depends(get_current_user_required)
+    current_user: TokenPrincipal = Depends(get_current_user_required)
 ):
     """
     更新用户信息
@@ -287,7 +344,7 @@ async def update_user(
 
     db_manager = get_db_manager()
     async with db_manager.get_session() as session:
-        stmt = select(User).where(User.user_id == user_id)
+        stmt = select(User).options(selectinload(User.roles)).where(User.user_id == user_id)
         result = await session.execute(stmt)
         user = result.scalar_one_or_none()
 
@@ -306,11 +363,16 @@ async def update_user(
             user.department = user_data.department
         if user_data.position is not None:
             user.position = user_data.position
+        revocations = []
         if user_data.is_active is not None:
+            if user.is_active and not user_data.is_active:
+                revocations = auth_service.stage_user_revocation(
+                    session, [user.user_id], "user_disabled", disable=True
+                )
             user.is_active = user_data.is_active
 
         await session.commit()
-        await session.refresh(user)
+        auth_service.apply_revocations(revocations)
 
         logger.info(f"[Admin] 用户更新成功: {user.username} by {current_user.username}")
 
@@ -331,7 +393,7 @@ async def update_user(
 @router.delete("/users/{user_id}", tags=["管理员"])
 async def delete_user(
     user_id: str,
-    current_user: User = Depends(get_current_user_required)
+    current_user: TokenPrincipal = Depends(get_current_user_required)
 ):
     """
     删除用户（软删除，仅禁用）
@@ -357,9 +419,13 @@ async def delete_user(
                 detail="用户不存在"
             )
 
-        # 软删除：禁用用户
+        # 软删除：禁用用户，已签发的Token一并吊销
         user.is_active = False
+        revocations = auth_service.stage_user_revocation(
+            session, [user.user_id], "user_deleted", disable=True
+        )
         await session.commit()
+        auth_service.apply_revocations(revocations)
 
         logger.info(f"[Admin] 用户删除成功: {user.username} by {current_user.username}")
 
@@ -370,7 +436,7 @@ async def delete_user(
 async def assign_user_roles(
     user_id: str,
     role_data: AssignRolesRequest,
-    current_user: User = Depends(get_current_user_required)
+    current_user: TokenPrincipal = Depends(get_current_user_required)
 ):
     """
     分配用户角色
@@ -387,7 +453,7 @@ async def assign_user_roles(
     db_manager = get_db_manager()
     async with db_manager.get_session() as session:
         # 查询用户
-        stmt = select(User).where(User.user_id == user_id)
+        stmt = select(User).options(selectinload(User.roles)).where(User.user_id == user_id)
         result = await session.execute(stmt)
         user = result.scalar_one_or_none()
 
@@ -397,18 +463,14 @@ async def assign_user_roles(
                 detail="用户不存在"
             )
 
-        # 清除现有角色
-        user.roles.clear()
-
-        # 分配新角色
-        for role_name in role_data.roles:
-            stmt = select(Role).where(Role.name == role_name)
-            result = await session.execute(stmt)
-            role = result.scalar_one_or_none()
-            if role:
-                user.roles.append(role)
+        # 一次查出所有目标角色，替换现有角色
+        result = await session.execute(select(Role).where(Role.name.in_(role_data.roles)))
+        user.roles = list(result.scalars().all())
 
+        # 旧访问Token中的权限位图失效，刷新后按新角色签发
+        revocations = auth_service.stage_user_revocation(session, [user.user_id], "roles_changed")
         await session.commit()
+        auth_service.apply_revocations(revocations)
 
         logger.info(f"[Admin] 用户角色分配成功: {user.username} -> {role_data.roles} by {current_user.username}")
 
@@ -421,12 +483,14 @@ async def assign_user_roles(
 
 @router.get("/roles", response_model=List[RoleListItem], tags=["管理员"])
 async def list_roles(
-    skip: int = Query(0, ge=0, description="跳过记录数"),
+    response: Response,
+    skip: int = Query(0, ge=0, description="跳过记录数（未传cursor时生效）"),
     limit: int = Query(50, ge=1, le=100, description="返回记录数"),
-    current_user: User = Depends(get_current_user_required)
+    cursor: Optional[str] = Query(None, description="上一页响应头 X-Next-Cursor 的值（键集分页）"),
+    current_user: TokenPrincipal = Depends(get_current_user_required)
 ):
     """
-    获取角色列表
+    获取角色列表（按角色名排序；还有下一页时响应头 X-Next-Cursor 给出游标）
 
     需要权限: role:read
     """
@@ -439,15 +503,27 @@ async def list_roles(
 
     db_manager = get_db_manager()
     async with db_manager.get_session() as session:
-        stmt = select(Role).offset(skip).limit(limit)
+        stmt = select(Role)
+        if cursor:
+            (last_name,) = _decode_page_cursor(cursor, 1)
+            stmt = stmt.where(Role.name > last_name)
+        elif skip:
+            stmt = stmt.offset(skip)
+        stmt = stmt.order_by(Role.name).limit(limit + 1)
         result = await session.execute(stmt)
         roles = result.scalars().all()
 
+        if len(roles) > limit:
+            roles = roles[:limit]
+            response.headers["X-Next-Cursor"] = encode_cursor(roles[-1].name)
+
+        # 用户数量一次分组计数
+        user_counts = await _active_user_counts(session, [role.id for role in roles])
+
         # 构建响应
         role_list = []
         for role in roles:
-            # 计算用户数量
-            user_count = len([u for u in role.users if u.is_active])
+            user_count = user_counts.get(role.id, 0)
 
             role_list.append(RoleListItem(
                 id=role.id,
@@ -466,7 +542,7 @@ async def list_roles(
 @router.get("/roles/{role_id}", response_model=RoleListItem, tags=["管理员"])
 async def get_role(
     role_id: UUID,
-    current_user: User = Depends(get_current_user_required)
+    current_user: TokenPrincipal = Depends(get_current_user_required)
 ):
     """
     获取角色详情
@@ -493,7 +569,7 @@ async def get_role(
             )
 
         # 计算用户数量
-        user_count = len([u for u in role.users if u.is_active])
+        user_count = (await _active_user_counts(session, [role.id])).get(role.id, 0)
 
         return RoleListItem(
             id=role.id,
@@ -510,7 +586,7 @@ async def get_role(
 @router.post("/roles", response_model=RoleListItem, tags=["管理员"])
 async def create_role(
     role_data: CreateRoleRequest,
-    current_user: User = Depends(get_current_user_required)
+    current_user: TokenPrincipal = Depends(get_current_user_required)
 ):
     """
     创建角色
@@ -577,7 +653,7 @@ async def create_role(
 async def update_role(
     role_id: UUID,
     role_data: UpdateRoleRequest,
-    current_user: User = Depends(get_current_user_required)
+    current_user: TokenPrincipal = Depends(get_current_user_required)
 ):
     """
     更新角色
@@ -615,16 +691,22 @@ async def update_role(
             role.display_name = role_data.display_name
         if role_data.description is not None:
             role.description = role_data.description
+        revocations = []
         if role_data.is_active is not None:
+            if role.is_active != role_data.is_active:
+                revocations = auth_service.stage_user_revocation(
+                    session, await _role_user_ids(session, role.id), "role_changed"
+                )
             role.is_active = role_data.is_active
 
         await session.commit()
+        auth_service.apply_revocations(revocations)
         await session.refresh(role)
 
         logger.info(f"[Admin] 角色更新成功: {role.name} by {current_user.username}")
 
         # 计算用户数量
-        user_count = len([u for u in role.users if u.is_active])
+        user_count = (await _active_user_counts(session, [role.id])).get(role.id, 0)
 
         return RoleListItem(
             id=role.id,
@@ -641,7 +723,7 @@ async def update_role(
 @router.delete("/roles/{role_id}", tags=["管理员"])
 async def delete_role(
     role_id: UUID,
-    current_user: User = Depends(get_current_user_required)
+    current_user: TokenPrincipal = Depends(get_current_user_required)
 ):
     """
     删除角色
@@ -674,8 +756,12 @@ async def delete_role(
                 detail="系统角色不能删除"
             )
 
+        revocations = auth_service.stage_user_revocation(
+            session, await _role_user_ids(session, role.id), "role_deleted"
+        )
         await session.delete(role)
         await session.commit()
+        auth_service.apply_revocations(revocations)
 
         logger.info(f"[Admin] 角色删除成功: {role.name} by {current_user.username}")
 
@@ -686,7 +772,7 @@ async def delete_role(
 async def assign_role_permissions(
     role_id: UUID,
     perm_data: AssignPermissionsRequest,
-    current_user: User = Depends(get_current_user_required)
+    current_user: TokenPrincipal = Depends(get_current_user_required)
 ):
     """
     分配角色权限
@@ -731,7 +817,11 @@ async def assign_role_permissions(
             if perm:
                 role.permissions.append(perm)
 
+        revocations = auth_service.stage_user_revocation(
+            session, await _role_user_ids(session, role.id), "role_permissions_changed"
+        )
         await session.commit()
+        auth_service.apply_revocations(revocations)
 
         logger.info(f"[Admin] 角色权限分配成功: {role.name} -> {perm_data.permissions} by {current_user.username}")
 
@@ -747,7 +837,7 @@ async def list_permissions(
     skip: int = Query(0, ge=0, description="跳过记录数"),
     limit: int = Query(100, ge=1, le=200, description="返回记录数"),
     resource: Optional[str] = Query(None, description="按资源筛选"),
-    current_user: User = Depends(get_current_user_required)
+    current_user: TokenPrincipal = Depends(get_current_user_required)
 ):
     """
     获取权限列表
@@ -15,6 +15,7 @@ import json
 import sys
 import traceback
 
+from .startup import get_startup_state, mark_booted, start_warmup
 from .schemas import (
     AnalyzeRequest,
     AnalyzeResponse,
@@ -23,8 +24,12 @@ from .schemas import (
     StatsResponse,
     ErrorResponse
 )
-from ..agents import get_workflow
 from ..database.connection import get_db_manager
+from ..monitoring import get_alert_manager
+from ..monitoring.metrics import configure_metrics
+from ..auth.password_pool import get_password_pool
+from ..auth.revocation import get_revocation_list
+from ..auth.service import auth_service
 
 from .routes import router as routes_router
 from .auth_routes import router as auth_router
@@ -82,12 +87,30 @@ async def lifespan(app: FastAPI):
     # 初始化数据库连接
     db_manager = get_db_manager()
     await db_manager.initialize()
+    # 只读副本延迟测量（未配置 DATABASE_REPLICA_URL 时跳过）
+    await db_manager.start_replica_router()
+    # Token吊销表须在接受请求前加载完成，之后后台增量拉取
+    await get_revocation_list().start()
+    mark_booted()
+
+    # 后台预热（BGE模型、LangGraph工作流），完成前 /api/v1/ready 返回503
+    warmup_task = start_warmup(settings)
+
+    # 告警后台分发（攒批入库、并发通知）
+    get_alert_manager().start_dispatcher()
+    configure_metrics()
 
     logger.info("系统启动完成")
     yield
 
     # 清理资源
     logger.info("系统关闭中...")
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    await get_alert_manager().stop_dispatcher()
+    await get_revocation_list().stop()
+    await auth_service.flush_login_audit()
+    get_password_pool().shutdown()
     await db_manager.close()
     logger.info("系统已关闭")
 
@@ -107,6 +130,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # 键集分页游标
 )
 
 # 认证中间件
@@ -182,6 +206,20 @@ async def health_check():
     )
 
 
+@app.get("/api/v1/ready", tags=["系统"])
+async def readiness_check():
+    """
+    就绪探针
+
+    启动预热结束前返回503，结束后返回200并附带各预热步骤耗时
+    """
+    state = get_startup_state()
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if state.is_ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=state.to_dict()
+    )
+
+
 @app.get("/api/v1/stats", response_model=StatsResponse, tags=["系统"])
 async def get_statistics():
     """
@@ -235,7 +273,8 @@ async def analyze_chip_fault(request: AnalyzeRequest):
     start_time = datetime.now()
 
     try:
-        # 获取工作流
+        # 获取工作流（LangGraph按需导入，通常已由启动预热加载）
+        from ..agents import get_workflow
         workflow = get_workflow()
 
         # 执行分析
@@ -283,6 +322,8 @@ async def analyze_chip_fault(request: AnalyzeRequest):
         try:
             db_manager = get_db_manager()
             logger.info(f"[API] 获取到db_manager: {db_manager}")
+            # 日志和报告存为大对象，行内只写引用（相同日志只存一份）
+            from ..database.blobs import offload_text
 
             await db_manager.store_analysis_result(
                 session_id=result["session_id"],
@@ -319,7 +360,7 @@ async def analyze_chip_fault(request: AnalyzeRequest):
                             "sid": result["session_id"],
                             "mt": "user_input",
                             "sn": 1,
-                            "content": request.raw_log,
+                            "content": await offload_text(request.raw_log),
                             "ct": "log",
                             "ic": False,
                             "cmid": None,
@@ -356,7 +397,7 @@ async def analyze_chip_fault(request: AnalyzeRequest):
                             UPDATE analysis_results
                             SET infer_report = :report
                             WHERE session_id = :sid
-                        """), {"report": result["infer_report"], "sid": result["session_id"]})
+                        """), {"report": await offload_text(result["infer_report"]), "sid": result["session_id"]})
                         await session.commit()
                         logger.info(f"[API] 直接SQL更新infer_report成功")
                 except Exception as sql_e:
@@ -512,7 +553,8 @@ async def root():
         "version": "1.0.0",
         "description": "基于2-Agent架构和MCP标准的自研SoC芯片失效分析系统",
         "docs": "/docs",
-        "health": "/api/v1/health"
+        "health": "/api/v1/health",
+        "ready": "/api/v1/ready"
     }
 
 
@@ -10,7 +10,8 @@ from typing import Optional, List
 from datetime import datetime
 from loguru import logger
 
-from ..auth.dependencies import get_current_user, get_current_user_required
+from ..auth.dependencies import get_current_user, get_current_user_required, get_current_user_record
+from ..auth.revocation import TokenPrincipal
 from ..auth.service import auth_service
 from ..database.rbac_models import User, SystemRoles, SystemPermissions
 from ..database.connection import get_db_manager
@@ -123,7 +124,7 @@ async def login(
 @router.post("/logout", tags=["认证"])
 async def logout(
     request: Request,
-    current_user: User = Depends(get_current_user_required)
+    current_user: TokenPrincipal = Depends(get_current_user_required)
 ):
     """
     用户登出
@@ -135,8 +136,8 @@ async def logout(
     Returns:
         登出成功消息
     """
-    # 从请求头获取session_id
-    session_id = request.headers.get("X-Session-ID")
+    # 会话ID随访问Token携带；兼容旧客户端通过请求头传入
+    session_id = current_user.session_id or request.headers.get("X-Session-ID")
 
     if session_id:
         await auth_service.logout_user(session_id)
@@ -174,7 +175,7 @@ async def refresh_token(refresh_data: RefreshTokenRequest):
 
 @router.get("/me", response_model=UserResponse, tags=["认证"])
 async def get_current_user_info(
-    current_user: User = Depends(get_current_user_required)
+    current_user: User = Depends(get_current_user_record)
 ):
     """
     获取当前用户信息
@@ -270,7 +271,7 @@ async def register(
 async def change_password(
     old_password: str,
     new_password: str,
-    current_user: User = Depends(get_current_user_required)
+    current_user: User = Depends(get_current_user_record)
 ):
     """
     修改密码
@@ -284,7 +285,7 @@ async def change_password(
         修改成功消息
     """
     # 验证旧密码
-    if not auth_service.verify_password(old_password, current_user.password_hash):
+    if not await auth_service.verify_password_async(old_password, current_user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="旧密码错误"
@@ -292,7 +293,7 @@ async def change_password(
 
     # 更新密码
     from ..auth.service import AuthService
-    current_user.password_hash = AuthService.hash_password(new_password)
+    current_user.password_hash = await AuthService.hash_password_async(new_password)
     current_user.password_changed_at = datetime.utcnow()
     current_user.must_change_password = False
 
@@ -11,7 +11,8 @@ from uuid import UUID
 from loguru import logger
 
 from ..auth.dependencies import get_current_user_required, get_current_user
-from ..database.rbac_models import User, SystemRoles, SystemPermissions
+from ..auth.revocation import TokenPrincipal
+from ..database.rbac_models import SystemRoles, SystemPermissions
 from ..agents.agent2.correction_processor import CorrectionProcessor
 from ..agents.agent2.expert_interaction import ExpertInteractionAgent
 from ..agents.agent2.knowledge_loop import KnowledgeLoopAgent
@@ -63,6 +64,12 @@ class RejectCorrectionRequest(BaseModel):
     reason: str = Field(..., description="拒绝原因", min_length=10)
 
 
+class BatchApproveRequest(BaseModel):
+    """批量批准修正请求"""
+    correction_ids: List[str] = Field(..., description="修正ID列表", min_length=1, max_length=500)
+    comments: Optional[str] = Field(None, description="审批意见")
+
+
 # ============================================
 # API端点
 # ============================================
@@ -162,10 +169,16 @@ async def submit_correction(
 
 @router.get("/corrections", tags=["专家修正"])
 async def list_corrections(
-    skip: int = Query(0, ge=0),
+    skip: int = Query(0, ge=0, description="跳过记录数（未传cursor时生效）"),
     limit: int = Query(50, ge=1, le=100),
-    status: Optional[str] = Query(None, description="筛选状态"),
-    current_user: User = Depends(get_current_user_required)
+    approval_status: Optional[str] = Query(
+        "pending", alias="status", description="筛选状态（pending/approved/rejected，传空字符串表示不限）"
+    ),
+    submitted_by: Optional[str] = Query(None, description="筛选提交专家ID"),
+    submitted_after: Optional[datetime] = Query(None, description="提交时间下限（含）"),
+    submitted_before: Optional[datetime] = Query(None, description="提交时间上限（不含）"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor（键集分页）"),
+    current_user: TokenPrincipal = Depends(get_current_user_required)
 ):
     """
     获取修正列表
@@ -177,31 +190,116 @@ async def list_corrections(
         # 只能查看自己提交的修正
         expert_id = current_user.user_id
     else:
-        expert_id = None
+        expert_id = submitted_by
 
-    # 获取待处理修正
-    corrections = await correction_processor.get_pending_corrections(
-        expert_id=expert_id
-    )
-
-    # 按状态筛选
-    if status:
-        corrections = [c for c in corrections if c.get("approval_status") == status]
+    try:
+        page = await correction_processor.list_corrections(
+            status=approval_status or None,
+            expert_id=expert_id,
+            submitted_after=submitted_after,
+            submitted_before=submitted_before,
+            limit=limit,
+            cursor=cursor,
+            offset=skip
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
 
     return {
         "success": True,
-        "data": corrections[skip:skip + limit],
-        "total": len(corrections),
+        "data": page["items"],
+        "total": page["total"],
+        "next_cursor": page["next_cursor"],
         "skip": skip,
         "limit": limit
     }
 
 
+@router.post("/corrections/batch/approve", tags=["专家修正"])
+async def approve_corrections_batch(
+    batch: BatchApproveRequest,
+    current_user: TokenPrincipal = Depends(get_current_user_required)
+):
+    """
+    批量批准专家修正，并对批准成功的修正做一次批量知识学习
+
+    需要权限: expert_correction:approve
+    """
+    if not current_user.has_permission(SystemPermissions.EXPERT_CORRECTION_APPROVE):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="权限不足，需要权限: expert_correction:approve"
+        )
+
+    approved = []
+    failed = {}
+    for correction_id in dict.fromkeys(batch.correction_ids):
+        result = await correction_processor.approve_correction(
+            correction_id=correction_id,
+            approver_id=current_user.user_id,
+            comments=batch.comments
+        )
+        if result["success"]:
+            approved.append(correction_id)
+        else:
+            failed[correction_id] = result.get("message", "批准失败")
+
+    logger.info(f"[Expert] 用户 {current_user.username} 批量批准修正: {len(approved)} 条成功, {len(failed)} 条失败")
+
+    response = {"success": bool(approved), "approved": approved, "failed": failed}
+    if not approved:
+        return response
+
+    try:
+        from ..database.connection import get_db_manager
+        from ..database.models import ExpertCorrection
+        from sqlalchemy import select
+
+        db_manager = get_db_manager()
+        async with db_manager.get_session() as session:
+            result = await session.execute(
+                select(ExpertCorrection).where(ExpertCorrection.correction_id.in_(approved))
+            )
+            corrections = {c.correction_id: c for c in result.scalars().all()}
+
+        items = []
+        for correction_id in approved:
+            correction = corrections.get(correction_id)
+            if correction is None:
+                continue
+            analysis = await db_manager.get_analysis_result(correction.analysis_id)
+            fault_features = analysis.get("fault_features", {}) if analysis else {}
+            if analysis and analysis.get("raw_log"):
+                fault_features["raw_log"] = analysis["raw_log"]
+            items.append({
+                "session_id": correction.analysis_id,
+                "chip_model": correction.original_result.get("chip_model", ""),
+                "original_result": correction.original_result,
+                "correction": {
+                    "corrected_result": correction.corrected_result,
+                    "correction_reason": correction.correction_reason,
+                    "submitted_by": correction.submitted_by
+                },
+                "fault_features": fault_features
+            })
+
+        response["learning"] = await knowledge_loop.learn_from_corrections_batch(items)
+    except Exception as e:
+        logger.error(f"[Expert] 批量知识学习失败: {str(e)}")
+        # 不影响批准操作，只记录错误
+        response["learning_error"] = str(e)
+
+    return response
+
+
 @router.post("/corrections/{correction_id}/approve", tags=["专家修正"])
 async def approve_correction(
     correction_id: str,
     comments: Optional[str] = None,
-    current_user: User = Depends(get_current_user_required)
+    current_user: TokenPrincipal = Depends(get_current_user_required)
 ):
     """
     批准专家修正
@@ -281,7 +379,7 @@ async def approve_correction(
 async def reject_correction(
     correction_id: str,
     reject_data: RejectCorrectionRequest,
-    current_user: User = Depends(get_current_user_required)
+    current_user: TokenPrincipal = Depends(get_current_user_required)
 ):
     """
     拒绝专家修正
@@ -317,7 +415,7 @@ async def reject_correction(
 async def assign_expert(
     analysis_id: str,
     assignment: ExpertAssignmentRequest,
-    current_user: User = Depends(get_current_user_required)
+    current_user: TokenPrincipal = Depends(get_current_user_required)
 ):
     """
     分配专家处理任务
@@ -372,7 +470,7 @@ async def assign_expert(
 async def list_experts(
     department: Optional[str] = Query(None, description="筛选部门"),
     failure_domain: Optional[str] = Query(None, description="筛选失效域"),
-    current_user: User = Depends(get_current_user_required)
+    current_user: TokenPrincipal = Depends(get_current_user_required)
 ):
     """
     获取可用专家列表
@@ -400,7 +498,7 @@ async def list_experts(
 
 @router.get("/knowledge/statistics", tags=["专家修正"])
 async def get_knowledge_statistics(
-    current_user: User = Depends(get_current_user_required)
+    current_user: TokenPrincipal = Depends(get_current_user_required)
 ):
     """
     获取知识学习统计
@@ -426,7 +524,7 @@ async def get_knowledge_statistics(
 @router.get("/workload/{expert_id}", tags=["专家修正"])
 async def get_expert_workload(
     expert_id: str,
-    current_user: User = Depends(get_current_user_required)
+    current_user: TokenPrincipal = Depends(get_current_user_required)
 ):
     """
     获取专家工作负载
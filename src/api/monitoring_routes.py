@@ -4,13 +4,14 @@
 """
 
 from fastapi import APIRouter, Depends, Query
+from fastapi.responses import PlainTextResponse
 from typing import Optional
 from datetime import datetime
 from loguru import logger
 
-from ..monitoring import get_alert_manager, AlertSeverity
+from ..monitoring import get_alert_manager, AlertSeverity, AlertType
 from ..auth.dependencies import get_current_user_required
-from ..database.rbac_models import User
+from ..auth.revocation import TokenPrincipal
 
 
 # ============================================
@@ -27,7 +28,9 @@ router = APIRouter(prefix="/api/v1/monitoring", tags=["监控告警"])
 async def get_recent_alerts(
     hours: int = Query(24, ge=1, le=168, description="查询最近几小时的告警"),
     severity: Optional[str] = Query(None, description="筛选严重程度"),
-    current_user: User = Depends(get_current_user_required)
+    alert_type: Optional[str] = Query(None, description="筛选告警类型"),
+    limit: int = Query(200, ge=1, le=1000, description="最多返回条数"),
+    current_user: TokenPrincipal = Depends(get_current_user_required)
 ):
     """获取最近的告警"""
     from ..database.rbac_models import SystemPermissions
@@ -41,8 +44,17 @@ async def get_recent_alerts(
         except ValueError:
             pass
 
+    type_filter = None
+    if alert_type:
+        try:
+            type_filter = AlertType(alert_type)
+        except ValueError:
+            pass
+
     alert_manager = get_alert_manager()
-    alerts = alert_manager.get_recent_alerts(hours=hours, severity=severity_filter)
+    alerts = alert_manager.get_recent_alerts(
+        hours=hours, severity=severity_filter, alert_type=type_filter, limit=limit
+    )
 
     return {
         "success": True,
@@ -54,6 +66,9 @@ async def get_recent_alerts(
                 "message": alert.message,
                 "details": alert.details,
                 "timestamp": alert.timestamp.isoformat(),
+                "alert_id": alert.alert_id,
+                "occurrences": alert.occurrences,
+                "last_seen": alert.last_seen.isoformat(),
                 "resolved": alert.resolved
             }
             for alert in alerts
@@ -64,7 +79,7 @@ async def get_recent_alerts(
 
 @router.get("/alerts/statistics", tags=["监控告警"])
 async def get_alert_statistics(
-    current_user: User = Depends(get_current_user_required)
+    current_user: TokenPrincipal = Depends(get_current_user_required)
 ):
     """获取告警统计"""
     from ..database.rbac_models import SystemPermissions
@@ -86,7 +101,7 @@ async def get_alert_health():
     has_critical = stats.get("by_severity", {}).get("critical", 0) > 0
     has_recent_critical = any(
         a.severity == AlertSeverity.CRITICAL and not a.resolved
-        for a in alert_manager.get_recent_alerts(hours=1)
+        for a in alert_manager.get_recent_alerts(hours=1, severity=AlertSeverity.CRITICAL)
     )
 
     return {
@@ -99,6 +114,25 @@ async def get_alert_health():
     }
 
 
+@router.get("/metrics", tags=["监控告警"], response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus 指标（本worker的各阶段耗时直方图和计数，无需认证）"""
+    from ..monitoring.metrics import get_metrics_registry
+
+    return PlainTextResponse(
+        get_metrics_registry().render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@router.get("/metrics/summary", tags=["监控告警"])
+async def get_metrics_summary():
+    """各阶段调用次数与 p50/p99 估计（本worker，无需认证）"""
+    from ..monitoring.metrics import stage_summary
+
+    return {"success": True, "data": stage_summary()}
+
+
 @router.get("/embedding/status", tags=["监控告警"])
 async def get_embedding_status():
     """获取Embedding服务状态（无需认证）"""
@@ -136,9 +170,37 @@ async def get_embedding_status():
             status["status"] = "error"
             status["error"] = str(e)
 
+    # 进程内微批执行器的队列深度与批大小统计
+    from ..embedding import get_embedding_batcher
+    status["batcher"] = get_embedding_batcher().get_stats()
+
     return {"success": True, "data": status}
 
 
+@router.get("/kg/cache", tags=["监控告警"])
+async def get_kg_cache_status():
+    """获取知识图谱投影缓存统计（无需认证）"""
+    from ..database.kg_cache import get_kg_cache
+
+    return {"success": True, "data": get_kg_cache().get_stats()}
+
+
+@router.get("/db/pool", tags=["监控告警"])
+async def get_db_pool_status():
+    """获取数据库连接池占用与借出耗时统计（本worker，无需认证）"""
+    from ..database.connection import get_db_manager
+
+    return {"success": True, "data": get_db_manager().get_pool_stats()}
+
+
+@router.get("/blobs", tags=["监控告警"])
+async def get_blob_store_status():
+    """获取日志/报告大对象存储的写入、去重与缓存统计（本worker，无需认证）"""
+    from ..database.blobs import get_blob_store
+
+    return {"success": True, "data": get_blob_store().get_stats()}
+
+
 @router.post("/embedding/test", tags=["监控告警"])
 async def test_embedding(
     text: str = Query(..., description="测试文本")
@@ -275,18 +275,18 @@ async def rollback_to_message(
     logger.info(f"[MultiTurn API] 回滚会话 - session: {session_id}, to_message: {to_message_id}")
 
     try:
-        # TODO: 实现回滚逻辑
-        # 1. 删除指定消息之后的所有消息
-        # 2. 删除指定快照之后的所有快照
-        # 3. 恢复到指定消息时的分析状态
+        result = await multi_turn_handler.rollback_to_message(session_id, to_message_id, reason)
 
-        return {
-            "success": True,
-            "message": "回滚功能待实现",
-            "session_id": session_id,
-            "rolled_back_to": to_message_id
-        }
+        if not result["success"]:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=result["error"]
+            )
+
+        return result
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"[MultiTurn API] 回滚失败: {str(e)}")
         raise HTTPException(
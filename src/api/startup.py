@@ -0,0 +1,222 @@
+"""
+芯片失效分析AI Agent系统 - 启动预热
+在后台加载BGE模型并执行一次编码、预先构建LangGraph工作流，
+预热完成前就绪探针（/api/v1/ready）返回503，避免首个分析请求承担冷启动开销
+"""
+
+import asyncio
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+
+# 进程内最早可获取的时间点：本模块由 app.py 在导入阶段加载
+_PROCESS_IMPORT_START = time.perf_counter()
+
+# 启动时记录耗时的重量级依赖
+HEAVY_MODULES = [
+    "sentence_transformers",
+    "torch",
+    "onnxruntime",
+    "sklearn",
+    "langgraph",
+    "langchain",
+    "openai",
+    "anthropic",
+    "neo4j",
+]
+
+WARMUP_TEXT = "芯片失效分析预热文本 [ERROR] Error Code: 0XCO001"
+
+
+class StartupState:
+    """启动与预热状态"""
+
+    def __init__(self):
+        self.phase = "starting"  # starting / warming / ready / degraded
+        self.started_at = datetime.now()
+        self.boot_seconds: Optional[float] = None
+        self.ready_at: Optional[datetime] = None
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        self.errors: List[str] = []
+
+    @property
+    def is_ready(self) -> bool:
+        """预热已结束（失败的步骤不阻塞服务）"""
+        return self.phase in ("ready", "degraded")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return {
+            "phase": self.phase,
+            "ready": self.is_ready,
+            "started_at": self.started_at.isoformat(),
+            "ready_at": self.ready_at.isoformat() if self.ready_at else None,
+            "boot_seconds": self.boot_seconds,
+            "steps": self.steps,
+            "errors": self.errors,
+            "loaded_heavy_modules": loaded_heavy_modules(),
+        }
+
+
+_startup_state = StartupState()
+
+
+def get_startup_state() -> StartupState:
+    """获取启动状态单例"""
+    return _startup_state
+
+
+def loaded_heavy_modules() -> List[str]:
+    """当前已导入的重量级依赖"""
+    return [name for name in HEAVY_MODULES if name in sys.modules]
+
+
+def mark_booted():
+    """记录从导入到lifespan就绪的耗时"""
+    state = get_startup_state()
+    state.boot_seconds = round(time.perf_counter() - _PROCESS_IMPORT_START, 3)
+    logger.info(
+        f"[Startup] 应用导入及初始化耗时 {state.boot_seconds:.2f}s - "
+        f"已加载重量级依赖: {loaded_heavy_modules() or '无'}"
+    )
+
+
+async def _warm_embedding(settings):
+    """加载BGE模型并执行一次编码"""
+    import os
+
+    if settings.EMBEDDING_BACKEND == "openai":
+        return {"skipped": "openai后端无需预热"}
+
+    if settings.EMBEDDING_SERVER_ENABLED and os.path.exists(settings.EMBEDDING_SERVER_SOCKET):
+        from ..embedding import get_embedding_client
+        client = get_embedding_client(
+            settings.EMBEDDING_SERVER_SOCKET,
+            timeout=settings.EMBEDDING_SERVER_TIMEOUT
+        )
+        embedding = await client.aencode(WARMUP_TEXT, normalize_embeddings=True)
+        return {"mode": "server", "dimension": int(embedding.shape[0])}
+
+    # 与 LLMTool / ClaudeStyleCompressor 共用 BGEModelManager 缓存的模型
+    from ..embedding import get_embedding_batcher
+    embedding = await get_embedding_batcher().encode(WARMUP_TEXT, normalize=True)
+    return {"mode": "local", "dimension": int(embedding.shape[0])}
+
+
+async def _warm_workflow(settings):
+    """导入并构建LangGraph工作流"""
+    from ..agents import get_workflow
+
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, get_workflow)
+    return {}
+
+
+async def _warm_noc_paths(settings):
+    """加载预计算的NoC路径表"""
+    from ..database.noc_paths import get_noc_path_registry
+
+    loop = asyncio.get_running_loop()
+    loaded = await loop.run_in_executor(None, get_noc_path_registry().load_all)
+    return {"chips": len(loaded)}
+
+
+async def _warm_kg_snapshot(settings):
+    """加载本地知识图谱快照"""
+    from ..database.local_graph import get_local_graph_store
+
+    loop = asyncio.get_running_loop()
+    store = await loop.run_in_executor(None, get_local_graph_store)
+    return {"chips": len(store.chip_models)}
+
+
+async def _warm_error_code_index(settings):
+    """从数据库和知识图谱快照构建错误码倒排索引"""
+    from ..database.connection import get_db_manager
+    from ..database.error_code_index import get_error_code_index
+
+    async with get_db_manager().get_session() as session:
+        stats = await get_error_code_index().build(session)
+    return {"codes": stats["codes"]}
+
+
+async def _warm_alert_history(settings):
+    """从数据库恢复最近的告警到内存环形缓冲区"""
+    from ..database.connection import get_db_manager
+    from ..monitoring import get_alert_manager
+
+    async with get_db_manager().get_session() as session:
+        restored = await get_alert_manager().restore_from_database(session)
+    return {"alerts": restored}
+
+
+WARMUP_STEPS = [
+    ("workflow", _warm_workflow),
+    ("embedding", _warm_embedding),
+    ("noc_paths", _warm_noc_paths),
+    ("kg_snapshot", _warm_kg_snapshot),
+    ("error_code_index", _warm_error_code_index),
+    ("alert_history", _warm_alert_history),
+]
+
+
+async def warm_up(settings) -> StartupState:
+    """
+    依次执行预热步骤
+
+    单个步骤失败只记录错误（状态为 degraded），不阻塞服务就绪；
+    全部步骤共用 STARTUP_WARMUP_TIMEOUT 的总时限，超时后剩余步骤记为失败
+
+    Args:
+        settings: 应用配置
+
+    Returns:
+        启动状态
+    """
+    state = get_startup_state()
+    state.phase = "warming"
+    warmup_start = time.perf_counter()
+    deadline = warmup_start + settings.STARTUP_WARMUP_TIMEOUT
+
+    for name, step in WARMUP_STEPS:
+        step_start = time.perf_counter()
+        try:
+            remaining = deadline - step_start
+            if remaining <= 0:
+                raise asyncio.TimeoutError(f"预热总时长超过 {settings.STARTUP_WARMUP_TIMEOUT}s，跳过")
+            detail = await asyncio.wait_for(step(settings), remaining)
+            state.steps[name] = {"ok": True, "seconds": round(time.perf_counter() - step_start, 3), **detail}
+            logger.info(f"[Startup] 预热 {name} 完成 - 耗时: {state.steps[name]['seconds']:.2f}s")
+        except Exception as e:
+            error = f"{name}: {type(e).__name__}: {e}"
+            state.steps[name] = {"ok": False, "seconds": round(time.perf_counter() - step_start, 3)}
+            state.errors.append(error)
+            logger.warning(f"[Startup] 预热 {name} 失败 - {error}")
+
+    state.phase = "degraded" if state.errors else "ready"
+    state.ready_at = datetime.now()
+    logger.info(
+        f"[Startup] 预热结束 - 状态: {state.phase}, "
+        f"耗时: {time.perf_counter() - warmup_start:.2f}s"
+    )
+    return state
+
+
+def start_warmup(settings) -> Optional[asyncio.Task]:
+    """
+    按配置启动后台预热任务
+
+    Returns:
+        预热任务（未启用预热时为None，并直接标记为就绪）
+    """
+    state = get_startup_state()
+    if not settings.STARTUP_WARMUP_ENABLED:
+        state.phase = "ready"
+        state.ready_at = datetime.now()
+        return None
+
+    return asyncio.create_task(warm_up(settings))
@@ -5,7 +5,8 @@
 
 from .service import AuthService, auth_service
 from .decorators import require_auth, require_permission, require_role
-from .dependencies import get_current_user, get_current_user_id
+from .dependencies import get_current_user, get_current_user_id, get_current_user_record
+from .revocation import TokenPrincipal, get_revocation_list
 
 __all__ = [
     "AuthService",
@@ -14,5 +15,8 @@ __all__ = [
     "require_permission",
     "require_role",
     "get_current_user",
-    "get_current_user_id"
+    "get_current_user_id",
+    "get_current_user_record",
+    "TokenPrincipal",
+    "get_revocation_list"
 ]
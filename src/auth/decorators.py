@@ -8,12 +8,9 @@ from typing import Callable, List, Optional
 
 from fastapi import Request, HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
 from loguru import logger
 
-from ..database.connection import get_db_manager
-from ..database.rbac_models import User
+from .revocation import TokenPrincipal
 from .service import auth_service
 
 
@@ -44,55 +41,34 @@ async def get_current_user_id(
     if not credentials:
         return None
 
-    token = credentials.credentials
-    payload = auth_service.decode_token(token)
-
-    if not payload or payload.get("type") != "access":
-        return None
-
-    user_id = payload.get("sub")
-    if not user_id:
+    # 验签 + 内存吊销表，不查库
+    principal = auth_service.verify_access_token(credentials.credentials)
+    if not principal:
         return None
 
-    # 验证用户是否存在且激活
-    db_manager = get_db_manager()
-    async with db_manager.get_session() as session:
-        stmt = select(User).where(
-            User.user_id == user_id,
-            User.is_active == True
-        )
-        result = await session.execute(stmt)
-        user = result.scalar_one_or_none()
-
-        if user:
-            # 存储用户信息到request state
-            request.state.user_id = user_id
-            request.state.user = user
-            return user_id
-
-    return None
+    # 存储用户信息到request state
+    request.state.user_id = principal.user_id
+    request.state.user = principal
+    return principal.user_id
 
 
 async def get_current_user(
+    request: Request,
     current_user_id: Optional[str] = Depends(get_current_user_id)
-) -> Optional[User]:
+) -> Optional[TokenPrincipal]:
     """
     获取当前用户对象
 
     Args:
+        request: FastAPI请求对象
         current_user_id: 当前用户ID
 
     Returns:
-        用户对象，未认证返回None
+        TokenPrincipal，未认证返回None
     """
     if not current_user_id:
         return None
-
-    db_manager = get_db_manager()
-    async with db_manager.get_session() as session:
-        stmt = select(User).where(User.user_id == current_user_id)
-        result = await session.execute(stmt)
-        return result.scalar_one_or_none()
+    return request.state.user
 
 
 # ============================================
@@ -106,7 +82,7 @@ def require_auth(func: Callable) -> Callable:
     Usage:
         @app.get("/api/v1/protected")
         @require_auth
-        async def protected_endpoint(current_user: User = Depends(get_current_user)):
+        async def protected_endpoint(current_user: TokenPrincipal = Depends(get_current_user)):
             return {"message": "Hello, {}".format(current_user.username)}
     """
     @wraps(func)
@@ -133,7 +109,7 @@ def require_permission(permission: str):
     Usage:
         @app.post("/api/v1/analysis")
         @require_permission("analysis:create")
-        async def create_analysis(current_user: User = Depends(get_current_user)):
+        async def create_analysis(current_user: TokenPrincipal = Depends(get_current_user)):
             ...
     """
     def decorator(func: Callable) -> Callable:
@@ -170,7 +146,7 @@ def require_role(role: str):
     Usage:
         @app.post("/api/v1/admin/users")
         @require_role("admin")
-        async def create_user(current_user: User = Depends(get_current_user)):
+        async def create_user(current_user: TokenPrincipal = Depends(get_current_user)):
             ...
     """
     def decorator(func: Callable) -> Callable:
@@ -207,7 +183,7 @@ def require_any_permission(*permissions: str):
     Usage:
         @app.get("/api/v1/resource")
         @require_any_permission("analysis:read", "analysis:update")
-        async def get_resource(current_user: User = Depends(get_current_user)):
+        async def get_resource(current_user: TokenPrincipal = Depends(get_current_user)):
             ...
     """
     def decorator(func: Callable) -> Callable:
@@ -245,7 +221,7 @@ def require_any_role(*roles: str):
     Usage:
         @app.get("/api/v1/resource")
         @require_any_role("admin", "expert")
-        async def get_resource(current_user: User = Depends(get_current_user)):
+        async def get_resource(current_user: TokenPrincipal = Depends(get_current_user)):
             ...
     """
     def decorator(func: Callable) -> Callable:
@@ -280,7 +256,7 @@ def require_superuser(func: Callable) -> Callable:
     Usage:
         @app.delete("/api/v1/users/{user_id}")
         @require_superuser
-        async def delete_user(current_user: User = Depends(get_current_user)):
+        async def delete_user(current_user: TokenPrincipal = Depends(get_current_user)):
             ...
     """
     return require_role("super_admin")(func)
@@ -298,7 +274,7 @@ def optional_auth(func: Callable) -> Callable:
     Usage:
         @app.get("/api/v1/resource")
         @optional_auth
-        async def get_resource(current_user: Optional[User] = Depends(get_current_user)):
+        async def get_resource(current_user: Optional[TokenPrincipal] = Depends(get_current_user)):
             if current_user:
                 return {"message": "Hello, {}".format(current_user.username)}
             else:
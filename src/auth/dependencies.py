@@ -7,10 +7,12 @@ from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy import select
+from sqlalchemy.orm import selectinload
 from loguru import logger
 
 from ..database.connection import get_db_manager
-from ..database.rbac_models import User
+from ..database.rbac_models import User, Role
+from .revocation import TokenPrincipal
 from .service import auth_service
 
 
@@ -24,72 +26,41 @@ security = HTTPBearer(auto_error=False)
 # 依赖注入函数
 # ============================================
 
-async def get_current_user_id(
+async def get_current_user(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
-) -> Optional[str]:
+) -> Optional[TokenPrincipal]:
     """
-    从Token中获取当前用户ID
+    从Token中还原当前用户（验签 + 内存吊销表，不查库）
 
     Args:
         credentials: HTTP Bearer凭证
 
     Returns:
-        用户ID，未认证或Token无效返回None
+        TokenPrincipal（提供 user_id/username/has_permission/has_role），未认证或Token无效返回None
     """
     if not credentials:
         return None
+    return auth_service.verify_access_token(credentials.credentials)
 
-    token = credentials.credentials
-    payload = auth_service.decode_token(token)
 
-    if not payload or payload.get("type") != "access":
-        return None
-
-    user_id = payload.get("sub")
-    if not user_id:
-        return None
-
-    # 验证用户是否存在且激活
-    db_manager = get_db_manager()
-    async with db_manager.get_session() as session:
-        stmt = select(User).where(
-            User.user_id == user_id,
-            User.is_active == True
-        )
-        result = await session.execute(stmt)
-        user = result.scalar_one_or_none()
-
-        if user:
-            return user_id
-
-    return None
-
-
-async def get_current_user(
-    current_user_id: Optional[str] = Depends(get_current_user_id)
-) -> Optional[User]:
+async def get_current_user_id(
+    current_user: Optional[TokenPrincipal] = Depends(get_current_user)
+) -> Optional[str]:
     """
-    获取当前用户对象
+    获取当前用户ID
 
     Args:
-        current_user_id: 当前用户ID
+        current_user: 当前用户
 
     Returns:
-        用户对象，未认证返回None
+        用户ID，未认证或Token无效返回None
     """
-    if not current_user_id:
-        return None
-
-    db_manager = get_db_manager()
-    async with db_manager.get_session() as session:
-        stmt = select(User).where(User.user_id == current_user_id)
-        result = await session.execute(stmt)
-        return result.scalar_one_or_none()
+    return current_user.user_id if current_user else None
 
 
 async def get_current_user_required(
-    current_user: Optional[User] = Depends(get_current_user)
-) -> User:
+    current_user: Optional[TokenPrincipal] = Depends(get_current_user)
+) -> TokenPrincipal:
     """
     获取当前用户对象（必需认证）
 
@@ -111,9 +82,39 @@ async def get_current_user_required(
     return current_user
 
 
-async def get_current_superuser(
-    current_user: User = Depends(get_current_user_required)
+async def get_current_user_record(
+    current_user: TokenPrincipal = Depends(get_current_user_required)
 ) -> User:
+    """
+    从数据库加载当前用户的完整记录（含角色和权限），
+    仅用于需要邮箱、密码哈希等Token中不携带的资料的接口
+
+    Raises:
+        HTTPException: 用户不存在或已禁用时抛出401错误
+    """
+    db_manager = get_db_manager()
+    async with db_manager.get_session() as session:
+        stmt = select(User).options(
+            selectinload(User.roles).selectinload(Role.permissions)
+        ).where(
+            User.user_id == current_user.user_id,
+            User.is_active == True
+        )
+        result = await session.execute(stmt)
+        user = result.scalar_one_or_none()
+
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="未认证，请先登录",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return user
+
+
+async def get_current_superuser(
+    current_user: TokenPrincipal = Depends(get_current_user_required)
+) -> TokenPrincipal:
     """
     获取当前超级管理员用户
 
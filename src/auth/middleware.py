@@ -6,13 +6,12 @@
 from fastapi import Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.types import ASGIApp
-from sqlalchemy import select
 from loguru import logger
 from datetime import datetime
 import json
 
 from ..database.connection import get_db_manager
-from ..database.rbac_models import AuditLog, User
+from ..database.rbac_models import AuditLog
 from .service import auth_service
 
 
@@ -141,7 +140,8 @@ class AuditLogMiddleware(BaseHTTPMiddleware):
             "/docs",
             "/redoc",
             "/openapi.json",
-            "/favicon.ico"
+            "/favicon.ico",
+            "/api/v1/monitoring/metrics"
         ]
         return any(path.startswith(skip_path) for skip_path in skip_paths)
 
@@ -179,29 +179,13 @@ class AuthenticationMiddleware(BaseHTTPMiddleware):
         if not authorization:
             return await call_next(request)
 
-        # 验证Token并设置用户信息到request.state
+        # 验证Token并设置用户信息到request.state（纯CPU，不查库）
         if authorization.startswith("Bearer "):
-            token = authorization[7:]
-            payload = auth_service.decode_token(token)
-
-            if payload and payload.get("type") == "access":
-                user_id = payload.get("sub")
-                if user_id:
-                    # 查询用户信息
-                    db_manager = get_db_manager()
-                    async with db_manager.get_session() as session:
-                        stmt = select(User).where(
-                            User.user_id == user_id,
-                            User.is_active == True
-                        )
-                        result = await session.execute(stmt)
-                        user = result.scalar_one_or_none()
-
-                        if user:
-                            # 设置用户信息到request.state
-                            request.state.user_id = user.user_id
-                            request.state.user = user
-                            request.state.username = user.username
+            principal = auth_service.verify_access_token(authorization[7:])
+            if principal:
+                request.state.user_id = principal.user_id
+                request.state.user = principal
+                request.state.username = principal.username
 
         return await call_next(request)
 
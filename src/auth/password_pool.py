@@ -0,0 +1,139 @@
+"""
+芯片失效分析AI Agent系统 - 密码哈希线程池
+bcrypt 每次校验约数十到数百毫秒且释放GIL，放到专用的有界线程池执行，
+登录高峰时不再阻塞事件循环上的其他请求（包括进行中的分析）
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from loguru import logger
+
+
+class PasswordHashPool:
+    """
+    密码哈希/校验线程池
+
+    - 线程数固定（max_workers），与默认线程池隔离，不和模型推理、文件IO争抢
+    - 同时在途的请求数不超过 max_pending，超出的协程在信号量上排队等待
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        max_pending: int = 64,
+        hasher: Optional[Callable[[str], str]] = None,
+        verifier: Optional[Callable[[str, str], bool]] = None
+    ):
+        """
+        Args:
+            max_workers: 哈希线程数
+            max_pending: 最大在途请求数（含排队）
+            hasher: 明文 -> 哈希（默认 passlib bcrypt）
+            verifier: (明文, 哈希) -> 是否匹配（默认 passlib bcrypt）
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._hasher = hasher
+        self._verifier = verifier
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats = {"calls": 0, "in_flight": 0, "max_wait_ms": 0.0, "total_ms": 0.0}
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_pending)
+            self._loop = loop
+        return self._semaphore
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="password-hash"
+            )
+        return self._executor
+
+    async def _run(self, func: Callable, *args) -> Any:
+        queued_at = time.perf_counter()
+        async with self._get_semaphore():
+            self.stats["in_flight"] += 1
+            started_at = time.perf_counter()
+            try:
+                return await asyncio.get_running_loop().run_in_executor(self._get_executor(), func, *args)
+            finally:
+                finished_at = time.perf_counter()
+                self.stats["in_flight"] -= 1
+                self.stats["calls"] += 1
+                self.stats["total_ms"] += (finished_at - started_at) * 1000
+                self.stats["max_wait_ms"] = max(self.stats["max_wait_ms"], (started_at - queued_at) * 1000)
+
+    async def hash(self, password: str) -> str:
+        """在线程池中计算密码哈希"""
+        hasher = self._hasher
+        if hasher is None:
+            from .service import pwd_context
+            hasher = pwd_context.hash
+        return await self._run(hasher, password)
+
+    async def verify(self, password: str, password_hash: Optional[str]) -> bool:
+        """在线程池中校验密码（哈希为空或格式错误时返回False）"""
+        if not password_hash:
+            return False
+        verifier = self._verifier
+        if verifier is None:
+            from .service import pwd_context
+            verifier = pwd_context.verify
+        try:
+            return await self._run(verifier, password, password_hash)
+        except ValueError as e:
+            logger.warning(f"[PasswordHashPool] 密码哈希格式无效: {e}")
+            return False
+
+    def shutdown(self):
+        """关闭线程池（应用关闭时调用）"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        calls = self.stats["calls"]
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "calls": calls,
+            "in_flight": self.stats["in_flight"],
+            "avg_ms": round(self.stats["total_ms"] / calls, 3) if calls else None,
+            "max_wait_ms": round(self.stats["max_wait_ms"], 3)
+        }
+
+
+# ============================================
+# 全局线程池
+# ============================================
+_password_pool: Optional[PasswordHashPool] = None
+
+
+def get_password_pool() -> PasswordHashPool:
+    """获取密码哈希线程池单例"""
+    global _password_pool
+    if _password_pool is None:
+        from ..config.settings import get_settings
+        settings = get_settings()
+        _password_pool = PasswordHashPool(
+            max_workers=settings.AUTH_HASH_WORKERS,
+            max_pending=settings.AUTH_HASH_MAX_PENDING
+        )
+    return _password_pool
+
+
+def reset_password_pool():
+    """关闭并重置线程池（测试用）"""
+    global _password_pool
+    if _password_pool is not None:
+        _password_pool.shutdown()
+    _password_pool = None
@@ -0,0 +1,316 @@
+"""
+芯片失效分析AI Agent系统 - 无状态Token校验
+访问Token自带权限位图和签发版本（毫秒时间戳），校验只做签名验证和内存吊销表查询；
+登出、角色变更、禁用账户写入 token_revocations 表，各worker每隔几秒增量拉取
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+
+# 吊销类型
+REVOKE_SESSION = "session"  # 会话的全部Token（登出）
+REVOKE_ACCESS = "access"    # 用户此前签发的访问Token（角色/权限变更，刷新后重新签发）
+REVOKE_USER = "user"        # 用户此前签发的全部Token（禁用账户）
+
+
+def now_ms() -> int:
+    """当前时间（毫秒），用作Token签发版本"""
+    return int(time.time() * 1000)
+
+
+# ============================================
+# 权限位图
+# ============================================
+
+class PermissionCodec:
+    """
+    权限名 <-> 位图（十六进制字符串）
+
+    位序取系统预定义权限的声明顺序，只能在末尾追加；
+    不在表中的自定义权限以名称列表单独携带
+    """
+
+    def __init__(self, names: Iterable[str]):
+        self._names = list(names)
+        self._bits = {name: i for i, name in enumerate(self._names)}
+
+    def encode(self, permissions: Iterable[str]) -> Tuple[str, List[str]]:
+        """返回 (位图, 位表之外的权限名)"""
+        bitmap = 0
+        extra = []
+        for name in permissions:
+            bit = self._bits.get(name)
+            if bit is None:
+                extra.append(name)
+            else:
+                bitmap |= 1 << bit
+        return format(bitmap, "x"), sorted(set(extra))
+
+    def decode(self, bitmap: str, extra: Iterable[str] = ()) -> FrozenSet[str]:
+        value = int(bitmap or "0", 16)
+        names = {name for i, name in enumerate(self._names) if value >> i & 1}
+        names.update(extra)
+        return frozenset(names)
+
+
+_permission_codec: Optional[PermissionCodec] = None
+
+
+def get_permission_codec() -> PermissionCodec:
+    """获取权限位图编解码器"""
+    global _permission_codec
+    if _permission_codec is None:
+        from ..database.rbac_models import SystemPermissions
+        _permission_codec = PermissionCodec(
+            item["name"] for item in SystemPermissions.get_default_permissions()
+        )
+    return _permission_codec
+
+
+@dataclass(frozen=True)
+class TokenPrincipal:
+    """
+    从访问Token还原的当前用户（不查库）
+
+    提供路由中用到的 user_id/username/has_permission/has_role；
+    需要邮箱、密码哈希等完整资料时使用 get_current_user_record
+    """
+    user_id: str
+    username: str
+    full_name: Optional[str]
+    roles: FrozenSet[str]
+    permissions: FrozenSet[str]
+    session_id: Optional[str] = None
+    issued_ms: int = 0
+    is_active: bool = True
+
+    def has_permission(self, permission_name: str) -> bool:
+        return permission_name in self.permissions
+
+    def has_role(self, role_name: str) -> bool:
+        return role_name in self.roles
+
+
+# ============================================
+# 内存吊销表
+# ============================================
+
+class RevocationList:
+    """
+    Token吊销表
+
+    - 会话吊销: session_id -> 过期时间
+    - 用户吊销: user_id -> 签发版本下限（访问Token、刷新Token分开记录）
+    条目在对应Token最长有效期之后清除，内存占用只与有效期内的吊销次数有关。
+    首次从数据库加载成功之前拒绝所有Token（失败即关闭）
+    """
+
+    def __init__(
+        self,
+        refresh_interval: float = 5.0,
+        overlap_seconds: float = 30.0,
+        initial_attempts: int = 3,
+        initial_backoff: float = 1.0
+    ):
+        """
+        Args:
+            refresh_interval: 从数据库增量拉取的间隔（秒）
+            overlap_seconds: 增量拉取的回看窗口（秒），覆盖晚提交的事务；重复应用是幂等的
+            initial_attempts: 启动时首次加载的尝试次数（服务就绪前）
+            initial_backoff: 首次加载重试的初始间隔（秒），每次翻倍
+        """
+        self.refresh_interval = refresh_interval
+        self.overlap_seconds = overlap_seconds
+        self.initial_attempts = initial_attempts
+        self.initial_backoff = initial_backoff
+        self.loaded = False
+        self._sessions: Dict[str, float] = {}
+        self._access_floor: Dict[str, Tuple[int, float]] = {}
+        self._refresh_floor: Dict[str, Tuple[int, float]] = {}
+        self._cursor: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"refreshes": 0, "refresh_failures": 0, "applied": 0, "last_refresh_at": None}
+
+    # ---------- 查询 ----------
+
+    def is_revoked(self, payload: Dict[str, Any]) -> bool:
+        """Token是否已吊销（payload 为已验签的Token内容；吊销表尚未加载时一律视为已吊销）"""
+        if not self.loaded:
+            return True
+        session_id = payload.get("sid")
+        if session_id and session_id in self._sessions:
+            return True
+        floors = self._refresh_floor if payload.get("type") == "refresh" else self._access_floor
+        floor = floors.get(payload.get("sub"))
+        return floor is not None and int(payload.get("sv") or 0) < floor[0]
+
+    # ---------- 更新 ----------
+
+    def apply(self, kind: str, subject: str, not_before_ms: int, expires_at: datetime):
+        """应用一条吊销记录（幂等）"""
+        expires = expires_at.timestamp()
+        if kind == REVOKE_SESSION:
+            self._sessions[subject] = max(expires, self._sessions.get(subject, 0.0))
+        else:
+            targets = [self._access_floor]
+            if kind == REVOKE_USER:
+                targets.append(self._refresh_floor)
+            for floors in targets:
+                current = floors.get(subject)
+                if current is None or current[0] < not_before_ms:
+                    floors[subject] = (not_before_ms, max(expires, current[1] if current else 0.0))
+        self.stats["applied"] += 1
+
+    def stage(
+        self,
+        session,
+        kind: str,
+        subjects: Iterable[str],
+        reason: str,
+        ttl: timedelta
+    ) -> List[Any]:
+        """
+        在调用方的事务中写入吊销记录（提交后再调用 apply_rows 立即在本worker生效，
+        其他worker在下次增量拉取时生效）
+        """
+        from ..database.rbac_models import TokenRevocation
+
+        not_before = now_ms()
+        expires_at = datetime.now(timezone.utc) + ttl
+        rows = [
+            TokenRevocation(
+                kind=kind,
+                subject=subject,
+                not_before_ms=not_before,
+                reason=reason,
+                expires_at=expires_at
+            )
+            for subject in dict.fromkeys(subjects)
+        ]
+        session.add_all(rows)
+        return rows
+
+    def apply_rows(self, rows: Iterable[Any]):
+        for row in rows:
+            self.apply(row.kind, row.subject, row.not_before_ms, row.expires_at)
+
+    def prune(self, now: Optional[float] = None):
+        """清除已过期的条目"""
+        now = time.time() if now is None else now
+        self._sessions = {k: v for k, v in self._sessions.items() if v > now}
+        self._access_floor = {k: v for k, v in self._access_floor.items() if v[1] > now}
+        self._refresh_floor = {k: v for k, v in self._refresh_floor.items() if v[1] > now}
+
+    async def refresh(self):
+        """从数据库增量拉取吊销记录"""
+        from sqlalchemy import select
+        from ..database.connection import get_db_manager
+        from ..database.rbac_models import TokenRevocation
+
+        stmt = select(
+            TokenRevocation.kind,
+            TokenRevocation.subject,
+            TokenRevocation.not_before_ms,
+            TokenRevocation.expires_at,
+            TokenRevocation.created_at
+        )
+        if self._cursor is None:
+            # 首次加载：所有仍在有效期内的吊销
+            stmt = stmt.where(TokenRevocation.expires_at > datetime.now(timezone.utc))
+        else:
+            stmt = stmt.where(
+                TokenRevocation.created_at > self._cursor - timedelta(seconds=self.overlap_seconds)
+            )
+
+        async with get_db_manager().get_session() as session:
+            rows = (await session.execute(stmt)).all()
+
+        for kind, subject, not_before_ms, expires_at, created_at in rows:
+            self.apply(kind, subject, not_before_ms, expires_at)
+            if self._cursor is None or created_at > self._cursor:
+                self._cursor = created_at
+        if self._cursor is None:
+            # 表为空时从当前时刻开始增量
+            self._cursor = datetime.now(timezone.utc)
+
+        self.prune()
+        self.loaded = True
+        self.stats["refreshes"] += 1
+        self.stats["last_refresh_at"] = time.time()
+
+    # ---------- 后台任务 ----------
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                self.stats["refresh_failures"] += 1
+                logger.warning(f"[RevocationList] 增量拉取吊销记录失败: {e}")
+
+    async def start(self):
+        """加载当前吊销记录并启动后台增量拉取"""
+        if self._task is not None and not self._task.done():
+            return
+        for attempt in range(1, self.initial_attempts + 1):
+            try:
+                await self.refresh()
+                logger.info(f"[RevocationList] 已加载吊销记录 - 会话: {len(self._sessions)}, 用户: {len(self._access_floor)}")
+                break
+            except Exception as e:
+                self.stats["refresh_failures"] += 1
+                logger.warning(f"[RevocationList] 初次加载吊销记录失败 ({attempt}/{self.initial_attempts}): {e}")
+                if attempt < self.initial_attempts:
+                    await asyncio.sleep(self.initial_backoff * 2 ** (attempt - 1))
+        if not self.loaded:
+            logger.error("[RevocationList] 吊销记录未能加载，加载成功前拒绝所有Token")
+        self._task = asyncio.get_running_loop().create_task(self._run(), name="token-revocations")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "loaded": self.loaded,
+            "revoked_sessions": len(self._sessions),
+            "revoked_users": len(self._access_floor),
+            "running": self._task is not None and not self._task.done()
+        }
+
+
+# ============================================
+# 全局吊销表
+# ============================================
+_revocation_list: Optional[RevocationList] = None
+
+
+def get_revocation_list() -> RevocationList:
+    """获取本进程吊销表单例"""
+    global _revocation_list
+    if _revocation_list is None:
+        from ..config.settings import get_settings
+        _revocation_list = RevocationList(
+            refresh_interval=get_settings().AUTH_REVOCATION_REFRESH_SECONDS
+        )
+    return _revocation_list
+
+
+def reset_revocation_list():
+    """重置吊销表（测试用）"""
+    global _revocation_list
+    _revocation_list = None
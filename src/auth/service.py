@@ -4,15 +4,17 @@
 """
 
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Set
 from uuid import UUID, uuid4
+import asyncio
 import hashlib
 import secrets
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy import select, and_, or_
+from sqlalchemy import select, update, case, or_
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from loguru import logger
 
 from ..database.connection import get_db_manager
@@ -21,6 +23,10 @@ from ..database.rbac_models import (
     SystemRoles, SystemPermissions
 )
 from ..config.settings import get_settings
+from .revocation import (
+    REVOKE_ACCESS, REVOKE_SESSION, REVOKE_USER,
+    TokenPrincipal, get_permission_codec, get_revocation_list, now_ms
+)
 
 settings = get_settings()
 
@@ -38,6 +44,8 @@ class AuthService:
         self.secret_key = settings.JWT_SECRET_KEY
         self.access_token_expire_minutes = settings.JWT_ACCESS_TOKEN_EXPIRE_MINUTES
         self.refresh_token_expire_days = settings.JWT_REFRESH_TOKEN_EXPIRE_DAYS
+        # 后台写入中的登录审计任务（保留引用，避免被垃圾回收）
+        self._pending_audit: Set[asyncio.Task] = set()
 
     # ============================================
     # 密码处理
@@ -53,6 +61,18 @@ class AuthService:
         """验证密码"""
         return pwd_context.verify(plain_password, hashed_password)
 
+    @staticmethod
+    async def hash_password_async(password: str) -> str:
+        """在密码哈希线程池中哈希密码（异步处理器中使用）"""
+        from .password_pool import get_password_pool
+        return await get_password_pool().hash(password)
+
+    @staticmethod
+    async def verify_password_async(plain_password: str, hashed_password: Optional[str]) -> bool:
+        """在密码哈希线程池中验证密码（异步处理器中使用）"""
+        from .password_pool import get_password_pool
+        return await get_password_pool().verify(plain_password, hashed_password)
+
     @staticmethod
     def generate_user_id(username: str) -> str:
         """生成用户ID"""
@@ -121,6 +141,85 @@ class AuthService:
             logger.warning(f"[{self.name}] Token解码失败: {str(e)}")
             return None
 
+    def build_token_data(self, user: User, session_id: str) -> Dict[str, Any]:
+        """
+        访问Token内容：角色、权限位图和签发版本(sv)随Token携带，校验时不再查库
+        （user.roles 及其 permissions 需已加载）
+        """
+        active_roles = [role for role in user.roles if role.is_active]
+        permissions = {
+            permission.name
+            for role in active_roles
+            for permission in role.permissions
+            if permission.is_active
+        }
+        bitmap, extra = get_permission_codec().encode(permissions)
+        token_data = {
+            "sub": user.user_id,
+            "username": user.username,
+            "full_name": user.full_name,
+            "sid": session_id,
+            "sv": now_ms(),
+            "roles": sorted(role.name for role in active_roles),
+            "perm": bitmap
+        }
+        if extra:
+            token_data["px"] = extra
+        return token_data
+
+    def verify_access_token(self, token: str) -> Optional[TokenPrincipal]:
+        """
+        校验访问Token（纯CPU：验签 + 内存吊销表）
+
+        Returns:
+            有效时返回 TokenPrincipal，否则返回None
+        """
+        payload = self.decode_token(token)
+        if not payload or payload.get("type") != "access":
+            return None
+        if not payload.get("sub") or "sv" not in payload:
+            # 旧格式Token不带权限位图，需重新登录
+            return None
+        if get_revocation_list().is_revoked(payload):
+            return None
+        return TokenPrincipal(
+            user_id=payload["sub"],
+            username=payload.get("username"),
+            full_name=payload.get("full_name"),
+            roles=frozenset(payload.get("roles") or ()),
+            permissions=get_permission_codec().decode(payload.get("perm"), payload.get("px") or ()),
+            session_id=payload.get("sid"),
+            issued_ms=int(payload["sv"])
+        )
+
+    def stage_user_revocation(
+        self,
+        session: AsyncSession,
+        user_ids: List[str],
+        reason: str,
+        disable: bool = False
+    ) -> List[Any]:
+        """
+        在调用方事务中吊销用户已签发的Token，提交后调用 apply_revocations
+
+        Args:
+            user_ids: 用户ID列表
+            reason: 原因（roles_changed/user_disabled等）
+            disable: True时刷新Token一并失效（禁用账户）；False时只吊销访问Token，刷新后按新权限签发
+        """
+        if disable:
+            return get_revocation_list().stage(
+                session, REVOKE_USER, user_ids, reason, timedelta(days=self.refresh_token_expire_days)
+            )
+        return get_revocation_list().stage(
+            session, REVOKE_ACCESS, user_ids, reason, timedelta(minutes=self.access_token_expire_minutes)
+        )
+
+    @staticmethod
+    def apply_revocations(rows: List[Any]):
+        """提交后在本worker立即生效（其他worker在下次增量拉取时生效）"""
+        get_revocation_list().apply_rows(rows)
+
     # ============================================
     # 用户认证
     # ============================================
@@ -146,8 +245,10 @@ class AuthService:
         """
         db_manager = get_db_manager()
         async with db_manager.get_session() as session:
-            # 查询用户
-            stmt = select(User).where(
+            # 查询用户（角色和权限一并加载，之后不再懒加载）
+            stmt = select(User).options(
+                selectinload(User.roles).selectinload(Role.permissions)
+            ).where(
                 or_(
                     User.username == username,
                     User.email == username
@@ -158,35 +259,50 @@ class AuthService:
 
             if not user:
                 logger.warning(f"[{self.name}] 用户不存在: {username}")
-                await self._record_login_attempt(session, None, username, False, ip_address, user_agent, "用户不存在")
+                self._record_login_attempt(None, username, False, ip_address, user_agent, "用户不存在")
                 return None
 
             # 检查账户是否激活
             if not user.is_active:
                 logger.warning(f"[{self.name}] 账户已禁用: {username}")
-                await self._record_login_attempt(session, user.user_id, username, False, ip_address, user_agent, "账户已禁用")
+                self._record_login_attempt(user.user_id, username, False, ip_address, user_agent, "账户已禁用")
                 return None
 
             # 检查账户是否被锁定
             if user.is_locked():
                 logger.warning(f"[{self.name}] 账户已锁定: {username}")
-                await self._record_login_attempt(session, user.user_id, username, False, ip_address, user_agent, "账户已锁定")
+                self._record_login_attempt(user.user_id, username, False, ip_address, user_agent, "账户已锁定")
                 return None
 
+            # 结束只读事务、归还连接，再到线程池中校验密码
+            await session.commit()
+
             # 验证密码
-            if not self.verify_password(password, user.password_hash):
+            if not await self.verify_password_async(password, user.password_hash):
                 logger.warning(f"[{self.name}] 密码错误: {username}")
 
-                # 增加失败次数
-                user.failed_login_attempts += 1
+                # 增加失败次数（SQL侧自增，并发失败登录不会丢计数）；失败次数达到5次，锁定账户30分钟
+                attempts = User.failed_login_attempts + 1
+                result = await session.execute(
+                    update(User)
+                    .where(User.id == user.id)
+                    .values(
+                        failed_login_attempts=attempts,
+                        locked_until=case(
+                            (attempts >= 5, datetime.utcnow() + timedelta(minutes=30)),
+                            else_=User.locked_until
+                        )
+                    )
+                    .returning(User.failed_login_attempts)
+                    .execution_options(synchronize_session=False)
+                )
+                failed_attempts = result.scalar_one()
+                await session.commit()
 
-                # 失败次数超过5次，锁定账户30分钟
-                if user.failed_login_attempts >= 5:
-                    user.locked_until = datetime.utcnow() + timedelta(minutes=30)
-                    logger.warning(f"[{self.name}] 账户已锁定: {username}, 失败次数: {user.failed_login_attempts}")
+                if failed_attempts >= 5:
+                    logger.warning(f"[{self.name}] 账户已锁定: {username}, 失败次数: {failed_attempts}")
 
-                await session.commit()
-                await self._record_login_attempt(session, user.user_id, username, False, ip_address, user_agent, "密码错误")
+                self._record_login_attempt(user.user_id, username, False, ip_address, user_agent, "密码错误")
                 return None
 
             # 认证成功，重置失败次数
@@ -195,20 +311,17 @@ class AuthService:
             user.last_login_at = datetime.utcnow()
             user.last_login_ip = ip_address
 
-            await session.commit()
-
             # 创建Token
-            token_data = {
-                "sub": user.user_id,
-                "username": user.username,
-                "full_name": user.full_name
-            }
+            session_id = self.generate_session_id()
+            token_data = self.build_token_data(user, session_id)
             access_token = self.create_access_token(token_data)
-            refresh_token = self.create_refresh_token(token_data)
+            refresh_token = self.create_refresh_token(
+                {key: token_data[key] for key in ("sub", "username", "sid", "sv")}
+            )
 
-            # 创建会话
+            # 创建会话（与用户登录信息在同一事务中提交）
             session_obj = UserSession(
-                session_id=self.generate_session_id(),
+                session_id=session_id,
                 user_id=user.user_id,
                 token=access_token,
                 refresh_token=refresh_token,
@@ -218,10 +331,9 @@ class AuthService:
             )
             session.add(session_obj)
             await session.commit()
-            await session.refresh(session_obj)
 
-            # 记录登录日志
-            await self._record_login_attempt(session, user.user_id, username, True, ip_address, user_agent)
+            # 记录登录日志（后台写入）
+            self._record_login_attempt(user.user_id, username, True, ip_address, user_agent)
 
             # 获取用户权限
             permissions = await self._get_user_permissions(session, user)
@@ -248,6 +360,8 @@ class AuthService:
         """
         刷新访问Token
 
+        会话是否有效由内存吊销表判断，只需查询用户以按当前角色重新计算权限
+
         Args:
             refresh_token: 刷新Token
 
@@ -260,28 +374,19 @@ class AuthService:
             return None
 
         user_id = payload.get("sub")
-        if not user_id:
+        session_id = payload.get("sid")
+        if not user_id or not session_id:
+            return None
+
+        if get_revocation_list().is_revoked(payload):
+            logger.warning(f"[{self.name}] 刷新Token已吊销: session_id={session_id}")
             return None
 
         db_manager = get_db_manager()
         async with db_manager.get_session() as session:
-            # 查询会话
-            stmt = select(UserSession).where(
-                and_(
-                    UserSession.refresh_token == refresh_token,
-                    UserSession.is_active == True,
-                    UserSession.expires_at > datetime.utcnow()
-                )
-            )
-            result = await session.execute(stmt)
-            user_session = result.scalar_one_or_none()
-
-            if not user_session:
-                logger.warning(f"[{self.name}] 无效的刷新Token")
-                return None
-
-            # 查询用户
-            stmt = select(User).where(User.user_id == user_id)
+            stmt = select(User).options(
+                selectinload(User.roles).selectinload(Role.permissions)
+            ).where(User.user_id == user_id)
             result = await session.execute(stmt)
             user = result.scalar_one_or_none()
 
@@ -289,20 +394,9 @@ class AuthService:
                 logger.warning(f"[{self.name}] 用户不存在或已禁用: {user_id}")
                 return None
 
-            # 创建新的访问Token
-            token_data = {
-                "sub": user.user_id,
-                "username": user.username,
-                "full_name": user.full_name
-            }
+            # 创建新的访问Token（沿用会话ID）
+            token_data = self.build_token_data(user, session_id)
             access_token = self.create_access_token(token_data)
-
-            # 更新会话
-            user_session.token = access_token
-            user_session.last_activity_at = datetime.utcnow()
-            await session.commit()
-
-            # 获取用户权限
             permissions = await self._get_user_permissions(session, user)
 
             return {
@@ -314,14 +408,14 @@ class AuthService:
                     "username": user.username,
                     "email": user.email,
                     "full_name": user.full_name,
-                    "roles": [role.name for role in user.roles if role.is_active],
+                    "roles": token_data["roles"],
                     "permissions": permissions
                 }
             }
 
     async def logout_user(self, session_id: str) -> bool:
         """
-        用户登出
+        用户登出（会话标记为登出，并吊销该会话的全部Token）
 
         Args:
             session_id: 会话ID
@@ -339,7 +433,12 @@ class AuthService:
                 user_session.is_active = False
                 user_session.logged_out_at = datetime.utcnow()
                 user_session.logout_reason = "user_logout"
+                rows = get_revocation_list().stage(
+                    session, REVOKE_SESSION, [session_id], "user_logout",
+                    timedelta(days=self.refresh_token_expire_days)
+                )
                 await session.commit()
+                self.apply_revocations(rows)
 
                 logger.info(f"[{self.name}] 用户登出成功: session_id={session_id}")
                 return True
@@ -457,7 +556,7 @@ class AuthService:
                 full_name=full_name,
                 department=department,
                 position=position,
-                password_hash=self.hash_password(password),
+                password_hash=await self.hash_password_async(password),
                 created_by=created_by
             )
 
@@ -494,9 +593,8 @@ class AuthService:
                     permissions.add(permission.name)
         return list(permissions)
 
-    async def _record_login_attempt(
+    def _record_login_attempt(
         self,
-        session: AsyncSession,
         user_id: Optional[str],
         username: str,
         success: bool,
@@ -504,7 +602,7 @@ class AuthService:
         user_agent: Optional[str] = None,
         error_message: Optional[str] = None
     ):
-        """记录登录尝试"""
+        """记录登录尝试（后台任务写入，不阻塞登录响应）"""
         audit_log = AuditLog(
             user_id=user_id,
             action="login" if success else "login_failed",
@@ -513,8 +611,24 @@ class AuthService:
             ip_address=ip_address,
             user_agent=user_agent
         )
-        session.add(audit_log)
-        await session.commit()
+        task = asyncio.create_task(self._write_audit_log(audit_log))
+        self._pending_audit.add(task)
+        task.add_done_callback(self._pending_audit.discard)
+
+    async def _write_audit_log(self, audit_log: AuditLog):
+        """写入审计日志（失败只记录警告）"""
+        try:
+            db_manager = get_db_manager()
+            async with db_manager.get_session() as session:
+                session.add(audit_log)
+                await session.commit()
+        except Exception as e:
+            logger.warning(f"[{self.name}] 登录审计日志写入失败: {str(e)}")
+
+    async def flush_login_audit(self):
+        """等待后台审计日志写完（应用关闭和测试时调用）"""
+        if self._pending_audit:
+            await asyncio.gather(*list(self._pending_audit), return_exceptions=True)
 
 
 # 全局认证服务实例
@@ -22,6 +22,8 @@ class Settings(BaseSettings):
     API_HOST: str = Field(default="0.0.0.0", description="API监听地址")
     API_PORT: int = Field(default=8000, description="API监听端口")
     API_PREFIX: str = Field(default="/api/v1", description="API前缀")
+    STARTUP_WARMUP_ENABLED: bool = Field(default=True, description="启动后台预热（加载BGE并编码一次、构建工作流），完成前 /api/v1/ready 返回503")
+    STARTUP_WARMUP_TIMEOUT: float = Field(default=300.0, description="启动预热总超时(秒)，所有预热步骤共用；容器健康检查的 start_period 应略大于该值")
 
     # ============================================
     # 数据库配置
@@ -35,6 +37,22 @@ class Settings(BaseSettings):
     POSTGRES_DB: str = Field(default="chip_analysis", description="PostgreSQL数据库")
     POSTGRES_USER: str = Field(default="postgres", description="PostgreSQL用户")
     POSTGRES_PASSWORD: str = Field(default="postgres", description="PostgreSQL密码")
+    # 每个worker一个连接池，workers × (DB_POOL_SIZE + DB_MAX_OVERFLOW) 需小于 PostgreSQL max_connections（默认100）
+    DB_POOL_SIZE: int = Field(default=10, description="每个worker常驻的数据库连接数")
+    DB_MAX_OVERFLOW: int = Field(default=10, description="每个worker在常驻连接之外最多临时新建的连接数")
+    DB_POOL_TIMEOUT: float = Field(default=10.0, description="等待空闲数据库连接的超时(秒)，超时抛错而不是无限排队")
+    DB_POOL_RECYCLE: int = Field(default=3600, description="数据库连接最长复用时间(秒)")
+    DB_POOL_PRE_PING: bool = Field(default=True, description="借出连接前探活（多一次往返，防止使用已被服务端断开的连接）")
+    DATABASE_REPLICA_URL: str = Field(default="", description="只读副本连接URL（为空时所有查询走主库）")
+    DB_REPLICA_MAX_LAG_SECONDS: float = Field(default=5.0, description="副本复制延迟超过该值(秒)时只读查询回落主库")
+    DB_REPLICA_STICKY_SECONDS: float = Field(default=1.0, description="会话写入后，在测得的复制延迟之外继续读主库的时间(秒)")
+    DB_REPLICA_CHECK_SECONDS: float = Field(default=2.0, description="副本复制延迟测量间隔(秒)")
+    DB_PARTITION_MONTHS_AHEAD: int = Field(default=2, description="analysis_results/analysis_messages 预建未来月分区的个数")
+    DB_RETENTION_MONTHS: int = Field(default=12, description="分析结果与消息在线保留的月数（含当月），更早的分区由归档任务导出后删除")
+    DB_ARCHIVE_DIR: str = Field(default="./data/archive", description="过期分区归档文件目录")
+    DB_ARCHIVE_FORMAT: str = Field(default="jsonl", description="归档格式：jsonl（gzip）或 parquet（需要pyarrow）")
+    DB_HOT_WINDOW_DAYS: int = Field(default=31, description="按会话查询时先只扫描最近N天的分区，未命中再查全部分区")
+    DB_STATEMENT_CACHE_SIZE: int = Field(default=500, description="每个连接缓存的asyncpg预编译语句数（经pgbouncer事务模式时设为0）")
 
     # ============================================
     # Neo4j配置
@@ -42,6 +60,13 @@ class Settings(BaseSettings):
     NEO4J_URI: str = Field(default="bolt://localhost:7687", description="Neo4j连接URI")
     NEO4J_USER: str = Field(default="neo4j", description="Neo4j用户")
     NEO4J_PASSWORD: str = Field(default="neo4j", description="Neo4j密码")
+    KG_CACHE_ENABLED: bool = Field(default=True, description="知识图谱查询使用进程内芯片投影缓存")
+    KG_CACHE_MAX_CHIPS: int = Field(default=64, description="知识图谱缓存最多保留的芯片型号数")
+    KG_CACHE_TTL_SECONDS: float = Field(default=3600.0, description="芯片投影最长存活时间(秒)，正常由图版本号失效")
+    KG_CACHE_VERSION_CHECK_SECONDS: float = Field(default=5.0, description="向Neo4j核对图版本号的最小间隔(秒)")
+    KG_SNAPSHOT_PATH: str = Field(default="./data/kg_snapshot.json", description="本地知识图谱快照（scripts/export_kg_snapshot.py 从Neo4j导出）")
+    KG_LOCAL_REASONING: bool = Field(default=True, description="Agent1知识图谱推理使用本地快照，不逐次访问Neo4j")
+    NOC_PATH_TABLE_DIR: str = Field(default="./data/noc_paths", description="NoC全源最短路径表目录（scripts/build_noc_paths.py 生成）")
 
     # ============================================
     # Redis配置
@@ -77,7 +102,7 @@ class Settings(BaseSettings):
     # ============================================
     EMBEDDING_BACKEND: str = Field(
         default="bge",
-        description="Embedding后端: openai, bge"
+        description="Embedding后端: openai, bge, bge_onnx (ONNX Runtime int8量化)"
     )
     EMBEDDING_MODEL: str = Field(
         default="BAAI/bge-large-zh-v1.5",
@@ -85,6 +110,17 @@ class Settings(BaseSettings):
     )
     EMBEDDING_DEVICE: str = Field(default="cpu", description="BGE推理设备: cpu, cuda, mps")
     EMBEDDING_DIMENSIONS: int = Field(default=1024, description="嵌入维度 (bge-large: 1024, bge-base: 768)")
+    EMBEDDING_ONNX_DIR: str = Field(default="./data/models/onnx", description="ONNX模型导出目录 (backend=bge_onnx)")
+    EMBEDDING_ONNX_QUANTIZE: bool = Field(default=True, description="ONNX后端使用动态int8量化模型")
+    EMBEDDING_ONNX_THREADS: int = Field(default=0, description="ONNX Runtime线程数 (0为自动)")
+    EMBEDDING_SERVER_ENABLED: bool = Field(default=False, description="使用共享Embedding服务（多worker共用一个模型，仅Linux/macOS）")
+    EMBEDDING_SERVER_SOCKET: str = Field(default="/tmp/chip-fault-embedding.sock", description="共享Embedding服务Unix socket路径")
+    EMBEDDING_SERVER_MAX_BATCH: int = Field(default=64, description="共享Embedding服务单批最大文本数")
+    EMBEDDING_SERVER_MAX_WAIT_MS: float = Field(default=5.0, description="共享Embedding服务凑批最大等待时间(ms)")
+    EMBEDDING_SERVER_TIMEOUT: float = Field(default=30.0, description="共享Embedding服务请求超时(秒)")
+    EMBEDDING_BATCH_MAX_SIZE: int = Field(default=32, description="进程内Embedding执行器单批最大文本数")
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = Field(default=3.0, description="进程内Embedding执行器凑批最大等待时间(ms)")
+    EMBEDDING_BATCH_QUEUE_SIZE: int = Field(default=1024, description="进程内Embedding执行器排队请求上限")
     OPENAI_EMBEDDING_MODEL: str = Field(
         default="text-embedding-3-small",
         description="OpenAI embedding模型 (当backend=openai时使用)"
@@ -100,6 +136,14 @@ class Settings(BaseSettings):
     MAX_LOG_SIZE_KB: int = Field(default=100, description="最大日志大小(KB)")
     MAX_BATCH_SIZE: int = Field(default=100, description="最大批量大小")
     ANALYSIS_TIMEOUT_SECONDS: int = Field(default=30, description="分析超时时间")
+    EXPERT_DOMAIN_SLACK: int = Field(default=2, description="专家分配时领域匹配专家的负载让分（任务数）")
+    EXPERT_SCHEDULER_RELOAD_SECONDS: float = Field(default=300.0, description="专家负载从数据库全量重建的间隔（秒）")
+    CASE_RETRIEVAL_MODE: str = Field(
+        default="auto",
+        description="案例检索模式: auto(错误码精确命中时只做词法检索), hybrid(词法+向量RRF融合), lexical, vector"
+    )
+    CASE_RETRIEVAL_RRF_K: int = Field(default=60, description="案例检索RRF融合平滑常数")
+    CASE_LEXICAL_MIN_SIMILARITY: float = Field(default=0.3, description="症状pg_trgm词相似度下限")
 
     # ============================================
     # 上下文管理配置（适配 64KB 限制的 LLM）
@@ -115,8 +159,30 @@ class Settings(BaseSettings):
     CONTEXT_PRESERVE_RATIO: float = Field(default=0.5, description="初始保留比例")
     CONTEXT_USE_CLAUDE_STYLE: bool = Field(default=True, description="使用 Claude Code 风格压缩")
     CONTEXT_TARGET_TOKENS: int = Field(default=18000, description="目标 token 数量（Claude 风格）")
+    CONTEXT_PIPELINE_STAGES: str = Field(
+        default="scan,prioritize,select,window,dedup,render",
+        description="启用的日志压缩阶段（逗号分隔；scan/prioritize/render 必需，可去掉 dedup 等降低延迟）"
+    )
     LLM_MAX_OUTPUT_TOKENS: int = Field(default=2000, description="LLM 最大输出 token 数")
 
+    # ============================================
+    # 日志模板挖掘配置（Drain 风格）
+    # ============================================
+    LOG_TEMPLATE_MINING: bool = Field(default=True, description="启用日志模板挖掘（压缩/去重/embedding 按模板处理）")
+    LOG_TEMPLATE_MAX_LINES: int = Field(default=3, description="每个模板最多保留的非错误码行数")
+
+    # ============================================
+    # 监控告警配置
+    # ============================================
+    ALERT_BUFFER_CAPACITY: int = Field(default=1000, description="内存告警环形缓冲区容量（满后覆盖最旧的告警）")
+    ALERT_DEDUP_SECONDS: int = Field(default=300, description="相同指纹告警的去重窗口(秒)，窗口内只累加出现次数")
+    ALERT_COOLDOWN_SECONDS: int = Field(default=300, description="同类型告警的通知冷却期(秒)，冷却期内只记录不通知")
+    ALERT_QUEUE_SIZE: int = Field(default=1000, description="告警分发队列上限（满时丢弃）")
+    ALERT_BATCH_SIZE: int = Field(default=50, description="告警分发单批最大条数（一次写入数据库）")
+    ALERT_FLUSH_INTERVAL_MS: float = Field(default=200.0, description="告警分发凑批最大等待时间(ms)")
+    ALERT_NOTIFY_TIMEOUT: float = Field(default=5.0, description="单个告警通知（Webhook/邮件）超时(秒)")
+    METRICS_ENABLED: bool = Field(default=True, description="启用流水线耗时指标采集（/api/v1/monitoring/metrics）")
+
     # ============================================
     # JWT配置
     # ============================================
@@ -124,6 +190,9 @@ class Settings(BaseSettings):
     JWT_ALGORITHM: str = Field(default="HS256", description="JWT算法")
     JWT_ACCESS_TOKEN_EXPIRE_MINUTES: int = Field(default=1440, description="JWT访问token过期时间")
     JWT_REFRESH_TOKEN_EXPIRE_DAYS: int = Field(default=30, description="JWT刷新token过期时间")
+    AUTH_HASH_WORKERS: int = Field(default=4, description="密码哈希专用线程数（bcrypt校验不占用事件循环）")
+    AUTH_HASH_MAX_PENDING: int = Field(default=64, description="密码哈希最大在途请求数（超出的登录请求排队等待）")
+    AUTH_REVOCATION_REFRESH_SECONDS: float = Field(default=5.0, description="Token吊销记录增量拉取间隔（秒），即登出/禁用在其他worker上生效的最大延迟")
 
     # ============================================
     # 文件存储配置
@@ -131,6 +200,17 @@ class Settings(BaseSettings):
     UPLOAD_DIR: str = Field(default="./data/uploads", description="上传文件目录")
     REPORTS_DIR: str = Field(default="./data/reports", description="报告存储目录")
     MAX_UPLOAD_SIZE_MB: int = Field(default=10, description="最大上传文件大小")
+    BLOB_STORE_BACKEND: str = Field(default="local", description="日志/报告大对象存储后端：local（本地分片目录）、s3（S3/MinIO，需要boto3）或 none（存在数据库行内）")
+    BLOB_STORE_DIR: str = Field(default="./data/blobs", description="本地大对象存储目录")
+    BLOB_INLINE_MAX_BYTES: int = Field(default=2048, description="不超过该字节数的文本直接存在数据库行内，更大的存为大对象引用")
+    BLOB_ZSTD_LEVEL: int = Field(default=3, description="大对象 zstd 压缩级别")
+    BLOB_CACHE_SIZE: int = Field(default=64, description="进程内缓存的已解压大对象条数")
+    BLOB_S3_BUCKET: str = Field(default="", description="S3 存储桶")
+    BLOB_S3_PREFIX: str = Field(default="blobs/", description="S3 对象键前缀")
+    BLOB_S3_ENDPOINT_URL: str = Field(default="", description="S3 兼容服务地址（MinIO 如 http://localhost:9000，为空使用AWS）")
+    BLOB_S3_ACCESS_KEY: str = Field(default="", description="S3 Access Key（为空使用默认凭证链）")
+    BLOB_S3_SECRET_KEY: str = Field(default="", description="S3 Secret Key")
+    BLOB_S3_REGION: str = Field(default="us-east-1", description="S3 区域")
 
     # ============================================
     # 日志配置
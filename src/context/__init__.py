@@ -6,10 +6,18 @@
 from .manager import ContextManager, get_context_manager
 from .compressor import LogCompressor
 from .conversation import ConversationHistory
+from .template_miner import LogTemplateMiner, LogTemplate, mine_templates
+from .pipeline import CompressionPipeline, CompressionState, STAGES as COMPRESSION_STAGES
 
 __all__ = [
     'ContextManager',
     'get_context_manager',
     'LogCompressor',
-    'ConversationHistory'
+    'ConversationHistory',
+    'LogTemplateMiner',
+    'LogTemplate',
+    'mine_templates',
+    'CompressionPipeline',
+    'CompressionState',
+    'COMPRESSION_STAGES'
 ]
@@ -5,15 +5,17 @@ Claude Code 风格的上下文压缩器
 
 import re
 import numpy as np
-from typing import Dict, List, Any, Set, Tuple, Optional
+from typing import Dict, List, Any, Iterable, Set, Tuple, Optional
 from loguru import logger
 
+from .pipeline import CompressionPipeline, CompressionState
 from .token_budget import (
     TokenBudgetManager,
     ContextToken,
     Priority,
     get_token_budget_manager
 )
+from .template_miner import LogTemplateMiner
 
 
 class ClaudeStyleCompressor:
@@ -26,6 +28,7 @@ class ClaudeStyleCompressor:
     3. 智能截断：保留信息密度高的部分
     4. 滑动窗口：保留最近的高优先级内容
     5. 语义去重：去除重复但保留不同信息
+    6. 模板挖掘：embedding 和去重按唯一日志模板处理，而非逐行
     """
 
     # 关键模式（自动分配 CRITICAL 优先级）
@@ -70,7 +73,9 @@ class ClaudeStyleCompressor:
         token_budget_manager: Optional[TokenBudgetManager] = None,
         target_tokens: int = 18000,
         enable_semantic: bool = True,
-        similarity_threshold: float = 0.3
+        similarity_threshold: float = 0.3,
+        enable_templates: bool = True,
+        stages: Optional[Iterable[str]] = None
     ):
         """
         初始化压缩器
@@ -80,11 +85,14 @@ class ClaudeStyleCompressor:
             target_tokens: 目标 token 数量
             enable_semantic: 是否启用语义分析
             similarity_threshold: 语义相似度阈值
+            enable_templates: 是否启用日志模板挖掘
+            stages: 启用的流水线阶段（为空时全部启用）
         """
         self.token_manager = token_budget_manager or get_token_budget_manager()
         self.target_tokens = target_tokens
         self.enable_semantic = enable_semantic
         self.similarity_threshold = similarity_threshold
+        self.enable_templates = enable_templates
 
         # 编译正则表达式
         self.critical_regex = [(re.compile(p, re.IGNORECASE), name) for p, name in self.CRITICAL_PATTERNS]
@@ -94,20 +102,28 @@ class ClaudeStyleCompressor:
         # 延迟加载 BGE 模型
         self._bge_model = None
 
+        self.pipeline = CompressionPipeline(
+            stages={
+                "scan": self._stage_scan,
+                "prioritize": self._stage_prioritize,
+                "select": self._stage_select,
+                "window": self._stage_window,
+                "dedup": self._stage_dedup,
+                "render": self._stage_render,
+            },
+            token_counter=self.token_manager.calculate_tokens,
+            enabled=stages
+        )
+
     @property
     def bge_model(self):
         """延迟加载 BGE 模型"""
         if self._bge_model is None and self.enable_semantic:
-            from src.embedding import get_bge_model_manager
-            from src.config.settings import get_settings
+            from src.embedding import get_embedding_model
 
             try:
-                settings = get_settings()
-                model_manager = get_bge_model_manager()
-                self._bge_model = model_manager.get_model(
-                    model_name=settings.EMBEDDING_MODEL,
-                    device=settings.EMBEDDING_DEVICE
-                )
+                # 启用共享服务时返回客户端，否则为本地模型
+                self._bge_model = get_embedding_model()
                 logger.info("[ClaudeStyleCompressor] BGE 模型加载完成")
             except Exception as e:
                 logger.warning(f"[ClaudeStyleCompressor] BGE 模型加载失败: {e}")
@@ -119,15 +135,19 @@ class ClaudeStyleCompressor:
         self,
         raw_log: str,
         fault_features: Dict = None,
-        preserve_ratio: float = 0.6
+        preserve_ratio: float = 0.6,
+        skip_stages: Optional[Iterable[str]] = None
     ) -> Dict[str, Any]:
         """
         Claude Code 风格的压缩
 
+        流水线阶段: scan → prioritize → select → window → dedup → render
+
         Args:
             raw_log: 原始日志
             fault_features: 故障特征
             preserve_ratio: 初始保留比例
+            skip_stages: 本次跳过的可选阶段（如延迟敏感时跳过 dedup）
 
         Returns:
             压缩结果
@@ -144,34 +164,16 @@ class ClaudeStyleCompressor:
             f"{original_tokens} tokens / {original_size_kb:.1f} KB"
         )
 
-        # 解析日志行
-        lines = raw_log.split('\n')
-
-        # 步骤1: 为每行分配优先级和 token 计数
-        line_tokens = self._analyze_and_prioritize(lines, fault_features or {})
-
-        # 步骤2: 智能选择（参考 Claude Code 的选择策略）
-        selected = self._intelligent_selection(line_tokens, preserve_ratio)
-
-        # 步骤3: 添加上下文窗口
-        extended = self._add_context_window(selected, len(lines))
+        state = CompressionState(raw_log=raw_log, fault_features=fault_features or {})
+        state.extras["preserve_ratio"] = preserve_ratio
+        profile = self.pipeline.run(state, skip_stages)
 
-        # 步骤4: 语义去重（如果启用）
-        if self.enable_semantic:
-            deduplicated = self._semantic_deduplication(lines, extended, fault_features or {})
-        else:
-            deduplicated = extended
-
-        # 步骤5: 构建结果
-        compressed_lines = [lines[i] for i in sorted(deduplicated)]
-        compressed_log = '\n'.join(compressed_lines)
-
-        # 统计
-        compressed_tokens = self.token_manager.calculate_tokens(compressed_log)
+        lines = state.lines
+        miner = state.miner
+        compressed_log = state.output
+        compressed_tokens = state.output_tokens
         compression_ratio = compressed_tokens / original_tokens if original_tokens > 0 else 0
-
-        # 按优先级统计
-        priority_stats = self._count_by_priority(lines, deduplicated, line_tokens)
+        priority_stats = state.extras["priority_stats"]
 
         logger.info(
             f"[ClaudeStyleCompressor] 压缩完成: "
@@ -188,18 +190,63 @@ class ClaudeStyleCompressor:
             "priority_stats": priority_stats,
             "metadata": {
                 "original_lines": len(lines),
-                "compressed_lines": len(compressed_lines),
+                "compressed_lines": len(state.indices),
+                "template_count": len(miner.templates) if miner else 0,
                 "method": "claude_style_semantic" if self.enable_semantic else "claude_style_rule"
-            }
+            },
+            "templates": miner.summary(top_n=10) if miner else [],
+            "pipeline_profile": profile
         }
 
+    # ==================== 流水线阶段 ====================
+
+    def _stage_scan(self, state: CompressionState):
+        """切分行，模板挖掘（同模板的行共享 embedding）"""
+        state.lines = state.raw_log.split('\n')
+        if self.enable_templates:
+            state.miner = LogTemplateMiner()
+            state.template_ids = state.miner.mine(state.lines)
+
+    def _stage_prioritize(self, state: CompressionState):
+        """为每行分配优先级和 token 计数"""
+        state.line_info = self._analyze_and_prioritize(
+            state.lines, state.fault_features, state.template_ids, state.line_tokens
+        )
+
+    def _stage_select(self, state: CompressionState):
+        """智能选择（参考 Claude Code 的选择策略）"""
+        selected = self._intelligent_selection(state.line_info, state.extras["preserve_ratio"])
+        state.indices = sorted(selected)
+
+    def _stage_window(self, state: CompressionState):
+        """添加上下文窗口"""
+        state.indices = sorted(self._add_context_window(set(state.indices), len(state.lines)))
+
+    def _stage_dedup(self, state: CompressionState):
+        """语义去重（未启用语义时跳过）"""
+        if self.enable_semantic:
+            deduplicated = self._semantic_deduplication(
+                state.lines, set(state.indices), state.fault_features, state.template_ids
+            )
+            state.indices = sorted(deduplicated)
+
+    def _stage_render(self, state: CompressionState):
+        """构建结果并按优先级统计"""
+        state.output = '\n'.join(state.lines[i] for i in state.indices)
+        state.output_tokens = self.token_manager.calculate_tokens(state.output)
+        state.extras["priority_stats"] = self._count_by_priority(
+            state.lines, set(state.indices), state.line_info
+        )
+
     def _analyze_and_prioritize(
         self,
         lines: List[str],
-        fault_features: Dict
+        fault_features: Dict,
+        template_ids: Optional[List[int]] = None,
+        line_tokens: Optional[List[int]] = None
     ) -> List[Dict]:
         """
-        分析每行并分配优先级
+        分析每行并分配优先级（line_tokens 为已计算的逐行 token 数）
 
         返回每行的信息：
         {
@@ -223,14 +270,14 @@ class ClaudeStyleCompressor:
         # 批量计算 embedding（如果启用）
         line_embeddings = None
         if self.enable_semantic and query_embedding is not None:
-            line_embeddings = self._batch_encode_lines(lines)
+            line_embeddings = self._batch_encode_lines(lines, template_ids)
 
         for idx, line in enumerate(lines):
             info = {
                 'index': idx,
                 'content': line,
                 'priority': Priority.LOW,
-                'tokens': self.token_manager.calculate_tokens(line),
+                'tokens': line_tokens[idx] if line_tokens else self.token_manager.calculate_tokens(line),
                 'is_critical': False,
                 'is_noise': False,
                 'semantic_score': 0.0,
@@ -352,34 +399,37 @@ class ClaudeStyleCompressor:
         self,
         lines: List[str],
         indices: Set[int],
-        fault_features: Dict
+        fault_features: Dict,
+        template_ids: Optional[List[int]] = None
     ) -> Set[int]:
         """语义去重"""
         if len(indices) <= 50 or not self.enable_semantic:
             return indices
 
-        # 获取选中行的 embedding
-        selected_list = [(i, lines[i]) for i in sorted(indices)]
-
-        embeddings = []
-        for idx, line in selected_list:
-            try:
-                emb = self.bge_model.encode(
-                    line,
-                    normalize_embeddings=True,
-                    show_progress_bar=False
-                )
-                embeddings.append((idx, emb))
-            except Exception as e:
-                logger.warning(f"[ClaudeStyleCompressor] 去重 embedding 失败: {e}")
-                embeddings.append((idx, np.zeros(1024)))
+        # 同模板的行只保留首次出现的一行（只对代表行做 embedding）
+        if template_ids is not None:
+            seen_templates = set()
+            idx_list = []
+            for idx in sorted(indices):
+                if template_ids[idx] not in seen_templates:
+                    seen_templates.add(template_ids[idx])
+                    idx_list.append(idx)
+        else:
+            idx_list = sorted(indices)
 
-        if not embeddings:
+        if not idx_list:
             return indices
 
-        # 计算相似度矩阵
-        idx_list = [e[0] for e in embeddings]
-        emb_matrix = np.array([e[1] for e in embeddings])
+        # 批量获取选中行的 embedding
+        try:
+            emb_matrix = np.asarray(self.bge_model.encode(
+                [lines[i] for i in idx_list],
+                normalize_embeddings=True,
+                show_progress_bar=False
+            ))
+        except Exception as e:
+            logger.warning(f"[ClaudeStyleCompressor] 去重 embedding 失败: {e}")
+            emb_matrix = np.zeros((len(idx_list), 1024))
 
         from sklearn.metrics.pairwise import cosine_similarity
         similarity_matrix = cosine_similarity(emb_matrix)
@@ -404,26 +454,56 @@ class ClaudeStyleCompressor:
 
         return deduplicated
 
-    def _batch_encode_lines(self, lines: List[str]) -> np.ndarray:
-        """批量编码日志行"""
-        embeddings = []
-
-        for line in lines:
-            if line.strip():
-                try:
-                    emb = self.bge_model.encode(
-                        line,
-                        normalize_embeddings=True,
-                        show_progress_bar=False
-                    )
-                    embeddings.append(emb)
-                except Exception as e:
-                    logger.warning(f"[ClaudeStyleCompressor] Embedding 失败: {e}")
-                    embeddings.append(np.zeros(1024))
-            else:
-                embeddings.append(np.zeros(1024))
+    def _batch_encode_lines(
+        self,
+        lines: List[str],
+        template_ids: Optional[List[int]] = None
+    ) -> np.ndarray:
+        """
+        批量编码日志行
+
+        提供 template_ids 时只编码每个模板的代表行（首次出现的行），
+        同模板的其它行复用该 embedding
+        """
+        # 每行映射到一个代表行（空行不编码）
+        representative: Dict[Any, int] = {}
+        line_to_rep: List[Optional[int]] = []
+        for idx, line in enumerate(lines):
+            if not line.strip():
+                line_to_rep.append(None)
+                continue
+            key = template_ids[idx] if template_ids is not None else idx
+            if key not in representative:
+                representative[key] = idx
+            line_to_rep.append(representative[key])
+
+        rep_indices = sorted(set(representative.values()))
+        rep_position = {idx: pos for pos, idx in enumerate(rep_indices)}
+
+        rep_embeddings = None
+        if rep_indices:
+            try:
+                rep_embeddings = np.asarray(self.bge_model.encode(
+                    [lines[i] for i in rep_indices],
+                    normalize_embeddings=True,
+                    show_progress_bar=False
+                ))
+            except Exception as e:
+                logger.warning(f"[ClaudeStyleCompressor] Embedding 失败: {e}")
+
+        dim = rep_embeddings.shape[1] if rep_embeddings is not None else 1024
+        embeddings = np.zeros((len(lines), dim))
+        if rep_embeddings is not None:
+            for idx, rep_idx in enumerate(line_to_rep):
+                if rep_idx is not None:
+                    embeddings[idx] = rep_embeddings[rep_position[rep_idx]]
+
+        logger.debug(
+            f"[ClaudeStyleCompressor] 编码 {len(rep_indices)} 个唯一行/模板 "
+            f"(共 {len(lines)} 行)"
+        )
 
-        return np.array(embeddings)
+        return embeddings
 
     def _get_query_embedding(self, fault_features: Dict) -> Optional[np.ndarray]:
         """获取故障特征的语义向量"""
@@ -492,5 +572,6 @@ class ClaudeStyleCompressor:
             "compressed_tokens": 0,
             "compression_ratio": 0.0,
             "priority_stats": {},
-            "metadata": {"method": "empty"}
+            "metadata": {"method": "empty"},
+            "pipeline_profile": []
         }
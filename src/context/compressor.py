@@ -3,18 +3,22 @@
 """
 
 import re
-from typing import Dict, List, Any, Set
+from typing import Dict, List, Any, Iterable, Optional, Set, Tuple
 from loguru import logger
 
+from .pipeline import CompressionPipeline, CompressionState
+from .template_miner import mine_templates
+from .token_budget import get_token_budget_manager
+
 
 class LogCompressor:
     """
     日志压缩器
 
-    策略：
+    策略（对应流水线阶段 scan → prioritize → select → window → dedup → render）：
     1. 提取关键行（错误码、异常、寄存器等）
     2. 时间窗口聚焦（故障前后）
-    3. 去重相似日志
+    3. 去重相似日志（同一模板的重复行只保留前几条）
     4. 智能截断
     """
 
@@ -42,7 +46,10 @@ class LogCompressor:
         self,
         target_size_kb: int = 35,
         keep_header_lines: int = 5,
-        keep_footer_lines: int = 5
+        keep_footer_lines: int = 5,
+        enable_templates: bool = True,
+        max_lines_per_template: int = 3,
+        stages: Optional[Iterable[str]] = None
     ):
         """
         初始化日志压缩器
@@ -51,23 +58,48 @@ class LogCompressor:
             target_size_kb: 目标大小（KB）
             keep_header_lines: 保留头部行数
             keep_footer_lines: 保留尾部行数
+            enable_templates: 是否按日志模板折叠重复行
+            max_lines_per_template: 每个模板最多保留的行数（含已知错误码的行不受限）
+            stages: 启用的流水线阶段（为空时全部启用）
         """
         self.target_size_kb = target_size_kb
         self.target_size_bytes = target_size_kb * 1024
         self.keep_header_lines = keep_header_lines
         self.keep_footer_lines = keep_footer_lines
+        self.enable_templates = enable_templates
+        self.max_lines_per_template = max_lines_per_template
 
         # 编译正则表达式
         self.keyword_regex = [re.compile(p, re.IGNORECASE) for p in self.KEYWORD_PATTERNS]
         self.noise_regex = [re.compile(p) for p in self.NOISE_PATTERNS]
 
-    def compress(self, raw_log: str, fault_features: Dict = None) -> Dict[str, Any]:
+        self._token_manager = get_token_budget_manager()
+        self.pipeline = CompressionPipeline(
+            stages={
+                "scan": self._stage_scan,
+                "prioritize": self._stage_prioritize,
+                "select": self._stage_select,
+                "window": self._stage_window,
+                "dedup": self._stage_dedup,
+                "render": self._stage_render,
+            },
+            token_counter=self._token_manager.calculate_tokens,
+            enabled=stages
+        )
+
+    def compress(
+        self,
+        raw_log: str,
+        fault_features: Dict = None,
+        skip_stages: Optional[Iterable[str]] = None
+    ) -> Dict[str, Any]:
         """
         压缩日志
 
         Args:
             raw_log: 原始日志
             fault_features: 故障特征（用于指导压缩）
+            skip_stages: 本次跳过的可选阶段（select / window / dedup）
 
         Returns:
             {
@@ -75,7 +107,8 @@ class LogCompressor:
                 "compression_ratio": float,
                 "original_size_kb": float,
                 "compressed_size_kb": float,
-                "preserved_elements": Dict[str, int]
+                "preserved_elements": Dict[str, int],
+                "pipeline_profile": List[Dict]  # 各阶段耗时、行数、token 数
             }
         """
         if not raw_log:
@@ -84,7 +117,8 @@ class LogCompressor:
                 "compression_ratio": 0.0,
                 "original_size_kb": 0.0,
                 "compressed_size_kb": 0.0,
-                "preserved_elements": {}
+                "preserved_elements": {},
+                "pipeline_profile": []
             }
 
         original_size = len(raw_log.encode('utf-8'))
@@ -92,37 +126,15 @@ class LogCompressor:
 
         logger.debug(f"[LogCompressor] 开始压缩 - 原始大小: {original_size_kb:.1f} KB")
 
-        # 提取已知错误码
-        error_codes = set()
-        if fault_features:
-            error_codes = set(fault_features.get('error_codes', []))
-
-        # 解析日志
-        lines = raw_log.split('\n')
-        line_info = self._analyze_lines(lines, error_codes)
-
-        # 分层处理
-        key_lines = self._extract_key_lines(lines, line_info)
-        context_lines = self._extract_context_lines(lines, line_info)
-
-        # 合并并去重
-        combined = self._merge_lines(key_lines, context_lines)
-
-        # 如果仍超限，截断
-        compressed = self._truncate_if_needed(combined)
+        state = CompressionState(raw_log=raw_log, fault_features=fault_features or {})
+        profile = self.pipeline.run(state, skip_stages)
+        compressed = state.output
+        miner = state.miner
 
         compressed_size = len(compressed.encode('utf-8'))
         compressed_size_kb = compressed_size / 1024
         compression_ratio = compressed_size / original_size if original_size > 0 else 0
 
-        # 统计保留的元素
-        preserved = {
-            "error_codes": sum(1 for c in error_codes if c in compressed),
-            "error_lines": sum(1 for li in line_info if li.get('is_error') and lines[li['index']] in compressed),
-            "register_lines": sum(1 for li in line_info if li.get('has_register') and lines[li['index']] in compressed),
-            "total_lines": len(compressed.split('\n'))
-        }
-
         logger.info(
             f"[LogCompressor] 压缩完成: "
             f"{original_size_kb:.1f} KB -> {compressed_size_kb:.1f} KB "
@@ -134,9 +146,53 @@ class LogCompressor:
             "compression_ratio": compression_ratio,
             "original_size_kb": original_size_kb,
             "compressed_size_kb": compressed_size_kb,
-            "preserved_elements": preserved
+            "compressed_tokens": state.output_tokens,
+            "preserved_elements": state.extras["preserved"],
+            "template_count": len(miner.templates) if miner else 0,
+            "templates": miner.summary(top_n=10) if miner else [],
+            "pipeline_profile": profile
         }
 
+    # ==================== 流水线阶段 ====================
+
+    def _stage_scan(self, state: CompressionState):
+        """切分行，模板挖掘"""
+        state.lines = state.raw_log.split('\n')
+        if self.enable_templates:
+            state.miner = mine_templates(state.lines)
+
+    def _stage_prioritize(self, state: CompressionState):
+        """逐行分析优先级，折叠同模板的重复行"""
+        error_codes = set(state.fault_features.get('error_codes', []))
+        state.line_info = self._analyze_lines(state.lines, error_codes)
+        if state.miner is not None:
+            self._mark_template_repeats(state.line_info, state.miner)
+        state.indices = [i["index"] for i in state.line_info if not i.get("template_repeat")]
+
+    def _stage_select(self, state: CompressionState):
+        """保留高优先级行"""
+        state.indices = self._extract_key_lines(state.line_info)
+
+    def _stage_window(self, state: CompressionState):
+        """补充关键行周围的上下文"""
+        context_indices = self._extract_context_lines(state.lines, state.line_info)
+        state.indices = list(dict.fromkeys(state.indices + context_indices))
+
+    def _stage_dedup(self, state: CompressionState):
+        """按行内容去重"""
+        state.indices = self._merge_lines(state.lines, state.indices)
+
+    def _stage_render(self, state: CompressionState):
+        """输出文本（超限时截断）并统计保留的元素"""
+        compressed, kept_indices, output_line_count = self._truncate_if_needed(state.lines, state.indices)
+        state.output = compressed
+        state.output_tokens = self._token_manager.calculate_tokens(compressed) if compressed else 0
+        state.indices = kept_indices
+
+        preserved = self._count_preserved(state.lines, state.line_info, kept_indices)
+        preserved["total_lines"] = output_line_count
+        state.extras["preserved"] = preserved
+
     def _analyze_lines(self, lines: List[str], error_codes: Set[str]) -> List[Dict]:
         """分析每一行的特征"""
         line_info = []
@@ -148,12 +204,13 @@ class LogCompressor:
                 "is_empty": not line.strip(),
                 "is_noise": any(r.search(line) for r in self.noise_regex),
                 "has_keyword": any(r.search(line) for r in self.keyword_regex),
-                "has_error_code": any(code in line for code in error_codes),
+                "error_codes": [code for code in error_codes if code in line],
                 "is_short": len(line.strip()) < 100,
                 "length": len(line),
                 "has_timestamp": bool(re.search(r'\d{2}:\d{2}:\d{2}', line)),
                 "has_register": bool(re.search(r'register|reg\s*[:=]|0x[0-9a-f]{8,}', line, re.IGNORECASE))
             }
+            info["has_error_code"] = bool(info["error_codes"])
             info["is_error"] = info["has_keyword"] or info["has_error_code"]
             info["priority"] = self._calculate_priority(info)
             line_info.append(info)
@@ -183,61 +240,92 @@ class LogCompressor:
 
         return max(0, priority)
 
-    def _extract_key_lines(self, lines: List[str], line_info: List[Dict]) -> List[str]:
-        """提取关键行"""
-        key_lines = []
+    def _mark_template_repeats(self, line_info: List[Dict], miner) -> None:
+        """
+        标记同模板的重复行
+
+        每个模板只保留前 max_lines_per_template 行，
+        其余行标记为 template_repeat（含已知错误码的行始终保留）
+        """
+        for template in miner.templates:
+            if template.count <= self.max_lines_per_template:
+                continue
+
+            kept = 0
+            for idx in template.line_indices:
+                info = line_info[idx]
+                if info["has_error_code"]:
+                    continue
+                if kept < self.max_lines_per_template:
+                    kept += 1
+                    continue
+                info["template_repeat"] = True
+
+    def _extract_key_lines(self, line_info: List[Dict]) -> List[int]:
+        """提取关键行的行号"""
+        key_indices = []
 
         for info in line_info:
+            if info.get("template_repeat"):
+                continue
             if info["priority"] >= 50:  # 高优先级阈值
-                key_lines.append(lines[info["index"]])
+                key_indices.append(info["index"])
 
-        return key_lines
+        return key_indices
 
-    def _extract_context_lines(self, lines: List[str], line_info: List[Dict]) -> List[str]:
-        """提取上下文行（关键行周围的内容）"""
-        context_lines = []
+    def _extract_context_lines(self, lines: List[str], line_info: List[Dict]) -> List[int]:
+        """提取上下文行（关键行周围的内容）的行号"""
+        context_indices = []
         context_window = 2  # 前后各2行
 
         # 找到高优先级行的索引
-        key_indices = [i["index"] for i in line_info if i["priority"] >= 80]
+        key_indices = [
+            i["index"] for i in line_info
+            if i["priority"] >= 80 and not i.get("template_repeat")
+        ]
 
         for idx in key_indices:
             # 添加上下文窗口
             for offset in range(-context_window, context_window + 1):
                 target_idx = idx + offset
-                if 0 <= target_idx < len(lines):
-                    context_lines.append(lines[target_idx])
+                if 0 <= target_idx < len(lines) and not line_info[target_idx].get("template_repeat"):
+                    context_indices.append(target_idx)
 
-        return context_lines
+        return context_indices
 
-    def _merge_lines(self, *line_lists: List[str]) -> List[str]:
-        """合并多组行并去重"""
+    def _merge_lines(self, lines: List[str], *index_lists: List[int]) -> List[int]:
+        """合并多组行号，按行内容去重（保留首次出现的行）"""
         seen = set()
         merged = []
 
-        for lines in line_lists:
-            for line in lines:
-                line_hash = hash(line.strip())
-                if line_hash not in seen and line.strip():
-                    seen.add(line_hash)
-                    merged.append(line)
+        for indices in index_lists:
+            for idx in indices:
+                key = lines[idx].strip()
+                if key and key not in seen:
+                    seen.add(key)
+                    merged.append(idx)
 
         return merged
 
-    def _truncate_if_needed(self, lines: List[str]) -> str:
-        """如果超限则智能截断"""
-        if not lines:
-            return ""
+    def _truncate_if_needed(self, lines: List[str], indices: List[int]) -> Tuple[str, List[int], int]:
+        """
+        如果超限则智能截断
+
+        Returns:
+            (压缩后文本, 保留的行号, 输出总行数（含省略标记）)
+        """
+        if not indices:
+            return "", [], 1
 
-        result = '\n'.join(lines)
-        current_size = len(result.encode('utf-8'))
+        selected = [lines[i] for i in indices]
+        current_size = sum(len(line.encode('utf-8')) for line in selected) + len(selected) - 1
 
         if current_size <= self.target_size_bytes:
-            return result
+            return '\n'.join(selected), list(indices), len(selected)
 
         # 计算需要保留的行数
         ratio = self.target_size_bytes / current_size
-        total_lines = len(lines)
+        total_lines = len(indices)
 
         # 保留头部和尾部
         header_size = self.keep_header_lines
@@ -246,20 +334,21 @@ class LogCompressor:
 
         if middle_size < 0:
             # 太小了，只保留头部
-            return '\n'.join(lines[:self.keep_header_lines])
+            kept = list(indices[:self.keep_header_lines])
+            return '\n'.join(lines[i] for i in kept), kept, max(1, len(kept))
 
-        header = lines[:header_size]
+        header = indices[:header_size]
         middle_start = header_size
         middle_end = total_lines - footer_size
 
         # 从中间均匀采样
         if middle_size < (middle_end - middle_start):
             step = max(1, (middle_end - middle_start) // middle_size)
-            middle = lines[middle_start:middle_end:step]
+            middle = indices[middle_start:middle_end:step]
         else:
-            middle = lines[middle_start:middle_end]
+            middle = indices[middle_start:middle_end]
 
-        footer = lines[-footer_size:] if footer_size > 0 else []
+        footer = indices[-footer_size:] if footer_size > 0 else []
 
         # 添加省略标记
         truncation_marker = [
@@ -268,7 +357,47 @@ class LogCompressor:
             ''
         ]
 
-        return '\n'.join(header + truncation_marker + middle + truncation_marker + footer)
+        output = (
+            [lines[i] for i in header] + truncation_marker +
+            [lines[i] for i in middle] + truncation_marker +
+            [lines[i] for i in footer]
+        )
+        return '\n'.join(output), header + middle + footer, len(output)
+
+    def _count_preserved(
+        self,
+        lines: List[str],
+        line_info: List[Dict],
+        kept_indices: List[int]
+    ) -> Dict[str, int]:
+        """
+        基于保留的行号统计保留的元素
+
+        内容与某条保留行相同的行（被去重的重复行）也视为已保留
+        """
+        kept_contents = {lines[i].strip() for i in kept_indices}
+        kept_codes: Set[str] = set()
+        error_lines = register_lines = collapsed_lines = 0
+
+        for info in line_info:
+            if info.get("template_repeat"):
+                collapsed_lines += 1
+            if not (info["is_error"] or info["has_register"]):
+                continue
+            if lines[info["index"]].strip() not in kept_contents:
+                continue
+            kept_codes.update(info["error_codes"])
+            if info["is_error"]:
+                error_lines += 1
+            if info["has_register"]:
+                register_lines += 1
+
+        return {
+            "error_codes": len(kept_codes),
+            "error_lines": error_lines,
+            "register_lines": register_lines,
+            "collapsed_lines": collapsed_lines
+        }
 
     def compress_conversation_message(self, message: str, max_chars: int = 500) -> str:
         """压缩单条对话消息"""
@@ -8,6 +8,8 @@ from typing import Dict, List, Any, Optional
 from loguru import logger
 from dataclasses import dataclass, field
 
+from src.monitoring.metrics import timed
+
 
 @dataclass
 class ContextBudget:
@@ -122,6 +124,9 @@ class ContextManager:
                 from src.config.settings import get_settings
                 self._settings = get_settings()
 
+            from .pipeline import parse_stages
+            stages = parse_stages(self._settings.CONTEXT_PIPELINE_STAGES)
+
             # 根据配置选择压缩器
             if self._settings.CONTEXT_USE_SEMANTIC:
                 from .claude_style_compressor import ClaudeStyleCompressor
@@ -129,13 +134,18 @@ class ContextManager:
                     token_budget_manager=self._get_token_manager(),
                     target_tokens=self.budget.compressed_log // 1,  # token 大约是字节的 1/3
                     enable_semantic=True,
-                    similarity_threshold=self._settings.CONTEXT_SIMILARITY_THRESHOLD
+                    similarity_threshold=self._settings.CONTEXT_SIMILARITY_THRESHOLD,
+                    enable_templates=self._settings.LOG_TEMPLATE_MINING,
+                    stages=stages
                 )
                 logger.info("[ContextManager] 使用 Claude Code 风格语义压缩器")
             else:
                 from .compressor import LogCompressor
                 self._compressor = LogCompressor(
-                    target_size_kb=self.budget.compressed_log // 1024
+                    target_size_kb=self.budget.compressed_log // 1024,
+                    enable_templates=self._settings.LOG_TEMPLATE_MINING,
+                    max_lines_per_template=self._settings.LOG_TEMPLATE_MAX_LINES,
+                    stages=stages
                 )
                 logger.info("[ContextManager] 使用规则压缩器")
 
@@ -157,12 +167,14 @@ class ContextManager:
             )
         return self._conversation_mgr
 
+    @timed("context_process")
     async def process(
         self,
         raw_log: str = "",
         conversation_messages: List[Dict] = None,
         analysis_result: Dict = None,
-        fault_features: Dict = None
+        fault_features: Dict = None,
+        skip_stages: Optional[List[str]] = None
     ) -> ProcessedContext:
         """
         处理输入上下文，确保不超出预算
@@ -172,6 +184,7 @@ class ContextManager:
             conversation_messages: 对话消息列表
             analysis_result: 已有的分析结果
             fault_features: 故障特征
+            skip_stages: 本次跳过的压缩阶段（如延迟敏感时传 ["dedup"]）
 
         Returns:
             ProcessedContext: 处理后的上下文
@@ -183,11 +196,13 @@ class ContextManager:
 
         # 1. 压缩日志
         if raw_log:
-            log_result = self.compressor.compress(raw_log, fault_features or {})
+            log_result = self.compressor.compress(raw_log, fault_features or {}, skip_stages=skip_stages)
             processed.compressed_log = log_result.get("compressed_log", "")
             processed.compressed_tokens = log_result.get("compressed_tokens", 0)
             processed.metadata["log_compression_ratio"] = log_result.get("compression_ratio", 0)
             processed.metadata["log_priority_stats"] = log_result.get("priority_stats", {})
+            processed.metadata["log_templates"] = log_result.get("templates", [])
+            processed.metadata["compression_profile"] = log_result.get("pipeline_profile", [])
             logger.info(f"[ContextManager] 日志压缩: {len(raw_log)} -> {len(processed.compressed_log)} 字符")
 
         # 2. 处理对话历史
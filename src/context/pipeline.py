@@ -0,0 +1,186 @@
+"""
+日志压缩流水线
+把压缩过程拆分为显式阶段，逐阶段记录耗时、行数和 token 数
+
+阶段（按顺序）：
+    scan        切分行、模板挖掘
+    prioritize  逐行特征分析与优先级
+    select      按优先级 / 预算选择行
+    window      为关键行补充上下文窗口
+    dedup       去重（规则压缩器按内容，语义压缩器按 embedding 相似度）
+    render      输出文本（必要时截断）
+
+scan / prioritize / render 为必需阶段，其余阶段可通过配置或单次请求跳过
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from loguru import logger
+
+
+STAGES = ("scan", "prioritize", "select", "window", "dedup", "render")
+REQUIRED_STAGES = frozenset({"scan", "prioritize", "render"})
+
+
+@dataclass
+class CompressionState:
+    """流水线各阶段之间传递的状态"""
+    raw_log: str
+    fault_features: Dict = field(default_factory=dict)
+    lines: List[str] = field(default_factory=list)
+    line_tokens: List[int] = field(default_factory=list)
+    template_ids: Optional[List[int]] = None
+    miner: Any = None
+    line_info: List[Dict] = field(default_factory=list)
+    # 当前保留的行号（有序）
+    indices: List[int] = field(default_factory=list)
+    # render 阶段的输出
+    output: str = ""
+    output_tokens: Optional[int] = None
+    # 各压缩器的附加结果
+    extras: Dict[str, Any] = field(default_factory=dict)
+
+    def tokens_of(self, indices: Iterable[int]) -> int:
+        """计算一组行的 token 数"""
+        line_tokens = self.line_tokens
+        return sum(line_tokens[i] for i in indices)
+
+
+StageFunc = Callable[[CompressionState], None]
+
+
+def parse_stages(value: Optional[Any]) -> Optional[List[str]]:
+    """
+    解析阶段配置
+
+    Args:
+        value: 逗号分隔的字符串或阶段名列表（为空时返回None，表示全部启用）
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.split(",")
+    stages = [s.strip() for s in value if s and s.strip()]
+    return stages or None
+
+
+class CompressionPipeline:
+    """
+    压缩流水线
+
+    每个阶段是一个接收 CompressionState 并原地修改的函数；
+    未启用的可选阶段直接跳过，行集合原样传给下一阶段
+    """
+
+    def __init__(
+        self,
+        stages: Dict[str, StageFunc],
+        token_counter: Callable[[str], int],
+        enabled: Optional[Iterable[str]] = None
+    ):
+        """
+        初始化流水线
+
+        Args:
+            stages: 阶段名 -> 阶段函数
+            token_counter: 单行 token 计数函数
+            enabled: 启用的阶段（为空时全部启用；必需阶段始终启用）
+        """
+        unknown = set(stages) - set(STAGES)
+        if unknown:
+            raise ValueError(f"未知的压缩阶段: {sorted(unknown)}")
+
+        self.stages = stages
+        self.token_counter = token_counter
+        self.enabled = self._resolve_enabled(enabled)
+
+    def _resolve_enabled(self, enabled: Optional[Iterable[str]]) -> List[str]:
+        """计算启用的阶段（保持标准顺序）"""
+        if enabled is None:
+            return [s for s in STAGES if s in self.stages]
+
+        enabled = set(enabled)
+        unknown = enabled - set(STAGES)
+        if unknown:
+            logger.warning(f"[CompressionPipeline] 忽略未知阶段: {sorted(unknown)}")
+
+        missing_required = REQUIRED_STAGES - enabled
+        if missing_required:
+            logger.warning(f"[CompressionPipeline] 必需阶段不可关闭: {sorted(missing_required)}")
+
+        return [s for s in STAGES if s in self.stages and (s in enabled or s in REQUIRED_STAGES)]
+
+    def run(
+        self,
+        state: CompressionState,
+        skip_stages: Optional[Iterable[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        依次执行各阶段
+
+        Args:
+            state: 初始状态
+            skip_stages: 本次额外跳过的阶段（必需阶段不可跳过）
+
+        Returns:
+            各阶段的性能记录：
+            [{"stage", "seconds", "lines_in", "lines_out", "tokens_in", "tokens_out", "skipped"}]
+        """
+        skip = set(skip_stages or ()) - REQUIRED_STAGES
+        profile = []
+        lines_in = 0
+        tokens_in = 0
+
+        for name in STAGES:
+            if name not in self.stages:
+                continue
+
+            if name not in self.enabled or name in skip:
+                profile.append({
+                    "stage": name,
+                    "seconds": 0.0,
+                    "lines_in": lines_in,
+                    "lines_out": lines_in,
+                    "tokens_in": tokens_in,
+                    "tokens_out": tokens_in,
+                    "skipped": True
+                })
+                continue
+
+            start = time.perf_counter()
+            self.stages[name](state)
+            if name == "scan":
+                # 逐行 token 数只计算一次，后续阶段按行号求和
+                state.line_tokens = [self.token_counter(line) for line in state.lines]
+                state.indices = list(range(len(state.lines)))
+            seconds = time.perf_counter() - start
+
+            lines_out = len(state.indices)
+            if name == "render" and state.output_tokens is not None:
+                tokens_out = state.output_tokens
+            else:
+                tokens_out = state.tokens_of(state.indices)
+
+            if name == "scan":
+                lines_in, tokens_in = lines_out, tokens_out
+
+            profile.append({
+                "stage": name,
+                "seconds": round(seconds, 6),
+                "lines_in": lines_in,
+                "lines_out": lines_out,
+                "tokens_in": tokens_in,
+                "tokens_out": tokens_out,
+                "skipped": False
+            })
+            lines_in, tokens_in = lines_out, tokens_out
+
+        logger.debug(
+            "[CompressionPipeline] " + ", ".join(
+                f"{p['stage']}={p['seconds'] * 1000:.1f}ms({p['lines_in']}->{p['lines_out']})"
+                for p in profile if not p["skipped"]
+            )
+        )
+        return profile
@@ -0,0 +1,262 @@
+"""
+日志模板挖掘器 - Drain 风格的在线模板聚类
+芯片日志大多由少量行模板构成（仅地址、核号、时间戳不同），
+先聚类为模板，后续的压缩、去重、embedding 只需处理唯一模板
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Optional
+
+
+# 通配符标记
+WILDCARD = "<*>"
+
+
+@dataclass
+class LogTemplate:
+    """日志模板（一个聚类）"""
+    template_id: int
+    tokens: List[str]
+    sample: str                       # 首次出现的原始行（代表行）
+    count: int = 0
+    first_index: int = -1             # 首次出现的行号
+    last_index: int = -1              # 最后出现的行号
+    first_timestamp: Optional[str] = None
+    last_timestamp: Optional[str] = None
+    line_indices: List[int] = field(default_factory=list)
+
+    @property
+    def template(self) -> str:
+        """模板文本"""
+        return " ".join(self.tokens)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典（不含行号列表）"""
+        return {
+            "template_id": self.template_id,
+            "template": self.template,
+            "sample": self.sample,
+            "count": self.count,
+            "first_index": self.first_index,
+            "last_index": self.last_index,
+            "first_timestamp": self.first_timestamp,
+            "last_timestamp": self.last_timestamp
+        }
+
+
+class LogTemplateMiner:
+    """
+    Drain 风格的在线日志模板挖掘器
+
+    算法：
+    1. 预处理：用正则把时间戳、地址、数字等变量替换为通配符
+    2. 按 token 数量分组，再按前 N 个 token 走固定深度的前缀树
+    3. 在叶子节点的候选模板中找相似度最高者，超过阈值则合并
+       （不同位置替换为通配符），否则新建模板
+    """
+
+    # 变量掩码（按顺序替换）
+    MASK_PATTERNS = [
+        r'\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?',   # 完整时间戳
+        r'\d{2}:\d{2}:\d{2}(?:[.,]\d+)?',                         # 时间
+        r'\b0x[0-9a-fA-F]+\b',                                    # 十六进制地址
+        r'\b\d+\.\d+\.\d+\.\d+(?::\d+)?\b',                       # IP
+        r'(?<!\w)[-+]?\d+(?:\.\d+)?(?!\w)',                       # 独立数字（核号、计数）
+    ]
+
+    # 时间戳提取（用于记录首末出现时间）
+    TIMESTAMP_PATTERN = r'\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}|\d{2}:\d{2}:\d{2}'
+
+    def __init__(
+        self,
+        depth: int = 4,
+        similarity_threshold: float = 0.5,
+        max_children: int = 100,
+        keep_line_indices: bool = True
+    ):
+        """
+        初始化模板挖掘器
+
+        Args:
+            depth: 前缀树深度（含长度层和叶子层，至少为 3）
+            similarity_threshold: 合并到已有模板的最小相似度
+            max_children: 每个内部节点的最大子节点数，超出后归入通配分支
+            keep_line_indices: 是否记录每个模板覆盖的全部行号
+        """
+        self.depth = max(3, depth)
+        self.similarity_threshold = similarity_threshold
+        self.max_children = max_children
+        self.keep_line_indices = keep_line_indices
+
+        self.mask_regex = [re.compile(p) for p in self.MASK_PATTERNS]
+        self.timestamp_regex = re.compile(self.TIMESTAMP_PATTERN)
+
+        self._root: Dict[Any, Any] = {}
+        self._templates: List[LogTemplate] = []
+        self._line_count = 0
+
+    @property
+    def templates(self) -> List[LogTemplate]:
+        """所有模板（按创建顺序）"""
+        return self._templates
+
+    @property
+    def line_count(self) -> int:
+        """已处理的行数"""
+        return self._line_count
+
+    def add_line(self, line: str, index: Optional[int] = None) -> LogTemplate:
+        """
+        增量处理一行日志
+
+        Args:
+            line: 原始日志行
+            index: 行号（默认按处理顺序递增）
+
+        Returns:
+            该行所属的模板
+        """
+        if index is None:
+            index = self._line_count
+        self._line_count += 1
+
+        tokens = self._tokenize(line)
+        leaf = self._descend(tokens)
+
+        template = self._match(leaf, tokens)
+        if template is None:
+            template = LogTemplate(
+                template_id=len(self._templates),
+                tokens=list(tokens),
+                sample=line
+            )
+            self._templates.append(template)
+            leaf.append(template)
+        else:
+            self._merge(template, tokens)
+
+        self._record_occurrence(template, line, index)
+        return template
+
+    def mine(self, lines: List[str]) -> List[int]:
+        """
+        批量处理日志行
+
+        Args:
+            lines: 日志行列表
+
+        Returns:
+            每行对应的模板 ID 列表
+        """
+        return [self.add_line(line, idx).template_id for idx, line in enumerate(lines)]
+
+    def summary(self, top_n: int = 20) -> List[Dict[str, Any]]:
+        """
+        按出现次数排序的模板摘要
+
+        Args:
+            top_n: 返回的最大模板数
+
+        Returns:
+            模板字典列表
+        """
+        ranked = sorted(self._templates, key=lambda t: (-t.count, t.first_index))
+        return [t.to_dict() for t in ranked[:top_n]]
+
+    def _tokenize(self, line: str) -> List[str]:
+        """掩码变量并切分 token"""
+        masked = line.strip()
+        for regex in self.mask_regex:
+            masked = regex.sub(WILDCARD, masked)
+        return masked.split()
+
+    def _descend(self, tokens: List[str]) -> List[LogTemplate]:
+        """沿前缀树下降，返回叶子节点的模板列表"""
+        length_node = self._root.setdefault(len(tokens), {})
+
+        node = length_node
+        prefix_depth = self.depth - 2
+        for depth_idx in range(min(prefix_depth, len(tokens))):
+            token = tokens[depth_idx]
+            if any(ch.isdigit() for ch in token):
+                token = WILDCARD
+
+            if token not in node:
+                if len(node) >= self.max_children:
+                    token = WILDCARD
+                node = node.setdefault(token, {})
+            else:
+                node = node[token]
+
+        return node.setdefault(None, [])
+
+    def _match(self, leaf: List[LogTemplate], tokens: List[str]) -> Optional[LogTemplate]:
+        """在叶子节点中查找最相似的模板"""
+        best = None
+        best_sim = -1.0
+        best_params = -1
+
+        for template in leaf:
+            sim, params = self._similarity(template.tokens, tokens)
+            if sim > best_sim or (sim == best_sim and params > best_params):
+                best, best_sim, best_params = template, sim, params
+
+        if best is not None and best_sim >= self.similarity_threshold:
+            return best
+        return None
+
+    @staticmethod
+    def _similarity(template_tokens: List[str], tokens: List[str]):
+        """计算模板与 token 序列的相似度及模板中的通配位数"""
+        if not tokens:
+            return 1.0, 0
+
+        same = 0
+        params = 0
+        for t1, t2 in zip(template_tokens, tokens):
+            if t1 == t2:
+                same += 1
+            if t1 == WILDCARD:
+                params += 1
+
+        return same / len(tokens), params
+
+    @staticmethod
+    def _merge(template: LogTemplate, tokens: List[str]):
+        """合并：不同位置替换为通配符"""
+        template.tokens = [
+            t1 if t1 == t2 else WILDCARD
+            for t1, t2 in zip(template.tokens, tokens)
+        ]
+
+    def _record_occurrence(self, template: LogTemplate, line: str, index: int):
+        """记录模板的出现次数和首末位置"""
+        template.count += 1
+        if template.first_index < 0:
+            template.first_index = index
+        template.last_index = index
+        if self.keep_line_indices:
+            template.line_indices.append(index)
+
+        ts_match = self.timestamp_regex.search(line)
+        if ts_match:
+            if template.first_timestamp is None:
+                template.first_timestamp = ts_match.group(0)
+            template.last_timestamp = ts_match.group(0)
+
+
+def mine_templates(lines: List[str], **kwargs) -> LogTemplateMiner:
+    """
+    便捷函数：对日志行进行模板挖掘
+
+    Args:
+        lines: 日志行列表
+        **kwargs: LogTemplateMiner 构造参数
+
+    Returns:
+        完成挖掘的 LogTemplateMiner
+    """
+    miner = LogTemplateMiner(**kwargs)
+    miner.mine(lines)
+    return miner
@@ -3,12 +3,17 @@ Token 预算管理器 - 参考 Claude Code 的上下文管理方式
 使用 token 计数而不是字节数来精确管理上下文
 """
 
+import re
 from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass, field
 from enum import IntEnum
 from loguru import logger
 
 
+# 中文字符（CJK统一表意文字基本区）
+CJK_CHAR_RE = re.compile('[\u4e00-\u9fff]')
+
+
 class Priority(IntEnum):
     """内容优先级（参考 Claude Code）"""
     CRITICAL = 100    # 关键内容：错误码、异常、根因分析
@@ -113,7 +118,7 @@ class TokenBudgetManager:
         # 中文：约 1.5 字符 = 1 token
         # 英文：约 4 字符 = 1 token
         # 更精确的估算
-        chinese_chars = sum(1 for c in text if '\u4e00' <= c <= '\u9fff')
+        chinese_chars = len(CJK_CHAR_RE.findall(text))
         other_chars = len(text) - chinese_chars
 
         # 中文字符通常每个占 2-3 字节，对应 1-1.5 token
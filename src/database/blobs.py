@@ -0,0 +1,285 @@
+"""
+芯片失效分析AI Agent系统 - 内容寻址大对象存储
+原始日志、分析报告等大文本按 SHA-256 内容哈希存为 zstd 压缩对象，数据库行只保存引用
+（blob:sha256:<hex>）：相同日志只存一份，表行和WAL只写几十字节。
+
+后端：本地文件系统（<root>/ab/cd/<hex>.zst 两级分片目录），或 S3 兼容对象存储（AWS S3 / MinIO，需要 boto3）
+"""
+
+import asyncio
+import hashlib
+import os
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+from loguru import logger
+
+
+BLOB_REF_PREFIX = "blob:sha256:"
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def blob_ref(digest: str) -> str:
+    return f"{BLOB_REF_PREFIX}{digest}"
+
+
+def is_blob_ref(value: Any) -> bool:
+    return isinstance(value, str) and value.startswith(BLOB_REF_PREFIX) and len(value) == len(BLOB_REF_PREFIX) + 64
+
+
+def ref_digest(ref: str) -> str:
+    return ref[len(BLOB_REF_PREFIX):]
+
+
+def _shard(digest: str) -> str:
+    return f"{digest[:2]}/{digest[2:4]}/{digest}.zst"
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise RuntimeError("大对象存储需要安装 zstandard（pip install zstandard），或设置 BLOB_STORE_BACKEND=none") from e
+    return zstandard
+
+
+# ============================================
+# 后端
+# ============================================
+
+class LocalBlobBackend:
+    """本地文件系统后端：先写临时文件再原子改名，并发写入同一对象时结果一致"""
+
+    name = "local"
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def _path(self, digest: str) -> Path:
+        return self.root / _shard(digest)
+
+    def exists(self, digest: str) -> bool:
+        return self._path(digest).exists()
+
+    def write(self, digest: str, data: bytes):
+        path = self._path(digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def read(self, digest: str) -> bytes:
+        with open(self._path(digest), "rb") as f:
+            return f.read()
+
+
+class S3BlobBackend:
+    """S3 兼容后端（AWS S3 / MinIO）；endpoint_url 为空时使用 AWS 默认地址"""
+
+    name = "s3"
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "blobs/",
+        endpoint_url: str = "",
+        access_key: str = "",
+        secret_key: str = "",
+        region: str = "us-east-1"
+    ):
+        try:
+            import boto3
+        except ImportError as e:
+            raise RuntimeError("S3 大对象存储需要安装 boto3，或设置 BLOB_STORE_BACKEND=local") from e
+        if not bucket:
+            raise ValueError("BLOB_STORE_BACKEND=s3 时必须配置 BLOB_S3_BUCKET")
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            aws_access_key_id=access_key or None,
+            aws_secret_access_key=secret_key or None,
+            region_name=region
+        )
+
+    def _key(self, digest: str) -> str:
+        return f"{self.prefix}{_shard(digest)}"
+
+    def exists(self, digest: str) -> bool:
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(digest))
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def write(self, digest: str, data: bytes):
+        self.client.put_object(Bucket=self.bucket, Key=self._key(digest), Body=data)
+
+    def read(self, digest: str) -> bytes:
+        return self.client.get_object(Bucket=self.bucket, Key=self._key(digest))["Body"].read()
+
+
+# ============================================
+# 存储
+# ============================================
+
+class BlobStore:
+    """
+    大对象存储
+
+    - offload(text): 超过 inline_max_bytes 的文本写入后端并返回引用，短文本原样返回
+    - resolve(value): 引用换回原文，非引用原样返回（兼容迁移前的内联数据）
+
+    后端读写是阻塞IO，放到线程池执行；最近读取的对象按条数缓存，多轮对话每轮重建上下文时不重复解压
+    """
+
+    def __init__(self, backend, inline_max_bytes: int = 2048, level: int = 3, cache_size: int = 64):
+        """
+        Args:
+            backend: LocalBlobBackend / S3BlobBackend
+            inline_max_bytes: 不超过该大小（UTF-8字节）的文本直接存在数据库行内
+            level: zstd 压缩级别
+            cache_size: 解压后对象的缓存条数
+        """
+        self.backend = backend
+        self.inline_max_bytes = inline_max_bytes
+        self.level = level
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self.stats = {"writes": 0, "dedup_hits": 0, "reads": 0, "cache_hits": 0, "bytes_in": 0, "bytes_stored": 0}
+
+    def put_bytes(self, data: bytes) -> str:
+        """写入对象（已存在则跳过），返回内容哈希"""
+        digest = content_hash(data)
+        if self.backend.exists(digest):
+            self.stats["dedup_hits"] += 1
+            return digest
+        compressed = _zstd().ZstdCompressor(level=self.level).compress(data)
+        self.backend.write(digest, compressed)
+        self.stats["writes"] += 1
+        self.stats["bytes_in"] += len(data)
+        self.stats["bytes_stored"] += len(compressed)
+        return digest
+
+    def get_bytes(self, digest: str) -> bytes:
+        data = _zstd().ZstdDecompressor().decompress(self.backend.read(digest))
+        if content_hash(data) != digest:
+            raise ValueError(f"大对象内容校验失败: {digest}")
+        self.stats["reads"] += 1
+        return data
+
+    async def put(self, content: str) -> str:
+        return await asyncio.to_thread(self.put_bytes, content.encode("utf-8"))
+
+    async def get(self, digest: str) -> str:
+        cached = self._cache.get(digest)
+        if cached is not None:
+            self._cache.move_to_end(digest)
+            self.stats["cache_hits"] += 1
+            return cached
+        content = (await asyncio.to_thread(self.get_bytes, digest)).decode("utf-8")
+        self._cache[digest] = content
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return content
+
+    async def offload(self, content: Optional[str]) -> Optional[str]:
+        """大文本换成引用"""
+        if not content or is_blob_ref(content) or len(content.encode("utf-8")) <= self.inline_max_bytes:
+            return content
+        return blob_ref(await self.put(content))
+
+    async def resolve(self, value: Any) -> Any:
+        """引用换回原文"""
+        if not is_blob_ref(value):
+            return value
+        return await self.get(ref_digest(value))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "backend": self.backend.name, "cached": len(self._cache)}
+
+
+class _DisabledBlobStore:
+    """BLOB_STORE_BACKEND=none：不卸载，遇到已有引用时原样返回"""
+
+    async def offload(self, content: Optional[str]) -> Optional[str]:
+        return content
+
+    async def resolve(self, value: Any) -> Any:
+        if is_blob_ref(value):
+            logger.warning(f"[BlobStore] 大对象存储未启用，无法读取 {value}")
+        return value
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"backend": "none"}
+
+
+_blob_store = None
+
+
+def get_blob_store():
+    """按配置创建大对象存储单例"""
+    global _blob_store
+    if _blob_store is None:
+        from src.config.settings import get_settings
+        settings = get_settings()
+        backend = settings.BLOB_STORE_BACKEND
+        if backend == "none":
+            _blob_store = _DisabledBlobStore()
+        else:
+            if backend == "s3":
+                blob_backend = S3BlobBackend(
+                    bucket=settings.BLOB_S3_BUCKET,
+                    prefix=settings.BLOB_S3_PREFIX,
+                    endpoint_url=settings.BLOB_S3_ENDPOINT_URL,
+                    access_key=settings.BLOB_S3_ACCESS_KEY,
+                    secret_key=settings.BLOB_S3_SECRET_KEY,
+                    region=settings.BLOB_S3_REGION
+                )
+            elif backend == "local":
+                blob_backend = LocalBlobBackend(settings.BLOB_STORE_DIR)
+            else:
+                raise ValueError(f"不支持的大对象存储后端: {backend}")
+            _blob_store = BlobStore(
+                blob_backend,
+                inline_max_bytes=settings.BLOB_INLINE_MAX_BYTES,
+                level=settings.BLOB_ZSTD_LEVEL,
+                cache_size=settings.BLOB_CACHE_SIZE
+            )
+            logger.info(f"[BlobStore] 大对象存储已启用 - 后端: {backend}")
+    return _blob_store
+
+
+def reset_blob_store():
+    """重置单例（测试用）"""
+    global _blob_store
+    _blob_store = None
+
+
+async def offload_text(content: Optional[str]) -> Optional[str]:
+    return await get_blob_store().offload(content)
+
+
+async def resolve_text(value: Any) -> Any:
+    return await get_blob_store().resolve(value)
+
+
+async def resolve_fields(record: Optional[Dict[str, Any]], fields: Iterable[str]) -> Optional[Dict[str, Any]]:
+    """返回把指定字段的引用换回原文后的副本"""
+    if not record:
+        return record
+    resolved = dict(record)
+    for field in fields:
+        if is_blob_ref(resolved.get(field)):
+            resolved[field] = await resolve_text(resolved[field])
+    return resolved
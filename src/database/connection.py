@@ -1,6 +1,7 @@
 """
 芯片失效分析AI Agent系统 - 数据库连接配置
 """
+import asyncio
 import traceback
 from typing import AsyncGenerator, Dict, Any, Optional
 from datetime import datetime
@@ -11,7 +12,7 @@ from sqlalchemy.ext.asyncio import (
     async_sessionmaker,
 )
 from sqlalchemy.pool import NullPool
-from sqlalchemy import select
+from sqlalchemy import select, text
 from loguru import logger
 
 
@@ -58,6 +59,8 @@ class DatabaseManager:
     _instance = None
     _engine = None
     _session_factory = None
+    _replica_engine = None
+    _replica_session_factory = None
 
     def __new__(cls):
         if cls._instance is None:
@@ -68,14 +71,13 @@ class DatabaseManager:
         if self._engine is not None:
             return
 
+        from src.database.pool import engine_options
+
         config = DatabaseConfig()
         self._engine = create_async_engine(
             config.database_url,
             echo=False,  # 生产环境设置为False
-            pool_size=10,
-            max_overflow=20,
-            pool_pre_ping=True,
-            pool_recycle=3600,
+            **engine_options(config.settings)
         )
         self._session_factory = async_sessionmaker(
             bind=self._engine,
@@ -85,6 +87,32 @@ class DatabaseManager:
             autoflush=False,
         )
 
+        # 只读副本（可选）：只读查询经 ReplicaRouter 决定走副本还是主库
+        from src.database.replica import ReplicaRouter
+
+        settings = config.settings
+        self._replica_engine = None
+        self._replica_session_factory = None
+        self.replica_router = ReplicaRouter(
+            max_lag=settings.DB_REPLICA_MAX_LAG_SECONDS,
+            sticky_seconds=settings.DB_REPLICA_STICKY_SECONDS,
+            check_interval=settings.DB_REPLICA_CHECK_SECONDS
+        )
+        if settings.DATABASE_REPLICA_URL:
+            self._replica_engine = create_async_engine(
+                settings.DATABASE_REPLICA_URL,
+                echo=False,
+                **engine_options(settings)
+            )
+            self._replica_engine.sync_engine.pool.metrics_name = "replica"
+            self._replica_session_factory = async_sessionmaker(
+                bind=self._replica_engine,
+                class_=AsyncSession,
+                expire_on_commit=False,
+                autocommit=False,
+                autoflush=False,
+            )
+
     @property
     def engine(self):
         """获取数据库引擎"""
@@ -101,8 +129,56 @@ class DatabaseManager:
         async with self._session_factory() as session:
             yield session
 
+    @asynccontextmanager
+    async def get_read_session(self, key: Optional[str] = None) -> AsyncGenerator[AsyncSession, None]:
+        """
+        获取只读会话：副本可用且该会话近期未写入时走副本，否则走主库
+
+        Args:
+            key: 读己之写的粘滞键（通常是分析会话ID，与 mark_written 对应）
+        """
+        factory = self._session_factory
+        if self._replica_session_factory is not None and self.replica_router.use_replica(key):
+            factory = self._replica_session_factory
+        async with factory() as session:
+            yield session
+
+    def mark_written(self, key: Optional[str]):
+        """记录会话写入，复制追上之前该会话的只读查询走主库"""
+        self.replica_router.mark_written(key)
+
+    async def start_replica_router(self):
+        """测量副本延迟并启动后台测量（未配置副本时不做任何事）"""
+        if self._replica_engine is not None:
+            await self.replica_router.start(self._replica_engine)
+
+    @staticmethod
+    def hot_since() -> datetime:
+        """热数据窗口起点：按会话查询先只扫描该时间之后的分区"""
+        from datetime import timedelta, timezone
+        from src.config.settings import get_settings
+        return datetime.now(timezone.utc) - timedelta(days=get_settings().DB_HOT_WINDOW_DAYS)
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """连接池占用与借出耗时统计（本worker）"""
+        stats = self._pool_stats(self._engine)
+        if self._replica_engine is not None:
+            stats["replica"] = self._pool_stats(self._replica_engine)
+            stats["replica_router"] = self.replica_router.get_stats()
+        return stats
+
+    @staticmethod
+    def _pool_stats(engine) -> Dict[str, Any]:
+        pool = engine.sync_engine.pool
+        if hasattr(pool, "get_stats"):
+            return pool.get_stats()
+        return {"status": pool.status()}
+
     async def close(self):
         """关闭数据库连接"""
+        await self.replica_router.stop()
+        if self._replica_engine:
+            await self._replica_engine.dispose()
         if self._engine:
             await self._engine.dispose()
 
@@ -110,11 +186,20 @@ class DatabaseManager:
         """初始化数据库表"""
         from src.database.models import Base
         from src.database.rbac_models import (
-            User, Role, Permission, UserSession
+            User, Role, Permission, UserSession, TokenRevocation
         )
         # 确保所有模型都已导入并注册到Base.metadata
         async with self._engine.begin() as conn:
+            # 案例症状、用户搜索的三元组索引依赖 pg_trgm
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            # 案例错误码规范化函数（表达式索引和词法检索依赖）
+            from src.database.error_code_index import NORMALIZE_ERROR_CODES_FUNCTION
+            await conn.execute(text(NORMALIZE_ERROR_CODES_FUNCTION))
             await conn.run_sync(Base.metadata.create_all)
+            # 分析结果/消息按月分区：补齐当月及未来几个月的分区
+            from src.config.settings import get_settings
+            from src.database.partitions import ensure_partitions
+            await ensure_partitions(conn, months_ahead=get_settings().DB_PARTITION_MONTHS_AHEAD)
 
         logger.info("[DatabaseManager] 数据库表初始化完成")
 
@@ -143,6 +228,12 @@ class DatabaseManager:
         if processing_duration is not None:
             logger.info(f"[DatabaseManager] 处理时长: {processing_duration:.2f}秒")
 
+        # 日志和报告存为大对象，行内只保存引用
+        from src.database.blobs import content_hash, offload_text
+        raw_log = analysis_result.get("raw_log")
+        raw_log_ref = await offload_text(raw_log)
+        infer_report_ref = await offload_text(analysis_result.get("infer_report"))
+
         async with self._session_factory() as session:
             try:
                 # 检查是否已存在
@@ -172,7 +263,7 @@ class DatabaseManager:
 
                     # 更新推理步骤和AI报告
                     existing_result.infer_trace = analysis_result.get("infer_trace", {})
-                    existing_result.infer_report = analysis_result.get("infer_report")
+                    existing_result.infer_report = infer_report_ref
 
                     existing_result.updated_at = datetime.now()
                 else:
@@ -193,17 +284,21 @@ class DatabaseManager:
                         session_id=session_id,
                         chip_model=chip_model,
                         fault_features=fault_features,
-                        raw_log=analysis_result.get("raw_log"),
+                        log_hash=content_hash(raw_log.encode("utf-8")) if raw_log else None,
+                        raw_log=raw_log_ref,
                         status="completed",
                         # 推理结果字段
                         failure_domain=final_root_cause.get("failure_domain"),
                         root_cause=final_root_cause.get("root_cause"),
                         root_cause_category=final_root_cause.get("root_cause_category"),
                         confidence=final_root_cause.get("confidence", 0.0),
+                        # 推理阶段由NoC路径表算出的路径与共经路由器
+                        noc_path=fault_features.get("noc_path"),
+                        noc_congestion_info=fault_features.get("noc_congestion_info"),
                         reasoning_sources=analysis_result.get("infer_trace", {}),
                         # AI分析报告和推理步骤
                         infer_trace=analysis_result.get("infer_trace", {}),
-                        infer_report=analysis_result.get("infer_report"),
+                        infer_report=infer_report_ref,
                         # 处理时长相关字段
                         processing_duration=processing_duration,
                         started_at=started_at,
@@ -213,6 +308,7 @@ class DatabaseManager:
                     session.add(db_result)
 
                 await session.commit()
+                self.mark_written(session_id)
                 logger.info(f"[DatabaseManager] 分析结果已存储 - session: {session_id}")
 
             except Exception as e:
@@ -222,17 +318,22 @@ class DatabaseManager:
                 raise
 
     async def get_analysis_result(self, session_id: str) -> Optional[Dict[str, Any]]:
-        """从数据库获取分析结果"""
+        """从数据库获取分析结果（只读，刚写入的会话读主库）"""
         from src.database.models import AnalysisResult as AnalysisResultModel
 
-        async with self._session_factory() as session:
+        async with self.get_read_session(session_id) as session:
             try:
-                # 先用ORM查询主要数据
+                # 先用ORM查询主要数据（先查近期分区，未命中再查全部分区）
                 stmt = select(AnalysisResultModel).where(
                     AnalysisResultModel.session_id == session_id
                 )
-                result = await session.execute(stmt)
+                result = await session.execute(
+                    stmt.where(AnalysisResultModel.created_at >= self.hot_since())
+                )
                 db_result = result.scalar_one_or_none()
+                if not db_result:
+                    result = await session.execute(stmt)
+                    db_result = result.scalar_one_or_none()
 
                 if not db_result:
                     return None
@@ -246,12 +347,13 @@ class DatabaseManager:
                     sql_result = await session.execute(text("""
                         SELECT infer_report, infer_trace
                         FROM analysis_results
-                        WHERE session_id = :sid
-                    """), {"sid": session_id})
+                        WHERE session_id = :sid AND created_at = :created_at
+                    """), {"sid": session_id, "created_at": db_result.created_at})
                     sql_row = sql_result.first()
                     logger.info(f"[DatabaseManager] SQL查询结果: has_row={sql_row is not None}")
                     if sql_row:
-                        infer_report = sql_row[0]  # infer_report
+                        from src.database.blobs import resolve_text
+                        infer_report = await resolve_text(sql_row[0])  # infer_report（大对象引用换回原文）
                         logger.info(f"[DatabaseManager] infer_report from SQL: {infer_report is not None}, len={len(infer_report) if infer_report else 0}")
                         if sql_row[1]:  # infer_trace (JSONB)
                             import json
@@ -298,7 +400,7 @@ class DatabaseManager:
         from src.database.models import AnalysisResult as AnalysisResultModel
         from datetime import datetime, timedelta
 
-        async with self._session_factory() as session:
+        async with self.get_read_session() as session:
             try:
                 # 获取今天的日期（从午夜开始）
                 today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
@@ -442,7 +544,7 @@ class DatabaseManager:
         from src.database.models import AnalysisResult as AnalysisResultModel
         from datetime import timedelta
 
-        async with self._session_factory() as session:
+        async with self.get_read_session() as session:
             try:
                 # 构建查询
                 stmt = select(AnalysisResultModel).order_by(
@@ -517,19 +619,29 @@ class DatabaseManager:
         self,
         session_id: str
     ) -> list:
-        """获取会话的所有消息（返回字典格式以避免序列化问题）"""
+        """获取会话的所有有效消息（不含已回滚的消息，返回字典格式以避免序列化问题）"""
         from src.database.models import AnalysisMessage
 
         try:
             async with self._session_factory() as session:
-                result = await session.execute(
+                stmt = (
                     select(AnalysisMessage)
-                    .where(AnalysisMessage.session_id == session_id)
+                    .where(
+                        AnalysisMessage.session_id == session_id,
+                        AnalysisMessage.is_superseded.isnot(True)
+                    )
                     .order_by(AnalysisMessage.sequence_number)
                 )
+                # 会话通常在近期分区内；查到的第一条不是会话首条消息时说明跨出了窗口，再查全部分区
+                result = await session.execute(
+                    stmt.where(AnalysisMessage.created_at >= self.hot_since())
+                )
                 messages = result.scalars().all()
+                if not messages or messages[0].sequence_number != 1:
+                    result = await session.execute(stmt)
+                    messages = result.scalars().all()
                 # 转换为字典格式
-                return [
+                records = [
                     {
                         "message_id": msg.message_id,
                         "session_id": msg.session_id,
@@ -548,18 +660,45 @@ class DatabaseManager:
             logger.error(f"[DatabaseManager] 获取会话消息失败: {str(e)}")
             return []
 
+        # 日志类消息内容存为大对象引用，逐条取回原文；单条失败保留引用，不影响整个会话历史
+        from src.database.blobs import resolve_fields
+
+        async def _resolve(record: dict) -> dict:
+            try:
+                return await resolve_fields(record, ("content",))
+            except Exception as e:
+                logger.error(f"[DatabaseManager] 读取消息 {record['message_id']} 的大对象失败，保留引用: {e}")
+                return record
+
+        return list(await asyncio.gather(*(_resolve(r) for r in records)))
+
+    async def get_max_sequence_number(self, session_id: str) -> int:
+        """会话中已用的最大消息序列号（含已回滚的消息，新消息序号不与其重复）"""
+        from sqlalchemy import func
+        from src.database.models import AnalysisMessage
+
+        async with self._session_factory() as session:
+            result = await session.execute(
+                select(func.max(AnalysisMessage.sequence_number))
+                .where(AnalysisMessage.session_id == session_id)
+            )
+            return result.scalar() or 0
+
     async def get_session_snapshots(
         self,
         session_id: str
     ) -> list:
-        """获取会话的所有快照"""
+        """获取会话的所有有效快照（不含已回滚的快照）"""
         from src.database.models import AnalysisSnapshot
 
         try:
             async with self._session_factory() as session:
                 result = await session.execute(
                     select(AnalysisSnapshot)
-                    .where(AnalysisSnapshot.session_id == session_id)
+                    .where(
+                        AnalysisSnapshot.session_id == session_id,
+                        AnalysisSnapshot.is_superseded.isnot(True)
+                    )
                     .order_by(AnalysisSnapshot.created_at)
                 )
                 return list(result.scalars().all())
@@ -571,28 +710,32 @@ class DatabaseManager:
         self,
         session_id: str
     ) -> Optional[Dict[str, Any]]:
-        """获取会话的最新快照"""
+        """获取会话的最新有效快照"""
         from src.database.models import AnalysisSnapshot
 
         try:
             async with self._session_factory() as session:
                 result = await session.execute(
                     select(AnalysisSnapshot)
-                    .where(AnalysisSnapshot.session_id == session_id)
+                    .where(
+                        AnalysisSnapshot.session_id == session_id,
+                        AnalysisSnapshot.is_superseded.isnot(True)
+                    )
                     .order_by(AnalysisSnapshot.created_at.desc())
                     .limit(1)
                 )
                 snapshot = result.scalar_one_or_none()
 
-                if snapshot:
-                    return {
-                        "snapshot_id": snapshot.snapshot_id,
-                        "message_id": snapshot.message_id,
-                        "accumulated_context": snapshot.accumulated_context,
-                        "analysis_result": snapshot.analysis_result,
-                        "created_at": snapshot.created_at
-                    }
-                return None
+                if not snapshot:
+                    return None
+                from src.database.blobs import resolve_fields
+                return {
+                    "snapshot_id": snapshot.snapshot_id,
+                    "message_id": snapshot.message_id,
+                    "accumulated_context": snapshot.accumulated_context,
+                    "analysis_result": await resolve_fields(snapshot.analysis_result, ("infer_report",)),
+                    "created_at": snapshot.created_at
+                }
         except Exception as e:
             logger.error(f"[DatabaseManager] 获取最新快照失败: {str(e)}")
             return None
@@ -0,0 +1,311 @@
+"""
+芯片失效分析AI Agent系统 - 错误码倒排索引
+规范化错误码（及前缀）-> 失效案例、推理规则、知识图谱节点；
+一条日志的多个错误码通过集合交/并得到候选案例和规则，前缀查询走字典树
+"""
+
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from loguru import logger
+
+
+_SEPARATOR_RE = re.compile(r"[\s_\-:]+")
+
+
+def normalize_error_code(code: Any) -> str:
+    """规范化错误码：去空白和分隔符、转大写（0xco001 / 0XCO-001 -> 0XCO001）"""
+    return _SEPARATOR_RE.sub("", str(code or "")).upper()
+
+
+# 数据库侧与 normalize_error_code 相同的规范化；IMMUTABLE，可在 failure_cases.error_codes 上建表达式索引
+NORMALIZE_ERROR_CODES_FUNCTION = """
+CREATE OR REPLACE FUNCTION normalize_error_codes(codes varchar[]) RETURNS varchar[]
+LANGUAGE sql IMMUTABLE PARALLEL SAFE RETURNS NULL ON NULL INPUT
+AS $$
+    SELECT ARRAY(
+        SELECT upper(regexp_replace(c, '[[:space:]_:-]+', '', 'g'))::varchar
+        FROM unnest(codes) AS c
+    )
+$$
+"""
+
+
+class ErrorCodeTrie:
+    """错误码字典树（只存规范化后的完整错误码）"""
+
+    _END = "\0"
+
+    def __init__(self):
+        self._root: Dict[str, Any] = {}
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def insert(self, code: str):
+        node = self._root
+        for char in code:
+            node = node.setdefault(char, {})
+        if self._END not in node:
+            node[self._END] = True
+            self._size += 1
+
+    def remove(self, code: str):
+        """删除错误码（不存在时忽略），顺带裁掉空分支"""
+        path = []
+        node = self._root
+        for char in code:
+            if char not in node:
+                return
+            path.append((node, char))
+            node = node[char]
+        if node.pop(self._END, None) is None:
+            return
+        self._size -= 1
+        for parent, char in reversed(path):
+            if parent[char]:
+                break
+            del parent[char]
+
+    def with_prefix(self, prefix: str) -> List[str]:
+        """前缀下的全部错误码"""
+        node = self._root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+
+        codes = []
+        stack = [(node, prefix)]
+        while stack:
+            node, code = stack.pop()
+            for char, child in node.items():
+                if char == self._END:
+                    codes.append(code)
+                else:
+                    stack.append((child, code + char))
+        return sorted(codes)
+
+
+@dataclass
+class Postings:
+    """单个错误码的倒排表"""
+    cases: Set[str] = field(default_factory=set)
+    rules: Set[str] = field(default_factory=set)
+    kg_nodes: Set[str] = field(default_factory=set)
+
+    def __bool__(self) -> bool:
+        return bool(self.cases or self.rules or self.kg_nodes)
+
+
+class ErrorCodeIndex:
+    """
+    错误码倒排索引
+
+    - 案例/规则按ID登记，同时记录芯片型号用于过滤
+    - KG节点键为 "芯片型号/模块名"
+    - 正排表（ID -> 错误码）用于增量更新时撤销旧倒排
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Postings] = {}
+        self._trie = ErrorCodeTrie()
+        self._case_codes: Dict[str, Set[str]] = {}
+        self._rule_codes: Dict[str, Set[str]] = {}
+        self._kg_codes: Dict[str, Set[str]] = {}
+        self._chip_of: Dict[str, Optional[str]] = {}
+        self.built_at: Optional[float] = None
+
+    # ============================================
+    # 登记
+    # ============================================
+    def _link(self, kind: str, key: str, codes: Iterable[Any], forward: Dict[str, Set[str]]):
+        """登记一个条目的全部错误码（先撤销旧的倒排）"""
+        self._unlink(kind, key, forward)
+        normalized = {normalize_error_code(c) for c in codes or []} - {""}
+        forward[key] = normalized
+        for code in normalized:
+            postings = self._postings.get(code)
+            if postings is None:
+                postings = self._postings[code] = Postings()
+                self._trie.insert(code)
+            getattr(postings, kind).add(key)
+
+    def _unlink(self, kind: str, key: str, forward: Dict[str, Set[str]]):
+        for code in forward.pop(key, ()):
+            postings = self._postings.get(code)
+            if postings is None:
+                continue
+            getattr(postings, kind).discard(key)
+            if not postings:
+                del self._postings[code]
+                self._trie.remove(code)
+
+    def add_case(self, case_id: str, error_codes: Iterable[Any], chip_model: Optional[str] = None):
+        self._link("cases", case_id, error_codes, self._case_codes)
+        self._chip_of[f"case:{case_id}"] = chip_model
+
+    def add_rule(self, rule_id: str, error_codes: Iterable[Any], chip_model: Optional[str] = None):
+        self._link("rules", rule_id, error_codes, self._rule_codes)
+        self._chip_of[f"rule:{rule_id}"] = chip_model
+
+    def add_kg_node(self, node_key: str, error_codes: Iterable[Any]):
+        self._link("kg_nodes", node_key, error_codes, self._kg_codes)
+
+    def remove_case(self, case_id: str):
+        self._unlink("cases", case_id, self._case_codes)
+        self._chip_of.pop(f"case:{case_id}", None)
+
+    def remove_rule(self, rule_id: str):
+        self._unlink("rules", rule_id, self._rule_codes)
+        self._chip_of.pop(f"rule:{rule_id}", None)
+
+    # ============================================
+    # 查询
+    # ============================================
+    def codes_with_prefix(self, prefix: str) -> List[str]:
+        """索引中以 prefix 开头的错误码"""
+        return self._trie.with_prefix(normalize_error_code(prefix))
+
+    def postings(self, code: str, prefix: bool = False) -> Postings:
+        """单个错误码（或前缀）的倒排表"""
+        code = normalize_error_code(code)
+        if not prefix:
+            return self._postings.get(code) or Postings()
+
+        merged = Postings()
+        for full in self._trie.with_prefix(code):
+            postings = self._postings[full]
+            merged.cases |= postings.cases
+            merged.rules |= postings.rules
+            merged.kg_nodes |= postings.kg_nodes
+        return merged
+
+    def resolve(
+        self,
+        error_codes: Iterable[Any],
+        chip_model: Optional[str] = None,
+        prefix_len: int = 4
+    ) -> Dict[str, Any]:
+        """
+        日志错误码 -> 候选案例 / 规则 / KG节点
+
+        精确命中的错误码之间取交集得到 "all" 候选，同时按命中错误码数量排序给出 "ranked" 候选；
+        所有错误码都没有精确命中时，按前 prefix_len 位前缀（如 0XCO）做模糊召回
+
+        Returns:
+            {"codes": [...], "matched_codes": [...], "prefix_fallback": bool,
+             "cases": {"all": [...], "ranked": [(id, 命中数)]}, "rules": {...}, "kg_nodes": {...}}
+        """
+        codes = list(dict.fromkeys(c for c in (normalize_error_code(c) for c in error_codes) if c))
+        per_code = {code: self._postings[code] for code in codes if code in self._postings}
+        prefix_fallback = False
+
+        if not per_code and prefix_len > 0:
+            prefix_fallback = True
+            for prefix in dict.fromkeys(code[:prefix_len] for code in codes if len(code) >= prefix_len):
+                postings = self.postings(prefix, prefix=True)
+                if postings:
+                    per_code[prefix] = postings
+
+        result = {
+            "codes": codes,
+            "matched_codes": list(per_code),
+            "prefix_fallback": prefix_fallback
+        }
+        for kind in ("cases", "rules", "kg_nodes"):
+            sets = [getattr(p, kind) for p in per_code.values()]
+            if kind != "kg_nodes" and chip_model is not None:
+                prefix = "case" if kind == "cases" else "rule"
+                sets = [
+                    {k for k in s if self._chip_of.get(f"{prefix}:{k}") in (chip_model, None)}
+                    for s in sets
+                ]
+            elif kind == "kg_nodes" and chip_model is not None:
+                sets = [{k for k in s if k.startswith(f"{chip_model}/")} for s in sets]
+
+            non_empty = [s for s in sets if s]
+            common = set.intersection(*non_empty) if non_empty else set()
+
+            counts: Dict[str, int] = {}
+            for s in sets:
+                for key in s:
+                    counts[key] = counts.get(key, 0) + 1
+            ranked = sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))
+
+            result[kind] = {"all": sorted(common), "ranked": ranked}
+        return result
+
+    # ============================================
+    # 构建
+    # ============================================
+    async def build(self, session, include_kg: bool = True) -> Dict[str, int]:
+        """从数据库（和本地知识图谱快照）全量构建"""
+        from sqlalchemy import select
+        from src.database.models import FailureCase, InferenceRule
+
+        start = time.perf_counter()
+        fresh = ErrorCodeIndex()
+
+        result = await session.execute(
+            select(FailureCase.case_id, FailureCase.chip_model, FailureCase.error_codes)
+        )
+        for case_id, chip_model, error_codes in result.all():
+            fresh.add_case(case_id, error_codes or [], chip_model)
+
+        result = await session.execute(
+            select(InferenceRule.rule_id, InferenceRule.chip_model, InferenceRule.conditions)
+            .where(InferenceRule.is_active == True)
+        )
+        for rule_id, chip_model, conditions in result.all():
+            fresh.add_rule(rule_id, (conditions or {}).get("error_codes", []), chip_model)
+
+        if include_kg:
+            from src.database.local_graph import get_local_graph_store
+            store = get_local_graph_store()
+            for chip_model in store.chip_models:
+                projection = store.get(chip_model)
+                by_module: Dict[str, Set[str]] = {}
+                for code, entries in projection.error_code_index.items():
+                    for entry in entries:
+                        module = projection.modules.get(entry["module_id"], {})
+                        by_module.setdefault(f"{chip_model}/{module.get('name')}", set()).add(code)
+                for node_key, codes in by_module.items():
+                    fresh.add_kg_node(node_key, codes)
+
+        # 整体替换，构建期间的查询仍使用旧索引
+        self.__dict__.update(fresh.__dict__)
+        self.built_at = time.time()
+
+        stats = self.get_stats()
+        logger.info(
+            f"[ErrorCodeIndex] 构建完成 - 错误码: {stats['codes']}, 案例: {stats['cases']}, "
+            f"规则: {stats['rules']}, KG节点: {stats['kg_nodes']}, 耗时 {(time.perf_counter() - start) * 1000:.1f}ms"
+        )
+        return stats
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "codes": len(self._postings),
+            "cases": len(self._case_codes),
+            "rules": len(self._rule_codes),
+            "kg_nodes": len(self._kg_codes),
+            "built_at": self.built_at
+        }
+
+
+# ============================================
+# 全局索引实例
+# ============================================
+_error_code_index: Optional[ErrorCodeIndex] = None
+
+
+def get_error_code_index() -> ErrorCodeIndex:
+    """获取错误码倒排索引单例（未构建时为空索引）"""
+    global _error_code_index
+    if _error_code_index is None:
+        _error_code_index = ErrorCodeIndex()
+    return _error_code_index
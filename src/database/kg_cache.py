@@ -0,0 +1,530 @@
+"""
+芯片失效分析AI Agent系统 - 知识图谱内存缓存
+按芯片型号缓存图投影（子系统、模块、失效模式、错误码、根因、连接关系），
+由图版本号统一失效；知识图谱推理直接读内存，不再逐次访问Neo4j
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+
+def _module_name(props: Dict[str, Any]) -> Optional[str]:
+    """模块显示名（CPUCore 只有 core_id）"""
+    name = props.get("name")
+    if name is None and props.get("core_id") is not None:
+        name = str(props["core_id"])
+    return name
+
+
+@dataclass
+class ChipGraphProjection:
+    """单个芯片型号的图投影"""
+    chip_model: str
+    version: int
+    loaded_at: float
+    chip: Dict[str, Any] = field(default_factory=dict)
+    subsystems: List[Dict[str, Any]] = field(default_factory=list)
+    # module_id -> {"id", "name", "type", "labels", "subsystem", "subsystem_type", "properties"}
+    modules: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    # module_id -> [{"name", "category", "description", "error_codes": [...]}]
+    module_failure_modes: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+    # 失效模式名 -> [根因属性]
+    root_causes: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+    # 错误码 -> [{"module_id", "failure_mode", "severity"}]
+    error_code_index: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+    # module_id -> [{"rel_type", "target_id", "name", "type", "labels", "properties"}]
+    edges: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+
+    @classmethod
+    def from_graph(cls, chip_model: str, graph: Dict[str, Any], version: int) -> "ChipGraphProjection":
+        """由 KnowledgeGraphRepository.load_chip_graphs 的结果构建投影"""
+        projection = cls(
+            chip_model=chip_model,
+            version=version,
+            loaded_at=time.monotonic(),
+            chip=graph.get("chip") or {},
+            subsystems=sorted(
+                (s for s in graph.get("subsystems", []) if s),
+                key=lambda s: (s.get("type") or "", s.get("name") or "")
+            ),
+            root_causes=dict(graph.get("root_causes", {}))
+        )
+
+        for record in graph.get("modules", []):
+            props = record.get("module") or {}
+            labels = record.get("labels") or []
+            subsystem = record.get("subsystem") or {}
+            projection.modules[record["module_id"]] = {
+                "id": record["module_id"],
+                "name": _module_name(props),
+                "type": props.get("type") or (labels[0] if labels else None),
+                "labels": labels,
+                "subsystem": subsystem.get("name"),
+                "subsystem_type": subsystem.get("type"),
+                "properties": props
+            }
+
+        for record in graph.get("failure_modes", []):
+            mode = record.get("failure_mode") or {}
+            error_codes = [
+                {"code": e.get("code"), "severity": e.get("severity")}
+                for e in record.get("error_codes", []) if e and e.get("code")
+            ]
+            projection.module_failure_modes.setdefault(record["module_id"], []).append({
+                "name": mode.get("name"),
+                "category": mode.get("category"),
+                "description": mode.get("description"),
+                "error_codes": error_codes
+            })
+            for error in error_codes:
+                projection.error_code_index.setdefault(error["code"], []).append({
+                    "module_id": record["module_id"],
+                    "failure_mode": mode.get("name"),
+                    "severity": error["severity"]
+                })
+
+        for record in graph.get("edges", []):
+            props = record.get("target") or {}
+            labels = record.get("target_labels") or []
+            projection.edges.setdefault(record["source_id"], []).append({
+                "rel_type": record["rel_type"],
+                "target_id": record["target_id"],
+                "name": _module_name(props),
+                "type": props.get("type") or (labels[0] if labels else None),
+                "labels": labels,
+                "properties": props
+            })
+
+        return projection
+
+    # ============================================
+    # 查询接口（返回格式与 KnowledgeGraphTool 的 Cypher 查询一致）
+    # ============================================
+    def find_modules(
+        self,
+        module_type: Optional[str] = None,
+        module_name: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """按类型（type 属性或节点标签）和名称过滤模块"""
+        return [
+            m for m in self.modules.values()
+            if (module_type is None or m["type"] == module_type or module_type in m["labels"])
+            and (module_name is None or m["name"] == module_name)
+        ]
+
+    def chip_structure(self, subsystem_type: Optional[str] = None) -> Dict[str, Any]:
+        """芯片结构"""
+        chip_info = None
+        if self.chip:
+            chip_info = {
+                "model": self.chip.get("model"),
+                "architecture": self.chip.get("architecture"),
+                "series": self.chip.get("series"),
+                "num_cores": self.chip.get("num_cores")
+            }
+
+        subsystems = [
+            {
+                "name": s.get("name"),
+                "type": s.get("type"),
+                "description": s.get("description")
+            }
+            for s in self.subsystems
+            if subsystem_type is None or s.get("type") == subsystem_type
+        ]
+        modules = [
+            {
+                "name": m["name"],
+                "type": m["type"],
+                "subsystem": m["subsystem"],
+                "subsystem_type": m["subsystem_type"]
+            }
+            for m in self.modules.values()
+            if subsystem_type is None or m["subsystem_type"] == subsystem_type
+        ]
+
+        return {"chip": chip_info, "subsystems": subsystems, "modules": modules}
+
+    def failure_modes(
+        self,
+        module_type: Optional[str] = None,
+        module_name: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """模块的失效模式及其错误码"""
+        failure_modes: Dict[str, Dict[str, Any]] = {}
+        error_codes = set()
+
+        for module in self.find_modules(module_type, module_name):
+            for mode in self.module_failure_modes.get(module["id"], []):
+                # 与Cypher版本一致：没有错误码的失效模式不返回
+                if not mode["error_codes"]:
+                    continue
+                entry = failure_modes.setdefault(mode["name"], {
+                    "name": mode["name"],
+                    "category": mode["category"],
+                    "error_codes": []
+                })
+                for error in mode["error_codes"]:
+                    if error not in entry["error_codes"]:
+                        entry["error_codes"].append(error)
+                    error_codes.add(error["code"])
+
+        for entry in failure_modes.values():
+            entry["error_codes"].sort(key=lambda e: e["code"])
+
+        return {
+            "failure_modes": dict(sorted(failure_modes.items())),
+            "error_codes": sorted(error_codes)
+        }
+
+    def root_causes_of(self, failure_mode: Optional[str] = None) -> Dict[str, Any]:
+        """失效模式对应的根因（不指定失效模式时返回本芯片所有根因）"""
+        if failure_mode is not None:
+            modes = [failure_mode]
+        else:
+            modes = sorted({
+                mode["name"]
+                for modes in self.module_failure_modes.values()
+                for mode in modes
+            })
+
+        causes = []
+        for mode in modes:
+            causes.extend(self.root_causes.get(mode, []))
+        causes.sort(key=lambda r: (r.get("category") or "", r.get("name") or ""))
+
+        return {
+            "root_causes": {
+                r.get("name"): {"category": r.get("category"), "solution": r.get("solution")}
+                for r in causes
+            }
+        }
+
+    def module_info(
+        self,
+        module_type: str,
+        module_name: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """模块信息及其NoC连接"""
+        modules = self.find_modules(module_type, module_name)
+        if not modules:
+            return {"module": None, "connections": []}
+
+        module = modules[0]
+        return {
+            "module": {
+                "name": module["name"],
+                "type": module["type"],
+                "subsystem": module["subsystem"],
+                "subsystem_type": module["subsystem_type"],
+                "attributes": module["properties"].get("attributes", {})
+            },
+            "connections": [
+                {"name": edge["name"], "type": edge["type"]}
+                for edge in self.edges.get(module["id"], [])
+                if edge["rel_type"] == "CONNECTED_VIA_NOC"
+            ]
+        }
+
+    def ha_topology(self) -> List[Dict[str, Any]]:
+        """HA拓扑（各HomeAgent连接的CPU核、L3、SnoopFilter）"""
+        topology = []
+        for module in self.find_modules("HomeAgent"):
+            props = module["properties"]
+            connected = [e for e in self.edges.get(module["id"], []) if e["rel_type"] == "CONNECTED_TO_HA"]
+            l3 = next((e["name"] for e in connected if "L3Cache" in e["labels"]), None)
+            snoop_filter = next((e["name"] for e in connected if "SnoopFilter" in e["labels"]), None)
+            topology.append({
+                "name": module["name"],
+                "role": props.get("role"),
+                "protocol": props.get("protocol"),
+                "connected_cores": [
+                    e["properties"].get("core_id") for e in connected if "CPUCore" in e["labels"]
+                ],
+                "connected_l3": l3,
+                "snoop_filter": snoop_filter
+            })
+        return topology
+
+    def modules_for_error_codes(self, error_codes: List[str]) -> List[Dict[str, Any]]:
+        """错误码反查模块与失效模式"""
+        matches = []
+        for code in error_codes:
+            for entry in self.error_code_index.get(code, []):
+                module = self.modules.get(entry["module_id"], {})
+                matches.append({
+                    "error_code": code,
+                    "module": module.get("name"),
+                    "module_type": module.get("type"),
+                    "subsystem_type": module.get("subsystem_type"),
+                    "failure_mode": entry["failure_mode"],
+                    "severity": entry["severity"]
+                })
+        return matches
+
+
+class KnowledgeGraphCache:
+    """
+    知识图谱投影缓存
+
+    - 按芯片型号缓存 ChipGraphProjection，LRU 淘汰
+    - 缺失的型号合并为一次 UNWIND 批量加载；同一型号的并发加载只执行一次
+    - 图版本号变化（本进程 bump_version 或其他进程写入 Neo4j 的 GraphVersion）时整体失效
+    """
+
+    def __init__(
+        self,
+        repository=None,
+        max_chips: int = 64,
+        ttl_seconds: float = 3600.0,
+        version_check_interval: float = 5.0
+    ):
+        """
+        初始化缓存
+
+        Args:
+            repository: KnowledgeGraphRepository（为空时首次使用再创建）
+            max_chips: 最多缓存的芯片型号数
+            ttl_seconds: 投影最长存活时间（兜底，正常由版本号失效）
+            version_check_interval: 向Neo4j核对版本号的最小间隔(秒)，0表示每次都核对
+        """
+        self._repository = repository
+        self.max_chips = max_chips
+        self.ttl_seconds = ttl_seconds
+        self.version_check_interval = version_check_interval
+
+        self._projections: "OrderedDict[str, ChipGraphProjection]" = OrderedDict()
+        self._version = 0
+        self._last_version_check: Optional[float] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "loads": 0,
+            "load_seconds": 0.0,
+            "invalidations": 0,
+            "evictions": 0
+        }
+
+    @property
+    def repository(self):
+        """延迟创建知识图谱仓库"""
+        if self._repository is None:
+            from src.database.neo4j_schema import KnowledgeGraphRepository
+            self._repository = KnowledgeGraphRepository()
+        return self._repository
+
+    @property
+    def version(self) -> int:
+        """当前图版本号"""
+        return self._version
+
+    def _ensure_loop(self):
+        """事件循环变化时丢弃旧循环上的进行中加载"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._inflight = {}
+            self._loop = loop
+
+    def _is_fresh(self, projection: ChipGraphProjection) -> bool:
+        """投影是否仍然有效"""
+        if projection.version != self._version:
+            return False
+        return time.monotonic() - projection.loaded_at < self.ttl_seconds
+
+    def _set_version(self, version: int, reason: str):
+        """更新版本号并清空投影"""
+        if version == self._version:
+            return
+        logger.info(f"[KnowledgeGraphCache] 图版本 {self._version} -> {version} ({reason})，清空 {len(self._projections)} 个投影")
+        self._version = version
+        self._projections.clear()
+        self._stats["invalidations"] += 1
+
+    async def _refresh_version(self):
+        """按间隔向Neo4j核对版本号（多进程部署时感知其他worker的更新）"""
+        now = time.monotonic()
+        if self._last_version_check is not None and now - self._last_version_check < self.version_check_interval:
+            return
+        self._last_version_check = now
+
+        try:
+            remote = await self.repository.get_graph_version()
+        except Exception as e:
+            logger.warning(f"[KnowledgeGraphCache] 读取图版本失败，沿用本地版本: {e}")
+            return
+
+        if remote is not None:
+            self._set_version(remote, "remote")
+
+    async def current_version(self) -> int:
+        """按核对间隔刷新后的当前图版本号（派生数据据此判断是否过期）"""
+        await self._refresh_version()
+        return self._version
+
+    async def get_projections(self, chip_models: List[str]) -> Dict[str, ChipGraphProjection]:
+        """
+        批量获取芯片投影
+
+        Returns:
+            {chip_model: ChipGraphProjection}（Neo4j中不存在的型号不出现在结果中）
+        """
+        self._ensure_loop()
+        await self._refresh_version()
+
+        result: Dict[str, ChipGraphProjection] = {}
+        waiting: Dict[str, asyncio.Future] = {}
+        to_load: List[str] = []
+
+        for chip_model in dict.fromkeys(chip_models):
+            projection = self._projections.get(chip_model)
+            if projection is not None and self._is_fresh(projection):
+                self._projections.move_to_end(chip_model)
+                self._stats["hits"] += 1
+                result[chip_model] = projection
+            elif chip_model in self._inflight:
+                self._stats["hits"] += 1
+                waiting[chip_model] = self._inflight[chip_model]
+            else:
+                self._stats["misses"] += 1
+                to_load.append(chip_model)
+
+        if to_load:
+            loaded = await self._load(to_load)
+            result.update(loaded)
+
+        for chip_model, future in waiting.items():
+            projection = await asyncio.shield(future)
+            if projection is not None:
+                result[chip_model] = projection
+
+        return result
+
+    async def get_projection(self, chip_model: str) -> Optional[ChipGraphProjection]:
+        """获取单个芯片投影（芯片不存在时返回None）"""
+        projections = await self.get_projections([chip_model])
+        return projections.get(chip_model)
+
+    async def _load(self, chip_models: List[str]) -> Dict[str, ChipGraphProjection]:
+        """UNWIND 批量加载并写入缓存"""
+        loop = asyncio.get_running_loop()
+        futures = {chip_model: loop.create_future() for chip_model in chip_models}
+        self._inflight.update(futures)
+        version = self._version
+
+        start = time.perf_counter()
+        try:
+            graphs = await self.repository.load_chip_graphs(chip_models)
+        except BaseException as e:
+            for chip_model, future in futures.items():
+                self._inflight.pop(chip_model, None)
+                if isinstance(e, Exception):
+                    future.set_exception(e)
+                    # 没有并发等待者时避免 "exception was never retrieved"
+                    future.exception()
+                else:
+                    future.cancel()
+            raise
+        elapsed = time.perf_counter() - start
+        self._stats["loads"] += 1
+        self._stats["load_seconds"] += elapsed
+
+        projections = {}
+        for chip_model in chip_models:
+            graph = graphs.get(chip_model)
+            projection = ChipGraphProjection.from_graph(chip_model, graph, version) if graph else None
+            # 加载期间版本变化则只返回结果，不写入缓存
+            if projection is not None and version == self._version:
+                self._store(chip_model, projection)
+            if projection is not None:
+                projections[chip_model] = projection
+            self._inflight.pop(chip_model, None)
+            futures[chip_model].set_result(projection)
+
+        logger.debug(f"[KnowledgeGraphCache] 批量加载 {len(chip_models)} 个芯片投影，耗时 {elapsed * 1000:.1f}ms")
+        return projections
+
+    def _store(self, chip_model: str, projection: ChipGraphProjection):
+        """写入缓存（超出容量时淘汰最久未用的型号）"""
+        self._projections[chip_model] = projection
+        self._projections.move_to_end(chip_model)
+        while len(self._projections) > self.max_chips:
+            self._projections.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    async def warm(self, chip_models: List[str]) -> int:
+        """预加载芯片投影，返回成功加载的数量"""
+        projections = await self.get_projections(chip_models)
+        return len(projections)
+
+    async def bump_version(self, reason: str = "update") -> int:
+        """
+        知识图谱写入后调用：版本号加一并清空本进程缓存
+
+        同时写入Neo4j的 GraphVersion 节点，其他进程在下一次版本核对时失效
+        """
+        try:
+            version = await self.repository.bump_graph_version()
+        except Exception as e:
+            logger.warning(f"[KnowledgeGraphCache] 写入图版本失败，仅本进程失效: {e}")
+            version = self._version + 1
+
+        # 远端版本可能与本地相同（其他进程已核对过），仍需保证本进程失效
+        if version == self._version:
+            version += 1
+        self._set_version(version, reason)
+        self._last_version_check = time.monotonic()
+        return version
+
+    def invalidate(self, chip_model: Optional[str] = None):
+        """丢弃指定芯片（或全部）的投影，不改变版本号"""
+        if chip_model is None:
+            self._projections.clear()
+        else:
+            self._projections.pop(chip_model, None)
+        self._stats["invalidations"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """缓存统计"""
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "load_seconds": round(self._stats["load_seconds"], 6),
+            "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+            "version": self._version,
+            "cached_chips": list(self._projections),
+            "max_chips": self.max_chips
+        }
+
+
+# ============================================
+# 全局缓存实例
+# ============================================
+_kg_cache: Optional[KnowledgeGraphCache] = None
+
+
+def get_kg_cache() -> KnowledgeGraphCache:
+    """获取知识图谱缓存单例"""
+    global _kg_cache
+    if _kg_cache is None:
+        from src.config.settings import get_settings
+        settings = get_settings()
+        _kg_cache = KnowledgeGraphCache(
+            max_chips=settings.KG_CACHE_MAX_CHIPS,
+            ttl_seconds=settings.KG_CACHE_TTL_SECONDS,
+            version_check_interval=settings.KG_CACHE_VERSION_CHECK_SECONDS
+        )
+    return _kg_cache
+
+
+def reset_kg_cache():
+    """重置知识图谱缓存（用于测试）"""
+    global _kg_cache
+    _kg_cache = None
@@ -0,0 +1,263 @@
+"""
+芯片失效分析AI Agent系统 - 进程内知识图谱
+从快照文件（Neo4j导出）加载各芯片的图投影，KG推理在本地内存完成；
+Neo4j 仍是数据源，快照由 scripts/export_kg_snapshot.py 定期导出
+"""
+
+import json
+import re
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from .kg_cache import ChipGraphProjection
+
+
+SNAPSHOT_FORMAT = 1
+
+# 日志解析器输出的模块类型（见 LogParserAgent._normalize_modules）-> 图中模块标签，键均为归一化后的形式
+MODULE_ALIASES = {
+    "cpu": ("cpucore",),
+    "ha": ("homeagent",),
+    "l3cache": ("l3cache",),
+    "nocrouter": ("nocrouter",),
+    "ddrcontroller": ("ddrcontroller",),
+    "hbmcontroller": ("hbmcontroller",),
+}
+
+_MODULE_KEY_SEPARATORS = re.compile(r"[\s_\-]+")
+
+
+def module_key(name: Any) -> str:
+    """模块名/类型/标签归一化：去掉下划线、连字符和空白后转小写（l3_cache、L3Cache -> l3cache）"""
+    return _MODULE_KEY_SEPARATORS.sub("", str(name)).lower()
+
+
+class LocalGraphStore:
+    """
+    本地图存储
+
+    每个芯片型号一个 ChipGraphProjection，另建两个索引：
+    归一化的模块名/类型/标签 -> 模块ID（见 module_key），大写错误码 -> 图中原始错误码
+    """
+
+    def __init__(self, graphs: Optional[Dict[str, Dict[str, Any]]] = None, graph_version: int = 0):
+        self.graph_version = graph_version
+        self.loaded_at: Optional[str] = None
+        self._graphs: Dict[str, Dict[str, Any]] = {}
+        self._projections: Dict[str, ChipGraphProjection] = {}
+        self._module_index: Dict[str, Dict[str, List[str]]] = {}
+        self._code_index: Dict[str, Dict[str, str]] = {}
+        for chip_model, graph in (graphs or {}).items():
+            self.add_chip(chip_model, graph)
+
+    def add_chip(self, chip_model: str, graph: Dict[str, Any]):
+        """加入（或替换）一个芯片的图数据"""
+        projection = ChipGraphProjection.from_graph(chip_model, graph, self.graph_version)
+
+        module_index: Dict[str, List[str]] = {}
+        for module_id, module in projection.modules.items():
+            keys = {module["name"], module["type"], *module["labels"]}
+            for key in keys:
+                if key:
+                    module_index.setdefault(module_key(key), []).append(module_id)
+
+        self._graphs[chip_model] = graph
+        self._projections[chip_model] = projection
+        self._module_index[chip_model] = module_index
+        self._code_index[chip_model] = {code.upper(): code for code in projection.error_code_index}
+
+    @property
+    def chip_models(self) -> List[str]:
+        return list(self._projections)
+
+    def get(self, chip_model: Optional[str]) -> Optional[ChipGraphProjection]:
+        """获取芯片投影（未收录时返回None）"""
+        return self._projections.get(chip_model) if chip_model else None
+
+    # ============================================
+    # 遍历
+    # ============================================
+    def match_modules(self, chip_model: str, modules: List[str]) -> List[Dict[str, Any]]:
+        """日志中的模块名（如 l3_cache / L3Cache / 解析器输出的 ha）匹配到图中的模块"""
+        projection = self.get(chip_model)
+        if projection is None:
+            return []
+        index = self._module_index[chip_model]
+        matched = {}
+        for module in modules:
+            key = module_key(module)
+            for alias in (key, *MODULE_ALIASES.get(key, ())):
+                for module_id in index.get(alias, []):
+                    matched.setdefault(module_id, projection.modules[module_id])
+        return list(matched.values())
+
+    def modules_for_error_codes(self, chip_model: str, error_codes: List[str]) -> List[Dict[str, Any]]:
+        """错误码 -> 模块（不区分大小写）"""
+        projection = self.get(chip_model)
+        if projection is None:
+            return []
+        code_index = self._code_index[chip_model]
+        codes = [code_index[c.upper()] for c in error_codes if c.upper() in code_index]
+        return projection.modules_for_error_codes(codes)
+
+    def root_causes_for_module(self, chip_model: str, module_id: str) -> List[Dict[str, Any]]:
+        """模块 -> 失效模式 -> 根因"""
+        projection = self.get(chip_model)
+        if projection is None:
+            return []
+        causes = []
+        for mode in projection.module_failure_modes.get(module_id, []):
+            for cause in projection.root_causes.get(mode["name"], []):
+                causes.append({
+                    "failure_mode": mode["name"],
+                    "root_cause": cause.get("name"),
+                    "category": cause.get("category"),
+                    "solution": cause.get("solution")
+                })
+        return causes
+
+    def infer(self, chip_model: str, modules: List[str], error_codes: List[str]) -> Optional[Dict[str, Any]]:
+        """
+        基于模块和错误码在本地图上推理失效模块
+
+        证据分级与 Agent1 原有规则一致：
+        错误码命中且与日志模块一致为强证据，仅错误码命中为中等，仅模块名命中为弱
+
+        Returns:
+            推理结果；芯片未收录、或模块和错误码都没有命中图时返回None（由调用方回退到规则匹配）
+        """
+        projection = self.get(chip_model)
+        if projection is None:
+            return None
+
+        result = {
+            "failure_domain": "unknown",
+            "failure_module": "unknown",
+            "confidence": 0.0,
+            "evidence_strength": "none",
+            "source": "local_graph"
+        }
+
+        module_matches = self.match_modules(chip_model, modules)
+        code_matches = self.modules_for_error_codes(chip_model, error_codes)
+        module_names = {m["name"] for m in module_matches}
+
+        if code_matches:
+            # 优先选择同时被日志模块印证的错误码
+            corroborated = [m for m in code_matches if m["module"] in module_names]
+            best = (corroborated or code_matches)[0]
+            module_id = next(
+                (mid for mid, m in projection.modules.items() if m["name"] == best["module"]),
+                None
+            )
+            result.update({
+                "failure_domain": best["subsystem_type"] or "unknown",
+                "failure_module": best["module"],
+                "failure_mode": best["failure_mode"],
+                "matched_error_codes": sorted({m["error_code"] for m in code_matches}),
+                "evidence_strength": "strong" if corroborated else "medium",
+                "confidence": 0.5 if corroborated else 0.35
+            })
+        elif module_matches:
+            module_id = module_matches[0]["id"]
+            result.update({
+                "failure_domain": module_matches[0]["subsystem_type"] or "unknown",
+                "failure_module": module_matches[0]["name"],
+                "evidence_strength": "weak",
+                "confidence": 0.1
+            })
+        else:
+            return None
+
+        if module_id is not None:
+            result["root_causes"] = self.root_causes_for_module(chip_model, module_id)
+        return result
+
+    # ============================================
+    # 快照
+    # ============================================
+    def to_snapshot(self) -> Dict[str, Any]:
+        """快照内容"""
+        return {
+            "format": SNAPSHOT_FORMAT,
+            "graph_version": self.graph_version,
+            "exported_at": datetime.utcnow().isoformat(),
+            "chips": self._graphs
+        }
+
+    def save_snapshot(self, path: Path):
+        """写入快照文件（先写临时文件再替换，避免读到半个文件）"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        # Neo4j 时间类型等非JSON属性按字符串保存
+        tmp.write_text(json.dumps(self.to_snapshot(), ensure_ascii=False, default=str), encoding="utf-8")
+        tmp.replace(path)
+
+    @classmethod
+    def from_snapshot(cls, path: Path) -> "LocalGraphStore":
+        """从快照文件加载"""
+        start = time.perf_counter()
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        if data.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"不支持的知识图谱快照格式: {data.get('format')}")
+
+        store = cls(data.get("chips", {}), graph_version=data.get("graph_version", 0))
+        store.loaded_at = data.get("exported_at")
+        logger.info(
+            f"[LocalGraphStore] 加载快照 {path}: {len(store.chip_models)} 个芯片，"
+            f"图版本 {store.graph_version}，耗时 {(time.perf_counter() - start) * 1000:.1f}ms"
+        )
+        return store
+
+    @classmethod
+    async def export_from_neo4j(cls, repository, chip_models: List[str]) -> "LocalGraphStore":
+        """从Neo4j批量导出（复用 load_chip_graphs 的 UNWIND 查询）"""
+        graphs = await repository.load_chip_graphs(chip_models)
+        try:
+            graph_version = await repository.get_graph_version() or 0
+        except Exception:
+            graph_version = 0
+        return cls(graphs, graph_version=graph_version)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """存储统计"""
+        return {
+            "chips": len(self._projections),
+            "modules": sum(len(p.modules) for p in self._projections.values()),
+            "error_codes": sum(len(p.error_code_index) for p in self._projections.values()),
+            "graph_version": self.graph_version,
+            "exported_at": self.loaded_at
+        }
+
+
+# ============================================
+# 全局实例
+# ============================================
+_local_graph_store: Optional[LocalGraphStore] = None
+
+
+def get_local_graph_store() -> LocalGraphStore:
+    """获取本地图存储单例（快照不存在或损坏时为空存储）"""
+    global _local_graph_store
+    if _local_graph_store is None:
+        from src.config.settings import get_settings
+        path = Path(get_settings().KG_SNAPSHOT_PATH)
+        store = LocalGraphStore()
+        if path.exists():
+            try:
+                store = LocalGraphStore.from_snapshot(path)
+            except Exception as e:
+                logger.warning(f"[LocalGraphStore] 快照加载失败，使用空存储: {e}")
+        _local_graph_store = store
+    return _local_graph_store
+
+
+def reset_local_graph_store():
+    """重置本地图存储（快照更新后或测试中调用）"""
+    global _local_graph_store
+    _local_graph_store = None
@@ -0,0 +1,17 @@
+-- 混合案例检索：规范化错误码表达式索引
+-- 查询错误码经 normalize_error_code 规范化（0x1a2b3c -> 0X1A2B3C，ERR_DDR_001 -> ERRDDR001），
+-- 库中错误码按原样存储，比较两侧都需规范化: normalize_error_codes(error_codes) && ARRAY[...]
+CREATE OR REPLACE FUNCTION normalize_error_codes(codes varchar[]) RETURNS varchar[]
+LANGUAGE sql IMMUTABLE PARALLEL SAFE RETURNS NULL ON NULL INPUT
+AS $$
+    SELECT ARRAY(
+        SELECT upper(regexp_replace(c, '[[:space:]_:-]+', '', 'g'))::varchar
+        FROM unnest(codes) AS c
+    )
+$$;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_case_error_codes_norm_gin
+    ON failure_cases USING gin (normalize_error_codes(error_codes));
+
+COMMENT ON FUNCTION normalize_error_codes(varchar[]) IS '错误码规范化（去空白和分隔符、转大写）';
+COMMENT ON INDEX idx_case_error_codes_norm_gin IS '失效案例规范化错误码GIN索引';
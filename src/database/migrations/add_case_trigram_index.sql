@@ -0,0 +1,8 @@
+-- 混合案例检索：症状三元组索引
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- word_similarity / <% 查询: :query <% symptoms
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_case_symptoms_trgm
+    ON failure_cases USING gin (symptoms gin_trgm_ops);
+
+COMMENT ON INDEX idx_case_symptoms_trgm IS '失效案例症状pg_trgm索引';
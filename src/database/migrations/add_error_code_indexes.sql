@@ -0,0 +1,12 @@
+-- 错误码倒排索引
+-- failure_cases.error_codes 数组包含查询: error_codes @> ARRAY['0XCO001']
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_case_error_codes_gin
+    ON failure_cases USING gin (error_codes);
+
+-- inference_rules.conditions 包含查询: conditions @> '{"error_codes": ["0XCO001"]}'
+-- jsonb_path_ops 只支持 @>，索引体积更小、查询更快
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_rule_conditions_path_ops
+    ON inference_rules USING gin (conditions jsonb_path_ops);
+
+COMMENT ON INDEX idx_case_error_codes_gin IS '失效案例错误码GIN索引';
+COMMENT ON INDEX idx_rule_conditions_path_ops IS '推理规则条件jsonb_path_ops索引';
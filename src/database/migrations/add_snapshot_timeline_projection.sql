@@ -0,0 +1,28 @@
+-- 分析快照时间线投影与回滚标记
+-- 时间线只读 summary/info_count，不再反序列化 accumulated_context/analysis_result
+ALTER TABLE analysis_snapshots ADD COLUMN IF NOT EXISTS summary JSONB;
+ALTER TABLE analysis_snapshots ADD COLUMN IF NOT EXISTS info_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE analysis_snapshots ADD COLUMN IF NOT EXISTS is_superseded BOOLEAN NOT NULL DEFAULT FALSE;
+
+-- 回填历史快照的投影
+UPDATE analysis_snapshots SET
+    summary = jsonb_build_object(
+        'failure_domain', analysis_result #> '{final_root_cause,failure_domain}',
+        'confidence', COALESCE(analysis_result #> '{final_root_cause,confidence}', '0'::jsonb),
+        'need_expert', COALESCE(analysis_result -> 'need_expert', 'false'::jsonb),
+        'root_cause', analysis_result #> '{final_root_cause,root_cause}'
+    ),
+    info_count = CASE
+        WHEN jsonb_typeof(accumulated_context -> 'messages') = 'array'
+        THEN jsonb_array_length(accumulated_context -> 'messages')
+        ELSE 0
+    END
+WHERE summary IS NULL;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_analysis_snapshots_timeline
+    ON analysis_snapshots (session_id, created_at);
+
+COMMENT ON COLUMN analysis_snapshots.summary IS '时间线摘要投影';
+COMMENT ON COLUMN analysis_snapshots.info_count IS '累积消息数';
+COMMENT ON COLUMN analysis_snapshots.is_superseded IS '是否已被回滚';
+COMMENT ON INDEX idx_analysis_snapshots_timeline IS '分析快照时间线索引';
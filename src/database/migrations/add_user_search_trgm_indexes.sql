@@ -0,0 +1,14 @@
+-- 管理后台用户搜索：用户名/姓名/邮箱三元组索引
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- ILIKE '%关键词%' 子串搜索（关键词不少于3个字符时走索引）
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_username_trgm
+    ON users USING gin (username gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_full_name_trgm
+    ON users USING gin (full_name gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_email_trgm
+    ON users USING gin (email gin_trgm_ops);
+
+COMMENT ON INDEX idx_users_username_trgm IS '用户名pg_trgm索引';
+COMMENT ON INDEX idx_users_full_name_trgm IS '用户姓名pg_trgm索引';
+COMMENT ON INDEX idx_users_email_trgm IS '用户邮箱pg_trgm索引';
@@ -0,0 +1,93 @@
+-- analysis_results / analysis_messages 改为按 created_at 月分区（UTC月边界）
+-- 旧表改名为 *_legacy 保留，核对行数后手工 DROP；需要停写执行（单事务内拷贝全部数据）
+-- 之后的分区由应用启动时 ensure_partitions 预建，过期分区由 scripts/archive_partitions.py 归档
+BEGIN;
+-- 月边界按UTC计算
+SET LOCAL timezone = 'UTC';
+
+-- 分区键不允许为空
+UPDATE analysis_results SET created_at = COALESCE(updated_at, now()) WHERE created_at IS NULL;
+UPDATE analysis_messages SET created_at = now() WHERE created_at IS NULL;
+
+ALTER TABLE analysis_results RENAME TO analysis_results_legacy;
+ALTER TABLE analysis_messages RENAME TO analysis_messages_legacy;
+ALTER INDEX IF EXISTS analysis_results_pkey RENAME TO analysis_results_legacy_pkey;
+ALTER INDEX IF EXISTS analysis_messages_pkey RENAME TO analysis_messages_legacy_pkey;
+
+-- ---------- analysis_results ----------
+CREATE TABLE analysis_results (
+    LIKE analysis_results_legacy INCLUDING DEFAULTS INCLUDING STORAGE INCLUDING COMMENTS
+) PARTITION BY RANGE (created_at);
+
+ALTER TABLE analysis_results ALTER COLUMN created_at SET NOT NULL;
+ALTER TABLE analysis_results ADD PRIMARY KEY (id, created_at);
+ALTER TABLE analysis_results
+    ADD CONSTRAINT uq_analysis_results_analysis_id UNIQUE (analysis_id, created_at);
+ALTER TABLE analysis_results
+    ADD FOREIGN KEY (chip_model) REFERENCES soc_chips (chip_model),
+    ADD FOREIGN KEY (failure_subsystem) REFERENCES soc_subsystems (id),
+    ADD FOREIGN KEY (failure_module) REFERENCES soc_modules (id),
+    ADD FOREIGN KEY (matched_case_id) REFERENCES failure_cases (id);
+
+-- 旧表上的同名索引随表改名保留，先删除再在分区父表上重建
+DROP INDEX IF EXISTS idx_analysis_chip_model, idx_analysis_status, idx_analysis_module,
+    idx_analysis_user, idx_analysis_created;
+CREATE INDEX idx_analysis_chip_model ON analysis_results (chip_model);
+CREATE INDEX idx_analysis_status ON analysis_results (status);
+CREATE INDEX idx_analysis_module ON analysis_results (failure_module);
+CREATE INDEX idx_analysis_user ON analysis_results (user_id);
+CREATE INDEX idx_analysis_created ON analysis_results (created_at);
+CREATE INDEX idx_analysis_session ON analysis_results (session_id);
+CREATE INDEX idx_analysis_analysis_id ON analysis_results (analysis_id);
+
+-- ---------- analysis_messages ----------
+CREATE TABLE analysis_messages (
+    LIKE analysis_messages_legacy INCLUDING DEFAULTS INCLUDING STORAGE INCLUDING COMMENTS
+) PARTITION BY RANGE (created_at);
+
+ALTER TABLE analysis_messages ALTER COLUMN created_at SET NOT NULL;
+ALTER TABLE analysis_messages ADD PRIMARY KEY (message_id, created_at);
+-- message_id 序列改归新表所有，删除旧表时不会一并删除
+ALTER SEQUENCE analysis_messages_message_id_seq OWNED BY analysis_messages.message_id;
+
+DROP INDEX IF EXISTS idx_analysis_messages_session, idx_analysis_messages_sequence,
+    idx_analysis_messages_correction, ix_analysis_messages_session_id;
+CREATE INDEX idx_analysis_messages_session ON analysis_messages (session_id);
+CREATE INDEX idx_analysis_messages_sequence ON analysis_messages (session_id, sequence_number);
+CREATE INDEX idx_analysis_messages_correction ON analysis_messages (corrected_message_id);
+
+-- ---------- 分区：覆盖已有数据的所有月份及未来两个月 ----------
+DO $$
+DECLARE
+    tbl text;
+    first_month timestamptz;
+    last_month timestamptz;
+    m timestamptz;
+BEGIN
+    FOREACH tbl IN ARRAY ARRAY['analysis_results', 'analysis_messages'] LOOP
+        EXECUTE format('SELECT date_trunc(''month'', min(created_at) AT TIME ZONE ''UTC'') AT TIME ZONE ''UTC'' FROM %I', tbl || '_legacy')
+            INTO first_month;
+        last_month := date_trunc('month', now() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC' + interval '2 months';
+        m := COALESCE(LEAST(first_month, last_month), last_month);
+        WHILE m <= last_month LOOP
+            EXECUTE format(
+                'CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L) WITH (toast_tuple_target = 512)',
+                tbl || '_p' || to_char(m AT TIME ZONE 'UTC', 'YYYYMM'), tbl, m, m + interval '1 month'
+            );
+            m := m + interval '1 month';
+        END LOOP;
+        EXECUTE format('CREATE TABLE IF NOT EXISTS %I PARTITION OF %I DEFAULT', tbl || '_default', tbl);
+    END LOOP;
+END $$;
+
+INSERT INTO analysis_results SELECT * FROM analysis_results_legacy;
+INSERT INTO analysis_messages SELECT * FROM analysis_messages_legacy;
+
+COMMENT ON TABLE analysis_results IS '分析结果（按created_at月分区）';
+COMMENT ON TABLE analysis_messages IS '多轮对话消息（按created_at月分区）';
+
+COMMIT;
+
+-- 核对无误后执行:
+-- DROP TABLE analysis_results_legacy;
+-- DROP TABLE analysis_messages_legacy;
@@ -10,7 +10,7 @@ from uuid import UUID, uuid4
 from sqlalchemy import (
     Column, String, Integer, Float, Boolean,
     DateTime, ForeignKey, Index, Text, Numeric, Date,
-    CheckConstraint, UniqueConstraint, ARRAY, UUID, MetaData, BigInteger
+    CheckConstraint, UniqueConstraint, ARRAY, UUID, MetaData, BigInteger, text
 )
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import DeclarativeBase, relationship, Mapped, mapped_column
@@ -225,6 +225,18 @@ class FailureCase(Base):
         Index("idx_case_failure_domain", "failure_domain"),
         Index("idx_case_module_type", "module_type"),
         Index("idx_case_module", "module_id"),
+        # 错误码数组包含查询（error_codes @> ARRAY[...]）
+        Index("idx_case_error_codes_gin", "error_codes", postgresql_using="gin"),
+        # 规范化错误码数组重叠查询（词法检索，normalize_error_codes 见 error_code_index.py）
+        Index(
+            "idx_case_error_codes_norm_gin", text("normalize_error_codes(error_codes)"),
+            postgresql_using="gin"
+        ),
+        # 症状三元组索引（词法检索 word_similarity / <%，需要 pg_trgm 扩展）
+        Index(
+            "idx_case_symptoms_trgm", "symptoms",
+            postgresql_using="gin", postgresql_ops={"symptoms": "gin_trgm_ops"}
+        ),
     )
 
 
@@ -235,11 +247,12 @@ class AnalysisResult(Base):
     """
     分析结果表 - 存储所有分析结果
     使用JSONB存储提取的特征和推理结果
+    按 created_at 月分区（分区维护与归档见 partitions.py），主键和唯一约束须包含分区键
     """
     __tablename__ = "analysis_results"
 
     id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid4)
-    analysis_id: Mapped[str] = mapped_column(String(50), unique=True, nullable=False)
+    analysis_id: Mapped[str] = mapped_column(String(50), nullable=False)
     session_id: Mapped[str] = mapped_column(String(100), nullable=False)
     user_id: Mapped[Optional[str]] = mapped_column(String(50))
     chip_model: Mapped[Optional[str]] = mapped_column(String(50), ForeignKey("soc_chips.chip_model"), nullable=True)
@@ -247,7 +260,8 @@ class AnalysisResult(Base):
     # 输入日志
     log_source: Mapped[Optional[str]] = mapped_column(String(255))
     log_hash: Mapped[Optional[str]] = mapped_column(String(64))
-    raw_log: Mapped[Optional[str]] = mapped_column(Text)
+    # 大字段延迟加载：列表/统计查询不读取TOAST中的日志和报告
+    raw_log: Mapped[Optional[str]] = mapped_column(Text, deferred=True, deferred_group="blobs")
 
     # 提取的特征（JSON格式）
     fault_features: Mapped[Dict[str, Any]] = mapped_column(JSONB, default=dict)
@@ -275,7 +289,7 @@ class AnalysisResult(Base):
     expert_correction_id: Mapped[Optional[str]] = mapped_column(String(50))
 
     # AI分析报告和推理步骤
-    infer_report: Mapped[Optional[str]] = mapped_column(Text)  # AI生成的分析报告
+    infer_report: Mapped[Optional[str]] = mapped_column(Text, deferred=True, deferred_group="blobs")  # AI生成的分析报告
     infer_trace: Mapped[Optional[Dict[str, Any]]] = mapped_column(JSONB, default=dict)  # 推理步骤轨迹
 
     # 处理时长（秒）
@@ -286,17 +300,23 @@ class AnalysisResult(Base):
         String(20), default="pending"
     )
 
-    # 时间戳
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+    # 时间戳（分区键）
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), primary_key=True, nullable=False, default=datetime.utcnow
+    )
     started_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
 
     __table_args__ = (
+        UniqueConstraint("analysis_id", "created_at", name="uq_analysis_results_analysis_id"),
         Index("idx_analysis_chip_model", "chip_model"),
         Index("idx_analysis_status", "status"),
         Index("idx_analysis_module", "failure_module"),
         Index("idx_analysis_user", "user_id"),
         Index("idx_analysis_created", "created_at"),
+        Index("idx_analysis_session", "session_id"),
+        Index("idx_analysis_analysis_id", "analysis_id"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
     )
 
 
@@ -339,6 +359,11 @@ class InferenceRule(Base):
         Index("idx_rule_chip_model", "chip_model"),
         Index("idx_rule_is_active", "is_active"),
         Index("idx_rule_priority", "priority"),
+        # 条件包含查询（conditions @> '{"error_codes": [...]}'）
+        Index(
+            "idx_rule_conditions_path_ops", "conditions",
+            postgresql_using="gin", postgresql_ops={"conditions": "jsonb_path_ops"}
+        ),
     )
 
 
@@ -411,7 +436,7 @@ class StatisticsSummary(Base):
 # 多轮对话功能表
 # ============================================
 class AnalysisMessage(Base):
-    """用户交互消息表"""
+    """用户交互消息表（按 created_at 月分区）"""
     __tablename__ = "analysis_messages"
 
     message_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
@@ -421,7 +446,9 @@ class AnalysisMessage(Base):
     content: Mapped[str] = mapped_column(Text, nullable=False)
     content_type: Mapped[Optional[str]] = mapped_column(String(50))  # text, log, correction_data
     message_metadata: Mapped[Dict[str, Any]] = mapped_column("metadata", JSONB, default=dict)
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), primary_key=True, nullable=False, default=datetime.utcnow
+    )  # 分区键
     is_correction: Mapped[bool] = mapped_column(Boolean, default=False)
     corrected_message_id: Mapped[Optional[int]] = mapped_column(BigInteger)  # 指向被纠正的消息
 
@@ -444,6 +471,7 @@ class AnalysisMessage(Base):
         Index("idx_analysis_messages_session", "session_id"),
         Index("idx_analysis_messages_sequence", "session_id", "sequence_number"),
         Index("idx_analysis_messages_correction", "corrected_message_id"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
     )
 
 
@@ -456,6 +484,10 @@ class AnalysisSnapshot(Base):
     message_id: Mapped[int] = mapped_column(BigInteger, nullable=False)  # 关联到触发的消息
     accumulated_context: Mapped[Dict[str, Any]] = mapped_column(JSONB, nullable=False)  # 累积的所有信息
     analysis_result: Mapped[Dict[str, Any]] = mapped_column(JSONB, nullable=False)  # 该次分析结果
+    # 时间线投影：保存时从 analysis_result/accumulated_context 提取，时间线查询不读取完整快照
+    summary: Mapped[Optional[Dict[str, Any]]] = mapped_column(JSONB)
+    info_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    is_superseded: Mapped[bool] = mapped_column(Boolean, default=False, server_default="false")  # 已被回滚
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=datetime.utcnow)
 
     # 关系暂时禁用
@@ -464,6 +496,7 @@ class AnalysisSnapshot(Base):
     __table_args__ = (
         Index("idx_analysis_snapshots_session", "session_id"),
         Index("idx_analysis_snapshots_message", "message_id"),
+        Index("idx_analysis_snapshots_timeline", "session_id", "created_at"),
     )
 
 
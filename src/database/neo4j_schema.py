@@ -360,7 +360,14 @@ class KnowledgeGraphRepository:
     # HA（一致性代理）特定查询
     # ============================================
     async def get_ha_topology(self, chip_model: str) -> Dict:
-        """获取HA拓扑信息（HA连接的CPU、L3缓存等）"""
+        """获取HA拓扑信息（HA连接的CPU、L3缓存等；启用投影缓存时不访问Neo4j）"""
+        from src.config.settings import get_settings
+        if get_settings().KG_CACHE_ENABLED:
+            from src.database.kg_cache import get_kg_cache
+            projection = await get_kg_cache().get_projection(chip_model)
+            topology = projection.ha_topology() if projection is not None else []
+            return topology[0] if topology else {}
+
         query = """
         MATCH (c:Chip {model: $chip_model})-[:HAS_MODULE]->(ha:HomeAgent)
         OPTIONAL MATCH (ha)-[:CONNECTED_TO_HA]->(cpu:CPUCore)
@@ -389,7 +396,12 @@ class KnowledgeGraphRepository:
         source_module: str,
         target_module: str
     ) -> List[Dict]:
-        """查找NoC路径"""
+        """查找NoC路径（有与当前图版本一致的路径表时直接查表）"""
+        from src.database.noc_paths import get_noc_path_table
+        table = await get_noc_path_table(chip_model, repository=self)
+        if table is not None and source_module in table and target_module in table:
+            return table.find_path(source_module, target_module)
+
         query = """
         MATCH (c:Chip {model: $chip_model})-[:HAS_MODULE]->(src)
         WHERE src.name = $source_module
@@ -409,6 +421,174 @@ class KnowledgeGraphRepository:
             records = await result.data()
             return [record for record in records]
 
+    # ============================================
+    # 批量投影加载（UNWIND）
+    # ============================================
+    async def load_chip_graphs(self, chip_models: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        批量加载多个芯片型号的图投影原始数据
+
+        每类数据一条 UNWIND 查询，无论芯片数量多少，往返次数固定
+
+        Returns:
+            {chip_model: {"chip", "subsystems", "modules", "failure_modes", "edges", "root_causes"}}
+        """
+        graphs: Dict[str, Dict[str, Any]] = {}
+        if not chip_models:
+            return graphs
+
+        structure_query = """
+        UNWIND $chip_models AS chip_model
+        MATCH (c:Chip {model: chip_model})
+        OPTIONAL MATCH (c)-[:HAS_SUBSYSTEM]->(s:SoCSubsystem)
+        RETURN chip_model, properties(c) AS chip, collect(DISTINCT properties(s)) AS subsystems
+        """
+        module_query = """
+        UNWIND $chip_models AS chip_model
+        MATCH (c:Chip {model: chip_model})-[:HAS_SUBSYSTEM*0..1]->(parent)-[:HAS_MODULE]->(m)
+        RETURN DISTINCT chip_model, elementId(m) AS module_id, properties(m) AS module,
+               labels(m) AS labels,
+               CASE WHEN parent:SoCSubsystem THEN properties(parent) ELSE null END AS subsystem
+        """
+        failure_query = """
+        UNWIND $chip_models AS chip_model
+        MATCH (c:Chip {model: chip_model})-[:HAS_SUBSYSTEM*0..1]->()-[:HAS_MODULE]->(m)
+        MATCH (m)-[:CAN_FAIL]->(f:FailureMode)
+        OPTIONAL MATCH (f)-[:HAS_ERROR]->(e:ErrorCode)
+        RETURN chip_model, elementId(m) AS module_id, properties(f) AS failure_mode,
+               collect(DISTINCT properties(e)) AS error_codes
+        """
+        edge_query = """
+        UNWIND $chip_models AS chip_model
+        MATCH (c:Chip {model: chip_model})-[:HAS_SUBSYSTEM*0..1]->()-[:HAS_MODULE]->(m)
+        MATCH (m)-[r:CONNECTED_VIA_NOC|CONNECTED_TO_HA]->(n)
+        RETURN DISTINCT chip_model, elementId(m) AS source_id, type(r) AS rel_type,
+               elementId(n) AS target_id, properties(n) AS target, labels(n) AS target_labels
+        """
+        root_cause_query = """
+        UNWIND $failure_modes AS failure_mode
+        MATCH (f:FailureMode {name: failure_mode})-[:CAUSED_BY]->(r:RootCause)
+        RETURN failure_mode, collect(DISTINCT properties(r)) AS root_causes
+        """
+
+        async with self.driver.session() as session:
+            result = await session.run(structure_query, chip_models=chip_models)
+            for record in await result.data():
+                graphs[record["chip_model"]] = {
+                    "chip": record["chip"],
+                    "subsystems": record["subsystems"],
+                    "modules": [],
+                    "failure_modes": [],
+                    "edges": [],
+                    "root_causes": {}
+                }
+
+            found = list(graphs)
+            if not found:
+                return graphs
+
+            result = await session.run(module_query, chip_models=found)
+            for record in await result.data():
+                graphs[record["chip_model"]]["modules"].append(record)
+
+            result = await session.run(failure_query, chip_models=found)
+            failure_mode_names = set()
+            for record in await result.data():
+                graphs[record["chip_model"]]["failure_modes"].append(record)
+                name = (record["failure_mode"] or {}).get("name")
+                if name:
+                    failure_mode_names.add(name)
+
+            result = await session.run(edge_query, chip_models=found)
+            for record in await result.data():
+                graphs[record["chip_model"]]["edges"].append(record)
+
+            # 根因挂在失效模式上（与芯片无关），按失效模式名一次取回后分发给各芯片
+            root_causes: Dict[str, List[Dict]] = {}
+            if failure_mode_names:
+                result = await session.run(root_cause_query, failure_modes=sorted(failure_mode_names))
+                for record in await result.data():
+                    root_causes[record["failure_mode"]] = record["root_causes"]
+
+        for graph in graphs.values():
+            for record in graph["failure_modes"]:
+                name = (record["failure_mode"] or {}).get("name")
+                if name in root_causes:
+                    graph["root_causes"][name] = root_causes[name]
+
+        return graphs
+
+    async def export_noc_topology(self, chip_models: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        导出芯片的NoC拓扑：芯片模块（含NoC路由器/端点）上的 CONNECTED_VIA_NOC 边逐条导出
+
+        只展开一跳，不做可变长路径匹配（mesh 上路径数随跳数指数增长）；
+        节点以 elementId 为唯一ID，模块名在不同子系统间可以重名
+
+        Returns:
+            {chip_model: {"nodes": [{"id", "name", "label", "subsystem"}], "edges": [(源节点ID, 目标节点ID)]}}
+        """
+        query = """
+        UNWIND $chip_models AS chip_model
+        MATCH (c:Chip {model: chip_model})-[:HAS_SUBSYSTEM*0..1]->(owner)-[:HAS_MODULE]->(m)
+        MATCH (m)-[:CONNECTED_VIA_NOC]-(n)
+        RETURN DISTINCT chip_model,
+               elementId(m) AS source_id, coalesce(m.name, toString(m.core_id), elementId(m)) AS source_name,
+               head(labels(m)) AS source_label,
+               CASE WHEN owner:SoCSubsystem THEN owner.name END AS source_subsystem,
+               elementId(n) AS target_id, coalesce(n.name, toString(n.core_id), elementId(n)) AS target_name,
+               head(labels(n)) AS target_label
+        """
+        topologies: Dict[str, Dict[str, Any]] = {}
+        async with self.driver.session() as session:
+            result = await session.run(query, chip_models=chip_models)
+            for record in await result.data():
+                topology = topologies.setdefault(record["chip_model"], {"nodes": {}, "edges": set()})
+                nodes = topology["nodes"]
+                source = nodes.setdefault(record["source_id"], {
+                    "id": record["source_id"], "name": record["source_name"],
+                    "label": record["source_label"], "subsystem": None
+                })
+                # 子系统只在节点作为芯片模块出现时可知
+                source["subsystem"] = source["subsystem"] or record["source_subsystem"]
+                nodes.setdefault(record["target_id"], {
+                    "id": record["target_id"], "name": record["target_name"],
+                    "label": record["target_label"], "subsystem": None
+                })
+                # 无向边：两端都是芯片模块时会出现两次
+                topology["edges"].add(tuple(sorted((record["source_id"], record["target_id"]))))
+
+        for topology in topologies.values():
+            topology["nodes"] = sorted(topology["nodes"].values(), key=lambda node: node["id"])
+            topology["edges"] = sorted(topology["edges"])
+        return topologies
+
+    # ============================================
+    # 图版本号（用于进程内缓存失效）
+    # ============================================
+    async def get_graph_version(self) -> Optional[int]:
+        """读取知识图谱版本号（未初始化时返回None）"""
+        query = """
+        MATCH (v:GraphVersion {key: 'knowledge'})
+        RETURN v.version AS version
+        """
+        async with self.driver.session() as session:
+            result = await session.run(query)
+            record = await result.single()
+            return record["version"] if record else None
+
+    async def bump_graph_version(self) -> int:
+        """知识图谱版本号加一，返回新版本号"""
+        query = """
+        MERGE (v:GraphVersion {key: 'knowledge'})
+        SET v.version = coalesce(v.version, 0) + 1, v.updated_at = datetime()
+        RETURN v.version AS version
+        """
+        async with self.driver.session() as session:
+            result = await session.run(query)
+            record = await result.single()
+            return record["version"]
+
     # ============================================
     # 创建芯片数据
     # ============================================
@@ -0,0 +1,529 @@
+"""
+芯片失效分析AI Agent系统 - NoC全源最短路径表
+把每个芯片型号的NoC拓扑导出为CSR邻接数组，离线用NumPy批量BFS预计算
+全部节点对的跳数与前驱矩阵；运行时跳数查询为一次数组读取，路径按前驱回溯
+"""
+
+import asyncio
+import re
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from loguru import logger
+
+
+# 与 find_noc_path 的 Cypher 查询一致：路径结果只列出NoC节点
+NOC_NODE_LABELS = ("NoCRouter", "NoCEndpoint")
+UNREACHABLE = -1
+
+# 日志中的模块名/路由器名（如 R3_4、ddr_ctrl0、noc.r12）
+_TOKEN_RE = re.compile(r"[\w./-]+")
+
+
+def build_csr(num_nodes: int, edges: Iterable[Tuple[int, int]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    由边列表构建无向图的CSR邻接数组（邻居按编号升序、去重、去自环）
+
+    Returns:
+        (indptr, indices)：节点 i 的邻居为 indices[indptr[i]:indptr[i + 1]]
+    """
+    pairs = np.asarray(list(edges), dtype=np.int64).reshape(-1, 2)
+    pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+    both = np.concatenate([pairs, pairs[:, ::-1]])
+    both = np.unique(both, axis=0)  # 按 (src, dst) 排序并去重
+
+    counts = np.bincount(both[:, 0], minlength=num_nodes)
+    indptr = np.zeros(num_nodes + 1, dtype=np.int32)
+    np.cumsum(counts, out=indptr[1:])
+    return indptr, both[:, 1].astype(np.int32)
+
+
+def bfs_all_pairs(indptr: np.ndarray, indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    全部源点同步逐层BFS
+
+    每层把所有 (源点, 前沿节点) 对一次性按CSR展开，循环次数等于图直径
+
+    Returns:
+        (dist, parent)：dist[s, t] 为跳数（不可达为-1）；
+        parent[s, t] 为 s 到 t 最短路径上 t 的前驱（s 自身及不可达为-1）
+    """
+    n = len(indptr) - 1
+    dist = np.full((n, n), UNREACHABLE, dtype=np.int16)
+    parent = np.full((n, n), UNREACHABLE, dtype=np.int32)
+
+    sources = np.arange(n, dtype=np.int64)
+    dist[sources, sources] = 0
+    frontier_src = sources
+    frontier_node = sources
+    level = 0
+
+    while frontier_src.size:
+        level += 1
+        starts = indptr[frontier_node].astype(np.int64)
+        counts = indptr[frontier_node + 1].astype(np.int64) - starts
+        total = int(counts.sum())
+        if total == 0:
+            break
+
+        # 展开每个前沿节点的邻居：第 k 个前沿节点贡献 counts[k] 个位置
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        neighbors = indices[np.repeat(starts, counts) + offsets].astype(np.int64)
+        src = np.repeat(frontier_src, counts)
+        via = np.repeat(frontier_node, counts)
+
+        fresh = dist[src, neighbors] == UNREACHABLE
+        src, neighbors, via = src[fresh], neighbors[fresh], via[fresh]
+
+        # 同一层多个前驱到达同一节点时保留第一个（结果与展开顺序一致，可复现）
+        _, first = np.unique(src * n + neighbors, return_index=True)
+        src, neighbors, via = src[first], neighbors[first], via[first]
+
+        dist[src, neighbors] = level
+        parent[src, neighbors] = via
+        frontier_src, frontier_node = src, neighbors
+
+    return dist, parent
+
+
+class NoCPathTable:
+    """
+    单个芯片型号的NoC路径表
+
+    节点按唯一ID（Neo4j elementId）编号；模块名在不同子系统间可能重名，
+    对外显示和查找使用 node_keys：名称唯一时为名称，重名时为 "子系统/名称"，仍冲突时为ID
+    """
+
+    def __init__(
+        self,
+        chip_model: str,
+        node_names: Sequence[str],
+        node_labels: Sequence[str],
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        dist: np.ndarray,
+        parent: np.ndarray,
+        graph_version: int = 0,
+        node_ids: Optional[Sequence[str]] = None,
+        node_subsystems: Optional[Sequence[str]] = None
+    ):
+        self.chip_model = chip_model
+        self.node_names = np.asarray(node_names, dtype=str)
+        self.node_labels = np.asarray(node_labels, dtype=str)
+        self.node_ids = np.asarray(node_ids if node_ids is not None else node_names, dtype=str)
+        self.node_subsystems = np.asarray(
+            node_subsystems if node_subsystems is not None else [""] * len(self.node_names), dtype=str
+        )
+        self.indptr = indptr
+        self.indices = indices
+        self.dist = dist
+        self.parent = parent
+        self.graph_version = graph_version
+        self.node_keys = np.asarray(self._display_keys(), dtype=str)
+        self._index = self._build_lookup()
+
+    def _display_keys(self) -> List[str]:
+        names = self.node_names.tolist()
+        subsystems = self.node_subsystems.tolist()
+        ids = self.node_ids.tolist()
+        name_counts = Counter(names)
+        keys = [
+            name if name_counts[name] == 1 else (f"{subsystem}/{name}" if subsystem else node_id)
+            for name, subsystem, node_id in zip(names, subsystems, ids)
+        ]
+        key_counts = Counter(keys)
+        return [key if key_counts[key] == 1 else node_id for key, node_id in zip(keys, ids)]
+
+    def _build_lookup(self) -> Dict[str, int]:
+        """ID、显示键和唯一的模块名都可用于查找；重名的模块名不可直接查找"""
+        lookup: Dict[str, int] = {}
+        name_counts = Counter(self.node_names.tolist())
+        for i, name in enumerate(self.node_names.tolist()):
+            if name_counts[name] == 1:
+                lookup[name] = i
+        for i, key in enumerate(self.node_keys.tolist()):
+            lookup[key] = i
+        for i, node_id in enumerate(self.node_ids.tolist()):
+            lookup[node_id] = i
+        return lookup
+
+    @classmethod
+    def build(
+        cls,
+        chip_model: str,
+        nodes: Sequence[Dict[str, Any]],
+        edges: Iterable[Tuple[str, str]],
+        graph_version: int = 0
+    ) -> "NoCPathTable":
+        """
+        由拓扑构建路径表
+
+        Args:
+            nodes: [{"id", "name", "label", "subsystem"}]（没有 id 时以 name 为ID）
+            edges: [(源节点ID, 目标节点ID)]，按无向边处理
+        """
+        ids = [node.get("id") or node["name"] for node in nodes]
+        index = {node_id: i for i, node_id in enumerate(ids)}
+        pairs = [(index[a], index[b]) for a, b in edges if a in index and b in index]
+
+        indptr, indices = build_csr(len(ids), pairs)
+        dist, parent = bfs_all_pairs(indptr, indices)
+        return cls(
+            chip_model,
+            [node.get("name") or node_id for node, node_id in zip(nodes, ids)],
+            [node.get("label") or "" for node in nodes],
+            indptr, indices, dist, parent, graph_version,
+            node_ids=ids,
+            node_subsystems=[node.get("subsystem") or "" for node in nodes]
+        )
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_names)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.indices) // 2
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def hop_count(self, source: str, target: str) -> Optional[int]:
+        """两节点间跳数（节点不存在、模块名有歧义或不可达时返回None）"""
+        s = self._index.get(source)
+        t = self._index.get(target)
+        if s is None or t is None:
+            return None
+        hops = int(self.dist[s, t])
+        return None if hops == UNREACHABLE else hops
+
+    def _path_indices(self, source: str, target: str) -> Optional[List[int]]:
+        hops = self.hop_count(source, target)
+        if hops is None:
+            return None
+
+        parent_row = self.parent[self._index[source]]
+        node = self._index[target]
+        nodes = [node]
+        for _ in range(hops):
+            node = int(parent_row[node])
+            nodes.append(node)
+        return nodes[::-1]
+
+    def path(self, source: str, target: str) -> Optional[List[str]]:
+        """最短路径上的全部节点（node_keys，含两端）"""
+        nodes = self._path_indices(source, target)
+        if nodes is None:
+            return None
+        return self.node_keys[nodes].tolist()
+
+    def find_path(self, source: str, target: str) -> List[Dict[str, Any]]:
+        """与 KnowledgeGraphRepository.find_noc_path 相同的返回格式"""
+        nodes = self._path_indices(source, target)
+        if nodes is None:
+            return []
+        noc_nodes = [
+            str(self.node_keys[i]) for i in nodes
+            if self.node_labels[i] in NOC_NODE_LABELS
+        ]
+        return [{"noc_nodes": noc_nodes, "hop_count": len(nodes) - 1}]
+
+    def congestion_info(self, pairs: Iterable[Tuple[str, str]]) -> Dict[str, Any]:
+        """
+        多个模块对的路径汇总：各NoC节点被多少条路径经过
+
+        Returns:
+            {"paths": [...], "router_load": {节点: 次数}, "hotspot": 最热节点, "unresolved": [...]}
+        """
+        paths = []
+        unresolved = []
+        load = np.zeros(self.num_nodes, dtype=np.int32)
+
+        for source, target in pairs:
+            nodes = self._path_indices(source, target)
+            if nodes is None:
+                unresolved.append([source, target])
+                continue
+            paths.append({
+                "source": source, "target": target, "hops": len(nodes) - 1,
+                "path": self.node_keys[nodes].tolist()
+            })
+            load[nodes] += 1
+
+        is_noc = np.isin(self.node_labels, NOC_NODE_LABELS)
+        loaded = np.flatnonzero((load > 0) & is_noc)
+        loaded = loaded[np.argsort(-load[loaded], kind="stable")]
+        router_load = {str(self.node_keys[i]): int(load[i]) for i in loaded}
+
+        return {
+            "paths": paths,
+            "router_load": router_load,
+            "hotspot": next(iter(router_load), None),
+            "unresolved": unresolved
+        }
+
+    def mentioned_modules(self, text: str) -> List[str]:
+        """
+        日志中出现的节点（按 node_keys 返回，保持首次出现顺序）
+
+        按词匹配、不区分大小写；有歧义的模块名（多个子系统重名）不匹配
+        """
+        lowered = {key.lower(): key for key in self._index}
+        found: Dict[str, None] = {}
+        for token in _TOKEN_RE.findall(text or ""):
+            key = lowered.get(token.lower())
+            if key is not None:
+                found.setdefault(str(self.node_keys[self._index[key]]), None)
+        return list(found)
+
+    def module_pairs(self, text: str, max_pairs: int = 16) -> List[Tuple[str, str]]:
+        """
+        日志中出现的模块两两配对，用于 congestion_info
+
+        优先用非路由器节点（故障两端的模块）配对；不足两个时用全部出现的节点
+        """
+        mentioned = self.mentioned_modules(text)
+        endpoints = [key for key in mentioned if self.node_labels[self._index[key]] != "NoCRouter"]
+        nodes = endpoints if len(endpoints) >= 2 else mentioned
+        pairs = []
+        for i, source in enumerate(nodes):
+            for target in nodes[i + 1:]:
+                pairs.append((source, target))
+                if len(pairs) >= max_pairs:
+                    return pairs
+        return pairs
+
+    # ============================================
+    # 持久化（npz）
+    # ============================================
+    def save(self, path: Path):
+        """保存为压缩npz"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(
+            path,
+            chip_model=np.asarray(self.chip_model),
+            graph_version=np.asarray(self.graph_version),
+            node_names=self.node_names,
+            node_labels=self.node_labels,
+            node_ids=self.node_ids,
+            node_subsystems=self.node_subsystems,
+            indptr=self.indptr,
+            indices=self.indices,
+            dist=self.dist,
+            parent=self.parent
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "NoCPathTable":
+        """从npz加载"""
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                chip_model=str(data["chip_model"]),
+                node_names=data["node_names"],
+                node_labels=data["node_labels"],
+                indptr=data["indptr"],
+                indices=data["indices"],
+                dist=data["dist"],
+                parent=data["parent"],
+                graph_version=int(data["graph_version"]),
+                node_ids=data["node_ids"] if "node_ids" in data else None,
+                node_subsystems=data["node_subsystems"] if "node_subsystems" in data else None
+            )
+
+
+def table_filename(chip_model: str) -> str:
+    """芯片型号对应的文件名"""
+    safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in chip_model)
+    return f"{safe}.npz"
+
+
+class NoCPathRegistry:
+    """按芯片型号懒加载路径表"""
+
+    def __init__(self, directory: str, retry_seconds: float = 60.0):
+        """
+        Args:
+            directory: npz 文件目录
+            retry_seconds: 按需重建失败后的重试间隔（Neo4j不可用时不在每次请求上重试）
+        """
+        self.directory = Path(directory)
+        self.retry_seconds = retry_seconds
+        self._tables: Dict[str, Optional[NoCPathTable]] = {}
+        # chip_model -> (图版本, 是否成功, 时间)：同一图版本只重建一次
+        self._rebuilds: Dict[str, Tuple[int, bool, float]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def get(self, chip_model: str) -> Optional[NoCPathTable]:
+        """获取路径表（没有预计算文件时返回None）"""
+        if chip_model not in self._tables:
+            path = self.directory / table_filename(chip_model)
+            table = None
+            if path.exists():
+                try:
+                    table = NoCPathTable.load(path)
+                except Exception as e:
+                    logger.warning(f"[NoCPathRegistry] 加载路径表失败 {path}: {e}")
+            self._tables[chip_model] = table
+        return self._tables[chip_model]
+
+    def load_all(self) -> Dict[str, int]:
+        """加载目录下全部路径表，返回 {芯片型号: 节点数}"""
+        loaded = {}
+        if not self.directory.exists():
+            return loaded
+        for path in sorted(self.directory.glob("*.npz")):
+            try:
+                table = NoCPathTable.load(path)
+            except Exception as e:
+                logger.warning(f"[NoCPathRegistry] 加载路径表失败 {path}: {e}")
+                continue
+            self._tables[table.chip_model] = table
+            loaded[table.chip_model] = table.num_nodes
+        return loaded
+
+    def put(self, table: NoCPathTable, save: bool = True):
+        """登记路径表（可选写入磁盘）"""
+        self._tables[table.chip_model] = table
+        if save:
+            table.save(self.directory / table_filename(table.chip_model))
+
+    def discard(self, chip_model: str):
+        """芯片已没有NoC拓扑：丢弃路径表及其文件"""
+        self._tables[chip_model] = None
+        (self.directory / table_filename(chip_model)).unlink(missing_ok=True)
+
+    def clear(self):
+        """清空已加载的路径表"""
+        self._tables.clear()
+        self._rebuilds.clear()
+
+    def should_rebuild(self, chip_model: str, version: int) -> bool:
+        """该芯片在此图版本下是否还需要（重新）尝试重建"""
+        attempt = self._rebuilds.get(chip_model)
+        if attempt is None or attempt[0] != version:
+            return True
+        _, ok, at = attempt
+        return not ok and time.monotonic() - at >= self.retry_seconds
+
+    def record_rebuild(self, chip_model: str, version: int, ok: bool):
+        self._rebuilds[chip_model] = (version, ok, time.monotonic())
+
+    def lock(self, chip_model: str) -> asyncio.Lock:
+        """同一芯片的并发重建只执行一次"""
+        return self._locks.setdefault(chip_model, asyncio.Lock())
+
+
+async def build_noc_path_tables(
+    repository,
+    chip_models: List[str],
+    registry: Optional[NoCPathRegistry] = None,
+    graph_version: Optional[int] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    从Neo4j导出NoC拓扑并预计算路径表
+
+    Args:
+        graph_version: 写入路径表的图版本号（为空时读取Neo4j中的当前版本）
+
+    Returns:
+        {chip_model: {"nodes", "edges", "seconds"}}
+    """
+    registry = registry or get_noc_path_registry()
+    topologies = await repository.export_noc_topology(chip_models)
+    if graph_version is None:
+        try:
+            graph_version = await repository.get_graph_version() or 0
+        except Exception:
+            graph_version = 0
+
+    summary = {}
+    for chip_model, topology in topologies.items():
+        start = time.perf_counter()
+        # BFS和npz写入是CPU/磁盘工作，不占用事件循环
+        table = await asyncio.to_thread(
+            NoCPathTable.build, chip_model, topology["nodes"], topology["edges"], graph_version
+        )
+        await asyncio.to_thread(registry.put, table)
+        summary[chip_model] = {
+            "nodes": table.num_nodes,
+            "edges": table.num_edges,
+            "seconds": round(time.perf_counter() - start, 4)
+        }
+        logger.info(f"[NoCPathTable] {chip_model}: {table.num_nodes} 节点 / {table.num_edges} 边，预计算 {summary[chip_model]['seconds']}s")
+    return summary
+
+
+async def get_noc_path_table(chip_model: str, repository=None) -> Optional[NoCPathTable]:
+    """
+    获取与当前知识图谱版本一致的路径表
+
+    路径表的 graph_version 与图版本（KnowledgeGraphCache 定期向Neo4j核对）不一致、
+    或尚未预计算时，从Neo4j导出该芯片拓扑重建；重建失败时沿用旧表，间隔 retry_seconds 后重试
+    """
+    from src.database.kg_cache import get_kg_cache
+
+    cache = get_kg_cache()
+    version = await cache.current_version()
+    registry = get_noc_path_registry()
+
+    table = registry.get(chip_model)
+    if (table is not None and table.graph_version == version) or not registry.should_rebuild(chip_model, version):
+        return table
+
+    async with registry.lock(chip_model):
+        table = registry.get(chip_model)
+        if (table is not None and table.graph_version == version) or not registry.should_rebuild(chip_model, version):
+            return table
+        try:
+            await build_noc_path_tables(repository or cache.repository, [chip_model], registry, graph_version=version)
+        except Exception as e:
+            registry.record_rebuild(chip_model, version, ok=False)
+            logger.warning(f"[NoCPathRegistry] 重建 {chip_model} 路径表失败，沿用旧表: {e}")
+            return table
+        registry.record_rebuild(chip_model, version, ok=True)
+        if table is not None and registry.get(chip_model) is table:
+            # 新版本图中该芯片已没有NoC拓扑
+            registry.discard(chip_model)
+        return registry.get(chip_model)
+
+
+async def analyze_noc_paths(chip_model: str, raw_log: str, max_pairs: int = 16) -> Optional[Dict[str, Any]]:
+    """
+    日志中出现的模块之间的NoC最短路径与共经路由器
+
+    Returns:
+        {"module_pairs", "noc_path", "congestion"}；没有路径表或日志中不足两个节点时返回None
+    """
+    table = await get_noc_path_table(chip_model)
+    if table is None:
+        return None
+    pairs = table.module_pairs(raw_log, max_pairs=max_pairs)
+    if not pairs:
+        return None
+    congestion = table.congestion_info(pairs)
+    if not congestion["paths"]:
+        return None
+    return {
+        "module_pairs": [list(pair) for pair in pairs],
+        "noc_path": congestion["paths"][0]["path"],
+        "congestion": congestion
+    }
+
+
+# ============================================
+# 全局实例
+# ============================================
+_noc_path_registry: Optional[NoCPathRegistry] = None
+
+
+def get_noc_path_registry() -> NoCPathRegistry:
+    """获取NoC路径表注册表单例"""
+    global _noc_path_registry
+    if _noc_path_registry is None:
+        from src.config.settings import get_settings
+        _noc_path_registry = NoCPathRegistry(get_settings().NOC_PATH_TABLE_DIR)
+    return _noc_path_registry
@@ -0,0 +1,51 @@
+"""
+键集分页游标
+游标是上一页最后一行排序键的编码（URL安全的base64 JSON），
+下一页用 (排序键...) < (游标值...) 在索引上直接定位，不随页码增大而变慢
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, List
+
+
+_DATETIME_TAG = "$dt"
+
+
+def encode_cursor(*values: Any) -> str:
+    """把排序键编码为游标（支持 str/int/float/None/datetime）"""
+    items = [
+        {_DATETIME_TAG: value.isoformat()} if isinstance(value, datetime) else value
+        for value in values
+    ]
+    raw = json.dumps(items, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """
+    解码游标
+
+    Args:
+        cursor: encode_cursor 生成的游标
+        size: 期望的排序键个数
+
+    Raises:
+        ValueError: 游标格式无效
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        items = json.loads(raw.decode("utf-8"))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"无效的分页游标: {e}") from e
+    if not isinstance(items, list) or len(items) != size:
+        raise ValueError("无效的分页游标")
+    values = []
+    for item in items:
+        if isinstance(item, dict):
+            if _DATETIME_TAG not in item:
+                raise ValueError("无效的分页游标")
+            item = datetime.fromisoformat(item[_DATETIME_TAG])
+        values.append(item)
+    return values
@@ -0,0 +1,268 @@
+"""
+芯片失效分析AI Agent系统 - 分区维护与归档
+analysis_results / analysis_messages 按 created_at 月分区（UTC月边界），分区名为 <表名>_pYYYYMM；
+启动时预建未来几个月的分区，归档任务把超出保留期的分区导出为压缩文件后摘除并删除
+"""
+
+import gzip
+import json
+import os
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+from sqlalchemy import text
+
+
+PARTITIONED_TABLES = ("analysis_results", "analysis_messages")
+
+# 大字段较多，降低行内阈值让日志/报告尽早移入TOAST，堆表只保留窄行
+TOAST_TUPLE_TARGET = 512
+
+_PARTITION_SUFFIX = re.compile(r"_p(\d{4})(\d{2})$")
+
+
+def month_start(value: datetime) -> date:
+    """所在月份的第一天"""
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, n: int) -> date:
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    """从分区名解析月份（默认分区等返回 None）"""
+    match = _PARTITION_SUFFIX.search(name)
+    if not match:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def _bound(month: date) -> str:
+    return f"{month:%Y-%m-%d} 00:00:00+00"
+
+
+def partition_ddl(table: str, month: date) -> str:
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, month)} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{_bound(month)}') TO ('{_bound(add_months(month, 1))}') "
+        f"WITH (toast_tuple_target = {TOAST_TUPLE_TARGET})"
+    )
+
+
+async def is_partitioned(conn, table: str) -> bool:
+    result = await conn.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))"),
+        {"table": table}
+    )
+    return bool(result.scalar())
+
+
+async def list_partitions(conn, table: str) -> List[str]:
+    """表当前挂载的分区名"""
+    result = await conn.execute(
+        text("""
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(:table)
+            ORDER BY c.relname
+        """),
+        {"table": table}
+    )
+    return [row[0] for row in result.all()]
+
+
+async def ensure_partitions(conn, months_ahead: int = 2, now: Optional[datetime] = None) -> List[str]:
+    """
+    创建当月及未来 months_ahead 个月的分区和默认分区（幂等）
+
+    默认分区兜底超出已建范围的写入；未分区的旧表（尚未执行迁移）跳过。
+    每个分区在独立的保存点中创建，单个分区失败只记录日志，不中断启动
+    """
+    now = now or datetime.now(timezone.utc)
+    current = month_start(now)
+    created = []
+    for table in PARTITIONED_TABLES:
+        if not await is_partitioned(conn, table):
+            logger.warning(f"[Partitions] {table} 不是分区表，跳过（见 src/database/migrations/partition_analysis_tables.sql）")
+            continue
+        existing = set(await list_partitions(conn, table))
+        has_default = f"{table}_default" in existing
+        if not has_default:
+            await conn.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"))
+            created.append(f"{table}_default")
+        for offset in range(months_ahead + 1):
+            month = add_months(current, offset)
+            if partition_name(table, month) in existing:
+                continue
+            try:
+                async with conn.begin_nested():
+                    await create_partition(conn, table, month, has_default)
+                created.append(partition_name(table, month))
+            except Exception as e:
+                logger.error(f"[Partitions] 创建分区 {partition_name(table, month)} 失败，该月写入仍落默认分区: {e}")
+    if created:
+        logger.info(f"[Partitions] 已创建分区: {created}")
+    return created
+
+
+async def create_partition(conn, table: str, month: date, has_default: bool = True):
+    """
+    创建月分区
+
+    默认分区中已有该月的行时（分区未及时预建），直接建分区会因默认分区约束冲突失败：
+    先摘除默认分区、建月分区、把这些行移入，再挂回默认分区
+    """
+    default = f"{table}_default"
+    bounds = {"lo": _bound(month), "hi": _bound(add_months(month, 1))}
+    in_range = "created_at >= CAST(:lo AS timestamptz) AND created_at < CAST(:hi AS timestamptz)"
+    rows_in_default = False
+    if has_default:
+        result = await conn.execute(text(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {in_range})"), bounds)
+        rows_in_default = bool(result.scalar())
+    if not rows_in_default:
+        await conn.execute(text(partition_ddl(table, month)))
+        return
+
+    await conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {default}"))
+    await conn.execute(text(partition_ddl(table, month)))
+    moved = await conn.execute(
+        text(f"WITH moved AS (DELETE FROM {default} WHERE {in_range} RETURNING *) "
+             f"INSERT INTO {partition_name(table, month)} SELECT * FROM moved"),
+        bounds
+    )
+    await conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT"))
+    logger.warning(f"[Partitions] 默认分区中 {moved.rowcount} 行已移入 {partition_name(table, month)}")
+
+
+# ============================================
+# 归档
+# ============================================
+
+@dataclass
+class ArchivedPartition:
+    table: str
+    partition: str
+    path: str
+    rows: int
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"table": self.table, "partition": self.partition, "path": self.path, "rows": self.rows}
+
+
+class PartitionArchiver:
+    """
+    过期分区归档
+
+    对早于保留期的每个月分区：流式导出为 JSONL.gz（或 Parquet/zstd）→ 摘除 → 删除。
+    导出先写临时文件再原子改名，导出失败时分区保持挂载、数据不动，下次运行重试
+    """
+
+    def __init__(
+        self,
+        retain_months: int = 12,
+        archive_dir: str = "./data/archive",
+        export_format: str = "jsonl",
+        batch_size: int = 5000
+    ):
+        """
+        Args:
+            retain_months: 在线保留的月数（含当月）
+            archive_dir: 归档文件目录（按表名分子目录）
+            export_format: jsonl（gzip压缩）或 parquet（需要 pyarrow）
+            batch_size: 导出时每批读取的行数
+        """
+        if export_format not in ("jsonl", "parquet"):
+            raise ValueError(f"不支持的归档格式: {export_format}")
+        self.retain_months = retain_months
+        self.archive_dir = Path(archive_dir)
+        self.export_format = export_format
+        self.batch_size = batch_size
+
+    def expired(self, partitions: List[str], now: Optional[datetime] = None) -> List[str]:
+        """超出保留期的月分区"""
+        cutoff = add_months(month_start(now or datetime.now(timezone.utc)), -(self.retain_months - 1))
+        return [
+            name for name in partitions
+            if (month := partition_month(name)) is not None and month < cutoff
+        ]
+
+    async def run(self, engine, now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """归档所有过期分区，返回归档清单"""
+        archived = []
+        for table in PARTITIONED_TABLES:
+            async with engine.connect() as conn:
+                if not await is_partitioned(conn, table):
+                    continue
+                expired = self.expired(await list_partitions(conn, table), now)
+            for partition in expired:
+                archived.append((await self.archive(engine, table, partition)).to_dict())
+        return archived
+
+    async def archive(self, engine, table: str, partition: str) -> ArchivedPartition:
+        directory = self.archive_dir / table
+        directory.mkdir(parents=True, exist_ok=True)
+        suffix = ".jsonl.gz" if self.export_format == "jsonl" else ".parquet"
+        path = directory / f"{partition}{suffix}"
+        tmp_path = path.with_name(path.name + ".tmp")
+
+        async with engine.connect() as conn:
+            # 旧月份不再写入，直接读分区本身，服务端游标分批取
+            result = await conn.stream(text(f"SELECT row_to_json(t)::text FROM {partition} t"))
+            if self.export_format == "jsonl":
+                rows = await self._write_jsonl(result, tmp_path)
+            else:
+                rows = await self._write_parquet(result, tmp_path)
+        if tmp_path.exists():
+            os.replace(tmp_path, path)
+
+        # 摘除只持有父表的短暂锁；存在默认分区时不能使用 DETACH ... CONCURRENTLY
+        async with engine.begin() as conn:
+            await conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {partition}"))
+            await conn.execute(text(f"DROP TABLE {partition}"))
+
+        logger.info(f"[PartitionArchiver] 已归档 {partition} - 行数: {rows}, 文件: {path if rows else '无'}")
+        return ArchivedPartition(table=table, partition=partition, path=str(path) if path.exists() else "", rows=rows)
+
+    async def _write_jsonl(self, result, path: Path) -> int:
+        rows = 0
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            async for partition_rows in result.partitions(self.batch_size):
+                f.writelines(row[0] + "\n" for row in partition_rows)
+                rows += len(partition_rows)
+        return rows
+
+    async def _write_parquet(self, result, path: Path) -> int:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("Parquet归档需要安装 pyarrow，或改用 jsonl 格式") from e
+
+        rows = 0
+        writer = None
+        try:
+            async for partition_rows in result.partitions(self.batch_size):
+                records = [json.loads(row[0]) for row in partition_rows]
+                # JSON/数组列统一序列化为字符串，避免各批推断出的schema不一致
+                batch = pa.Table.from_pylist([
+                    {k: json.dumps(v, ensure_ascii=False) if isinstance(v, (dict, list)) else v for k, v in record.items()}
+                    for record in records
+                ])
+                if writer is None:
+                    writer = pq.ParquetWriter(str(path), batch.schema, compression="zstd")
+                writer.write_table(batch.cast(writer.schema))
+                rows += len(records)
+        finally:
+            if writer is not None:
+                writer.close()
+        return rows
@@ -0,0 +1,115 @@
+"""
+芯片失效分析AI Agent系统 - 数据库连接池
+连接池参数来自配置；借出连接的等待耗时、超时次数和占用率记入进程指标，
+池耗尽时可以从 /api/v1/monitoring/db/pool 和 Prometheus 指标直接看到
+"""
+
+import time
+from typing import Any, Dict
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from ..monitoring.metrics import get_metrics_registry
+
+
+# 借出等待耗时桶（秒）：空闲连接应在亚毫秒级借出，排队时落在后面的桶
+CHECKOUT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+_registry = get_metrics_registry()
+
+POOL_CHECKOUT_SECONDS = _registry.histogram(
+    "chip_fault_db_pool_checkout_seconds", "借出数据库连接的等待耗时（秒，含新建连接和pre-ping）",
+    ("pool",), CHECKOUT_BUCKETS
+)
+POOL_TIMEOUTS = _registry.counter(
+    "chip_fault_db_pool_timeouts_total", "等待数据库连接超时次数", ("pool",)
+)
+POOL_CHECKED_OUT = _registry.gauge(
+    "chip_fault_db_pool_checked_out", "已借出的数据库连接数", ("pool",)
+)
+POOL_SATURATION = _registry.gauge(
+    "chip_fault_db_pool_saturation", "连接池占用率（已借出 / (pool_size + max_overflow)）", ("pool",)
+)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    带指标的异步连接池
+
+    只在借出/归还时各做一次计时和几次字典写入，不改变排队和溢出行为
+    """
+
+    metrics_name = "primary"
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            POOL_TIMEOUTS.inc(self.metrics_name)
+            raise
+        finally:
+            POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - start, self.metrics_name)
+        self._update_gauges()
+        return connection
+
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        self._update_gauges()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics_name = self.metrics_name
+        return pool
+
+    def _update_gauges(self):
+        checked_out = self.checkedout()
+        capacity = self.size() + max(self._max_overflow, 0)
+        POOL_CHECKED_OUT.set(checked_out, self.metrics_name)
+        POOL_SATURATION.set(round(checked_out / capacity, 4) if capacity else 0.0, self.metrics_name)
+
+    def get_stats(self) -> Dict[str, Any]:
+        name = self.metrics_name
+        return {
+            "pool": name,
+            "pool_size": self.size(),
+            "max_overflow": self._max_overflow,
+            "timeout": self.timeout(),
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": self.overflow(),
+            "saturation": POOL_SATURATION.value(name),
+            "checkouts": POOL_CHECKOUT_SECONDS.count(name),
+            "checkout_p50_ms": _ms(POOL_CHECKOUT_SECONDS.quantile(0.5, name)),
+            "checkout_p99_ms": _ms(POOL_CHECKOUT_SECONDS.quantile(0.99, name)),
+            "timeouts": int(POOL_TIMEOUTS.value(name))
+        }
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3) if seconds is not None else None
+
+
+def engine_options(settings) -> Dict[str, Any]:
+    """
+    create_async_engine 的连接池与语句缓存参数
+
+    prepared_statement_cache_size 是 asyncpg 方言在每个连接上缓存的预编译语句数，
+    相同SQL文本（包括 text() 原生查询）第二次执行起跳过 Parse 步骤；
+    经 pgbouncer 事务模式连接时需设为 0
+    """
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "connect_args": {
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE
+        }
+    }
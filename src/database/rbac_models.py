@@ -8,7 +8,8 @@ from typing import Optional, List, Dict, Any
 from uuid import UUID, uuid4
 
 from sqlalchemy import (
-    Column, String, Integer, Boolean, DateTime, ForeignKey, Index, Text, Table, UniqueConstraint, UUID
+    Column, String, Integer, BigInteger, Boolean, DateTime, ForeignKey, Index, Text, Table, UniqueConstraint, UUID,
+    func
 )
 from sqlalchemy.dialects.postgresql import JSONB, ARRAY
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -114,6 +115,10 @@ class User(Base):
         Index('idx_users_username', 'username'),
         Index('idx_users_email', 'email'),
         Index('idx_users_is_active', 'is_active'),
+        # 管理后台子串搜索（ILIKE '%关键词%'，需要 pg_trgm 扩展）
+        Index('idx_users_username_trgm', 'username', postgresql_using='gin', postgresql_ops={'username': 'gin_trgm_ops'}),
+        Index('idx_users_full_name_trgm', 'full_name', postgresql_using='gin', postgresql_ops={'full_name': 'gin_trgm_ops'}),
+        Index('idx_users_email_trgm', 'email', postgresql_using='gin', postgresql_ops={'email': 'gin_trgm_ops'}),
     )
 
     def has_permission(self, permission_name: str) -> bool:
@@ -302,6 +307,33 @@ class UserSession(Base):
         return True
 
 
+# ============================================
+# Token吊销记录表
+# ============================================
+class TokenRevocation(Base):
+    """
+    Token吊销记录表 - 只追加；各worker定期增量拉取到内存吊销表，
+    Token校验本身不查库
+    """
+    __tablename__ = "token_revocations"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    # session: 吊销该会话的所有Token（登出）
+    # access: 吊销该用户此前签发的访问Token，刷新后按新权限重新签发（角色/权限变更）
+    # user: 吊销该用户此前签发的所有Token（禁用账户）
+    kind: Mapped[str] = mapped_column(String(20), nullable=False)
+    subject: Mapped[str] = mapped_column(String(100), nullable=False)  # session_id 或 user_id
+    not_before_ms: Mapped[int] = mapped_column(BigInteger, nullable=False)  # 早于此时间签发的Token无效
+    reason: Mapped[Optional[str]] = mapped_column(String(50))
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)  # 之后不再需要保留
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index('idx_token_revocations_created_at', 'created_at'),
+        Index('idx_token_revocations_expires_at', 'expires_at'),
+    )
+
+
 # ============================================
 # 审计日志表（扩展原AuditLog模型）
 # ============================================
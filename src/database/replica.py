@@ -0,0 +1,142 @@
+"""
+芯片失效分析AI Agent系统 - 只读副本路由
+配置 DATABASE_REPLICA_URL 后，历史、统计、时间线、向量检索等只读查询走副本；
+后台定期测量副本复制延迟，延迟超限或副本不可用时自动回落主库，
+刚写入过的会话（按会话ID）在复制追上之前继续读主库（读己之写）
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import text
+from loguru import logger
+
+
+# 副本复制延迟（秒）：WAL已全部回放时为0，否则为距最后回放事务的时间；在主库上执行返回0
+REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class ReplicaRouter:
+    """
+    读写路由决策
+
+    - 副本延迟由后台任务每 check_interval 秒测量一次，查询失败视为不可用
+    - 延迟超过 max_lag 时所有读请求回落主库
+    - mark_written(key) 记录会话最近一次写入时间；写入后 (当前延迟 + sticky_seconds)
+      之内该会话的读请求走主库，之后副本必然已回放该写入
+
+    写入记录只在本worker内存中，请求落到其他worker时读己之写的上界由 max_lag 保证
+    """
+
+    def __init__(
+        self,
+        max_lag: float = 5.0,
+        sticky_seconds: float = 1.0,
+        check_interval: float = 2.0,
+        max_tracked: int = 10000
+    ):
+        """
+        Args:
+            max_lag: 允许读副本的最大复制延迟（秒）
+            sticky_seconds: 写入后在测得的延迟之外额外粘滞主库的时间（秒）
+            check_interval: 副本延迟测量间隔（秒）
+            max_tracked: 最多跟踪的最近写入会话数
+        """
+        self.max_lag = max_lag
+        self.sticky_seconds = sticky_seconds
+        self.check_interval = check_interval
+        self.max_tracked = max_tracked
+        self.lag: Optional[float] = None  # None 表示尚未测量或副本不可用
+        self._written: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"replica_reads": 0, "primary_reads": 0, "sticky_reads": 0, "lag_fallbacks": 0, "check_failures": 0}
+
+    # ---------- 路由 ----------
+
+    @property
+    def replica_available(self) -> bool:
+        return self.lag is not None and self.lag <= self.max_lag
+
+    def mark_written(self, key: Optional[str]):
+        """记录会话写入（提交后调用）"""
+        if not key:
+            return
+        self._written.pop(key, None)
+        self._written[key] = time.monotonic()
+        if len(self._written) > self.max_tracked:
+            # 字典按写入时间有序，淘汰最早的一条
+            self._written.pop(next(iter(self._written)))
+
+    def _prune(self):
+        """清除已超出粘滞窗口的写入记录"""
+        horizon = time.monotonic() - self.max_lag - self.sticky_seconds
+        self._written = {k: v for k, v in self._written.items() if v > horizon}
+
+    def use_replica(self, key: Optional[str] = None) -> bool:
+        """本次读取是否走副本"""
+        if not self.replica_available:
+            self.stats["lag_fallbacks"] += 1
+            self.stats["primary_reads"] += 1
+            return False
+        if key:
+            written_at = self._written.get(key)
+            if written_at is not None and time.monotonic() - written_at < self.lag + self.sticky_seconds:
+                self.stats["sticky_reads"] += 1
+                self.stats["primary_reads"] += 1
+                return False
+        self.stats["replica_reads"] += 1
+        return True
+
+    # ---------- 延迟测量 ----------
+
+    async def check(self, engine):
+        """在副本上测量复制延迟"""
+        try:
+            async with engine.connect() as conn:
+                self.lag = float((await conn.execute(REPLICA_LAG_SQL)).scalar() or 0.0)
+        except Exception as e:
+            if self.lag is not None:
+                logger.warning(f"[ReplicaRouter] 副本不可用，读请求回落主库: {e}")
+            self.lag = None
+            self.stats["check_failures"] += 1
+
+    async def _run(self, engine):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await self.check(engine)
+            self._prune()
+
+    async def start(self, engine):
+        """测量一次延迟并启动后台测量"""
+        if self._task is not None and not self._task.done():
+            return
+        await self.check(engine)
+        logger.info(f"[ReplicaRouter] 只读副本已启用 - 当前延迟: {self.lag}")
+        self._task = asyncio.get_running_loop().create_task(self._run(engine), name="replica-lag")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "lag_seconds": self.lag,
+            "max_lag_seconds": self.max_lag,
+            "replica_available": self.replica_available,
+            "tracked_writes": len(self._written),
+            "running": self._task is not None and not self._task.done()
+        }
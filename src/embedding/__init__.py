@@ -8,9 +8,33 @@ from .bge_manager import (
     bge_model_manager,
     get_bge_model_manager
 )
+from .onnx_backend import (
+    ONNXEmbeddingModel,
+    export_onnx_model,
+    load_onnx_model
+)
+from .batcher import (
+    EmbeddingBatcher,
+    get_embedding_batcher
+)
+from .client import (
+    EmbeddingClient,
+    EmbeddingServiceError,
+    get_embedding_client,
+    get_embedding_model
+)
 
 __all__ = [
     "BGEModelManager",
     "bge_model_manager",
-    "get_bge_model_manager"
+    "get_bge_model_manager",
+    "ONNXEmbeddingModel",
+    "export_onnx_model",
+    "load_onnx_model",
+    "EmbeddingBatcher",
+    "get_embedding_batcher",
+    "EmbeddingClient",
+    "EmbeddingServiceError",
+    "get_embedding_client",
+    "get_embedding_model"
 ]
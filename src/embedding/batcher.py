@@ -0,0 +1,237 @@
+"""
+Embedding微批执行器
+用专用线程执行模型推理，把同一事件循环内的并发请求合并为微批，
+避免逐条占用默认线程池
+
+用法:
+    batcher = get_embedding_batcher()
+    embedding = await batcher.encode("text", normalize=True)
+"""
+import asyncio
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from loguru import logger
+
+
+def normalize_rows(embeddings: np.ndarray) -> np.ndarray:
+    """L2归一化"""
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.clip(norms, 1e-12, None)
+
+
+class EmbeddingBatcher:
+    """
+    Embedding微批执行器
+
+    请求进入有界队列后由批处理协程合并：
+    取到第一个请求后最多再等待 max_wait_ms，或凑满 max_batch_size 条文本，
+    然后在专用线程中调用一次 model.encode；队列满时 encode() 等待（背压）
+    """
+
+    def __init__(
+        self,
+        model: Any = None,
+        model_loader: Optional[Callable[[], Any]] = None,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0,
+        max_queue_size: int = 1024,
+        thread_name_prefix: str = "embedding"
+    ):
+        """
+        初始化执行器
+
+        Args:
+            model: 已加载的模型（具有 encode() 接口）
+            model_loader: 模型为空时在推理线程中调用的加载函数
+            max_batch_size: 单批最大文本数
+            max_wait_ms: 凑批的最大等待时间（毫秒）
+            max_queue_size: 排队请求数上限
+            thread_name_prefix: 推理线程名前缀
+        """
+        self.model = model
+        self.model_loader = model_loader
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue_size = max_queue_size
+
+        # 模型推理只用一个线程，批内并行交给模型自身
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=thread_name_prefix)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._batch_task: Optional[asyncio.Task] = None
+
+        self.stats = {
+            "requests": 0,
+            "batches": 0,
+            "texts": 0,
+            "max_batch_texts": 0,
+            "errors": 0
+        }
+        self._batch_sizes: Counter = Counter()
+
+    async def encode(
+        self,
+        texts: Union[str, List[str]],
+        normalize: bool = False
+    ) -> np.ndarray:
+        """
+        生成embedding
+
+        Args:
+            texts: 单条文本或文本列表
+            normalize: 是否L2归一化
+
+        Returns:
+            单条文本返回一维向量，列表返回二维数组
+        """
+        single = isinstance(texts, str)
+        items = [texts] if single else list(texts)
+        self.stats["requests"] += 1
+
+        if not items:
+            dim = await self.run_in_executor(lambda: self._get_model().get_sentence_embedding_dimension())
+            return np.zeros((0, dim), dtype=np.float32)
+
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((items, future))
+        embeddings = await future
+
+        if normalize:
+            embeddings = normalize_rows(embeddings)
+        return embeddings[0] if single else embeddings
+
+    async def run_in_executor(self, func: Callable[..., Any], *args) -> Any:
+        """在推理线程中执行函数（与批处理串行）"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def close(self):
+        """停止批处理协程并关闭推理线程"""
+        if self._batch_task is not None:
+            self._batch_task.cancel()
+            try:
+                await self._batch_task
+            except (asyncio.CancelledError, RuntimeError):
+                pass
+            self._batch_task = None
+        self._executor.shutdown(wait=False)
+
+    def _ensure_started(self):
+        """在当前事件循环中启动批处理协程（事件循环变化时重建）"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._batch_task is not None and not self._batch_task.done():
+            return
+
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._batch_task = loop.create_task(self._batch_loop())
+
+    def _get_model(self) -> Any:
+        """获取模型（推理线程中调用，必要时加载）"""
+        if self.model is None:
+            if self.model_loader is None:
+                raise RuntimeError("EmbeddingBatcher未配置模型")
+            self.model = self.model_loader()
+        return self.model
+
+    async def _batch_loop(self):
+        """合并队列中的请求为微批"""
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch: List[Tuple[List[str], asyncio.Future]] = [await self._queue.get()]
+            n_texts = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+
+            while n_texts < self.max_batch_size:
+                # 已排队的请求直接取走，不必等待
+                if not self._queue.empty():
+                    item = self._queue.get_nowait()
+                else:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                batch.append(item)
+                n_texts += len(item[0])
+
+            await self._run_batch(batch)
+
+    async def _run_batch(self, batch: List[Tuple[List[str], asyncio.Future]]):
+        """执行一个微批并把结果分发给各请求"""
+        texts = [text for item_texts, _ in batch for text in item_texts]
+
+        def _encode():
+            return np.asarray(self._get_model().encode(
+                texts,
+                batch_size=self.max_batch_size,
+                normalize_embeddings=False,
+                show_progress_bar=False
+            ))
+
+        try:
+            embeddings = await self.run_in_executor(_encode)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"[EmbeddingBatcher] 批量推理失败 - 文本数: {len(texts)}, 错误: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.stats["batches"] += 1
+        self.stats["texts"] += len(texts)
+        self.stats["max_batch_texts"] = max(self.stats["max_batch_texts"], len(texts))
+        self._batch_sizes[len(texts)] += 1
+
+        offset = 0
+        for item_texts, future in batch:
+            if not future.done():
+                future.set_result(embeddings[offset:offset + len(item_texts)])
+            offset += len(item_texts)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取队列深度与批大小统计"""
+        stats = dict(self.stats)
+        stats["avg_batch_texts"] = (
+            round(stats["texts"] / stats["batches"], 2) if stats["batches"] else 0.0
+        )
+        stats["queue_depth"] = self._queue.qsize() if self._queue is not None else 0
+        stats["max_queue_size"] = self.max_queue_size
+        stats["batch_size_histogram"] = dict(sorted(self._batch_sizes.items()))
+        return stats
+
+
+# 全局执行器
+_embedding_batcher: Optional[EmbeddingBatcher] = None
+
+
+def get_embedding_batcher() -> EmbeddingBatcher:
+    """获取本进程的Embedding微批执行器单例（按配置加载BGE模型）"""
+    global _embedding_batcher
+    if _embedding_batcher is None:
+        from src.config.settings import get_settings
+        from .bge_manager import get_bge_model_manager
+
+        settings = get_settings()
+
+        def _load_model():
+            return get_bge_model_manager().get_model(
+                model_name=settings.EMBEDDING_MODEL,
+                device=settings.EMBEDDING_DEVICE,
+                backend=settings.EMBEDDING_BACKEND
+            )
+
+        _embedding_batcher = EmbeddingBatcher(
+            model_loader=_load_model,
+            max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+            max_wait_ms=settings.EMBEDDING_BATCH_MAX_WAIT_MS,
+            max_queue_size=settings.EMBEDDING_BATCH_QUEUE_SIZE
+        )
+    return _embedding_batcher
@@ -2,12 +2,15 @@
 BGE模型管理器
 单例模式，缓存已加载的模型
 """
-from typing import Optional
-from sentence_transformers import SentenceTransformer
+from typing import Optional, Any
 from loguru import logger
 from threading import Lock
 
 
+# 使用ONNX Runtime推理的后端名称
+ONNX_BACKEND = "bge_onnx"
+
+
 class BGEModelManager:
     """BGE模型管理器 - 单例模式"""
 
@@ -22,6 +25,7 @@ class BGEModelManager:
                     cls._instance._model = None
                     cls._instance._model_name = None
                     cls._instance._device = None
+                    cls._instance._backend = None
         return cls._instance
 
     def __init__(self):
@@ -31,44 +35,68 @@ class BGEModelManager:
     def get_model(
         self,
         model_name: str = "BAAI/bge-large-zh-v1.5",
-        device: str = "cpu"
-    ) -> SentenceTransformer:
+        device: str = "cpu",
+        backend: str = "bge"
+    ) -> Any:
         """
         获取BGE模型（使用缓存）
 
         Args:
             model_name: 模型名称
-            device: 设备类型 (cpu, cuda, mps)
+            device: 设备类型 (cpu, cuda, mps)，ONNX后端固定使用CPU
+            backend: 推理后端 (bge: SentenceTransformer, bge_onnx: ONNX Runtime int8)
 
         Returns:
-            SentenceTransformer 模型实例
+            SentenceTransformer 或 ONNXEmbeddingModel 实例（encode接口一致）
         """
+        backend = ONNX_BACKEND if backend.lower() == ONNX_BACKEND else "bge"
+
         # 检查是否需要重新加载
         if (self._model is None or
             self._model_name != model_name or
-            self._device != device):
+            self._device != device or
+            self._backend != backend):
 
             with self._lock:
                 # 双重检查
                 if (self._model is None or
                     self._model_name != model_name or
-                    self._device != device):
+                    self._device != device or
+                    self._backend != backend):
 
-                    logger.info(f"[BGEModelManager] 加载BGE模型: {model_name}, 设备: {device}")
+                    logger.info(f"[BGEModelManager] 加载BGE模型: {model_name}, 设备: {device}, 后端: {backend}")
 
                     # 释放旧模型
                     if self._model is not None:
                         del self._model
 
                     # 加载新模型
-                    self._model = SentenceTransformer(model_name, device=device)
+                    self._model = self._load_model(model_name, device, backend)
                     self._model_name = model_name
                     self._device = device
+                    self._backend = backend
 
                     logger.success(f"[BGEModelManager] BGE模型加载完成 - 维度: {self._model.get_sentence_embedding_dimension()}")
 
         return self._model
 
+    def _load_model(self, model_name: str, device: str, backend: str) -> Any:
+        """按后端加载模型"""
+        if backend == ONNX_BACKEND:
+            from src.config.settings import get_settings
+            from .onnx_backend import load_onnx_model
+
+            settings = get_settings()
+            return load_onnx_model(
+                model_name,
+                settings.EMBEDDING_ONNX_DIR,
+                quantized=settings.EMBEDDING_ONNX_QUANTIZE,
+                num_threads=settings.EMBEDDING_ONNX_THREADS
+            )
+
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name, device=device)
+
     def get_embedding_dimension(self) -> Optional[int]:
         """获取当前模型的向量维度"""
         if self._model is not None:
@@ -87,6 +115,7 @@ class BGEModelManager:
                 self._model = None
                 self._model_name = None
                 self._device = None
+                self._backend = None
                 logger.info("[BGEModelManager] BGE模型已卸载")
 
 
@@ -0,0 +1,193 @@
+"""
+共享Embedding服务客户端
+encode() 与 SentenceTransformer.encode 兼容，可直接替换本地模型
+"""
+import asyncio
+import json
+import os
+import socket
+import threading
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from loguru import logger
+
+from .server import FRAME_HEADER, pack_frame, read_frame
+
+
+class EmbeddingServiceError(RuntimeError):
+    """Embedding服务返回错误"""
+
+
+class EmbeddingClient:
+    """
+    Embedding服务客户端
+
+    同步 encode() 每个线程复用一条连接；异步 aencode() 每次请求新建连接
+    """
+
+    def __init__(self, socket_path: str, timeout: float = 30.0):
+        """
+        初始化客户端
+
+        Args:
+            socket_path: 服务端Unix socket路径
+            timeout: 单次请求超时（秒）
+        """
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._dimension: Optional[int] = None
+
+    def get_sentence_embedding_dimension(self) -> int:
+        """获取向量维度（首次调用时向服务端查询）"""
+        if self._dimension is None:
+            self.encode([])
+        return self._dimension
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        normalize_embeddings: bool = False,
+        show_progress_bar: bool = False,
+        **kwargs
+    ) -> np.ndarray:
+        """同步生成embedding（batch_size/show_progress_bar 为兼容参数）"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        request = self._build_request(texts, normalize_embeddings)
+
+        try:
+            sock = self._get_socket()
+            sock.sendall(request)
+            header = self._recv_frame(sock)
+            body = self._recv_frame(sock)
+        except (OSError, ConnectionError):
+            self._close_socket()
+            raise
+
+        embeddings = self._parse_response(header, body)
+        return embeddings[0] if single else embeddings
+
+    async def aencode(
+        self,
+        sentences: Union[str, List[str]],
+        normalize_embeddings: bool = False
+    ) -> np.ndarray:
+        """异步生成embedding，不占用线程池"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        async def _request() -> Tuple[bytes, bytes]:
+            reader, writer = await asyncio.open_unix_connection(self.socket_path)
+            try:
+                writer.write(self._build_request(texts, normalize_embeddings))
+                await writer.drain()
+                return await read_frame(reader), await read_frame(reader)
+            finally:
+                writer.close()
+
+        header, body = await asyncio.wait_for(_request(), self.timeout)
+        embeddings = self._parse_response(header, body)
+        return embeddings[0] if single else embeddings
+
+    def _build_request(self, texts: List[str], normalize: bool) -> bytes:
+        """构建请求帧"""
+        payload = json.dumps({"texts": texts, "normalize": normalize}, ensure_ascii=False)
+        return pack_frame(payload.encode("utf-8"))
+
+    def _parse_response(self, header: bytes, body: bytes) -> np.ndarray:
+        """解析响应"""
+        meta: Dict[str, Any] = json.loads(header)
+        if not meta.get("ok"):
+            raise EmbeddingServiceError(meta.get("error", "Embedding服务未知错误"))
+
+        self._dimension = meta["dim"]
+        return np.frombuffer(body, dtype=np.float32).reshape(meta["rows"], meta["dim"]).copy()
+
+    def _get_socket(self) -> socket.socket:
+        """获取当前线程的连接"""
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _close_socket(self):
+        """关闭当前线程的连接"""
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            try:
+                sock.close()
+            finally:
+                self._local.sock = None
+
+    @staticmethod
+    def _recv_exact(sock: socket.socket, size: int) -> bytes:
+        """读取指定字节数"""
+        chunks = []
+        remaining = size
+        while remaining > 0:
+            chunk = sock.recv(remaining)
+            if not chunk:
+                raise ConnectionError("Embedding服务连接已断开")
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        return b"".join(chunks)
+
+    def _recv_frame(self, sock: socket.socket) -> bytes:
+        """读取一个帧"""
+        (length,) = FRAME_HEADER.unpack(self._recv_exact(sock, FRAME_HEADER.size))
+        return self._recv_exact(sock, length)
+
+
+# 客户端缓存（按socket路径）
+_clients: Dict[str, EmbeddingClient] = {}
+
+
+def get_embedding_client(socket_path: str, timeout: float = 30.0) -> EmbeddingClient:
+    """获取Embedding服务客户端单例"""
+    client = _clients.get(socket_path)
+    if client is None:
+        client = EmbeddingClient(socket_path, timeout=timeout)
+        _clients[socket_path] = client
+    return client
+
+
+def get_embedding_model(settings=None) -> Any:
+    """
+    获取embedding模型
+
+    启用共享服务且socket存在时返回 EmbeddingClient，
+    否则回退到本进程的 BGEModelManager 模型
+
+    Args:
+        settings: 应用配置（默认读取全局配置）
+
+    Returns:
+        具有 encode() 接口的模型对象
+    """
+    if settings is None:
+        from src.config.settings import get_settings
+        settings = get_settings()
+
+    if settings.EMBEDDING_SERVER_ENABLED:
+        if os.path.exists(settings.EMBEDDING_SERVER_SOCKET):
+            return get_embedding_client(
+                settings.EMBEDDING_SERVER_SOCKET,
+                timeout=settings.EMBEDDING_SERVER_TIMEOUT
+            )
+        logger.warning(
+            f"[EmbeddingClient] 共享服务socket不存在: {settings.EMBEDDING_SERVER_SOCKET}，"
+            f"回退到本地模型"
+        )
+
+    from .bge_manager import get_bge_model_manager
+    return get_bge_model_manager().get_model(
+        model_name=settings.EMBEDDING_MODEL,
+        device=settings.EMBEDDING_DEVICE,
+        backend=settings.EMBEDDING_BACKEND
+    )
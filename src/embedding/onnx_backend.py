@@ -0,0 +1,221 @@
+"""
+BGE ONNX Runtime 推理后端
+将BGE模型导出为ONNX并做动态int8量化，CPU推理不依赖torch，
+内存约为SentenceTransformer全精度模型的1/4
+"""
+from pathlib import Path
+from typing import List, Union
+
+import numpy as np
+from loguru import logger
+
+
+# 导出文件名
+FP32_MODEL_FILE = "model.onnx"
+INT8_MODEL_FILE = "model_int8.onnx"
+
+
+class ONNXEmbeddingModel:
+    """
+    ONNX Runtime embedding模型
+
+    encode() 与 SentenceTransformer.encode 的常用参数兼容，
+    可以直接替换 BGEModelManager 返回的模型
+    """
+
+    def __init__(
+        self,
+        model_dir: Union[str, Path],
+        quantized: bool = True,
+        max_seq_length: int = 512,
+        num_threads: int = 0
+    ):
+        """
+        初始化ONNX模型
+
+        Args:
+            model_dir: 导出目录（包含onnx文件和tokenizer）
+            quantized: 是否加载int8量化模型
+            max_seq_length: 最大序列长度
+            num_threads: ONNX Runtime线程数（0表示自动）
+        """
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.model_dir = Path(model_dir)
+        self.model_path = self.model_dir / (INT8_MODEL_FILE if quantized else FP32_MODEL_FILE)
+        self.quantized = quantized
+        self.max_seq_length = max_seq_length
+
+        self.tokenizer = AutoTokenizer.from_pretrained(str(self.model_dir))
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+
+        self.session = ort.InferenceSession(
+            str(self.model_path),
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        self._dimension = self.session.get_outputs()[0].shape[-1]
+
+    def get_sentence_embedding_dimension(self) -> int:
+        """获取向量维度"""
+        return self._dimension
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        normalize_embeddings: bool = False,
+        show_progress_bar: bool = False,
+        **kwargs
+    ) -> np.ndarray:
+        """
+        生成embedding（CLS池化，与BGE一致）
+
+        Args:
+            sentences: 单条文本或文本列表
+            batch_size: 批大小
+            normalize_embeddings: 是否L2归一化
+            show_progress_bar: 兼容参数，忽略
+
+        Returns:
+            单条文本返回一维向量，列表返回二维数组
+        """
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+        if not sentences:
+            return np.zeros((0, self._dimension), dtype=np.float32)
+
+        # 按长度降序分批，减少padding
+        order = np.argsort([-len(s) for s in sentences], kind="stable")
+
+        chunks = []
+        for start in range(0, len(sentences), batch_size):
+            batch = [sentences[i] for i in order[start:start + batch_size]]
+            encoded = self.tokenizer(
+                batch,
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np"
+            )
+            feed = {
+                name: value.astype(np.int64)
+                for name, value in encoded.items()
+                if name in self._input_names
+            }
+            last_hidden_state = self.session.run(None, feed)[0]
+            chunks.append(last_hidden_state[:, 0])
+
+        embeddings = np.concatenate(chunks)[np.argsort(order, kind="stable")]
+
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.clip(norms, 1e-12, None)
+
+        embeddings = embeddings.astype(np.float32)
+        return embeddings[0] if single else embeddings
+
+
+def get_onnx_model_dir(onnx_root: Union[str, Path], model_name: str) -> Path:
+    """获取模型的ONNX导出目录"""
+    return Path(onnx_root) / model_name.replace("/", "__")
+
+
+def export_onnx_model(
+    model_name: str,
+    output_dir: Union[str, Path],
+    quantize: bool = True,
+    opset_version: int = 14
+) -> Path:
+    """
+    导出BGE模型为ONNX，并可选做动态int8量化
+
+    导出只需执行一次（需要torch和transformers），之后推理只依赖onnxruntime
+
+    Args:
+        model_name: HuggingFace模型名或本地路径
+        output_dir: 导出目录
+        quantize: 是否生成int8量化模型
+        opset_version: ONNX opset版本
+
+    Returns:
+        导出目录
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    fp32_path = output_dir / FP32_MODEL_FILE
+
+    logger.info(f"[ONNXExport] 导出模型: {model_name} -> {output_dir}")
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name)
+    model.eval()
+
+    dummy = tokenizer(["芯片失效分析"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in dummy]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(dummy[name] for name in input_names),
+            str(fp32_path),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset_version,
+            do_constant_folding=True
+        )
+    tokenizer.save_pretrained(str(output_dir))
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        quantize_dynamic(
+            str(fp32_path),
+            str(output_dir / INT8_MODEL_FILE),
+            weight_type=QuantType.QInt8
+        )
+        logger.info(f"[ONNXExport] int8量化完成: {output_dir / INT8_MODEL_FILE}")
+
+    logger.success(f"[ONNXExport] 导出完成: {output_dir}")
+    return output_dir
+
+
+def load_onnx_model(
+    model_name: str,
+    onnx_root: Union[str, Path],
+    quantized: bool = True,
+    num_threads: int = 0
+) -> ONNXEmbeddingModel:
+    """
+    加载ONNX模型，不存在时先导出
+
+    Args:
+        model_name: 模型名称
+        onnx_root: ONNX导出根目录
+        quantized: 是否使用int8量化模型
+        num_threads: ONNX Runtime线程数
+
+    Returns:
+        ONNXEmbeddingModel 实例
+    """
+    model_dir = get_onnx_model_dir(onnx_root, model_name)
+    model_file = model_dir / (INT8_MODEL_FILE if quantized else FP32_MODEL_FILE)
+
+    if not model_file.exists():
+        logger.info(f"[ONNXExport] 未找到ONNX模型 {model_file}，开始导出")
+        export_onnx_model(model_name, model_dir, quantize=quantized)
+
+    return ONNXEmbeddingModel(model_dir, quantized=quantized, num_threads=num_threads)
@@ -0,0 +1,177 @@
+"""
+共享Embedding服务
+由一个进程持有BGE模型，通过Unix socket为所有uvicorn worker提供embedding，
+并通过 EmbeddingBatcher 把多个worker的并发请求合并为微批后统一推理
+
+启动:
+    python run.py embedding
+    python -m src.embedding.server
+
+协议（每个帧为4字节大端长度 + 内容）:
+    请求: JSON {"texts": [...], "normalize": bool}
+    响应: JSON头 {"ok": bool, "rows": n, "dim": d, "error": str} + float32原始字节帧
+"""
+import asyncio
+import json
+import os
+import struct
+from typing import Any, Dict, Optional
+
+import numpy as np
+from loguru import logger
+
+from .batcher import EmbeddingBatcher
+
+
+FRAME_HEADER = struct.Struct(">I")
+
+
+def pack_frame(payload: bytes) -> bytes:
+    """打包一个帧"""
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+async def read_frame(reader: asyncio.StreamReader) -> bytes:
+    """读取一个帧"""
+    header = await reader.readexactly(FRAME_HEADER.size)
+    (length,) = FRAME_HEADER.unpack(header)
+    return await reader.readexactly(length)
+
+
+class EmbeddingServer:
+    """
+    Embedding服务端
+
+    各连接的请求交给 EmbeddingBatcher 合并：
+    取到第一个请求后最多再等待 max_wait_ms，或凑满 max_batch_size 条文本，
+    然后在专用线程中调用一次 model.encode
+    """
+
+    def __init__(
+        self,
+        socket_path: str,
+        model: Any = None,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0
+    ):
+        """
+        初始化服务端
+
+        Args:
+            socket_path: Unix socket路径
+            model: 已加载的模型（为空时按配置通过BGEModelManager加载）
+            max_batch_size: 单批最大文本数
+            max_wait_ms: 凑批的最大等待时间（毫秒）
+        """
+        self.socket_path = socket_path
+        self.batcher = EmbeddingBatcher(
+            model=model,
+            model_loader=self._load_model,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            thread_name_prefix="embedding-server"
+        )
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def _load_model(self):
+        """按配置加载模型"""
+        from src.config.settings import get_settings
+        from .bge_manager import get_bge_model_manager
+
+        settings = get_settings()
+        return get_bge_model_manager().get_model(
+            model_name=settings.EMBEDDING_MODEL,
+            device=settings.EMBEDDING_DEVICE,
+            backend=settings.EMBEDDING_BACKEND
+        )
+
+    async def start(self):
+        """加载模型并开始监听"""
+        await self.batcher.run_in_executor(self.batcher._get_model)
+
+        # 清理上次残留的socket文件
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        self._server = await asyncio.start_unix_server(self._handle_client, path=self.socket_path)
+        os.chmod(self.socket_path, 0o660)
+
+        logger.info(
+            f"[EmbeddingServer] 监听 {self.socket_path} - "
+            f"max_batch={self.batcher.max_batch_size}, max_wait={self.batcher.max_wait * 1000:.1f}ms"
+        )
+
+    async def serve_forever(self):
+        """启动并持续服务"""
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        """停止服务"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.batcher.close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        logger.info("[EmbeddingServer] 已停止")
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """处理单个连接（同一连接可发送多个请求）"""
+        try:
+            while True:
+                try:
+                    request = json.loads(await read_frame(reader))
+                except (asyncio.IncompleteReadError, ConnectionResetError):
+                    break
+
+                try:
+                    embeddings = await self.batcher.encode(
+                        list(request.get("texts", [])),
+                        normalize=bool(request.get("normalize", False))
+                    )
+                    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+                    header = {"ok": True, "rows": embeddings.shape[0], "dim": embeddings.shape[1]}
+                    writer.write(pack_frame(json.dumps(header).encode("utf-8")))
+                    writer.write(pack_frame(embeddings.tobytes()))
+                except Exception as e:
+                    logger.error(f"[EmbeddingServer] 请求处理失败: {e}")
+                    header = {"ok": False, "error": str(e)}
+                    writer.write(pack_frame(json.dumps(header).encode("utf-8")))
+                    writer.write(pack_frame(b""))
+
+                await writer.drain()
+        finally:
+            writer.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取批处理统计"""
+        return self.batcher.get_stats()
+
+
+def run_embedding_server():
+    """按配置启动共享Embedding服务（阻塞）"""
+    from src.config.settings import get_settings
+
+    settings = get_settings()
+    server = EmbeddingServer(
+        socket_path=settings.EMBEDDING_SERVER_SOCKET,
+        max_batch_size=settings.EMBEDDING_SERVER_MAX_BATCH,
+        max_wait_ms=settings.EMBEDDING_SERVER_MAX_WAIT_MS
+    )
+
+    async def _main():
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(_main())
+    except KeyboardInterrupt:
+        logger.info("[EmbeddingServer] 收到中断信号")
+
+
+if __name__ == "__main__":
+    run_embedding_server()
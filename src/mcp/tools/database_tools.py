@@ -9,14 +9,85 @@ from sqlalchemy.ext.asyncio import AsyncSession
 import asyncio
 import json
 
+from src.monitoring.metrics import timed
+
+
+# ============================================
+# 热点原生SQL
+# ============================================
+# 模块级常量：SQLAlchemy 编译缓存和 asyncpg 预编译语句缓存都按SQL文本命中，
+# 每次调用不再重新构造 text() 和解析绑定参数
+_CHIP_ID_SQL = text("SELECT id FROM soc_chips WHERE chip_model = :chip_model")
+_MODULE_ID_SQL = text("SELECT id FROM soc_modules WHERE id = :module_id")
+_SUBSYSTEM_ID_SQL = text("SELECT id FROM soc_subsystems WHERE id = :subsystem_id")
+_MODULE_BY_NAME_SQL = text("SELECT id FROM soc_modules WHERE chip_model = :chip_model AND module_name = :module_name")
+_SUBSYSTEM_BY_NAME_SQL = text("SELECT id FROM soc_subsystems WHERE chip_model = :chip_model AND subsystem_name = :subsystem_name")
+_TRGM_THRESHOLD_SQL = text("SELECT set_config('pg_trgm.word_similarity_threshold', :threshold, true)")
+
+_VECTOR_SEARCH_SQL = text("""
+    SELECT
+        fc.case_id,
+        fc.chip_model,
+        fc.module_type,
+        fc.failure_domain,
+        fc.symptoms,
+        fc.error_codes,
+        fc.failure_mode,
+        fc.root_cause,
+        fc.root_cause_category,
+        fc.solution,
+        fc.sensitivity_level,
+        fc.is_verified,
+        1 - (fc.embedding <=> :vector) as similarity
+    FROM failure_cases fc
+    JOIN soc_chips sc ON fc.chip_model = sc.chip_model
+    WHERE sc.is_active = true
+      AND fc.chip_model = :chip_model
+      AND fc.embedding IS NOT NULL
+      AND (1 - (fc.embedding <=> :vector)) >= :threshold
+    ORDER BY fc.embedding <=> :vector
+    LIMIT :limit
+""")
+
+_LEXICAL_SEARCH_SQL = text("""
+    SELECT
+        fc.case_id,
+        fc.chip_model,
+        fc.module_type,
+        fc.failure_domain,
+        fc.symptoms,
+        fc.error_codes,
+        fc.failure_mode,
+        fc.root_cause,
+        fc.root_cause_category,
+        fc.solution,
+        fc.sensitivity_level,
+        fc.is_verified,
+        cardinality(ARRAY(
+            SELECT unnest(normalize_error_codes(fc.error_codes))
+            INTERSECT SELECT unnest(CAST(:codes AS varchar[]))
+        )) AS code_hits,
+        CASE WHEN CAST(:query AS text) = '' THEN 0
+             ELSE word_similarity(CAST(:query AS text), fc.symptoms) END AS text_score
+    FROM failure_cases fc
+    WHERE fc.chip_model = :chip_model
+      AND (normalize_error_codes(fc.error_codes) && CAST(:codes AS varchar[])
+           OR (CAST(:query AS text) <> '' AND CAST(:query AS text) <% fc.symptoms))
+    ORDER BY code_hits DESC, text_score DESC, fc.is_verified DESC
+    LIMIT :limit
+""")
+
 
 class DatabaseTool:
     """数据库操作工具类"""
 
     def __init__(self):
         """初始化工具"""
-        from src.database.connection import get_db_session
-        self.get_session = get_db_session
+        from src.database.connection import get_db_manager
+        db_manager = get_db_manager()
+        self.get_session = db_manager.get_session
+        # 案例检索只读，配置了只读副本时走副本
+        self.get_read_session = db_manager.get_read_session
 
     async def store(
         self,
@@ -62,7 +133,7 @@ class DatabaseTool:
 
         # 查询芯片ID
         chip = await session.execute(
-            text("SELECT id FROM soc_chips WHERE chip_model = :chip_model"),
+            _CHIP_ID_SQL,
             {"chip_model": data.get("chip_model")}
         )
         chip_row = chip.fetchone()
@@ -75,7 +146,7 @@ class DatabaseTool:
         module_id = None
         if data.get("failure_module_id"):
             module_result = await session.execute(
-                text("SELECT id FROM soc_modules WHERE id = :module_id"),
+                _MODULE_ID_SQL,
                 {"module_id": data["failure_module_id"]}
             )
             module_row = module_result.fetchone()
@@ -86,7 +157,7 @@ class DatabaseTool:
         subsystem_id = None
         if data.get("failure_subsystem_id"):
             subsystem_result = await session.execute(
-                text("SELECT id FROM soc_subsystems WHERE id = :subsystem_id"),
+                _SUBSYSTEM_ID_SQL,
                 {"subsystem_id": data["failure_subsystem_id"]}
             )
             subsystem_row = subsystem_result.fetchone()
@@ -103,6 +174,23 @@ class DatabaseTool:
             data.get("raw_log", "").encode()
         ).hexdigest()
 
+        # 原始日志存为大对象，行内只保存引用（与 DatabaseManager.store_analysis_result 一致）
+        from src.database.blobs import offload_text
+        raw_log_ref = await offload_text(data.get("raw_log"))
+
+        # NoC路径：调用方只给出模块对时，从预计算路径表填充
+        fault_features = data.get("fault_features", {})
+        noc_path = data.get("noc_path") or fault_features.get("noc_path", [])
+        noc_congestion_info = data.get("noc_congestion_info") or fault_features.get("noc_congestion_info", {})
+        noc_module_pairs = data.get("noc_module_pairs") or fault_features.get("noc_module_pairs")
+        if not noc_path and noc_module_pairs and data.get("chip_model"):
+            from src.database.noc_paths import get_noc_path_table
+            table = await get_noc_path_table(data["chip_model"])
+            if table is not None:
+                noc_congestion_info = table.congestion_info(noc_module_pairs)
+                if noc_congestion_info["paths"]:
+                    noc_path = noc_congestion_info["paths"][0]["path"]
+
         # 创建分析结果记录
         result = AnalysisResult(
             analysis_id=analysis_id,
@@ -111,12 +199,12 @@ class DatabaseTool:
             chip_model=data.get("chip_model"),
             log_source=data.get("log_source", ""),
             log_hash=log_hash,
-            raw_log=data.get("raw_log"),
+            raw_log=raw_log_ref,
             fault_features=data.get("fault_features", {}),
             affected_modules=data.get("affected_modules", []),
             affected_subsystems=data.get("affected_subsystems", []),
-            noc_path=data.get("noc_path", []),
-            noc_congestion_info=data.get("noc_congestion_info", {}),
+            noc_path=noc_path,
+            noc_congestion_info=noc_congestion_info,
             failure_domain=data.get("failure_domain"),
             failure_subsystem=subsystem_id,
             failure_module=module_id,
@@ -150,7 +238,7 @@ class DatabaseTool:
 
         # 查询芯片ID
         chip_result = await session.execute(
-            text("SELECT id FROM soc_chips WHERE chip_model = :chip_model"),
+            _CHIP_ID_SQL,
             {"chip_model": data.get("chip_model")}
         )
         chip_row = chip_result.fetchone()
@@ -171,7 +259,7 @@ class DatabaseTool:
         module_id = None
         if data.get("module_name"):
             module_result = await session.execute(
-                text("SELECT id FROM soc_modules WHERE chip_model = :chip_model AND module_name = :module_name"),
+                _MODULE_BY_NAME_SQL,
                 {"chip_model": data.get("chip_model"), "module_name": data.get("module_name")}
             )
             module_row = module_result.fetchone()
@@ -182,7 +270,7 @@ class DatabaseTool:
         subsystem_id = None
         if data.get("subsystem_name"):
             subsystem_result = await session.execute(
-                text("SELECT id FROM soc_subsystems WHERE chip_model = :chip_model AND subsystem_name = :subsystem_name"),
+                _SUBSYSTEM_BY_NAME_SQL,
                 {"chip_model": data.get("chip_model"), "subsystem_name": data.get("subsystem_name")}
             )
             subsystem_row = subsystem_result.fetchone()
@@ -234,7 +322,7 @@ class DatabaseTool:
 
         # 查询芯片ID
         chip_result = await session.execute(
-            text("SELECT id FROM soc_chips WHERE chip_model = :chip_model"),
+            _CHIP_ID_SQL,
             {"chip_model": data.get("chip_model")}
         )
         chip_row = chip_result.fetchone()
@@ -244,7 +332,7 @@ class DatabaseTool:
         module_id = None
         if data.get("module_name"):
             module_result = await session.execute(
-                text("SELECT id FROM soc_modules WHERE chip_model = :chip_model AND module_name = :module_name"),
+                _MODULE_BY_NAME_SQL,
                 {"chip_model": data.get("chip_model"), "module_name": data.get("module_name")}
             )
             module_row = module_result.fetchone()
@@ -255,7 +343,7 @@ class DatabaseTool:
         subsystem_id = None
         if data.get("subsystem_name"):
             subsystem_result = await session.execute(
-                text("SELECT id FROM soc_subsystems WHERE chip_model = :chip_model AND subsystem_name = :subsystem_name"),
+                _SUBSYSTEM_BY_NAME_SQL,
                 {"chip_model": data.get("chip_model"), "subsystem_name": data.get("subsystem_name")}
             )
             subsystem_row = subsystem_result.fetchone()
@@ -401,8 +489,8 @@ class DatabaseTool:
             if "is_verified" in filters:
                 query = query.filter(FailureCase.is_verified == filters["is_verified"])
             if "error_codes" in filters:
-                for code in filters["error_codes"]:
-                    query = query.filter(FailureCase.error_codes.contains([code]))
+                # 单个 @> 条件即可命中 GIN 索引
+                query = query.filter(FailureCase.error_codes.contains(list(filters["error_codes"])))
             if "search" in filters:
                 search_term = f"%{filters['search']}%"
                 query = query.filter(
@@ -500,6 +588,7 @@ class DatabaseTool:
             ]
         }
 
+    @timed("vector_search")
     async def vector_search(
         self,
         feature_vector: List[float],
@@ -520,38 +609,12 @@ class DatabaseTool:
             相似案例列表及相似度
         """
 
-        async with self.get_session() as session:
+        async with self.get_read_session() as session:
             # 使用余弦相似度搜索
             # pgvector余弦距离：1 - 余弦相似度
             # 相似度 = 1 - 距离
-
-            query = text("""
-                SELECT
-                    fc.case_id,
-                    fc.chip_model,
-                    fc.module_type,
-                    fc.failure_domain,
-                    fc.symptoms,
-                    fc.error_codes,
-                    fc.failure_mode,
-                    fc.root_cause,
-                    fc.root_cause_category,
-                    fc.solution,
-                    fc.sensitivity_level,
-                    fc.is_verified,
-                    1 - (fc.embedding <=> :vector) as similarity
-                FROM failure_cases fc
-                JOIN soc_chips sc ON fc.chip_model = sc.chip_model
-                WHERE sc.is_active = true
-                  AND fc.chip_model = :chip_model
-                  AND fc.embedding IS NOT NULL
-                  AND (1 - (fc.embedding <=> :vector)) >= :threshold
-                ORDER BY fc.embedding <=> :vector
-                LIMIT :limit
-            """)
-
             result = await session.execute(
-                query,
+                _VECTOR_SEARCH_SQL,
                 {
                     "vector": feature_vector,
                     "chip_model": chip_model,
@@ -586,3 +649,77 @@ class DatabaseTool:
                     for row in rows
                 ]
             }
+
+    @timed("lexical_search")
+    async def lexical_search(
+        self,
+        chip_model: str,
+        error_codes: List[str],
+        query_text: str = "",
+        top_k: int = 20,
+        min_similarity: float = 0.3
+    ) -> Dict[str, Any]:
+        """
+        词法检索：错误码数组重叠（GIN索引）+ 症状 pg_trgm 词相似度（trigram索引）
+
+        Args:
+            chip_model: 芯片型号
+            error_codes: 规范化后的错误码（normalize_error_code），与库中 normalize_error_codes(error_codes) 比较
+            query_text: 症状查询文本
+            top_k: 返回Top-K结果
+            min_similarity: 症状词相似度下限
+
+        Returns:
+            与 vector_search 相同格式的案例列表，额外带 code_hits / text_score / lexical_score
+        """
+
+        from src.database.error_code_index import normalize_error_code
+        error_codes = list(dict.fromkeys(c for c in (normalize_error_code(c) for c in error_codes) if c))
+
+        async with self.get_read_session() as session:
+            # <% 使用会话级阈值，SET LOCAL 只对本事务生效
+            await session.execute(
+                _TRGM_THRESHOLD_SQL,
+                {"threshold": str(min_similarity)}
+            )
+            result = await session.execute(
+                _LEXICAL_SEARCH_SQL,
+                {
+                    "codes": error_codes,
+                    "query": query_text or "",
+                    "chip_model": chip_model,
+                    "limit": top_k
+                }
+            )
+            rows = result.fetchall()
+
+        results = []
+        for row in rows:
+            code_hits = int(row[12] or 0)
+            text_score = float(row[13] or 0.0)
+            # 错误码覆盖率优先；没有错误码命中时用症状相似度
+            coverage = min(code_hits / len(error_codes), 1.0) if error_codes else 0.0
+            results.append({
+                "case_id": row[0],
+                "chip_model": row[1],
+                "module_type": row[2],
+                "failure_domain": row[3],
+                "symptoms": row[4],
+                "error_codes": row[5],
+                "failure_mode": row[6],
+                "root_cause": row[7],
+                "root_cause_category": row[8],
+                "solution": row[9],
+                "sensitivity_level": row[10],
+                "is_verified": row[11],
+                "code_hits": code_hits,
+                "text_score": text_score,
+                "lexical_score": round(max(coverage, text_score), 4)
+            })
+
+        return {
+            "table": "failure_cases",
+            "search_type": "lexical",
+            "top_k": top_k,
+            "results": results
+        }
@@ -0,0 +1,207 @@
+"""
+芯片失效分析AI Agent系统 - 混合案例检索
+错误码/症状的词法检索（GIN + pg_trgm）与pgvector向量检索并行执行，
+按倒数排名融合（RRF）合并；错误码精确命中时只走词法检索，不生成embedding（词法无结果时回退向量检索）
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from loguru import logger
+
+from src.database.error_code_index import normalize_error_code
+
+
+RETRIEVAL_MODES = ("auto", "hybrid", "lexical", "vector")
+
+
+def reciprocal_rank_fusion(
+    rankings: Dict[str, List[str]],
+    k: int = 60
+) -> List[tuple]:
+    """
+    倒数排名融合
+
+    Args:
+        rankings: 检索源 -> 按相关度排序的ID列表
+        k: 平滑常数（越大排名靠后的结果权重越接近排名靠前的）
+
+    Returns:
+        [(ID, 融合分数)]，按分数降序
+    """
+    scores: Dict[str, float] = {}
+    for ranked_ids in rankings.values():
+        for rank, item_id in enumerate(ranked_ids, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))
+
+
+def build_lexical_query(features: Dict[str, Any]) -> str:
+    """词法检索的症状查询文本（只取短字段，不含原始日志）"""
+    parts = []
+    modules = features.get("modules", [])
+    if modules:
+        parts.append(" ".join(modules))
+    fault_desc = features.get("fault_description", "")
+    if fault_desc:
+        parts.append(fault_desc)
+    return " ".join(parts)[:500]
+
+
+class HybridCaseSearch:
+    """混合案例检索"""
+
+    def __init__(
+        self,
+        embed: Optional[Callable[[Dict[str, Any]], Awaitable[List[float]]]] = None,
+        database_tool=None,
+        mode: Optional[str] = None,
+        rrf_k: Optional[int] = None,
+        lexical_min_similarity: Optional[float] = None
+    ):
+        """
+        初始化检索器
+
+        Args:
+            embed: 故障特征 -> 向量（向量检索需要；为空时只能做词法检索）
+            database_tool: DatabaseTool（为空时自动创建）
+            mode: auto / hybrid / lexical / vector，默认取配置 CASE_RETRIEVAL_MODE
+            rrf_k: RRF 平滑常数
+            lexical_min_similarity: 症状 pg_trgm 词相似度下限
+        """
+        from src.config.settings import get_settings
+        settings = get_settings()
+
+        self.embed = embed
+        self.mode = mode or settings.CASE_RETRIEVAL_MODE
+        if self.mode not in RETRIEVAL_MODES:
+            raise ValueError(f"未知的案例检索模式: {self.mode}")
+        self.rrf_k = rrf_k or settings.CASE_RETRIEVAL_RRF_K
+        self.lexical_min_similarity = (
+            lexical_min_similarity if lexical_min_similarity is not None
+            else settings.CASE_LEXICAL_MIN_SIMILARITY
+        )
+
+        if database_tool is None:
+            from src.mcp.tools.database_tools import DatabaseTool
+            database_tool = DatabaseTool()
+        self.database_tool = database_tool
+
+    def _choose_mode(self, chip_model: str, codes: List[str]) -> str:
+        """auto 模式：错误码在倒排索引中有全部精确命中的案例时只做词法检索"""
+        if self.mode != "auto":
+            return self.mode
+        if self.embed is None:
+            return "lexical"
+        if codes:
+            from src.database.error_code_index import get_error_code_index
+            resolved = get_error_code_index().resolve(codes, chip_model, prefix_len=0)
+            if resolved["cases"]["all"] and len(resolved["matched_codes"]) == len(codes):
+                return "lexical"
+        return "hybrid"
+
+    async def _lexical(self, chip_model, codes, query_text, limit) -> List[Dict]:
+        return (await self.database_tool.lexical_search(
+            chip_model, codes, query_text, limit, self.lexical_min_similarity
+        ))["results"]
+
+    async def _vector(self, chip_model, features, limit, threshold) -> List[Dict]:
+        vector = await self.embed(features)
+        return (await self.database_tool.vector_search(vector, chip_model, limit, threshold))["results"]
+
+    async def search(
+        self,
+        chip_model: str,
+        features: Dict[str, Any],
+        top_k: int = 5,
+        threshold: float = 0.7
+    ) -> Dict[str, Any]:
+        """
+        检索相似案例
+
+        Returns:
+            与 DatabaseTool.vector_search 相同的 "results" 格式，每条额外带
+            rrf_score / sources / lexical_score；similarity 取向量相似度与词法得分的较大值
+        """
+        codes = [normalize_error_code(c) for c in features.get("error_codes", [])]
+        codes = list(dict.fromkeys(c for c in codes if c))
+        query_text = build_lexical_query(features)
+        mode = self._choose_mode(chip_model, codes)
+        # 融合前各路多取一些候选
+        candidates = max(top_k * 4, 20)
+
+        start = time.perf_counter()
+        lexical: List[Dict] = []
+        vector: List[Dict] = []
+        errors = {}
+
+        if mode == "lexical":
+            lexical = await self._lexical(chip_model, codes, query_text, candidates)
+            # 内存索引与库中案例不一致（新增/删除未同步）时词法可能无结果，改走向量检索
+            if not lexical and self.mode == "auto" and self.embed is not None:
+                logger.info("[HybridCaseSearch] 词法检索无结果，回退向量检索")
+                mode = "vector"
+                vector = await self._vector(chip_model, features, candidates, threshold)
+        elif mode == "vector":
+            vector = await self._vector(chip_model, features, candidates, threshold)
+        else:
+            lexical_result, vector_result = await asyncio.gather(
+                self._lexical(chip_model, codes, query_text, candidates),
+                self._vector(chip_model, features, candidates, threshold),
+                return_exceptions=True
+            )
+            # 任一路失败时退化为另一路
+            for name, value in (("lexical", lexical_result), ("vector", vector_result)):
+                if isinstance(value, BaseException):
+                    errors[name] = str(value)
+                    logger.warning(f"[HybridCaseSearch] {name} 检索失败: {value}")
+            if len(errors) == 2:
+                raise RuntimeError(f"词法和向量检索均失败: {errors}")
+            lexical = [] if "lexical" in errors else lexical_result
+            vector = [] if "vector" in errors else vector_result
+
+        results = self._fuse(lexical, vector, top_k)
+        elapsed = time.perf_counter() - start
+        logger.info(
+            f"[HybridCaseSearch] mode={mode} 词法 {len(lexical)} / 向量 {len(vector)} -> {len(results)} 条，"
+            f"耗时 {elapsed * 1000:.1f}ms"
+        )
+
+        return {
+            "table": "failure_cases",
+            "search_type": "hybrid",
+            "mode": mode,
+            "top_k": top_k,
+            "lexical_count": len(lexical),
+            "vector_count": len(vector),
+            "errors": errors,
+            "seconds": round(elapsed, 6),
+            "results": results
+        }
+
+    def _fuse(self, lexical: List[Dict], vector: List[Dict], top_k: int) -> List[Dict]:
+        """RRF 融合两路结果"""
+        cases: Dict[str, Dict] = {}
+        for row in vector:
+            cases[row["case_id"]] = {**row, "vector_similarity": row["similarity"], "sources": ["vector"]}
+        for row in lexical:
+            entry = cases.get(row["case_id"])
+            if entry is None:
+                entry = cases[row["case_id"]] = {**row, "sources": []}
+            entry["lexical_score"] = row["lexical_score"]
+            entry["code_hits"] = row["code_hits"]
+            entry["sources"].append("lexical")
+
+        fused = reciprocal_rank_fusion({
+            "lexical": [row["case_id"] for row in lexical],
+            "vector": [row["case_id"] for row in vector]
+        }, k=self.rrf_k)
+
+        results = []
+        for case_id, score in fused[:top_k]:
+            entry = cases[case_id]
+            entry["rrf_score"] = round(score, 6)
+            entry["similarity"] = max(entry.get("vector_similarity", 0.0), entry.get("lexical_score", 0.0))
+            results.append(entry)
+        return results
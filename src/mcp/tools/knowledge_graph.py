@@ -4,18 +4,31 @@
 """
 
 from typing import Dict, List, Optional, Any
-from neo4j import AsyncGraphDatabase
 import json
 
+from loguru import logger
+
+from src.monitoring.metrics import timed
+
 
 class KnowledgeGraphTool:
     """知识图谱工具类"""
 
+    CACHED_QUERY_TYPES = ("chip_structure", "failure_modes", "root_causes", "module_info")
+
     def __init__(self):
         """初始化工具"""
+        from src.config.settings import get_settings
         from src.database.neo4j_schema import get_neo4j_driver
         self.driver = get_neo4j_driver()
 
+        # 芯片结构、失效模式等很少变化，默认从进程内投影缓存读取
+        self.cache = None
+        if get_settings().KG_CACHE_ENABLED:
+            from src.database.kg_cache import get_kg_cache
+            self.cache = get_kg_cache()
+
+    @timed("kg_query")
     async def query(
         self,
         query_type: str,
@@ -38,6 +51,9 @@ class KnowledgeGraphTool:
             查询结果
         """
 
+        if self.cache is not None and query_type in self.CACHED_QUERY_TYPES:
+            return await self._query_cached(query_type, chip_model, **kwargs)
+
         if query_type == "chip_structure":
             return await self._query_chip_structure(chip_model, **kwargs)
         elif query_type == "failure_modes":
@@ -49,6 +65,36 @@ class KnowledgeGraphTool:
         else:
             raise ValueError(f"Unknown query type: {query_type}")
 
+    async def _query_cached(
+        self,
+        query_type: str,
+        chip_model: str,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """从芯片投影缓存查询（返回格式与Cypher查询一致）"""
+        try:
+            projection = await self.cache.get_projection(chip_model)
+        except Exception as e:
+            # Neo4j不可用时退回本地快照
+            from src.database.local_graph import get_local_graph_store
+            projection = get_local_graph_store().get(chip_model)
+            if projection is None:
+                raise
+            logger.warning(f"[KnowledgeGraphTool] Neo4j查询失败，使用本地快照: {e}")
+
+        if projection is None:
+            from src.database.kg_cache import ChipGraphProjection
+            projection = ChipGraphProjection(chip_model=chip_model, version=self.cache.version, loaded_at=0.0)
+
+        if query_type == "chip_structure":
+            return projection.chip_structure(kwargs.get("subsystem_type"))
+        elif query_type == "failure_modes":
+            return projection.failure_modes(kwargs.get("module_type"), kwargs.get("module_name"))
+        elif query_type == "root_causes":
+            return projection.root_causes_of(kwargs.get("failure_mode"))
+        else:
+            return projection.module_info(kwargs.get("module_type"), kwargs.get("module_name"))
+
     async def _query_chip_structure(
         self,
         chip_model: str,
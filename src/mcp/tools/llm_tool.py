@@ -3,12 +3,17 @@
 支持OpenAI和Anthropic Claude API
 """
 
-from typing import List, Dict, Any, Optional
-from openai import AsyncOpenAI
-import anthropic
+from typing import List, Dict, Any, Optional, TYPE_CHECKING
 from loguru import logger
 import json
 
+from src.monitoring.metrics import record_llm_tokens, timed
+
+if TYPE_CHECKING:
+    # SDK较重，仅在首次创建客户端时导入
+    import anthropic
+    from openai import AsyncOpenAI
+
 
 class LLMTool:
     """大语言模型工具类"""
@@ -19,33 +24,36 @@ class LLMTool:
         self.description = "调用大语言模型进行对话和文本生成"
 
         # 初始化客户端（懒加载）
-        self._openai_client: Optional[AsyncOpenAI] = None
-        self._anthropic_client: Optional[anthropic.AsyncAnthropic] = None
+        self._openai_client: Optional["AsyncOpenAI"] = None
+        self._anthropic_client: Optional["anthropic.AsyncAnthropic"] = None
 
-    def _get_openai_client(self) -> AsyncOpenAI:
+    def _get_openai_client(self) -> "AsyncOpenAI":
         """获取OpenAI客户端"""
         from src.config.settings import get_settings
         settings = get_settings()
 
         if self._openai_client is None and settings.OPENAI_API_KEY:
+            from openai import AsyncOpenAI
             self._openai_client = AsyncOpenAI(
                 api_key=settings.OPENAI_API_KEY,
                 base_url=settings.OPENAI_API_BASE
             )
         return self._openai_client
 
-    def _get_anthropic_client(self) -> Optional[anthropic.AsyncAnthropic]:
+    def _get_anthropic_client(self) -> Optional["anthropic.AsyncAnthropic"]:
         """获取Anthropic客户端"""
         from src.config.settings import get_settings
         settings = get_settings()
 
         if self._anthropic_client is None and settings.ANTHROPIC_API_KEY:
+            import anthropic
             self._anthropic_client = anthropic.AsyncAnthropic(
                 api_key=settings.ANTHROPIC_API_KEY,
                 base_url=settings.ANTHROPIC_BASE_URL
             )
         return self._anthropic_client
 
+    @timed("llm_chat", is_ok=lambda result: result.get("success", False))
     async def chat(
         self,
         messages: List[Dict[str, str]],
@@ -80,6 +88,8 @@ class LLMTool:
 
             logger.info(f"[{self.name}] LLM对话完成 - 消耗tokens: {response.get('usage', {}).get('total_tokens', 0)}")
 
+            record_llm_tokens(model, response.get("usage") or {})
+
             return response
 
         except Exception as e:
@@ -334,6 +344,7 @@ class LLMTool:
 生成时间: {analysis_data.get('analysis_timestamp', 'N/A')}
 """
 
+    @timed("embedding")
     async def generate_embedding(
         self,
         text: str,
@@ -360,7 +371,7 @@ class LLMTool:
         # 根据配置选择后端
         backend = settings.EMBEDDING_BACKEND.lower()
 
-        if backend == "bge":
+        if backend in ("bge", "bge_onnx"):
             return await self._generate_bge_embedding(text, settings)
         elif backend == "openai":
             return await self._generate_openai_embedding(text, settings)
@@ -368,37 +379,71 @@ class LLMTool:
             # 默认使用BGE
             return await self._generate_bge_embedding(text, settings)
 
+    @timed("embedding_batch")
+    async def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        批量生成embedding（BGE后端一次编码整批文本）
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            与 texts 等长的向量列表
+
+        Raises:
+            RuntimeError: 当embedding服务不可用时
+        """
+        from src.config.settings import get_settings
+        settings = get_settings()
+
+        if not texts:
+            return []
+
+        backend = settings.EMBEDDING_BACKEND.lower()
+        logger.info(f"[{self.name}] 批量生成embedding - 文本数: {len(texts)}, 后端: {backend}")
+
+        if backend == "openai":
+            # OpenAI 后端逐条请求
+            return [await self._generate_openai_embedding(text, settings) for text in texts]
+
+        import os
+        try:
+            if settings.EMBEDDING_SERVER_ENABLED and os.path.exists(settings.EMBEDDING_SERVER_SOCKET):
+                from src.embedding import get_embedding_client
+                client = get_embedding_client(
+                    settings.EMBEDDING_SERVER_SOCKET,
+                    timeout=settings.EMBEDDING_SERVER_TIMEOUT
+                )
+                vectors = await client.aencode(list(texts), normalize_embeddings=True)
+            else:
+                from src.embedding import get_embedding_batcher
+                vectors = await get_embedding_batcher().encode(list(texts), normalize=True)
+        except Exception as e:
+            raise RuntimeError(f"BGE批量embedding生成失败: {str(e)}")
+
+        return [vector.tolist() for vector in vectors]
+
     async def _generate_bge_embedding(
         self,
         text: str,
         settings
     ) -> List[float]:
-        """使用BGE模型生成embedding（本地，带缓存）"""
-        import asyncio
-        from concurrent.futures import ThreadPoolExecutor
-        from src.embedding import get_bge_model_manager
-
-        def _encode():
-            # 获取缓存的模型
-            model_manager = get_bge_model_manager()
-            model = model_manager.get_model(
-                model_name=settings.EMBEDDING_MODEL,
-                device=settings.EMBEDDING_DEVICE
-            )
-
-            # 生成embedding
-            embedding = model.encode(
-                text,
-                normalize_embeddings=True,  # 归一化向量
-                show_progress_bar=False
-            )
-
-            return embedding.tolist()
+        """使用BGE模型生成embedding（共享Embedding服务或进程内微批执行器）"""
+        import os
 
         try:
-            # 在线程池中执行
-            loop = asyncio.get_event_loop()
-            embedding = await loop.run_in_executor(None, _encode)
+            if settings.EMBEDDING_SERVER_ENABLED and os.path.exists(settings.EMBEDDING_SERVER_SOCKET):
+                # 共享服务：异步请求，由服务端合并批次
+                from src.embedding import get_embedding_client
+                client = get_embedding_client(
+                    settings.EMBEDDING_SERVER_SOCKET,
+                    timeout=settings.EMBEDDING_SERVER_TIMEOUT
+                )
+                embedding = (await client.aencode(text, normalize_embeddings=True)).tolist()
+            else:
+                # 本地模型：并发请求在专用推理线程中合并为微批
+                from src.embedding import get_embedding_batcher
+                embedding = (await get_embedding_batcher().encode(text, normalize=True)).tolist()
 
             logger.info(f"[{self.name}] BGE embedding生成成功 - 维度: {len(embedding)}")
 
@@ -417,6 +462,7 @@ class LLMTool:
                     "text_length": len(text),
                     "model": settings.EMBEDDING_MODEL,
                     "device": settings.EMBEDDING_DEVICE,
+                    "backend": settings.EMBEDDING_BACKEND,
                     "error": str(e),
                     "impact": "案例匹配将无法使用语义相似度"
                 }
@@ -8,6 +8,8 @@ import json
 import re
 from datetime import datetime
 
+from src.context.template_miner import mine_templates
+
 
 class LogParserTool:
     """日志解析工具类"""
@@ -150,6 +152,9 @@ class LogParserTool:
         # 提取故障描述
         fault_description = self._extract_fault_description(lines)
 
+        # 模板挖掘（重复行聚类）
+        miner = mine_templates(lines)
+
         return {
             "format": "text",
             "lines": lines,
@@ -157,7 +162,9 @@ class LogParserTool:
             "error_codes": error_codes,
             "registers": registers,
             "timestamps": timestamps,
-            "fault_description": fault_description
+            "fault_description": fault_description,
+            "template_count": len(miner.templates),
+            "templates": miner.summary(top_n=20)
         }
 
     def _extract_error_codes(self, text: str) -> List[str]:
@@ -8,8 +8,11 @@ from .alerts import (
     AlertSeverity,
     AlertType,
     get_alert_manager,
+    reset_alert_manager,
     alert_manager
 )
+from .alert_store import AlertRingBuffer
+from .dispatcher import AlertDispatcher
 
 __all__ = [
     "AlertManager",
@@ -17,5 +20,8 @@ __all__ = [
     "AlertSeverity",
     "AlertType",
     "get_alert_manager",
-    "alert_manager"
+    "reset_alert_manager",
+    "alert_manager",
+    "AlertRingBuffer",
+    "AlertDispatcher"
 ]
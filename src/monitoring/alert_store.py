@@ -0,0 +1,128 @@
+"""
+告警存储 - 定长环形缓冲区
+按序号写入固定槽位，容量满后覆盖最旧的告警；
+另按告警类型/严重程度维护序号索引，按时间倒序查询时遇到截止时间即停止
+"""
+
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+
+class AlertRingBuffer:
+    """
+    定长告警环形缓冲区
+
+    - 第 seq 条告警存放在槽位 seq % capacity
+    - 类型/严重程度索引保存序号，已被覆盖的序号在查询和写入时惰性清除
+    - 指纹 -> 最近一次序号，用于去重
+    """
+
+    def __init__(self, capacity: int = 1000):
+        if capacity <= 0:
+            raise ValueError(f"告警缓冲区容量必须为正数: {capacity}")
+        self.capacity = capacity
+        self._slots: List[Optional[Any]] = [None] * capacity
+        self._next_seq = 0
+        self._by_type: Dict[str, Deque[int]] = {}
+        self._by_severity: Dict[str, Deque[int]] = {}
+        self._by_fingerprint: Dict[str, int] = {}
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return min(self._next_seq, self.capacity)
+
+    @property
+    def _oldest_seq(self) -> int:
+        return max(0, self._next_seq - self.capacity)
+
+    def append(self, alert) -> int:
+        """写入告警，返回序号（容量满时覆盖最旧的一条）"""
+        seq = self._next_seq
+        slot = seq % self.capacity
+        old = self._slots[slot]
+        if old is not None:
+            self.evicted += 1
+            if self._by_fingerprint.get(old.fingerprint) == seq - self.capacity:
+                del self._by_fingerprint[old.fingerprint]
+
+        self._slots[slot] = alert
+        self._next_seq += 1
+        self._index(self._by_type, alert.alert_type.value, seq)
+        self._index(self._by_severity, alert.severity.value, seq)
+        self._by_fingerprint[alert.fingerprint] = seq
+        return seq
+
+    def _index(self, index: Dict[str, Deque[int]], key: str, seq: int):
+        seqs = index.setdefault(key, deque())
+        seqs.append(seq)
+        oldest = self._oldest_seq
+        while seqs and seqs[0] < oldest:
+            seqs.popleft()
+
+    def find_by_fingerprint(self, fingerprint: str):
+        """指纹对应的最近一条告警（已被覆盖时返回None）"""
+        seq = self._by_fingerprint.get(fingerprint)
+        if seq is None or seq < self._oldest_seq:
+            return None
+        return self._slots[seq % self.capacity]
+
+    def _iter_seqs(
+        self,
+        alert_type: Optional[str] = None,
+        severity: Optional[str] = None
+    ) -> Iterator[int]:
+        """从新到旧的序号（按类型/严重程度过滤时走索引）"""
+        oldest = self._oldest_seq
+        if alert_type is None and severity is None:
+            yield from range(self._next_seq - 1, oldest - 1, -1)
+            return
+
+        candidates = []
+        if alert_type is not None:
+            candidates.append(self._by_type.get(alert_type, deque()))
+        if severity is not None:
+            candidates.append(self._by_severity.get(severity, deque()))
+        # 从较短的索引出发，另一个条件逐条校验
+        seqs = min(candidates, key=len)
+        for seq in reversed(seqs):
+            if seq < oldest:
+                break
+            yield seq
+
+    def query(
+        self,
+        since: Optional[datetime] = None,
+        alert_type: Optional[str] = None,
+        severity: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> List[Any]:
+        """
+        按时间倒序查询告警
+
+        Args:
+            since: 只返回创建时间不早于此时间的告警
+            alert_type: 告警类型值
+            severity: 严重程度值
+            limit: 最多返回条数
+
+        Returns:
+            告警列表（新的在前）
+        """
+        results = []
+        for seq in self._iter_seqs(alert_type, severity):
+            alert = self._slots[seq % self.capacity]
+            # 序号与创建时间同序，早于截止时间即可停止
+            if since is not None and alert.timestamp < since:
+                break
+            if alert_type is not None and alert.alert_type.value != alert_type:
+                continue
+            if severity is not None and alert.severity.value != severity:
+                continue
+            results.append(alert)
+            if limit is not None and len(results) >= limit:
+                break
+        return results
+
+    def clear(self):
+        self.__init__(self.capacity)
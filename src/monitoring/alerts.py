@@ -8,7 +8,14 @@ from enum import Enum
 from loguru import logger
 from datetime import datetime, timedelta
 from dataclasses import dataclass, field
+from uuid import uuid4
 import asyncio
+import hashlib
+import json
+import re
+
+from .alert_store import AlertRingBuffer
+from .dispatcher import AlertDispatcher
 
 
 class AlertSeverity(Enum):
@@ -40,6 +47,29 @@ class Alert:
     timestamp: datetime = field(default_factory=datetime.utcnow)
     resolved: bool = False
     resolved_at: Optional[datetime] = None
+    alert_id: str = field(default_factory=lambda: f"ALERT_{uuid4().hex}")
+    # 去重：指纹相同的告警在去重窗口内只记录一条，累加出现次数
+    fingerprint: str = ""
+    occurrences: int = 1
+    last_seen: Optional[datetime] = None
+    # 是否发送通知（同类型通知冷却期内为False，仍会记录和持久化）
+    notify: bool = True
+
+    def __post_init__(self):
+        if not self.fingerprint:
+            self.fingerprint = alert_fingerprint(self.alert_type, self.severity, self.title, self.message)
+        if self.last_seen is None:
+            self.last_seen = self.timestamp
+
+
+_VOLATILE_RE = re.compile(r"0x[0-9a-fA-F]+|\d+")
+
+
+def alert_fingerprint(alert_type: AlertType, severity: AlertSeverity, title: str, message: str) -> str:
+    """告警指纹：类型 + 严重程度 + 标题 + 去掉数字/地址后的消息"""
+    normalized = _VOLATILE_RE.sub("#", message or "")
+    raw = f"{alert_type.value}|{severity.value}|{title}|{normalized}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
 
 
 class AlertManager:
@@ -50,10 +80,7 @@ class AlertManager:
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
-            cls._instance._alerts: List[Alert] = []
-            cls._instance._alert_counts: Dict[AlertType, int] = {}
-            cls._instance._last_alert_time: Dict[AlertType, datetime] = {}
-            cls._instance._cooldown_period = timedelta(minutes=5)  # 告警冷却期
+            cls._instance._init_state()
         return cls._instance
 
     def __init__(self):
@@ -61,6 +88,30 @@ class AlertManager:
         self.name = "AlertManager"
         self.description = "监控系统服务状态并发送告警"
 
+    def _init_state(self):
+        """按配置初始化缓冲区、计数和分发器"""
+        from src.config.settings import get_settings
+        settings = get_settings()
+
+        self._alerts = AlertRingBuffer(settings.ALERT_BUFFER_CAPACITY)
+        self._alert_counts: Dict[AlertType, int] = {}
+        self._severity_counts: Dict[AlertSeverity, int] = {}
+        self._deduplicated = 0
+        self._last_notify_time: Dict[AlertType, datetime] = {}
+        self._cooldown_period = timedelta(seconds=settings.ALERT_COOLDOWN_SECONDS)  # 同类型通知冷却期
+        self._dedup_window = timedelta(seconds=settings.ALERT_DEDUP_SECONDS)
+        self._dispatcher = AlertDispatcher(
+            store_batch=self._store_alerts_to_database,
+            notifiers={
+                "webhook": self._send_webhook_notification,
+                "email": self._send_email_notification
+            },
+            queue_size=settings.ALERT_QUEUE_SIZE,
+            batch_size=settings.ALERT_BATCH_SIZE,
+            flush_interval=settings.ALERT_FLUSH_INTERVAL_MS / 1000,
+            notify_timeout=settings.ALERT_NOTIFY_TIMEOUT
+        )
+
     async def send_alert(
         self,
         alert_type: AlertType,
@@ -72,6 +123,8 @@ class AlertManager:
         """
         发送告警
 
+        只在内存中记录并放入分发队列，数据库写入和通知由后台分发器完成
+
         Args:
             alert_type: 告警类型
             severity: 严重程度
@@ -80,13 +133,25 @@ class AlertManager:
             details: 详细信息
 
         Returns:
-            创建的告警对象
+            告警对象（去重时返回已有告警）
         """
-        # 检查冷却期（避免重复告警）
-        last_time = self._last_alert_time.get(alert_type)
-        if last_time and datetime.utcnow() - last_time < self._cooldown_period:
-            logger.debug(f"[AlertManager] 告警冷却期 - {alert_type.value}")
-            return None
+        now = datetime.utcnow()
+        fingerprint = alert_fingerprint(alert_type, severity, title, message)
+
+        # 指纹去重：窗口内重复的告警只累加次数
+        existing = self._alerts.find_by_fingerprint(fingerprint)
+        if existing is not None and now - existing.timestamp < self._dedup_window:
+            existing.occurrences += 1
+            existing.last_seen = now
+            self._deduplicated += 1
+            logger.debug(f"[AlertManager] 重复告警 - {alert_type.value} x{existing.occurrences}")
+            return existing
+
+        # 同类型通知冷却期（告警仍会记录）
+        last_notify = self._last_notify_time.get(alert_type)
+        notify = not (last_notify and now - last_notify < self._cooldown_period)
+        if notify:
+            self._last_notify_time[alert_type] = now
 
         # 创建告警
         alert = Alert(
@@ -94,13 +159,14 @@ class AlertManager:
             severity=severity,
             title=title,
             message=message,
-            details=details or {}
+            details=details or {},
+            timestamp=now,
+            fingerprint=fingerprint,
+            notify=notify
         )
 
         # 记录告警
-        self._alerts.append(alert)
-        self._alert_counts[alert_type] = self._alert_counts.get(alert_type, 0) + 1
-        self._last_alert_time[alert_type] = datetime.utcnow()
+        self._record(alert)
 
         # 记录日志
         log_method = {
@@ -116,58 +182,94 @@ class AlertManager:
             f"详情: {details}"
         )
 
-        # 发送通知
-        await self._send_notification(alert)
+        # 交给后台分发（不等待数据库和通知I/O）
+        self._dispatcher.enqueue(alert)
 
         return alert
 
-    async def _send_notification(self, alert: Alert):
-        """
-        发送告警通知
+    def _record(self, alert: Alert):
+        self._alerts.append(alert)
+        self._alert_counts[alert.alert_type] = self._alert_counts.get(alert.alert_type, 0) + 1
+        self._severity_counts[alert.severity] = self._severity_counts.get(alert.severity, 0) + 1
 
-        支持的通知方式：
-        - 邮件通知（如果配置了SMTP）
-        - Webhook通知（如果配置了webhook URL）
-        - 系统日志
-        """
-        # 1. 记录到专门的告警日志表（如果配置了数据库）
-        try:
-            await self._store_alert_to_database(alert)
-        except Exception as e:
-            logger.warning(f"[AlertManager] 存储告警到数据库失败: {str(e)}")
-
-        # 2. 发送Webhook通知（如果配置了）
-        try:
-            await self._send_webhook_notification(alert)
-        except Exception as e:
-            logger.warning(f"[AlertManager] Webhook通知失败: {str(e)}")
-
-        # 3. 发送邮件通知（如果配置了）
-        try:
-            await self._send_email_notification(alert)
-        except Exception as e:
-            logger.warning(f"[AlertManager] 邮件通知失败: {str(e)}")
-
-    async def _store_alert_to_database(self, alert: Alert):
-        """存储告警到数据库"""
+    async def _store_alerts_to_database(self, alerts: List[Alert]):
+        """批量存储告警到数据库（一条多行INSERT）"""
         from ..database.connection import get_db_manager
-        from sqlalchemy import text
+        from ..database.models import SystemAlert
+        from sqlalchemy import insert
 
         db_manager = get_db_manager()
         async with db_manager.get_session() as session:
-            await session.execute(text("""
-                INSERT INTO system_alerts (alert_type, severity, title, message, details, created_at)
-                VALUES (:alert_type, :severity, :title, :message, :details, :created_at)
-            """), {
-                "alert_type": alert.alert_type.value,
-                "severity": alert.severity.value,
-                "title": alert.title,
-                "message": alert.message,
-                "details": str(alert.details),
-                "created_at": alert.timestamp
-            })
+            await session.execute(insert(SystemAlert), [
+                {
+                    "alert_id": alert.alert_id,
+                    "alert_type": alert.alert_type.value,
+                    "severity": alert.severity.value,
+                    "title": alert.title[:255],
+                    "message": alert.message,
+                    "details": json.loads(json.dumps(alert.details, ensure_ascii=False, default=str)),
+                    "resolved": alert.resolved,
+                    "created_at": alert.timestamp
+                }
+                for alert in alerts
+            ])
             await session.commit()
 
+    async def restore_from_database(self, session, limit: Optional[int] = None) -> int:
+        """
+        启动时从数据库恢复最近的告警到环形缓冲区
+
+        Returns:
+            恢复的条数
+        """
+        from ..database.models import SystemAlert
+        from sqlalchemy import select
+
+        # 缓冲区按写入顺序即时间顺序，已有新告警时不再插入历史告警
+        if len(self._alerts):
+            return 0
+
+        limit = limit or self._alerts.capacity
+        result = await session.execute(
+            select(SystemAlert).order_by(SystemAlert.created_at.desc()).limit(limit)
+        )
+        rows = list(result.scalars().all())
+        restored = 0
+        for row in reversed(rows):
+            try:
+                alert_type = AlertType(row.alert_type)
+                severity = AlertSeverity(row.severity)
+            except ValueError:
+                continue
+            created_at = row.created_at.replace(tzinfo=None) if row.created_at else datetime.utcnow()
+            self._record(Alert(
+                alert_type=alert_type,
+                severity=severity,
+                title=row.title,
+                message=row.message,
+                details=row.details or {},
+                timestamp=created_at,
+                resolved=row.resolved,
+                resolved_at=row.resolved_at,
+                alert_id=row.alert_id,
+                notify=False
+            ))
+            restored += 1
+        logger.info(f"[AlertManager] 从数据库恢复告警 {restored} 条")
+        return restored
+
+    def start_dispatcher(self):
+        """启动后台分发任务（应用启动时调用；首次告警时也会自动启动）"""
+        self._dispatcher.start()
+
+    async def stop_dispatcher(self, timeout: float = 5.0):
+        """分发剩余告警并停止后台任务（应用关闭时调用）"""
+        await self._dispatcher.stop(timeout)
+
+    async def flush(self, timeout: float = 5.0):
+        """等待已入队的告警分发完毕"""
+        await self._dispatcher.flush(timeout)
+
     async def _send_webhook_notification(self, alert: Alert):
         """发送Webhook通知"""
         from src.config.settings import get_settings
@@ -236,41 +338,51 @@ class AlertManager:
 时间: {alert.timestamp.isoformat()}
         """)
 
-        async with asyncio.get_event_loop() as loop:
-            await loop.run_in_executor(None, lambda: smtplib.SMTP(smtp_config['host'], smtp_config['port']))
-            # ... 实际邮件发送逻辑
+        def _send():
+            with smtplib.SMTP(smtp_config['host'], smtp_config['port'], timeout=10) as smtp:
+                smtp.starttls()
+                smtp.login(smtp_config['username'], smtp_config['password'])
+                smtp.send_message(msg)
+
+        # smtplib 是阻塞调用，放到线程池执行
+        await asyncio.get_running_loop().run_in_executor(None, _send)
 
     def get_recent_alerts(
         self,
         hours: int = 24,
-        severity: Optional[AlertSeverity] = None
+        severity: Optional[AlertSeverity] = None,
+        alert_type: Optional[AlertType] = None,
+        limit: Optional[int] = None
     ) -> List[Alert]:
-        """获取最近的告警"""
+        """获取最近的告警（新的在前，按类型/严重程度过滤时走索引）"""
         cutoff_time = datetime.utcnow() - timedelta(hours=hours)
-
-        alerts = [
-            alert for alert in self._alerts
-            if alert.timestamp >= cutoff_time
-            and (severity is None or alert.severity == severity)
-        ]
-
-        return sorted(alerts, key=lambda a: a.timestamp, reverse=True)
+        return self._alerts.query(
+            since=cutoff_time,
+            alert_type=alert_type.value if alert_type else None,
+            severity=severity.value if severity else None,
+            limit=limit
+        )
 
     def get_alert_statistics(self) -> Dict[str, Any]:
         """获取告警统计"""
-        total_alerts = len(self._alerts)
-        last_24_hours = datetime.utcnow() - timedelta(hours=24)
+        recent_alerts = self.get_recent_alerts(hours=24)
 
-        recent_alerts = [a for a in self._alerts if a.timestamp >= last_24_hours]
+        by_severity = {severity.value: 0 for severity in AlertSeverity}
+        for alert in recent_alerts:
+            by_severity[alert.severity.value] += 1
 
         return {
-            "total_alerts": total_alerts,
+            "total_alerts": sum(self._alert_counts.values()),
             "last_24_hours": len(recent_alerts),
-            "by_type": self._alert_counts.copy(),
-            "by_severity": {
-                severity.value: len([a for a in recent_alerts if a.severity == severity])
-                for severity in AlertSeverity
-            }
+            "by_type": {alert_type.value: count for alert_type, count in self._alert_counts.items()},
+            "by_severity": by_severity,
+            "deduplicated": self._deduplicated,
+            "buffer": {
+                "capacity": self._alerts.capacity,
+                "size": len(self._alerts),
+                "evicted": self._alerts.evicted
+            },
+            "dispatcher": self._dispatcher.get_stats()
         }
 
 
@@ -281,3 +393,8 @@ alert_manager = AlertManager()
 def get_alert_manager() -> AlertManager:
     """获取告警管理器单例"""
     return alert_manager
+
+
+def reset_alert_manager():
+    """清空告警缓冲区和计数（测试用，单例对象保持不变）"""
+    alert_manager._init_state()
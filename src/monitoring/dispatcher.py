@@ -0,0 +1,154 @@
+"""
+告警分发器
+send_alert 只把告警放入队列；后台任务攒批后一次写入数据库，
+并并发发送各通知渠道（每个渠道单独超时），通知I/O不再阻塞分析流程
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from loguru import logger
+
+
+class AlertDispatcher:
+    """告警后台分发任务"""
+
+    def __init__(
+        self,
+        store_batch: Callable[[List[Any]], Awaitable[None]],
+        notifiers: Dict[str, Callable[[Any], Awaitable[None]]],
+        queue_size: int = 1000,
+        batch_size: int = 50,
+        flush_interval: float = 0.2,
+        notify_timeout: float = 5.0
+    ):
+        """
+        Args:
+            store_batch: 批量持久化（一批告警一次调用）
+            notifiers: 渠道名 -> 单条告警通知协程
+            queue_size: 待分发队列上限（满时丢弃并计数）
+            batch_size: 单批最大告警数
+            flush_interval: 凑批最大等待时间（秒）
+            notify_timeout: 单个通知的超时（秒）
+        """
+        self.store_batch = store_batch
+        self.notifiers = notifiers
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.notify_timeout = notify_timeout
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats = {"enqueued": 0, "dropped": 0, "batches": 0, "stored": 0, "store_failures": 0}
+        self.notify_failures: Dict[str, int] = {name: 0 for name in notifiers}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """在当前事件循环中启动后台任务（已在运行时忽略）"""
+        loop = asyncio.get_running_loop()
+        if self.running and self._loop is loop:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._task = loop.create_task(self._run(), name="alert-dispatcher")
+        logger.info(f"[AlertDispatcher] 后台分发任务已启动 - 批大小: {self.batch_size}")
+
+    def enqueue(self, alert) -> bool:
+        """放入待分发队列（不等待）；队列满时丢弃"""
+        self.start()
+        try:
+            self._queue.put_nowait(alert)
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            logger.warning(f"[AlertDispatcher] 分发队列已满，丢弃告警: {alert.title}")
+            return False
+        self.stats["enqueued"] += 1
+        return True
+
+    async def _next_batch(self) -> List[Any]:
+        """取一批告警：阻塞等第一条，之后在 flush_interval 内凑满 batch_size"""
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self.dispatch(batch)
+            except Exception as e:
+                logger.error(f"[AlertDispatcher] 分发批次失败: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def dispatch(self, batch: List[Any]):
+        """持久化一批告警，同时并发发送通知"""
+        self.stats["batches"] += 1
+        jobs = [self._store(batch)]
+        for alert in batch:
+            if not alert.notify:
+                continue
+            for name, notifier in self.notifiers.items():
+                jobs.append(self._notify(name, notifier, alert))
+        await asyncio.gather(*jobs)
+
+    async def _store(self, batch: List[Any]):
+        try:
+            await self.store_batch(batch)
+            self.stats["stored"] += len(batch)
+        except Exception as e:
+            self.stats["store_failures"] += 1
+            logger.warning(f"[AlertDispatcher] 存储告警到数据库失败: {str(e)}")
+
+    async def _notify(self, name: str, notifier: Callable[[Any], Awaitable[None]], alert):
+        try:
+            await asyncio.wait_for(notifier(alert), self.notify_timeout)
+        except asyncio.TimeoutError:
+            self.notify_failures[name] += 1
+            logger.warning(f"[AlertDispatcher] {name} 通知超时（>{self.notify_timeout}s）")
+        except Exception as e:
+            self.notify_failures[name] += 1
+            logger.warning(f"[AlertDispatcher] {name} 通知失败: {str(e)}")
+
+    async def flush(self, timeout: float = 5.0):
+        """等待队列中的告警分发完毕"""
+        if self.running:
+            await asyncio.wait_for(self._queue.join(), timeout)
+
+    async def stop(self, timeout: float = 5.0):
+        """分发剩余告警后停止后台任务"""
+        if not self.running:
+            return
+        try:
+            await self.flush(timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"[AlertDispatcher] 停止时仍有 {self._queue.qsize()} 条告警未分发")
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "running": self.running,
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "notify_failures": dict(self.notify_failures)
+        }
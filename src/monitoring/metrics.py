@@ -0,0 +1,273 @@
+"""
+流水线性能指标
+直方图/计数器按进程（worker）聚合，以Prometheus文本格式暴露；
+指标只在事件循环线程中更新，不加锁，每次观测只是一次二分查找和几次整数加法
+"""
+
+import functools
+import os
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+
+# 默认耗时桶（秒）：覆盖毫秒级的解析/检索到数十秒的LLM调用
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 25.0, 60.0
+)
+
+_enabled = True
+
+
+def set_metrics_enabled(enabled: bool):
+    """开关指标采集（关闭后 timed 装饰器直接调用原函数）"""
+    global _enabled
+    _enabled = enabled
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """计数器"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def collect(self, const_labels: str = "") -> List[str]:
+        lines = []
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels, const_labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """瞬时值（如连接池占用数），与计数器的区别只在于可直接设置"""
+
+    kind = "gauge"
+
+    def set(self, value: float, *labels: str):
+        self._values[labels] = value
+
+
+class Histogram:
+    """直方图（固定桶，非累积计数，导出时再累加）"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签值 -> [各桶计数..., +Inf桶计数, 总和]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return int(sum(series[:-1])) if series else 0
+
+    def quantile(self, q: float, *labels: str) -> Optional[float]:
+        """按桶线性插值估计分位数（与PromQL histogram_quantile 一致）"""
+        series = self._series.get(labels)
+        if not series:
+            return None
+        counts = series[:-1]
+        total = sum(counts)
+        if total == 0:
+            return None
+        rank = q * total
+        cumulative = 0
+        for i, n in enumerate(counts):
+            if cumulative + n >= rank and n > 0:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i]
+                return lower + (upper - lower) * (rank - cumulative) / n
+            cumulative += n
+        return self.buckets[-1]
+
+    def collect(self, const_labels: str = "") -> List[str]:
+        lines = []
+        bounds = self.buckets + (float("inf"),)
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, n in zip(bounds, series[:-1]):
+                cumulative += n
+                le = f'le="{_format_value(bound)}"'
+                extra = f"{const_labels},{le}" if const_labels else le
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, extra)} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels, const_labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """本进程的指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+
+    def counter(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Counter:
+        if name not in self._metrics:
+            self._metrics[name] = Counter(name, help_text, labelnames)
+        return self._metrics[name]
+
+    def gauge(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Gauge:
+        if name not in self._metrics:
+            self._metrics[name] = Gauge(name, help_text, labelnames)
+        return self._metrics[name]
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        if name not in self._metrics:
+            self._metrics[name] = Histogram(name, help_text, labelnames, buckets)
+        return self._metrics[name]
+
+    def render(self) -> str:
+        """Prometheus 文本格式（带 worker=进程号 标签，多worker时在PromQL中 sum by 汇总）"""
+        const_labels = f'worker="{os.getpid()}"'
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.collect(const_labels))
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        for metric in self._metrics.values():
+            if isinstance(metric, Histogram):
+                metric._series.clear()
+            else:
+                metric._values.clear()
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """获取本进程指标注册表"""
+    return _registry
+
+
+STAGE_SECONDS = _registry.histogram(
+    "chip_fault_stage_seconds", "流水线各阶段耗时（秒）", ("stage",)
+)
+STAGE_TOTAL = _registry.counter(
+    "chip_fault_stage_total", "流水线各阶段调用次数", ("stage", "status")
+)
+
+LLM_TOKENS = _registry.counter(
+    "chip_fault_llm_tokens_total", "LLM调用消耗的token数", ("model", "kind")
+)
+
+
+def observe_stage(stage: str, seconds: float, status: str = "ok"):
+    """记录一次阶段耗时"""
+    if not _enabled:
+        return
+    STAGE_SECONDS.observe(seconds, stage)
+    STAGE_TOTAL.inc(stage, status)
+
+
+def record_llm_tokens(model: str, usage: Dict[str, Any]):
+    """记录一次LLM调用的 prompt/completion token 数"""
+    if not _enabled:
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        if usage.get(kind):
+            LLM_TOKENS.inc(model, kind.split("_")[0], amount=usage[kind])
+
+
+def timed(stage: str, is_ok: Optional[Callable[[Any], bool]] = None) -> Callable:
+    """
+    异步函数耗时装饰器
+
+    成功记为 status="ok"，抛出异常记为 status="error"（异常照常抛出）；
+    对吞掉异常、以返回值表示失败的函数，用 is_ok 判断返回值
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not _enabled:
+                return await func(*args, **kwargs)
+            start = time.perf_counter()
+            status = "error"
+            try:
+                result = await func(*args, **kwargs)
+                status = "ok" if is_ok is None or is_ok(result) else "error"
+                return result
+            finally:
+                observe_stage(stage, time.perf_counter() - start, status)
+        return wrapper
+    return decorator
+
+
+def stage_summary(quantiles: Tuple[float, ...] = (0.5, 0.99)) -> Dict[str, Dict[str, Any]]:
+    """各阶段调用次数与分位数估计（供JSON接口和日志使用）"""
+    summary = {}
+    for labels in sorted(STAGE_SECONDS._series):
+        stage = labels[0]
+        summary[stage] = {
+            "count": STAGE_SECONDS.count(stage),
+            "errors": int(STAGE_TOTAL.value(stage, "error")),
+            **{f"p{int(q * 100)}": STAGE_SECONDS.quantile(q, stage) for q in quantiles}
+        }
+    return summary
+
+
+def configure_metrics():
+    """按配置开关指标采集"""
+    try:
+        from src.config.settings import get_settings
+        set_metrics_enabled(get_settings().METRICS_ENABLED)
+    except Exception as e:
+        logger.warning(f"[Metrics] 读取指标配置失败，保持默认开启: {e}")
@@ -0,0 +1,171 @@
+"""
+上下文管理测试 - 内存优化版
+只测试规则压缩路径，不加载BGE模型
+"""
+
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def _repetitive_log(n: int = 2000) -> str:
+    """构造以少量模板为主的重复日志"""
+    lines = []
+    for i in range(n):
+        lines.append(f"2024-01-01 12:{i // 60 % 60:02d}:{i % 60:02d} [INFO] core {i % 8} heartbeat ok seq={i}")
+        if i % 200 == 0:
+            lines.append(f"2024-01-01 12:{i // 60 % 60:02d}:{i % 60:02d} [ERROR] Error Code: 0XCO001 addr 0x{i:08x} fault on core {i % 8}")
+    return "\n".join(lines)
+
+
+class TestLogTemplateMiner:
+    """测试日志模板挖掘"""
+
+    def test_repeated_lines_share_template(self):
+        """测试只有变量不同的行归入同一模板"""
+        from src.context.template_miner import mine_templates
+
+        lines = [f"core {i} heartbeat ok addr 0x{i:04x}" for i in range(100)]
+        miner = mine_templates(lines)
+
+        assert len(miner.templates) == 1
+        template = miner.templates[0]
+        assert template.count == 100
+        assert template.first_index == 0
+        assert template.last_index == 99
+        assert template.template == "core <*> heartbeat ok addr <*>"
+
+    def test_distinct_lines_split(self):
+        """测试不同结构的行不合并"""
+        from src.context.template_miner import mine_templates
+
+        miner = mine_templates([
+            "[ERROR] Error Code: 0XCO001 CPU fault",
+            "[INFO] boot complete",
+            "[ERROR] Error Code: 0XCO001 CPU fault",
+        ])
+
+        assert len(miner.templates) == 2
+        assert miner.summary()[0]["count"] == 2
+
+    def test_first_last_timestamp(self):
+        """测试记录首末出现时间"""
+        from src.context.template_miner import mine_templates
+
+        miner = mine_templates([
+            "2024-01-01 12:00:00 link retry 1",
+            "2024-01-01 12:00:05 link retry 2",
+            "2024-01-01 12:00:09 link retry 3",
+        ])
+
+        template = miner.templates[0]
+        assert template.first_timestamp == "2024-01-01 12:00:00"
+        assert template.last_timestamp == "2024-01-01 12:00:09"
+
+
+class TestLogCompressorTemplates:
+    """测试规则压缩器的模板折叠"""
+
+    def test_collapse_keeps_error_code_lines(self):
+        """测试重复行被折叠，含错误码的行全部保留"""
+        from src.context.compressor import LogCompressor
+
+        compressor = LogCompressor(max_lines_per_template=3)
+        result = compressor.compress(_repetitive_log(), {"error_codes": ["0XCO001"]})
+
+        assert result["template_count"] == 2
+        assert result["preserved_elements"]["error_lines"] == 10
+        assert result["preserved_elements"]["collapsed_lines"] > 1900
+        assert result["compressed_log"].count("0XCO001") == 10
+
+
+class TestLogCompressorAccounting:
+    """测试基于行号的保留统计"""
+
+    def test_stats_match_substring_accounting(self):
+        """测试行号统计与在压缩文本中逐行查找的结果一致（含截断）"""
+        from scripts.benchmark_compressor import ERROR_CODES, generate_log, legacy_preserved
+        from src.context.compressor import LogCompressor
+
+        raw_log = generate_log(5000, seed=7)
+        for target_kb in (35, 4):
+            compressor = LogCompressor(target_size_kb=target_kb, enable_templates=False)
+            result = compressor.compress(raw_log, {"error_codes": ERROR_CODES})
+
+            lines = raw_log.split("\n")
+            line_info = compressor._analyze_lines(lines, set(ERROR_CODES))
+            legacy = legacy_preserved(result["compressed_log"], lines, line_info, ERROR_CODES)
+
+            for key, value in legacy.items():
+                assert result["preserved_elements"][key] == value
+            assert result["preserved_elements"]["total_lines"] == len(result["compressed_log"].split("\n"))
+
+    def test_stats_linear_on_large_log(self):
+        """回归保护：5万行日志的保留统计应远快于压缩本身"""
+        import time
+        from scripts.benchmark_compressor import ERROR_CODES, generate_log
+        from src.context.compressor import LogCompressor
+
+        compressor = LogCompressor(target_size_kb=200, enable_templates=False)
+        lines = generate_log(50000).split("\n")
+        line_info = compressor._analyze_lines(lines, set(ERROR_CODES))
+        kept = compressor._merge_lines(lines, compressor._extract_key_lines(line_info))
+
+        start = time.perf_counter()
+        compressor._count_preserved(lines, line_info, kept)
+        elapsed = time.perf_counter() - start
+
+        assert elapsed < 0.5
+
+
+class TestCompressionPipeline:
+    """测试压缩流水线的阶段记录与跳过"""
+
+    def test_profile_records_every_stage(self):
+        """测试每个阶段都记录耗时、行数与 token 数"""
+        from src.context.compressor import LogCompressor
+        from src.context.pipeline import STAGES
+
+        result = LogCompressor().compress(_repetitive_log(), {"error_codes": ["0XCO001"]})
+        profile = result["pipeline_profile"]
+
+        assert [p["stage"] for p in profile] == list(STAGES)
+        for before, after in zip(profile, profile[1:]):
+            assert after["lines_in"] == before["lines_out"]
+            assert after["tokens_in"] == before["tokens_out"]
+        assert profile[0]["lines_in"] == len(_repetitive_log().split("\n"))
+        assert profile[-1]["tokens_out"] == result["compressed_tokens"]
+        assert all(p["seconds"] >= 0 and not p["skipped"] for p in profile)
+
+    def test_skip_optional_stage_per_request(self):
+        """测试单次请求跳过 dedup，必需阶段不可跳过"""
+        from src.context.claude_style_compressor import ClaudeStyleCompressor
+
+        compressor = ClaudeStyleCompressor(enable_semantic=False)
+        result = compressor.compress(_repetitive_log(200), {}, skip_stages=["dedup", "render"])
+        by_stage = {p["stage"]: p for p in result["pipeline_profile"]}
+
+        assert by_stage["dedup"]["skipped"] is True
+        assert by_stage["dedup"]["lines_out"] == by_stage["window"]["lines_out"]
+        assert by_stage["render"]["skipped"] is False
+        assert result["compressed_log"]
+
+    def test_stages_configured_at_construction(self):
+        """测试通过配置关闭阶段"""
+        from src.context.compressor import LogCompressor
+        from src.context.pipeline import parse_stages
+
+        stages = parse_stages("scan, prioritize, render")
+        result = LogCompressor(enable_templates=False, stages=stages).compress(
+            "line a\nERROR line b\nline c", {}
+        )
+        skipped = {p["stage"] for p in result["pipeline_profile"] if p["skipped"]}
+
+        assert skipped == {"select", "window", "dedup"}
+        assert result["compressed_log"] == "line a\nERROR line b\nline c"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
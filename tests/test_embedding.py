@@ -0,0 +1,227 @@
+"""
+Embedding后端测试
+ONNX与SentenceTransformer的一致性测试需要本地有BGE模型，
+缺少依赖时自动跳过
+"""
+
+import pytest
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+PARITY_TEXTS = [
+    "芯片失效分析测试文本",
+    "[ERROR] Error Code: 0XCO001 - CPU fault on core 3",
+    "DDR控制器ECC不可纠正错误，地址 0x40001000",
+    "NoC router 2 congestion timeout",
+    "L3 cache coherence violation detected by HA",
+]
+
+# 动态int8量化后与全精度向量的最小余弦相似度
+PARITY_MIN_COSINE = 0.98
+
+
+class _FakeTokenizer:
+    """按文本长度生成token的假tokenizer"""
+
+    def __call__(self, batch, **kwargs):
+        max_len = max(len(t) for t in batch)
+        ids = np.zeros((len(batch), max_len), dtype=np.int64)
+        for i, text in enumerate(batch):
+            ids[i, :len(text)] = [ord(c) % 100 + 1 for c in text]
+        return {"input_ids": ids, "attention_mask": (ids > 0).astype(np.int64)}
+
+
+class _FakeSession:
+    """CLS位置输出 [文本长度, 首字符编码, 1] 的假推理会话"""
+
+    def run(self, _, feed):
+        ids = feed["input_ids"]
+        hidden = np.zeros((ids.shape[0], ids.shape[1], 3), dtype=np.float32)
+        hidden[:, 0, 0] = (ids > 0).sum(axis=1)
+        hidden[:, 0, 1] = ids[:, 0]
+        hidden[:, 0, 2] = 1.0
+        return [hidden]
+
+
+class TestONNXEmbeddingModel:
+    """测试ONNX模型的批处理逻辑（不加载真实模型）"""
+
+    def _make_model(self):
+        from src.embedding.onnx_backend import ONNXEmbeddingModel
+
+        model = object.__new__(ONNXEmbeddingModel)
+        model.tokenizer = _FakeTokenizer()
+        model.session = _FakeSession()
+        model.max_seq_length = 512
+        model._input_names = {"input_ids", "attention_mask"}
+        model._dimension = 3
+        return model
+
+    def test_batch_order_preserved(self):
+        """测试按长度分批后结果顺序与输入一致"""
+        model = self._make_model()
+        texts = ["a", "ccc", "bb", "dddd"]
+
+        embeddings = model.encode(texts, batch_size=2)
+
+        assert embeddings.shape == (4, 3)
+        assert list(embeddings[:, 0]) == [1, 3, 2, 4]
+
+    def test_single_text_normalized(self):
+        """测试单条文本返回归一化的一维向量"""
+        model = self._make_model()
+
+        embedding = model.encode("hello", normalize_embeddings=True)
+
+        assert embedding.shape == (3,)
+        assert abs(np.linalg.norm(embedding) - 1.0) < 1e-5
+
+
+class _FakeSentenceModel:
+    """向量为 [文本长度, 1] 的假模型，记录每次 encode 的批大小"""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def get_sentence_embedding_dimension(self):
+        return 2
+
+    def encode(self, texts, **kwargs):
+        self.batch_sizes.append(len(texts))
+        return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+
+class TestEmbeddingServer:
+    """测试共享Embedding服务的微批合并"""
+
+    def test_concurrent_requests_are_batched(self, tmp_path):
+        """测试并发请求被合并为一个批次，结果按请求拆分"""
+        import asyncio
+        from src.embedding.server import EmbeddingServer
+        from src.embedding.client import EmbeddingClient
+
+        socket_path = str(tmp_path / "embedding.sock")
+        model = _FakeSentenceModel()
+
+        async def _run():
+            server = EmbeddingServer(socket_path, model=model, max_batch_size=64, max_wait_ms=50)
+            await server.start()
+            try:
+                client = EmbeddingClient(socket_path)
+                texts = ["a" * (i + 1) for i in range(8)]
+                results = await asyncio.gather(*[client.aencode(t) for t in texts])
+                normalized = await client.aencode(["abc"], normalize_embeddings=True)
+                return texts, results, normalized, server.get_stats()
+            finally:
+                await server.close()
+
+        texts, results, normalized, stats = asyncio.run(_run())
+
+        assert [r[0] for r in results] == [len(t) for t in texts]
+        assert abs(np.linalg.norm(normalized[0]) - 1.0) < 1e-5
+        assert stats["requests"] == 9
+        assert stats["batches"] < 9
+        assert max(model.batch_sizes) > 1
+
+
+class TestEmbeddingBatcher:
+    """测试进程内微批执行器"""
+
+    def test_concurrent_encodes_share_batches(self):
+        """测试并发请求被合并且结果与请求一一对应"""
+        import asyncio
+        from src.embedding.batcher import EmbeddingBatcher
+
+        model = _FakeSentenceModel()
+
+        async def _run():
+            batcher = EmbeddingBatcher(model=model, max_batch_size=16, max_wait_ms=20)
+            try:
+                texts = ["x" * (i + 1) for i in range(40)]
+                results = await asyncio.gather(*[batcher.encode(t) for t in texts])
+                return texts, results, batcher.get_stats()
+            finally:
+                await batcher.close()
+
+        texts, results, stats = asyncio.run(_run())
+
+        assert [r[0] for r in results] == [len(t) for t in texts]
+        assert stats["requests"] == 40
+        assert stats["texts"] == 40
+        assert stats["batches"] < 40
+        assert stats["max_batch_texts"] <= 16
+        assert stats["queue_depth"] == 0
+        assert sum(stats["batch_size_histogram"].values()) == stats["batches"]
+
+    def test_lazy_model_load_and_error_propagation(self):
+        """测试模型延迟加载，推理异常传递给调用方"""
+        import asyncio
+        from src.embedding.batcher import EmbeddingBatcher
+
+        class _BrokenModel(_FakeSentenceModel):
+            def encode(self, texts, **kwargs):
+                raise ValueError("boom")
+
+        loads = []
+
+        def _loader():
+            loads.append(1)
+            return _BrokenModel()
+
+        async def _run():
+            batcher = EmbeddingBatcher(model_loader=_loader, max_wait_ms=1)
+            try:
+                with pytest.raises(ValueError):
+                    await batcher.encode(["a", "b"])
+                return batcher.get_stats()
+            finally:
+                await batcher.close()
+
+        stats = asyncio.run(_run())
+
+        assert loads == [1]
+        assert stats["errors"] == 1
+        assert stats["batches"] == 0
+
+
+class TestONNXParity:
+    """测试ONNX int8后端与SentenceTransformer的向量一致性"""
+
+    def test_parity_with_sentence_transformer(self, tmp_path):
+        """测试量化模型的向量与全精度模型在容差范围内"""
+        pytest.importorskip("onnxruntime")
+        pytest.importorskip("torch")
+        sentence_transformers = pytest.importorskip("sentence_transformers")
+
+        from src.config.settings import get_settings
+        from src.embedding.onnx_backend import load_onnx_model
+
+        model_name = get_settings().EMBEDDING_MODEL
+        try:
+            reference = sentence_transformers.SentenceTransformer(model_name, device="cpu")
+        except Exception as e:
+            pytest.skip(f"BGE模型不可用: {e}")
+
+        onnx_model = load_onnx_model(model_name, tmp_path, quantized=True)
+
+        expected = reference.encode(PARITY_TEXTS, normalize_embeddings=True)
+        actual = onnx_model.encode(PARITY_TEXTS, normalize_embeddings=True)
+
+        assert actual.shape == expected.shape
+        cosines = np.sum(expected * actual, axis=1)
+        assert cosines.min() >= PARITY_MIN_COSINE, f"余弦相似度过低: {cosines}"
+
+        # 相似度排序保持一致
+        assert np.array_equal(
+            np.argmax(expected @ expected.T - np.eye(len(PARITY_TEXTS)) * 2, axis=1),
+            np.argmax(actual @ actual.T - np.eye(len(PARITY_TEXTS)) * 2, axis=1)
+        )
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "--tb=short"])
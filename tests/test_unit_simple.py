@@ -186,5 +186,1684 @@ class TestAgentState:
         assert state.expert_inputs is None
 
 
+class TestStartup:
+    """测试启动预热与按需导入"""
+
+    def test_agents_package_is_lazy(self):
+        """测试导入agent子模块不会加载LangGraph工作流"""
+        import subprocess
+
+        code = (
+            "import sys; import src.agents.agent2.correction_processor; "
+            "assert 'src.agents.workflow' not in sys.modules; "
+            "assert 'langgraph' not in sys.modules; "
+            "from src.agents import Agent1State; print('ok')"
+        )
+        proc = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True, text=True, cwd=Path(__file__).parent.parent
+        )
+
+        assert proc.returncode == 0, proc.stderr[-2000:]
+        assert proc.stdout.strip().endswith("ok")
+
+    def test_warmup_failure_is_degraded_not_blocking(self, monkeypatch):
+        """测试预热步骤失败时记录错误且状态仍为就绪"""
+        import asyncio
+        from types import SimpleNamespace
+        from src.api import startup
+
+        async def _ok(settings):
+            return {"dimension": 3}
+
+        async def _broken(settings):
+            raise RuntimeError("model missing")
+
+        monkeypatch.setattr(startup, "WARMUP_STEPS", [("ok", _ok), ("broken", _broken)])
+        monkeypatch.setattr(startup, "_startup_state", startup.StartupState())
+
+        settings = SimpleNamespace(STARTUP_WARMUP_ENABLED=True, STARTUP_WARMUP_TIMEOUT=5.0)
+        state = asyncio.run(startup.warm_up(settings))
+
+        assert state.phase == "degraded"
+        assert state.is_ready
+        assert state.steps["ok"] == {"ok": True, "seconds": state.steps["ok"]["seconds"], "dimension": 3}
+        assert state.steps["broken"]["ok"] is False
+        assert "model missing" in state.errors[0]
+
+    def test_warmup_timeout_is_overall_deadline(self, monkeypatch):
+        """测试预热超时为所有步骤的总时限，超时后剩余步骤直接记为失败"""
+        import asyncio
+        from types import SimpleNamespace
+        from src.api import startup
+
+        calls = []
+
+        async def _slow(settings):
+            calls.append("slow")
+            await asyncio.sleep(0.3)
+            return {}
+
+        async def _later(settings):
+            calls.append("later")
+            return {}
+
+        monkeypatch.setattr(startup, "WARMUP_STEPS", [("slow", _slow), ("later", _later)])
+        monkeypatch.setattr(startup, "_startup_state", startup.StartupState())
+
+        settings = SimpleNamespace(STARTUP_WARMUP_ENABLED=True, STARTUP_WARMUP_TIMEOUT=0.1)
+        state = asyncio.run(startup.warm_up(settings))
+
+        assert calls == ["slow"]
+        assert state.phase == "degraded"
+        assert state.steps["slow"]["ok"] is False and state.steps["later"]["ok"] is False
+        assert state.steps["slow"]["seconds"] < 0.3
+
+    def test_warmup_disabled_is_ready_immediately(self, monkeypatch):
+        """测试关闭预热时直接就绪"""
+        from types import SimpleNamespace
+        from src.api import startup
+
+        monkeypatch.setattr(startup, "_startup_state", startup.StartupState())
+
+        task = startup.start_warmup(SimpleNamespace(STARTUP_WARMUP_ENABLED=False))
+
+        assert task is None
+        assert startup.get_startup_state().phase == "ready"
+
+
+def _sample_chip_graph():
+    """按 KnowledgeGraphRepository.load_chip_graphs 返回格式构造的单芯片图"""
+    return {
+        "chip": {"model": "XC9000", "architecture": "ARMv9", "num_cores": 8},
+        "subsystems": [{"name": "cpu_cluster", "type": "compute"}],
+        "modules": [
+            {"module_id": "m1", "module": {"name": "l3_cache", "type": "cache"},
+             "labels": ["L3Cache"], "subsystem": {"name": "cpu_cluster", "type": "compute"}},
+            {"module_id": "m2", "module": {"name": "ha0", "role": "home", "protocol": "MESI"},
+             "labels": ["HomeAgent"], "subsystem": None},
+        ],
+        "failure_modes": [
+            {"module_id": "m1", "failure_mode": {"name": "tag_parity", "category": "logic"},
+             "error_codes": [{"code": "0XL3001", "severity": "high"}]},
+        ],
+        "edges": [
+            {"source_id": "m2", "rel_type": "CONNECTED_TO_HA", "target_id": "m1",
+             "target": {"name": "l3_cache"}, "target_labels": ["L3Cache"]},
+        ],
+        "root_causes": {"tag_parity": [{"name": "sram_defect", "category": "process", "solution": "screen"}]}
+    }
+
+
+class TestKnowledgeGraphCache:
+    """测试知识图谱投影缓存"""
+
+    @staticmethod
+    def _fake_repository():
+        """按 load_chip_graphs 返回格式构造的内存仓库"""
+        graph = _sample_chip_graph()
+
+        class FakeRepository:
+            def __init__(self):
+                self.load_calls = []
+                self.version = 1
+
+            async def load_chip_graphs(self, chip_models):
+                self.load_calls.append(list(chip_models))
+                return {m: graph for m in chip_models if m == "XC9000"}
+
+            async def get_graph_version(self):
+                return self.version
+
+            async def bump_graph_version(self):
+                self.version += 1
+                return self.version
+
+        return FakeRepository()
+
+    def test_projection_queries_served_from_memory(self):
+        """测试一次批量加载后查询全部命中内存"""
+        import asyncio
+        from src.database.kg_cache import KnowledgeGraphCache
+
+        repo = self._fake_repository()
+        cache = KnowledgeGraphCache(repository=repo, version_check_interval=0)
+
+        async def _run():
+            projections = await cache.get_projections(["XC9000", "XC9000", "UNKNOWN"])
+            again = await cache.get_projection("XC9000")
+            return projections, again
+
+        projections, again = asyncio.run(_run())
+
+        assert repo.load_calls == [["XC9000", "UNKNOWN"]]
+        assert set(projections) == {"XC9000"}
+        assert again is projections["XC9000"]
+
+        modes = again.failure_modes("L3Cache")["failure_modes"]
+        assert modes["tag_parity"]["error_codes"] == [{"code": "0XL3001", "severity": "high"}]
+        assert again.root_causes_of("tag_parity")["root_causes"] == {
+            "sram_defect": {"category": "process", "solution": "screen"}
+        }
+        assert again.ha_topology()[0]["connected_l3"] == "l3_cache"
+        assert again.modules_for_error_codes(["0XL3001"])[0]["module"] == "l3_cache"
+        assert cache.get_stats()["hits"] == 1
+
+    def test_version_bump_invalidates(self):
+        """测试图版本号变化后重新加载"""
+        import asyncio
+        from src.database.kg_cache import KnowledgeGraphCache
+
+        repo = self._fake_repository()
+        cache = KnowledgeGraphCache(repository=repo, version_check_interval=0)
+
+        async def _run():
+            await cache.get_projection("XC9000")
+            version = await cache.bump_version("test")
+            await cache.get_projection("XC9000")
+            # 其他进程写入的新版本号
+            repo.version += 1
+            await cache.get_projection("XC9000")
+            return version
+
+        version = asyncio.run(_run())
+
+        assert version == 2
+        assert len(repo.load_calls) == 3
+        assert cache.version == 3
+
+    def test_repository_ha_topology_served_from_projection(self, monkeypatch):
+        """测试仓库的HA拓扑查询走投影缓存，不访问Neo4j"""
+        import asyncio
+        from src.database import kg_cache
+        from src.database.neo4j_schema import KnowledgeGraphRepository
+
+        repo = self._fake_repository()
+        monkeypatch.setattr(kg_cache, "_kg_cache", kg_cache.KnowledgeGraphCache(repository=repo, version_check_interval=0))
+        # driver 为 None：任何 Cypher 查询都会失败
+        graph = KnowledgeGraphRepository(driver=object())
+        graph.driver = None
+
+        topology = asyncio.run(graph.get_ha_topology("XC9000"))
+        assert topology["name"] == "ha0"
+        assert topology["connected_l3"] == "l3_cache"
+        assert topology["protocol"] == "MESI"
+        assert asyncio.run(graph.get_ha_topology("UNKNOWN")) == {}
+
+
+class TestLocalGraphStore:
+    """测试本地知识图谱"""
+
+    def test_infer_from_error_codes_and_modules(self):
+        """测试错误码 -> 模块 -> 失效模式 -> 根因的本地推理"""
+        from src.database.local_graph import LocalGraphStore
+
+        store = LocalGraphStore({"XC9000": _sample_chip_graph()})
+
+        strong = store.infer("XC9000", ["l3_cache"], ["0xl3001"])
+        assert strong["failure_module"] == "l3_cache"
+        assert strong["failure_domain"] == "compute"
+        assert strong["evidence_strength"] == "strong"
+        assert strong["root_causes"][0]["root_cause"] == "sram_defect"
+
+        weak = store.infer("XC9000", ["homeagent"], [])
+        assert weak["failure_module"] == "ha0"
+        assert weak["evidence_strength"] == "weak"
+
+        assert store.infer("XC9000", ["ddr"], []) is None
+        assert store.infer("OTHER", ["l3_cache"], []) is None
+
+    def test_parser_module_types_match_graph_labels(self):
+        """测试日志解析器输出的模块类型（ha、noc_router 等）匹配到图中标签"""
+        from src.agents.agent1.log_parser import LogParserAgent
+        from src.database.local_graph import LocalGraphStore
+
+        store = LocalGraphStore({"XC9000": _sample_chip_graph()})
+        parsed = LogParserAgent()._parse_log_direct("XC9000", "[ERROR] HomeAgent snoop timeout on L3 bank 2")
+
+        assert [m["name"] for m in store.match_modules("XC9000", parsed["modules"])] == ["l3_cache", "ha0"]
+        assert store.match_modules("XC9000", ["HA"])[0]["name"] == "ha0"
+        assert store.infer("XC9000", ["ha"], [])["evidence_strength"] == "weak"
+
+    def test_snapshot_roundtrip(self, tmp_path):
+        """测试快照保存后加载结果一致"""
+        from src.database.local_graph import LocalGraphStore
+
+        path = tmp_path / "kg_snapshot.json"
+        LocalGraphStore({"XC9000": _sample_chip_graph()}, graph_version=4).save_snapshot(path)
+        store = LocalGraphStore.from_snapshot(path)
+
+        assert store.chip_models == ["XC9000"]
+        assert store.graph_version == 4
+        assert store.modules_for_error_codes("XC9000", ["0XL3001"])[0]["failure_mode"] == "tag_parity"
+
+
+class TestErrorCodeIndex:
+    """测试错误码倒排索引"""
+
+    def test_resolve_intersects_cases_and_rules(self):
+        """测试多错误码取交集、按命中数排序并按芯片过滤"""
+        from src.database.error_code_index import ErrorCodeIndex
+
+        index = ErrorCodeIndex()
+        index.add_case("CASE_A", ["0xCO001", "0XLA017"], "XC9000")
+        index.add_case("CASE_B", ["0XCO001"], "XC9000")
+        index.add_case("CASE_C", ["0XCO001", "0XLA017"], "XC9100")
+        index.add_rule("RULE_1", ["0XLA017"], "XC9000")
+        index.add_kg_node("XC9000/l3_cache", ["0XLA017"])
+
+        result = index.resolve(["0xco-001", "0XLA017"], chip_model="XC9000")
+
+        assert result["matched_codes"] == ["0XCO001", "0XLA017"]
+        assert result["cases"]["all"] == ["CASE_A"]
+        assert result["cases"]["ranked"] == [("CASE_A", 2), ("CASE_B", 1)]
+        assert result["rules"]["ranked"] == [("RULE_1", 1)]
+        assert result["kg_nodes"]["all"] == ["XC9000/l3_cache"]
+
+    def test_prefix_fallback_and_incremental_update(self):
+        """测试前缀召回，以及案例错误码变更后旧倒排被撤销"""
+        from src.database.error_code_index import ErrorCodeIndex
+
+        index = ErrorCodeIndex()
+        index.add_case("CASE_A", ["0XCO001"])
+        index.add_case("CASE_B", ["0XCO005"])
+
+        result = index.resolve(["0XCO999"])
+        assert result["prefix_fallback"] is True
+        assert result["cases"]["ranked"] == [("CASE_A", 1), ("CASE_B", 1)]
+
+        index.add_case("CASE_A", ["0XDD042"])
+        assert index.codes_with_prefix("0X") == ["0XCO005", "0XDD042"]
+        assert index.postings("0XCO001").cases == set()
+
+        index.remove_case("CASE_B")
+        assert index.codes_with_prefix("0XCO") == []
+
+
+class TestHybridCaseSearch:
+    """测试混合案例检索"""
+
+    @staticmethod
+    def _fake_database_tool():
+        class FakeDatabaseTool:
+            def __init__(self):
+                self.calls = []
+
+            async def lexical_search(self, chip_model, codes, query_text, limit, min_similarity):
+                self.calls.append(("lexical", codes))
+                return {"results": [
+                    {"case_id": "CASE_A", "similarity": None, "code_hits": 1, "lexical_score": 1.0},
+                    {"case_id": "CASE_B", "similarity": None, "code_hits": 0, "lexical_score": 0.4},
+                ]}
+
+            async def vector_search(self, vector, chip_model, limit, threshold):
+                self.calls.append(("vector", vector))
+                return {"results": [
+                    {"case_id": "CASE_C", "similarity": 0.9},
+                    {"case_id": "CASE_B", "similarity": 0.8},
+                ]}
+
+        return FakeDatabaseTool()
+
+    def test_reciprocal_rank_fusion(self):
+        """测试两路都靠前的结果排在最前"""
+        from src.mcp.tools.hybrid_search import reciprocal_rank_fusion
+
+        fused = reciprocal_rank_fusion({"lexical": ["A", "B"], "vector": ["C", "B"]}, k=60)
+
+        assert [item for item, _ in fused] == ["B", "A", "C"]
+        assert fused[0][1] == pytest.approx(1 / 62 + 1 / 62)
+
+    def test_hybrid_fuses_and_auto_skips_embedding(self, monkeypatch):
+        """测试hybrid模式融合两路；auto模式错误码精确命中时不生成embedding"""
+        import asyncio
+        from src.database import error_code_index
+        from src.mcp.tools.hybrid_search import HybridCaseSearch
+
+        embed_calls = []
+
+        async def _embed(features):
+            embed_calls.append(features)
+            return [0.1, 0.2]
+
+        features = {"error_codes": ["0xco001"], "modules": ["cpu"]}
+
+        tool = self._fake_database_tool()
+        hybrid = HybridCaseSearch(embed=_embed, database_tool=tool, mode="hybrid", rrf_k=60)
+        result = asyncio.run(hybrid.search("XC9000", features, top_k=3))
+
+        assert [r["case_id"] for r in result["results"]] == ["CASE_B", "CASE_A", "CASE_C"]
+        assert result["results"][0]["sources"] == ["vector", "lexical"]
+        assert result["results"][0]["similarity"] == 0.8
+        assert len(embed_calls) == 1
+
+        index = error_code_index.ErrorCodeIndex()
+        index.add_case("CASE_A", ["0XCO001"], "XC9000")
+        monkeypatch.setattr(error_code_index, "_error_code_index", index)
+
+        tool = self._fake_database_tool()
+        auto = HybridCaseSearch(embed=_embed, database_tool=tool, mode="auto")
+        result = asyncio.run(auto.search("XC9000", features, top_k=3))
+
+        assert result["mode"] == "lexical"
+        assert tool.calls == [("lexical", ["0XCO001"])]
+        assert len(embed_calls) == 1
+
+    def test_vector_failure_falls_back_to_lexical(self):
+        """测试embedding失败时仍返回词法结果"""
+        import asyncio
+        from src.mcp.tools.hybrid_search import HybridCaseSearch
+
+        async def _broken(features):
+            raise RuntimeError("embedding down")
+
+        search = HybridCaseSearch(embed=_broken, database_tool=self._fake_database_tool(), mode="hybrid")
+        result = asyncio.run(search.search("XC9000", {"error_codes": ["0XCO001"]}))
+
+        assert [r["case_id"] for r in result["results"]] == ["CASE_A", "CASE_B"]
+        assert "vector" in result["errors"]
+
+    def test_parser_code_formats_match_end_to_end(self, monkeypatch):
+        """测试解析器输出的错误码格式（0x1A2B / ERR_DDR_001）在SQL两侧都规范化后命中，词法无结果时回退向量"""
+        import asyncio
+        import re
+        from contextlib import asynccontextmanager
+        from src.database import error_code_index
+        from src.mcp.tools.database_tools import DatabaseTool
+        from src.mcp.tools.hybrid_search import HybridCaseSearch
+        from src.mcp.tools.log_parser import LogParserTool
+
+        parsed = asyncio.run(LogParserTool().parse("XC9000", "[ERROR] ddr fault 0x1A2B at ch1 ERR_DDR_001 retry"))
+        features = parsed["parsed_features"]
+        assert sorted(features["error_codes"]) == ["0x1A2B", "ERR_DDR_001"]
+
+        # 库中按原样存储的错误码（与解析器格式一致）
+        stored = {"CASE_DDR": ["0x1a2b", "ERR_DDR_001"]}
+        executed = []
+
+        def _sql_normalize(codes):
+            # 与 NORMALIZE_ERROR_CODES_FUNCTION 的 regexp_replace 等价
+            return [re.sub(r"[\s_:-]+", "", c).upper() for c in codes]
+
+        class _Session:
+            async def execute(self, statement, params=None):
+                sql = str(statement)
+                executed.append((sql, params))
+                if "set_config" in sql:
+                    return None
+                assert "normalize_error_codes(fc.error_codes) && CAST(:codes AS varchar[])" in sql
+                rows = []
+                for case_id, codes in stored.items():
+                    hits = len(set(_sql_normalize(codes)) & set(params["codes"]))
+                    if hits:
+                        rows.append((case_id, "XC9000", "ddr", "memory", "", codes, None, None, None, None, 1, True, hits, 0.0))
+                return type("R", (), {"fetchall": lambda self: rows})()
+
+        @asynccontextmanager
+        async def _read_session(key=None):
+            yield _Session()
+
+        tool = DatabaseTool.__new__(DatabaseTool)
+        tool.get_read_session = _read_session
+
+        index = error_code_index.ErrorCodeIndex()
+        index.add_case("CASE_DDR", stored["CASE_DDR"], "XC9000")
+        monkeypatch.setattr(error_code_index, "_error_code_index", index)
+
+        vector_calls = []
+
+        async def _embed(features):
+            return [0.1]
+
+        async def _vector_search(vector, chip_model, limit, threshold):
+            vector_calls.append(vector)
+            return {"results": [{"case_id": "CASE_VEC", "similarity": 0.9}]}
+
+        tool.vector_search = _vector_search
+        search = HybridCaseSearch(embed=_embed, database_tool=tool, mode="auto")
+
+        result = asyncio.run(search.search("XC9000", features))
+        assert result["mode"] == "lexical"
+        assert [r["case_id"] for r in result["results"]] == ["CASE_DDR"]
+        assert result["results"][0]["code_hits"] == 2
+        assert sorted(executed[-1][1]["codes"]) == ["0X1A2B", "ERRDDR001"]
+        assert vector_calls == []
+
+        # 内存索引命中但库中已无该案例：回退向量检索
+        stored.clear()
+        result = asyncio.run(search.search("XC9000", features))
+        assert result["mode"] == "vector"
+        assert [r["case_id"] for r in result["results"]] == ["CASE_VEC"]
+        assert len(vector_calls) == 1
+
+
+class TestNoCPathTable:
+    """测试NoC全源最短路径表"""
+
+    def test_hop_counts_match_reference_bfs(self):
+        """测试NumPy批量BFS与逐源BFS结果一致，路径合法"""
+        import random
+        from collections import deque
+        from src.database.noc_paths import NoCPathTable
+
+        rng = random.Random(7)
+        nodes = [{"name": f"N{i}", "label": "NoCRouter"} for i in range(40)]
+        edges = [(f"N{rng.randrange(40)}", f"N{rng.randrange(40)}") for _ in range(60)]
+        table = NoCPathTable.build("XC9000", nodes, edges)
+
+        adjacency = {n["name"]: set() for n in nodes}
+        for a, b in edges:
+            if a != b:
+                adjacency[a].add(b)
+                adjacency[b].add(a)
+
+        for source in adjacency:
+            expected = {source: 0}
+            queue = deque([source])
+            while queue:
+                node = queue.popleft()
+                for nxt in adjacency[node]:
+                    if nxt not in expected:
+                        expected[nxt] = expected[node] + 1
+                        queue.append(nxt)
+
+            for target in adjacency:
+                assert table.hop_count(source, target) == expected.get(target)
+                path = table.path(source, target)
+                if target in expected:
+                    assert path[0] == source and path[-1] == target
+                    assert len(path) == expected[target] + 1
+                    assert all(b in adjacency[a] for a, b in zip(path, path[1:]))
+                else:
+                    assert path is None
+
+    def test_find_path_format_and_persistence(self, tmp_path):
+        """测试返回格式与Cypher一致，npz保存后可加载"""
+        from src.database.noc_paths import NoCPathRegistry, NoCPathTable
+
+        nodes = [
+            {"name": "cpu0", "label": "CPUCore"},
+            {"name": "r0", "label": "NoCRouter"},
+            {"name": "r1", "label": "NoCRouter"},
+            {"name": "ddr0", "label": "DDRController"},
+        ]
+        edges = [("cpu0", "r0"), ("r0", "r1"), ("r1", "ddr0")]
+
+        registry = NoCPathRegistry(str(tmp_path))
+        registry.put(NoCPathTable.build("XC9000", nodes, edges, graph_version=3))
+        table = NoCPathRegistry(str(tmp_path)).get("XC9000")
+
+        assert table.graph_version == 3
+        assert table.find_path("cpu0", "ddr0") == [{"noc_nodes": ["r0", "r1"], "hop_count": 3}]
+
+        info = table.congestion_info([("cpu0", "ddr0"), ("cpu0", "r1"), ("cpu0", "missing")])
+        assert info["router_load"] == {"r0": 2, "r1": 2}
+        assert info["unresolved"] == [["cpu0", "missing"]]
+
+    def test_duplicate_names_keyed_by_subsystem(self):
+        """测试不同子系统的同名模块按唯一ID区分，日志中的模块名配对"""
+        from src.database.noc_paths import NoCPathTable
+
+        nodes = [
+            {"id": "4:a:1", "name": "ddr_ctrl", "label": "DDRController", "subsystem": "mem0"},
+            {"id": "4:a:2", "name": "ddr_ctrl", "label": "DDRController", "subsystem": "mem1"},
+            {"id": "4:a:3", "name": "R0", "label": "NoCRouter"},
+            {"id": "4:a:4", "name": "R1", "label": "NoCRouter"},
+            {"id": "4:a:5", "name": "cpu0", "label": "CPUCore", "subsystem": "cpu"},
+        ]
+        edges = [("4:a:5", "4:a:3"), ("4:a:3", "4:a:1"), ("4:a:3", "4:a:4"), ("4:a:4", "4:a:2")]
+        table = NoCPathTable.build("XC9000", nodes, edges)
+
+        assert table.node_keys.tolist() == ["mem0/ddr_ctrl", "mem1/ddr_ctrl", "R0", "R1", "cpu0"]
+        assert "ddr_ctrl" not in table
+        assert table.path("cpu0", "mem1/ddr_ctrl") == ["cpu0", "R0", "R1", "mem1/ddr_ctrl"]
+        assert table.hop_count("cpu0", "4:a:1") == 2
+
+        log = "[ERR] cpu0 timeout via noc r1 -> MEM1/ddr_ctrl, ddr_ctrl retry"
+        assert table.mentioned_modules(log) == ["cpu0", "R1", "mem1/ddr_ctrl"]
+        assert table.module_pairs(log) == [("cpu0", "mem1/ddr_ctrl")]
+
+    def test_stale_table_rebuilt_for_current_graph_version(self, tmp_path, monkeypatch):
+        """测试路径表图版本落后时按需从图重建，同版本不重复导出"""
+        import asyncio
+        from src.database import kg_cache, noc_paths
+        from src.database.noc_paths import NoCPathRegistry, NoCPathTable
+
+        class FakeRepository:
+            def __init__(self):
+                self.version = 2
+                self.exports = 0
+
+            async def get_graph_version(self):
+                return self.version
+
+            async def export_noc_topology(self, chip_models):
+                self.exports += 1
+                return {"XC9000": {
+                    "nodes": [{"id": "1", "name": "cpu0", "label": "CPUCore"},
+                              {"id": "2", "name": "R0", "label": "NoCRouter"},
+                              {"id": "3", "name": "l3", "label": "L3Cache"}],
+                    "edges": [("1", "2"), ("2", "3")]
+                }}
+
+        repo = FakeRepository()
+        registry = NoCPathRegistry(str(tmp_path))
+        registry.put(NoCPathTable.build(
+            "XC9000", [{"name": "cpu0", "label": "CPUCore"}, {"name": "l3", "label": "L3Cache"}],
+            [("cpu0", "l3")], graph_version=1
+        ))
+        monkeypatch.setattr(noc_paths, "_noc_path_registry", registry)
+        monkeypatch.setattr(kg_cache, "_kg_cache", kg_cache.KnowledgeGraphCache(
+            repository=repo, version_check_interval=0
+        ))
+
+        async def _run():
+            first = await noc_paths.analyze_noc_paths("XC9000", "cpu0 -> l3 parity error")
+            await noc_paths.get_noc_path_table("XC9000")
+            return first
+
+        result = asyncio.run(_run())
+
+        assert repo.exports == 1
+        assert registry.get("XC9000").graph_version == 2
+        assert result["module_pairs"] == [["cpu0", "l3"]]
+        assert result["noc_path"] == ["cpu0", "R0", "l3"]
+        assert NoCPathRegistry(str(tmp_path)).get("XC9000").graph_version == 2
+
+
+class TestKnowledgeLoopBatch:
+    """批量知识学习测试"""
+
+    @staticmethod
+    def _payload(agent, module, codes, root_cause):
+        return agent._build_case_payload(
+            "XC9000",
+            {"failure_domain": "cpu"},
+            {
+                "corrected_result": {"failure_domain": "cpu", "module": module, "root_cause": root_cause},
+                "correction_reason": "专家确认的根因",
+                "submitted_by": "expert1"
+            },
+            {"error_codes": codes, "modules": [module]}
+        )
+
+    def test_plan_batch_merges_cases_and_rules(self):
+        """测试同一案例/规则在批内合并，已存在的规则复用ID"""
+        from datetime import datetime
+        from types import SimpleNamespace
+        from src.agents.agent2.knowledge_loop import KnowledgeLoopAgent
+
+        agent = KnowledgeLoopAgent()
+        payloads = [
+            self._payload(agent, "L3Cache", ["0xCO001", "0xCO002"], "旧根因"),
+            self._payload(agent, "L3Cache", ["0xCO001"], "新根因"),
+            self._payload(agent, "DDR", ["0xDD001", "0xDD002", "0xDD003", "0xDD004"], "时序"),
+        ]
+        existing = {
+            ("XC9000", "cpu", "DDR"): SimpleNamespace(
+                case_id="CASE_OLD", root_cause="r", root_cause_category="c",
+                failure_mode="m", failure_mechanism="k"
+            )
+        }
+        plan = agent._plan_batch(
+            payloads, existing, {("XC9000", "0xCO002"): "RULE_EXISTING"}, datetime(2026, 1, 1)
+        )
+
+        assert len(plan["cases"]) == 2
+        assert plan["cases_created"] == 1
+        l3_case = plan["items"][0]["case_id"]
+        assert plan["items"][1]["case_id"] == l3_case
+        assert plan["items"][1]["case_action"] == "updated"
+        assert plan["cases"][l3_case]["root_cause"] == "新根因"
+        assert plan["cases"]["CASE_OLD"]["failure_mode"] == "m"
+
+        # 0xCO001 两条修正共用一条新规则；0xCO002 复用已有规则；DDR 最多3条
+        assert plan["items"][0]["rules"][0] == plan["items"][1]["rules"][0]
+        assert plan["items"][0]["rules"][1] == "RULE_EXISTING"
+        assert len(plan["items"][2]["rules"]) == 3
+        assert "RULE_EXISTING" not in plan["new_rules"]
+        assert len(plan["new_rules"]) == 4
+        assert plan["rules"][plan["items"][0]["rules"][0]]["conclusion"]["root_cause"] == "新根因"
+
+    def test_upsert_statements_compile(self):
+        """测试批量 upsert 语句生成 ON CONFLICT"""
+        from sqlalchemy.dialects import postgresql
+        from src.agents.agent2.knowledge_loop import KnowledgeLoopAgent
+
+        case_sql = str(KnowledgeLoopAgent._case_upsert_stmt().compile(dialect=postgresql.dialect()))
+        assert "ON CONFLICT (case_id) DO UPDATE" in case_sql
+        assert "coalesce(excluded.embedding, failure_cases.embedding)" in case_sql
+        assert "version = (failure_cases.version +" in case_sql
+
+        rule_sql = str(KnowledgeLoopAgent._rule_upsert_stmt().compile(dialect=postgresql.dialect()))
+        assert "ON CONFLICT (rule_id) DO UPDATE SET conclusion = excluded.conclusion" in rule_sql
+
+
+class TestAlertStore:
+    """告警环形缓冲区与后台分发测试"""
+
+    @staticmethod
+    def _alert(alert_type, severity, message, **kwargs):
+        from src.monitoring import Alert
+        return Alert(alert_type=alert_type, severity=severity, title="t", message=message, **kwargs)
+
+    def test_ring_buffer_evicts_and_indexes(self):
+        """测试容量满后覆盖最旧告警，按类型/严重程度的查询只返回未覆盖的告警"""
+        from datetime import datetime, timedelta
+        from src.monitoring import AlertRingBuffer, AlertSeverity, AlertType
+
+        buffer = AlertRingBuffer(capacity=4)
+        base = datetime.utcnow() - timedelta(minutes=10)
+        kinds = [AlertType.LLM_API_FAILED, AlertType.EMBEDDING_API_FAILED]
+        for i in range(6):
+            buffer.append(self._alert(
+                kinds[i % 2],
+                AlertSeverity.CRITICAL if i % 3 == 0 else AlertSeverity.WARNING,
+                f"m{i}",
+                timestamp=base + timedelta(minutes=i)
+            ))
+
+        assert len(buffer) == 4
+        assert buffer.evicted == 2
+        assert [a.message for a in buffer.query()] == ["m5", "m4", "m3", "m2"]
+        assert [a.message for a in buffer.query(alert_type="llm_api_failed")] == ["m4", "m2"]
+        assert [a.message for a in buffer.query(severity="critical")] == ["m3"]
+        assert [a.message for a in buffer.query(since=base + timedelta(minutes=3, seconds=30))] == ["m5", "m4"]
+        assert [a.message for a in buffer.query(limit=1)] == ["m5"]
+        assert buffer.find_by_fingerprint(self._alert(kinds[0], AlertSeverity.CRITICAL, "m0").fingerprint) is None
+
+    def test_send_alert_dedups_and_dispatches_in_background(self, monkeypatch):
+        """测试相同指纹告警去重，入库按批进行，慢通知超时不阻塞发送"""
+        import asyncio
+        import time
+        from src.monitoring import AlertSeverity, AlertType, get_alert_manager, reset_alert_manager
+
+        reset_alert_manager()
+        manager = get_alert_manager()
+        stored = []
+
+        async def _store(batch):
+            stored.append([a.message for a in batch])
+
+        async def _slow_notify(alert):
+            await asyncio.sleep(10)
+
+        dispatcher = manager._dispatcher
+        monkeypatch.setattr(dispatcher, "store_batch", _store)
+        monkeypatch.setattr(dispatcher, "notifiers", {"webhook": _slow_notify})
+        monkeypatch.setattr(dispatcher, "notify_failures", {"webhook": 0})
+        monkeypatch.setattr(dispatcher, "notify_timeout", 0.05)
+
+        async def _run():
+            start = time.perf_counter()
+            first = await manager.send_alert(
+                AlertType.LLM_API_FAILED, AlertSeverity.ERROR, "LLM失败", "请求 1234 超时"
+            )
+            again = await manager.send_alert(
+                AlertType.LLM_API_FAILED, AlertSeverity.ERROR, "LLM失败", "请求 5678 超时"
+            )
+            other = await manager.send_alert(
+                AlertType.LLM_API_FAILED, AlertSeverity.ERROR, "LLM失败", "连接被拒绝"
+            )
+            elapsed = time.perf_counter() - start
+            await manager.flush()
+            await manager.stop_dispatcher()
+            return first, again, other, elapsed, manager.get_alert_statistics()
+
+        try:
+            first, again, other, elapsed, stats = asyncio.run(_run())
+        finally:
+            reset_alert_manager()
+
+        assert elapsed < 0.05
+        assert again is first and first.occurrences == 2
+        assert other is not first
+        # 同类型第二条告警在通知冷却期内
+        assert first.notify and not other.notify
+        assert stored == [["请求 1234 超时", "连接被拒绝"]]
+        assert dispatcher.notify_failures == {"webhook": 1}
+        assert stats["deduplicated"] == 1 and stats["total_alerts"] == 2
+        assert stats["dispatcher"]["batches"] == 1 and stats["dispatcher"]["pending"] == 0
+
+
+class TestPipelineMetrics:
+    """流水线耗时指标测试"""
+
+    def test_timed_records_histogram_and_status(self):
+        """测试装饰器记录耗时和成功/失败状态，异常照常抛出"""
+        import asyncio
+        from src.monitoring.metrics import STAGE_SECONDS, STAGE_TOTAL, get_metrics_registry, timed
+
+        get_metrics_registry().clear()
+
+        @timed("unit_ok")
+        async def _ok():
+            return 1
+
+        @timed("unit_soft_fail", is_ok=lambda r: r["success"])
+        async def _soft_fail():
+            return {"success": False}
+
+        @timed("unit_raise")
+        async def _raise():
+            raise ValueError("boom")
+
+        async def _run():
+            for _ in range(3):
+                await _ok()
+            await _soft_fail()
+            with pytest.raises(ValueError):
+                await _raise()
+
+        asyncio.run(_run())
+
+        assert STAGE_SECONDS.count("unit_ok") == 3
+        assert STAGE_TOTAL.value("unit_ok", "ok") == 3
+        assert STAGE_TOTAL.value("unit_soft_fail", "error") == 1
+        assert STAGE_TOTAL.value("unit_raise", "error") == 1
+        get_metrics_registry().clear()
+
+    def test_histogram_exposition_and_quantile(self):
+        """测试Prometheus文本格式（累积桶、+Inf、_sum/_count）和分位数插值"""
+        from src.monitoring.metrics import Histogram
+
+        hist = Histogram("t_seconds", "测试", ("stage",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 0.7, 3.0):
+            hist.observe(value, "parse")
+
+        lines = hist.collect('worker="1"')
+        assert 't_seconds_bucket{stage="parse",worker="1",le="0.1"} 2' in lines
+        assert 't_seconds_bucket{stage="parse",worker="1",le="1.0"} 4' in lines
+        assert 't_seconds_bucket{stage="parse",worker="1",le="+Inf"} 5' in lines
+        assert 't_seconds_count{stage="parse",worker="1"} 5' in lines
+        assert hist.quantile(0.5, "parse") == 0.1 + 0.9 * 0.5 / 2
+        assert hist.quantile(0.99, "parse") == 1.0
+        assert hist.quantile(0.5, "missing") is None
+
+    def test_llm_tokens_respect_metrics_switch(self):
+        """测试关闭指标采集后不再累计LLM token数"""
+        from src.monitoring.metrics import LLM_TOKENS, get_metrics_registry, record_llm_tokens, set_metrics_enabled
+
+        get_metrics_registry().clear()
+        usage = {"prompt_tokens": 120, "completion_tokens": 30, "total_tokens": 150}
+        try:
+            record_llm_tokens("glm-4", usage)
+            set_metrics_enabled(False)
+            record_llm_tokens("glm-4", usage)
+        finally:
+            set_metrics_enabled(True)
+
+        assert LLM_TOKENS.value("glm-4", "prompt") == 120
+        assert LLM_TOKENS.value("glm-4", "completion") == 30
+        get_metrics_registry().clear()
+
+
+class TestPasswordHashPool:
+    """密码哈希线程池测试"""
+
+    def test_verify_runs_off_event_loop_with_bounded_pending(self):
+        """测试慢校验在线程池中执行，不阻塞事件循环，在途请求数受限"""
+        import asyncio
+        import threading
+        import time
+        from src.auth.password_pool import PasswordHashPool
+
+        active = {"now": 0, "peak": 0}
+        lock = threading.Lock()
+
+        def _slow_verify(password, password_hash):
+            with lock:
+                active["now"] += 1
+                active["peak"] = max(active["peak"], active["now"])
+            time.sleep(0.05)
+            with lock:
+                active["now"] -= 1
+            return password == password_hash
+
+        pool = PasswordHashPool(max_workers=2, max_pending=3, verifier=_slow_verify)
+
+        async def _run():
+            ticks = 0
+
+            async def _ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.005)
+                    ticks += 1
+
+            ticker = asyncio.create_task(_ticker())
+            results = await asyncio.gather(*[pool.verify("pw", "pw" if i % 2 else "x") for i in range(6)])
+            ticker.cancel()
+            return results, ticks
+
+        try:
+            results, ticks = asyncio.run(_run())
+        finally:
+            pool.shutdown()
+
+        assert results == [False, True] * 3
+        assert active["peak"] == 2
+        # 6 次 50ms 校验、2 线程约 150ms，期间心跳应持续运行
+        assert ticks >= 10
+        assert pool.get_stats()["calls"] == 6
+        assert pool.get_stats()["in_flight"] == 0
+
+    def test_verify_empty_or_invalid_hash(self):
+        """测试空哈希和无效哈希返回False"""
+        import asyncio
+        from src.auth.password_pool import PasswordHashPool
+
+        def _raise(password, password_hash):
+            raise ValueError("hash could not be identified")
+
+        pool = PasswordHashPool(max_workers=1, verifier=_raise)
+        try:
+            assert asyncio.run(pool.verify("pw", None)) is False
+            assert asyncio.run(pool.verify("pw", "garbage")) is False
+        finally:
+            pool.shutdown()
+
+
+class TestStatelessToken:
+    """无状态Token校验与吊销表测试"""
+
+    @staticmethod
+    def _user(user_id="USR_1", permissions=("analysis:read", "case:read", "custom:perm")):
+        from types import SimpleNamespace
+        perms = [SimpleNamespace(name=name, is_active=True) for name in permissions]
+        roles = [
+            SimpleNamespace(name="engineer", is_active=True, permissions=perms),
+            SimpleNamespace(name="retired", is_active=False, permissions=[SimpleNamespace(name="user:delete", is_active=True)])
+        ]
+        return SimpleNamespace(user_id=user_id, username="alice", full_name="Alice", roles=roles)
+
+    @staticmethod
+    def _loaded_revocations():
+        """已完成首次加载的空吊销表"""
+        from src.auth.revocation import RevocationList
+        revocations = RevocationList()
+        revocations.loaded = True
+        return revocations
+
+    def test_access_token_carries_permissions(self, monkeypatch):
+        """测试访问Token携带权限位图，校验不查库"""
+        from src.auth import revocation
+        from src.auth.service import auth_service
+
+        monkeypatch.setattr(revocation, "_revocation_list", self._loaded_revocations())
+        token_data = auth_service.build_token_data(self._user(), "SES_1")
+        assert token_data["px"] == ["custom:perm"]
+
+        principal = auth_service.verify_access_token(auth_service.create_access_token(token_data))
+        assert principal.user_id == "USR_1"
+        assert principal.session_id == "SES_1"
+        assert principal.has_role("engineer") and not principal.has_role("retired")
+        assert principal.has_permission("case:read") and principal.has_permission("custom:perm")
+        assert not principal.has_permission("user:delete")
+
+        # 刷新Token、旧格式Token不能当作访问Token
+        assert auth_service.verify_access_token(auth_service.create_refresh_token(token_data)) is None
+        legacy = auth_service.create_access_token({"sub": "USR_1", "username": "alice"})
+        assert auth_service.verify_access_token(legacy) is None
+
+    def test_revocation_kinds(self, monkeypatch):
+        """测试登出/角色变更/禁用账户三种吊销"""
+        from datetime import datetime, timedelta, timezone
+        from src.auth import revocation
+        from src.auth.service import auth_service
+
+        revocations = self._loaded_revocations()
+        monkeypatch.setattr(revocation, "_revocation_list", revocations)
+        expires = datetime.now(timezone.utc) + timedelta(hours=1)
+
+        def _tokens(session_id):
+            data = auth_service.build_token_data(self._user(), session_id)
+            return {**data, "type": "access"}, {**data, "type": "refresh"}
+
+        access, refresh = _tokens("SES_A")
+        other_access, other_refresh = _tokens("SES_B")
+
+        # 登出：只影响该会话
+        revocations.apply(revocation.REVOKE_SESSION, "SES_A", 0, expires)
+        assert revocations.is_revoked(access) and revocations.is_revoked(refresh)
+        assert not revocations.is_revoked(other_access)
+
+        # 角色变更：此前签发的访问Token失效，刷新Token仍可用，之后签发的新Token有效
+        revocations.apply(revocation.REVOKE_ACCESS, "USR_1", other_access["sv"] + 1, expires)
+        assert revocations.is_revoked(other_access)
+        assert not revocations.is_revoked(other_refresh)
+        assert not revocations.is_revoked({**other_access, "sv": other_access["sv"] + 2})
+
+        # 禁用账户：刷新Token也失效
+        revocations.apply(revocation.REVOKE_USER, "USR_1", other_access["sv"] + 1, expires)
+        assert revocations.is_revoked(other_refresh)
+
+        # 过期条目被清除
+        revocations.prune(now=expires.timestamp() + 1)
+        assert not revocations.is_revoked(access)
+        assert revocations.get_stats()["revoked_users"] == 0
+
+    def test_rejects_tokens_until_first_load(self, monkeypatch):
+        """测试首次加载吊销记录前拒绝所有Token，启动时重试加载"""
+        import asyncio
+        from src.auth import revocation
+        from src.auth.service import auth_service
+
+        revocations = revocation.RevocationList(initial_attempts=3, initial_backoff=0)
+        monkeypatch.setattr(revocation, "_revocation_list", revocations)
+        token = auth_service.create_access_token(auth_service.build_token_data(self._user(), "SES_1"))
+        assert auth_service.verify_access_token(token) is None
+
+        attempts = []
+
+        async def _refresh():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise ConnectionError("db down")
+            revocations.loaded = True
+
+        monkeypatch.setattr(revocations, "refresh", _refresh)
+
+        async def _run():
+            await revocations.start()
+            await revocations.stop()
+
+        asyncio.run(_run())
+        assert len(attempts) == 3
+        assert revocations.get_stats()["refresh_failures"] == 2
+        assert auth_service.verify_access_token(token).user_id == "USR_1"
+
+
+class TestCorrectionPagination:
+    """修正列表SQL分页测试"""
+
+    def test_cursor_roundtrip(self):
+        """测试游标编解码"""
+        from datetime import datetime, timezone
+        from src.database.pagination import encode_cursor, decode_cursor
+
+        ts = datetime(2026, 3, 1, 8, 30, tzinfo=timezone.utc)
+        assert decode_cursor(encode_cursor(ts, "COR_1"), 2) == [ts, "COR_1"]
+        with pytest.raises(ValueError):
+            decode_cursor("not-a-cursor", 2)
+        with pytest.raises(ValueError):
+            decode_cursor(encode_cursor(ts), 2)
+
+    def test_list_corrections_pushes_filters_into_sql(self, monkeypatch):
+        """测试筛选、键集分页和计数都在SQL中完成，只取 limit+1 行"""
+        import asyncio
+        from contextlib import asynccontextmanager
+        from datetime import datetime, timedelta, timezone
+        from types import SimpleNamespace
+        from sqlalchemy.dialects import postgresql
+        from src.agents.agent2 import correction_processor as module
+
+        base = datetime(2026, 3, 1, tzinfo=timezone.utc)
+        rows = [
+            SimpleNamespace(
+                correction_id=f"COR_{i}", analysis_id="A1", submitted_by="expert1",
+                submitted_at=base - timedelta(minutes=i), approval_status="pending", approved_by=None,
+                correction_reason="r", original_result={}, corrected_result={}
+            )
+            for i in range(3)
+        ]
+        statements = []
+
+        class _Session:
+            async def execute(self, stmt):
+                statements.append(str(stmt.compile(dialect=postgresql.dialect())))
+                if "count(*)" in statements[-1]:
+                    return SimpleNamespace(scalar_one=lambda: 42)
+                return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: rows))
+
+        @asynccontextmanager
+        async def _get_session():
+            yield _Session()
+
+        monkeypatch.setattr(module, "get_db_manager", lambda: SimpleNamespace(get_session=_get_session))
+        processor = module.CorrectionProcessor()
+
+        page = asyncio.run(processor.list_corrections(expert_id="expert1", limit=2))
+        assert [item["correction_id"] for item in page["items"]] == ["COR_0", "COR_1"]
+        assert page["total"] == 42
+        assert page["next_cursor"]
+        assert "expert_corrections.approval_status = %(approval_status_1)s" in statements[0]
+        assert "ORDER BY expert_corrections.submitted_at DESC, expert_corrections.correction_id DESC" in statements[0]
+        assert "LIMIT %(param_1)s" in statements[0]
+        assert "ORDER BY" not in statements[1]
+
+        statements.clear()
+        asyncio.run(processor.list_corrections(limit=2, cursor=page["next_cursor"], offset=10))
+        assert "(expert_corrections.submitted_at, expert_corrections.correction_id) < " in statements[0]
+        assert "OFFSET" not in statements[0]
+
+
+class TestAdminListings:
+    """管理后台列表查询测试"""
+
+    @staticmethod
+    def _fake_db(monkeypatch, module, results):
+        from contextlib import asynccontextmanager
+        from types import SimpleNamespace
+        from sqlalchemy.dialects import postgresql
+
+        statements = []
+
+        class _Session:
+            async def execute(self, stmt):
+                statements.append(str(stmt.compile(dialect=postgresql.dialect())))
+                rows = results.pop(0)
+                return SimpleNamespace(
+                    scalars=lambda: SimpleNamespace(all=lambda: rows),
+                    all=lambda: rows
+                )
+
+        @asynccontextmanager
+        async def _get_session():
+            yield _Session()
+
+        monkeypatch.setattr(module, "get_db_manager", lambda: SimpleNamespace(get_session=_get_session))
+        return statements
+
+    @staticmethod
+    def _admin():
+        from src.auth.revocation import TokenPrincipal
+        return TokenPrincipal(
+            user_id="USR_ADMIN", username="admin", full_name=None, roles=frozenset(),
+            permissions=frozenset({"user:read", "role:read"})
+        )
+
+    def test_list_users_keyset_and_eager_roles(self, monkeypatch):
+        """测试用户列表批量加载角色、转义搜索词并按用户名键集分页"""
+        import asyncio
+        from datetime import datetime
+        from types import SimpleNamespace
+        from fastapi import Response
+        from src.api import admin_routes
+
+        role = SimpleNamespace(name="viewer", is_active=True)
+        users = [
+            SimpleNamespace(
+                user_id=f"USR_{i}", username=f"user{i}", email=None, full_name=None, department=None,
+                position=None, is_active=True, is_verified=False, roles=[role], created_at=datetime(2026, 1, 1)
+            )
+            for i in range(3)
+        ]
+        statements = self._fake_db(monkeypatch, admin_routes, [list(users), users[2:]])
+
+        response = Response()
+        page = asyncio.run(admin_routes.list_users(
+            response=response, skip=0, limit=2, search="50%_off", cursor=None, current_user=self._admin()
+        ))
+        assert [item.username for item in page] == ["user0", "user1"]
+        assert page[0].roles == ["viewer"]
+        cursor = response.headers["X-Next-Cursor"]
+        assert "users.username ILIKE %(username_1)s::VARCHAR ESCAPE '\\'" in statements[0]
+        assert "ORDER BY users.username" in statements[0]
+        assert "OFFSET" not in statements[0]
+
+        response = Response()
+        page = asyncio.run(admin_routes.list_users(
+            response=response, skip=0, limit=2, search=None, cursor=cursor, current_user=self._admin()
+        ))
+        assert [item.username for item in page] == ["user2"]
+        assert "users.username > %(username_1)s" in statements[1]
+        assert "X-Next-Cursor" not in response.headers
+
+    def test_list_roles_counts_users_in_one_query(self, monkeypatch):
+        """测试角色列表的用户数用一次分组计数得到"""
+        import asyncio
+        from uuid import uuid4
+        from types import SimpleNamespace
+        from fastapi import Response
+        from src.api import admin_routes
+
+        roles = [
+            SimpleNamespace(
+                id=uuid4(), name=name, display_name=name, description=None,
+                is_active=True, is_system_role=False, level=0
+            )
+            for name in ("admin", "viewer")
+        ]
+        statements = self._fake_db(monkeypatch, admin_routes, [roles, [(roles[1].id, 7)]])
+
+        page = asyncio.run(admin_routes.list_roles(
+            response=Response(), skip=0, limit=10, cursor=None, current_user=self._admin()
+        ))
+        assert [(item.name, item.user_count) for item in page] == [("admin", 0), ("viewer", 7)]
+        assert len(statements) == 2
+        assert "GROUP BY user_roles.role_id" in statements[1]
+
+
+class TestExpertScheduler:
+    """专家调度器测试"""
+
+    @staticmethod
+    def _scheduler():
+        from src.agents.agent2.expert_scheduler import ExpertScheduler, ExpertProfile, infer_expert_domains
+
+        scheduler = ExpertScheduler(domain_slack=2)
+        scheduler.set_experts([
+            ExpertProfile("E_CACHE", "cache1", department="缓存设计部", domains=infer_expert_domains("缓存设计部")),
+            ExpertProfile("E_IO", "io1", department="IO设计部", domains=infer_expert_domains("IO设计部"), pending=1),
+            ExpertProfile(
+                "E_QA", "qa1", department="质量部",
+                domains=infer_expert_domains("质量部", {"expert_domains": ["io"]}), pending=5
+            ),
+        ])
+        return scheduler
+
+    def test_domain_match_with_load_slack(self):
+        """测试优先分给领域专家，负载超出让分后改派给负载更低的专家"""
+        scheduler = self._scheduler()
+
+        picks = [scheduler.assign("cache").user_id for _ in range(6)]
+        # E_CACHE 领先 E_IO 不超过2个任务时一直由它处理，之后与 E_IO 交替
+        assert picks[:3] == ["E_CACHE"] * 3
+        assert set(picks[3:]) == {"E_CACHE", "E_IO"}
+        assert scheduler.get("E_CACHE").pending + scheduler.get("E_IO").pending == 7
+        assert scheduler.get_stats()["assignments"] == 6
+
+        # 显式配置的领域 + 部门筛选
+        assert scheduler.select("io", department="质量部").user_id == "E_QA"
+        assert scheduler.select("io", department="不存在的部门") is None
+
+    def test_resolve_release_and_listing(self):
+        """测试审批/撤销更新负载，过期堆条目被懒删除"""
+        scheduler = self._scheduler()
+
+        expert = scheduler.assign("io")
+        assert expert.user_id == "E_IO" and expert.pending == 2
+        scheduler.release("E_IO")
+        assert scheduler.get("E_IO").pending == 1 and scheduler.get("E_IO").recent == 0
+
+        for _ in range(200):
+            scheduler.on_correction_created("E_QA", pending=True)
+            scheduler.on_correction_resolved("E_QA")
+        assert scheduler.get("E_QA").pending == 5
+        assert len(scheduler._heaps[(None, None)]) <= 4 * 3 + 64
+
+        # 未知专家的事件被忽略
+        scheduler.on_correction_resolved("UNKNOWN")
+
+        listing = [expert.user_id for expert in scheduler.list_experts()]
+        assert listing[0] == "E_CACHE"
+        assert scheduler.get("E_CACHE").to_dict()["domains"] == ["cache"]
+
+
+class TestSnapshotRollback:
+    """多轮对话回滚与时间线投影测试"""
+
+    @staticmethod
+    def _handler(results):
+        from contextlib import asynccontextmanager
+        from types import SimpleNamespace
+        from sqlalchemy.dialects import postgresql
+        from src.agents.multi_turn_handler import MultiTurnConversationHandler
+
+        statements = []
+
+        class _Session:
+            async def execute(self, stmt):
+                statements.append(str(stmt.compile(dialect=postgresql.dialect())))
+                return results.pop(0)
+
+            async def commit(self):
+                statements.append("COMMIT")
+
+        @asynccontextmanager
+        async def _factory():
+            yield _Session()
+
+        handler = MultiTurnConversationHandler()
+        handler.db = SimpleNamespace(
+            _session_factory=_factory,
+            get_read_session=lambda key=None: _factory(),
+            mark_written=lambda key: statements.append(f"WRITTEN {key}")
+        )
+        return handler, statements
+
+    def test_timeline_reads_projection_only(self):
+        """测试时间线只查询摘要投影列并跳过已回滚快照"""
+        import asyncio
+        from datetime import datetime, timezone
+        from types import SimpleNamespace
+
+        row = SimpleNamespace(
+            snapshot_id=1, message_id=10, created_at=datetime(2026, 3, 1, tzinfo=timezone.utc),
+            summary={"failure_domain": "cache", "confidence": 0.8, "need_expert": False, "root_cause": "x"},
+            info_count=3
+        )
+        handler, statements = self._handler([SimpleNamespace(all=lambda: [row])])
+
+        timeline = asyncio.run(handler.get_analysis_timeline("S1"))
+        assert timeline["total_entries"] == 1
+        assert timeline["timeline"][0]["analysis_summary"]["failure_domain"] == "cache"
+        assert timeline["timeline"][0]["accumulated_info_count"] == 3
+        assert "accumulated_context" not in statements[0]
+        assert "analysis_snapshots.analysis_result" not in statements[0]
+        assert "analysis_snapshots.is_superseded IS NOT true" in statements[0]
+
+    def test_rollback_marks_later_rows_superseded(self):
+        """测试回滚以批量UPDATE标记后续消息和快照，不删除"""
+        import asyncio
+        from types import SimpleNamespace
+
+        target = SimpleNamespace(sequence_number=3, message_type="user_input")
+        current = SimpleNamespace(
+            snapshot_id=2, analysis_result={"final_root_cause": {"failure_domain": "io"}},
+            summary=None, info_count=2
+        )
+        handler, statements = self._handler([
+            SimpleNamespace(first=lambda: target),
+            SimpleNamespace(rowcount=1),
+            SimpleNamespace(rowcount=4),
+            SimpleNamespace(first=lambda: current)
+        ])
+
+        result = asyncio.run(handler.rollback_to_message("S1", 7, reason="误输入"))
+        assert result["success"]
+        assert result["superseded_messages"] == 4
+        assert result["superseded_snapshots"] == 1
+        assert result["analysis_summary"]["failure_domain"] == "io"
+        assert statements[1].startswith("UPDATE analysis_snapshots SET is_superseded")
+        assert statements[2].startswith("UPDATE analysis_messages SET is_superseded")
+        assert not any(stmt.startswith("DELETE") for stmt in statements)
+        assert statements[-2:] == ["COMMIT", "WRITTEN S1"]
+
+    def test_rollback_unknown_message(self):
+        """测试目标消息不存在时不做任何修改"""
+        import asyncio
+        from types import SimpleNamespace
+
+        handler, statements = self._handler([SimpleNamespace(first=lambda: None)])
+        result = asyncio.run(handler.rollback_to_message("S1", 99))
+        assert not result["success"]
+        assert len(statements) == 1
+
+    def test_sequence_continues_after_superseded_messages(self):
+        """测试回滚后新消息序号接在已回滚消息之后，不复用其序号"""
+        import asyncio
+        from types import SimpleNamespace
+        from src.agents.multi_turn_handler import MultiTurnConversationHandler
+
+        active = [
+            {"message_id": 1, "message_type": "user_input", "sequence_number": 1, "content": "log",
+             "content_type": "log", "is_correction": False, "corrected_message_id": None, "extracted_fields": {}},
+            {"message_id": 2, "message_type": "system_response", "sequence_number": 2, "content": "ok",
+             "content_type": "text", "is_correction": False, "corrected_message_id": None, "extracted_fields": {}},
+        ]
+
+        async def _messages(session_id):
+            return active
+
+        async def _max_sequence(session_id):
+            # 序号 3..6 的消息已回滚
+            return 6
+
+        handler = MultiTurnConversationHandler()
+        handler.db = SimpleNamespace(get_session_messages=_messages, get_max_sequence_number=_max_sequence)
+        context = asyncio.run(handler._get_conversation_context("S1"))
+
+        assert context["last_sequence"] == 6
+        assert [m["message_id"] for m in context["messages"]] == [1, 2]
+
+
+class TestDbPoolMetrics:
+    """数据库连接池配置与指标测试"""
+
+    def test_engine_options_from_settings(self):
+        """测试连接池参数和预编译语句缓存来自配置"""
+        from types import SimpleNamespace
+        from src.database.pool import engine_options, InstrumentedQueuePool
+
+        settings = SimpleNamespace(
+            DB_POOL_SIZE=7, DB_MAX_OVERFLOW=3, DB_POOL_TIMEOUT=2.5,
+            DB_POOL_RECYCLE=600, DB_POOL_PRE_PING=False, DB_STATEMENT_CACHE_SIZE=0
+        )
+        options = engine_options(settings)
+        assert options["poolclass"] is InstrumentedQueuePool
+        assert options["pool_size"] == 7
+        assert options["max_overflow"] == 3
+        assert options["pool_timeout"] == 2.5
+        assert options["connect_args"] == {"prepared_statement_cache_size": 0}
+
+    def test_checkout_latency_saturation_and_timeouts(self):
+        """测试借出耗时、占用率和超时计数"""
+        import asyncio
+        from sqlalchemy import exc
+        from sqlalchemy.util.concurrency import greenlet_spawn
+        from src.database.pool import InstrumentedQueuePool
+        from src.monitoring.metrics import get_metrics_registry
+
+        class _Connection:
+            def close(self):
+                pass
+
+            def rollback(self):
+                pass
+
+        pool = InstrumentedQueuePool(creator=_Connection, pool_size=1, max_overflow=0, timeout=0.01)
+        pool.metrics_name = "test-pool"
+
+        async def _scenario():
+            first = await greenlet_spawn(pool.connect)
+            assert pool.get_stats()["saturation"] == 1.0
+            with pytest.raises(exc.TimeoutError):
+                await greenlet_spawn(pool.connect)
+            await greenlet_spawn(first.close)
+
+        asyncio.run(_scenario())
+        stats = pool.get_stats()
+        assert stats["checkouts"] == 2
+        assert stats["timeouts"] == 1
+        assert stats["checked_out"] == 0
+        assert stats["saturation"] == 0.0
+        assert stats["checkout_p99_ms"] is not None
+
+        rendered = get_metrics_registry().render()
+        assert "# TYPE chip_fault_db_pool_saturation gauge" in rendered
+        assert 'chip_fault_db_pool_timeouts_total{pool="test-pool"' in rendered
+
+
+class TestReplicaRouter:
+    """只读副本路由测试"""
+
+    def test_routes_reads_by_lag_and_recent_writes(self, monkeypatch):
+        """测试延迟超限回落主库、刚写入的会话粘滞主库"""
+        from src.database import replica
+        from src.database.replica import ReplicaRouter
+
+        clock = [100.0]
+        monkeypatch.setattr(replica.time, "monotonic", lambda: clock[0])
+        router = ReplicaRouter(max_lag=5.0, sticky_seconds=1.0)
+
+        # 尚未测得延迟：副本视为不可用
+        assert not router.use_replica("S1")
+
+        router.lag = 0.5
+        assert router.use_replica("S1")
+
+        router.mark_written("S1")
+        assert not router.use_replica("S1")
+        assert router.use_replica("S2")
+
+        clock[0] += 1.6  # 超过 延迟 + 粘滞时间
+        assert router.use_replica("S1")
+
+        router.lag = 8.0
+        assert not router.use_replica("S2")
+        stats = router.get_stats()
+        assert stats["sticky_reads"] == 1
+        assert stats["lag_fallbacks"] == 2
+
+    def test_lag_check_failure_falls_back(self):
+        """测试副本不可达时回落主库"""
+        import asyncio
+        from src.database.replica import ReplicaRouter
+
+        class _Engine:
+            def connect(self):
+                raise ConnectionError("replica down")
+
+        router = ReplicaRouter()
+        router.lag = 0.1
+        asyncio.run(router.check(_Engine()))
+        assert router.lag is None
+        assert not router.replica_available
+        assert router.stats["check_failures"] == 1
+
+    def test_tracked_writes_are_bounded(self):
+        """测试写入记录数有上限，淘汰最早写入的会话"""
+        from src.database.replica import ReplicaRouter
+
+        router = ReplicaRouter(max_tracked=2)
+        for key in ("A", "B", "A", "C"):
+            router.mark_written(key)
+        assert list(router._written) == ["A", "C"]
+
+
+class TestPartitions:
+    """分区维护与归档测试"""
+
+    def test_partition_naming_and_bounds(self):
+        """测试月份换算、分区命名和UTC边界"""
+        from datetime import date
+        from src.database.partitions import add_months, partition_ddl, partition_month, partition_name
+
+        assert add_months(date(2026, 11, 1), 2) == date(2027, 1, 1)
+        assert add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+        assert partition_name("analysis_results", date(2026, 3, 1)) == "analysis_results_p202603"
+        assert partition_month("analysis_messages_p202512") == date(2025, 12, 1)
+        assert partition_month("analysis_messages_default") is None
+
+        ddl = partition_ddl("analysis_results", date(2026, 12, 1))
+        assert "FROM ('2026-12-01 00:00:00+00') TO ('2027-01-01 00:00:00+00')" in ddl
+        assert "toast_tuple_target" in ddl
+
+    def test_expired_partitions(self):
+        """测试只有超出保留期的月分区被归档，默认分区保留"""
+        from datetime import datetime, timezone
+        from src.database.partitions import PartitionArchiver
+
+        archiver = PartitionArchiver(retain_months=3)
+        partitions = [
+            "analysis_results_default",
+            "analysis_results_p202606", "analysis_results_p202607",
+            "analysis_results_p202608", "analysis_results_p202609",
+        ]
+        now = datetime(2026, 9, 15, tzinfo=timezone.utc)
+        assert archiver.expired(partitions, now) == ["analysis_results_p202606"]
+
+    def test_ensure_partitions_creates_missing(self):
+        """测试只创建缺失的分区，未分区的表跳过"""
+        import asyncio
+        from datetime import datetime, timezone
+        from src.database.partitions import ensure_partitions
+
+        conn = self._fake_conn()
+        now = datetime(2026, 10, 19, tzinfo=timezone.utc)
+        created = asyncio.run(ensure_partitions(conn, months_ahead=2, now=now))
+        assert created == ["analysis_results_p202611", "analysis_results_p202612"]
+        assert not any("analysis_messages_p" in sql for sql in conn.executed)
+        assert not any("DETACH" in sql for sql in conn.executed)
+
+    @staticmethod
+    def _fake_conn(default_rows_in=(), failing=()):
+        """分区表只有 analysis_results；default_rows_in: 默认分区中有行的月份下界"""
+        from contextlib import asynccontextmanager
+        from types import SimpleNamespace
+
+        class _Conn:
+            def __init__(self):
+                self.executed = []
+                self.rolled_back = 0
+
+            @asynccontextmanager
+            async def begin_nested(self):
+                try:
+                    yield
+                except Exception:
+                    self.rolled_back += 1
+                    raise
+
+            async def execute(self, statement, params=None):
+                sql = str(statement)
+                self.executed.append(sql)
+                if "pg_partitioned_table" in sql:
+                    return SimpleNamespace(scalar=lambda: params["table"] == "analysis_results")
+                if "pg_inherits" in sql:
+                    return SimpleNamespace(all=lambda: [("analysis_results_default",), ("analysis_results_p202610",)])
+                if "SELECT EXISTS" in sql:
+                    return SimpleNamespace(scalar=lambda: params["lo"] in default_rows_in)
+                if any(name in sql for name in failing):
+                    raise RuntimeError("updated partition constraint for default partition would be violated")
+                return SimpleNamespace(rowcount=3)
+
+        return _Conn()
+
+    def test_ensure_partitions_moves_rows_out_of_default(self):
+        """测试默认分区已有该月的行时摘除默认分区、移入新分区后挂回；单个分区失败不中断"""
+        import asyncio
+        from datetime import datetime, timezone
+        from src.database.partitions import ensure_partitions
+
+        conn = self._fake_conn(default_rows_in=("2026-11-01 00:00:00+00",), failing=("analysis_results_p202612",))
+        now = datetime(2026, 10, 19, tzinfo=timezone.utc)
+        created = asyncio.run(ensure_partitions(conn, months_ahead=2, now=now))
+
+        assert created == ["analysis_results_p202611"]
+        assert conn.rolled_back == 1
+        moves = [sql for sql in conn.executed if "analysis_results_p202611" in sql or "analysis_results_default" in sql]
+        assert moves[1].startswith("ALTER TABLE analysis_results DETACH PARTITION analysis_results_default")
+        assert moves[2].startswith("CREATE TABLE IF NOT EXISTS analysis_results_p202611")
+        assert "DELETE FROM analysis_results_default" in moves[3]
+        assert "INSERT INTO analysis_results_p202611" in moves[3]
+        assert moves[4] == "ALTER TABLE analysis_results ATTACH PARTITION analysis_results_default DEFAULT"
+
+    def test_models_are_range_partitioned(self):
+        """测试分区表DDL包含分区键和复合主键"""
+        from sqlalchemy.dialects import postgresql
+        from sqlalchemy.schema import CreateTable
+        from src.database.models import AnalysisMessage, AnalysisResult
+
+        dialect = postgresql.dialect()
+        ddl = str(CreateTable(AnalysisResult.__table__).compile(dialect=dialect))
+        assert "PARTITION BY RANGE (created_at)" in ddl
+        assert "PRIMARY KEY (id, created_at)" in ddl
+        assert "UNIQUE (analysis_id, created_at)" in ddl
+
+        ddl = str(CreateTable(AnalysisMessage.__table__).compile(dialect=dialect))
+        assert "PRIMARY KEY (message_id, created_at)" in ddl
+
+
+class TestBlobStore:
+    """内容寻址大对象存储测试"""
+
+    def test_offload_dedup_and_resolve(self, tmp_path):
+        """测试大文本存为引用、相同内容只存一份、短文本保持内联"""
+        import asyncio
+        from src.database.blobs import BlobStore, LocalBlobBackend, content_hash, is_blob_ref
+
+        store = BlobStore(LocalBlobBackend(str(tmp_path)), inline_max_bytes=64)
+        log = "[ERROR] 0XC0001 CPU core 0 fault detected\n" * 200
+
+        async def scenario():
+            first = await store.offload(log)
+            second = await store.offload(log)
+            short = await store.offload("补充：温度85度")
+            return first, second, short, await store.resolve(first)
+
+        first, second, short, resolved = asyncio.run(scenario())
+        digest = content_hash(log.encode("utf-8"))
+        assert first == second == f"blob:sha256:{digest}"
+        assert is_blob_ref(first)
+        assert short == "补充：温度85度"
+        assert resolved == log
+
+        path = tmp_path / digest[:2] / digest[2:4] / f"{digest}.zst"
+        assert path.exists()
+        assert path.stat().st_size < len(log) // 10
+        assert store.stats["writes"] == 1
+        assert store.stats["dedup_hits"] == 1
+
+    def test_corrupted_blob_is_rejected(self, tmp_path):
+        """测试对象内容与哈希不符时报错"""
+        import zstandard
+        from src.database.blobs import BlobStore, LocalBlobBackend
+
+        store = BlobStore(LocalBlobBackend(str(tmp_path)), inline_max_bytes=0)
+        digest = store.put_bytes(b"original log")
+        store.backend.write(digest, zstandard.ZstdCompressor().compress(b"tampered log"))
+        with pytest.raises(ValueError):
+            store.get_bytes(digest)
+
+    def test_snapshot_stores_references(self, tmp_path, monkeypatch):
+        """测试快照中的累积日志和报告只保存引用"""
+        import asyncio
+        from contextlib import asynccontextmanager
+        from types import SimpleNamespace
+        from src.agents.multi_turn_handler import MultiTurnConversationHandler
+        from src.database import blobs
+
+        monkeypatch.setattr(blobs, "_blob_store", blobs.BlobStore(blobs.LocalBlobBackend(str(tmp_path)), inline_max_bytes=64))
+        added = []
+
+        class _Session:
+            def add(self, obj):
+                added.append(obj)
+
+            async def commit(self):
+                pass
+
+        @asynccontextmanager
+        async def _factory():
+            yield _Session()
+
+        handler = MultiTurnConversationHandler()
+        handler.db = SimpleNamespace(_session_factory=_factory, mark_written=lambda key: None)
+
+        log = "[ERROR] DDR training failed on channel 1\n" * 50
+        context = {
+            "session_id": "S1",
+            "messages": [{"message_id": 1, "content": log}, {"message_id": 2, "content": "短消息"}],
+            "accumulated_logs": [log, "短消息"]
+        }
+        result = {"final_root_cause": {"failure_domain": "memory"}, "infer_report": "报告正文" * 100}
+        asyncio.run(handler._save_snapshot("S1", 2, context, result))
+
+        snapshot = added[0]
+        ref = snapshot.accumulated_context["accumulated_logs"][0]
+        assert blobs.is_blob_ref(ref)
+        assert snapshot.accumulated_context["messages"][0]["content"] == ref
+        assert snapshot.accumulated_context["accumulated_logs"][1] == "短消息"
+        assert blobs.is_blob_ref(snapshot.analysis_result["infer_report"])
+        assert snapshot.summary["failure_domain"] == "memory"
+        assert context["accumulated_logs"][0] == log
+
+        resolved = asyncio.run(blobs.resolve_fields(snapshot.analysis_result, ("infer_report",)))
+        assert resolved["infer_report"] == result["infer_report"]
+
+    def test_missing_blob_keeps_session_history(self, tmp_path, monkeypatch):
+        """测试单条消息的大对象丢失时保留引用，其余消息照常返回"""
+        import asyncio
+        from contextlib import asynccontextmanager
+        from types import SimpleNamespace
+        from src.database import blobs
+        from src.database.connection import DatabaseManager
+
+        store = blobs.BlobStore(blobs.LocalBlobBackend(str(tmp_path)), inline_max_bytes=16)
+        monkeypatch.setattr(blobs, "_blob_store", store)
+        log = "[ERROR] L3 cache parity error\n" * 20
+        ref = asyncio.run(store.offload(log))
+        missing = "blob:sha256:" + "0" * 64
+
+        def _message(seq, content):
+            return SimpleNamespace(
+                message_id=seq, session_id="S1", message_type="user_input", sequence_number=seq,
+                content=content, content_type="log", is_correction=False, corrected_message_id=None,
+                extracted_fields=None, created_at=None
+            )
+
+        rows = [_message(1, ref), _message(2, missing), _message(3, "补充说明")]
+
+        class _Session:
+            async def execute(self, stmt):
+                return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: rows))
+
+        @asynccontextmanager
+        async def _factory():
+            yield _Session()
+
+        manager = object.__new__(DatabaseManager)
+        manager._session_factory = _factory
+        messages = asyncio.run(manager.get_session_messages("S1"))
+
+        assert [m["sequence_number"] for m in messages] == [1, 2, 3]
+        assert messages[0]["content"] == log
+        assert messages[1]["content"] == missing
+        assert messages[2]["content"] == "补充说明"
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "--tb=short"])